@@ -0,0 +1,63 @@
+"""
+Micro-benchmark of template dataset creation time per product format, for obsarray
+creation from deep copied variables definitions (before) and creation from the compiled
+format blueprints of HypernetsDSBuilder (after)
+"""
+
+import copy
+import timeit
+from unittest.mock import MagicMock
+import obsarray
+from hypernets_processor.context import Context
+from hypernets_processor.data_io.hypernets_ds_builder import (
+    HypernetsDSBuilder,
+    create_ds_from_blueprint,
+)
+
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = "0.0"
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+DIM_SIZES = {"wavelength": 1441, "scan": 60, "series": 10}
+N_REPEAT = 20
+
+
+def benchmark_ds_templates(dim_sizes=DIM_SIZES, n_repeat=N_REPEAT):
+    hdsb = HypernetsDSBuilder(context=Context(logger=MagicMock()))
+
+    total_before = 0.0
+    total_after = 0.0
+    print("%-10s %12s %12s" % ("format", "before / ms", "after / ms"))
+    for ds_format in hdsb.return_ds_formats():
+        dims = {
+            dim: dim_sizes.get(dim, 4)
+            for dim in hdsb.create_empty_dim_sizes_dict(ds_format)
+        }
+        variables_dict = hdsb.variables_dict_defs[ds_format]
+        blueprint = hdsb.return_ds_format_blueprint(ds_format)
+
+        before = timeit.timeit(
+            lambda: obsarray.create_ds(copy.deepcopy(variables_dict), dims),
+            number=n_repeat,
+        )
+        after = timeit.timeit(
+            lambda: create_ds_from_blueprint(blueprint, dims), number=n_repeat
+        )
+
+        total_before += before / n_repeat
+        total_after += after / n_repeat
+        print(
+            "%-10s %12.2f %12.2f"
+            % (ds_format, before / n_repeat * 1e3, after / n_repeat * 1e3)
+        )
+    print("%-10s %12.2f %12.2f" % ("total", total_before * 1e3, total_after * 1e3))
+
+
+if __name__ == "__main__":
+    benchmark_ds_templates()
@@ -1,3 +1,22 @@
-from hypernets_processor.data_io.hypernets_ds_builder import HypernetsDSBuilder
-from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
-from hypernets_processor.scheduler import Scheduler
+"""
+hypernets_processor package, with main classes imported when first accessed (so the
+command line tools start without loading the processing dependencies)
+"""
+
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    "HypernetsDSBuilder": "hypernets_processor.data_io.hypernets_ds_builder",
+    "HypernetsWriter": "hypernets_processor.data_io.hypernets_writer",
+    "Scheduler": "hypernets_processor.scheduler",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    raise AttributeError("module 'hypernets_processor' has no attribute " + repr(name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
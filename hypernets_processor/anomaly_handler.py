@@ -4,7 +4,6 @@ AnomalyHandler class
 
 from hypernets_processor.version import __version__
 from hypernets_processor.data_io.format.anomalies import ANOMALIES_DICT
-from hypernets_processor.data_io.hypernets_db_builder import open_database
 
 
 """___Authorship___"""
@@ -39,6 +38,8 @@ class AnomalyHandler:
         if anomaly_db is not None:
             self.anomaly_db = anomaly_db
         elif url is not None:
+            from hypernets_processor.data_io.hypernets_db_builder import open_database
+
             self.anomaly_db = open_database(url, db_format="anomaly", context=context)
 
         self.anomalies_dict = anomalies_dict
@@ -12,11 +12,11 @@ from hypernets_processor.data_io.data_templates import DataTemplates
 from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
 from hypernets_processor.plotting.plotting import Plotting
 from hypernets_processor.data_utils.average import Average
+from hypernets_processor.data_utils.grouping import group_index, Grouping
 
 import punpy
 
 import numpy as np
-import matplotlib.pyplot as plt
 from obsarray.templater.dataset_util import DatasetUtil
 
 """___Authorship___"""
@@ -70,15 +70,7 @@ class Calibrate:
             measurandstring, dataset_l0_masked, swir
         )
 
-        prop = punpy.MCPropagation(
-            self.context.get_config_value("mcsteps"), dtype="float32", MCdimlast=True
-        )
-
-        calibrate_function = self._measurement_function_factory(
-            prop=prop, repeat_dims="scan", yvariable=measurandstring
-        ).get_measurement_function(
-            self.context.get_config_value("measurement_function_calibrate")
-        )
+        calibrate_function = self.get_calibrate_function(measurandstring, "scan")
 
         if (
             self.context.get_config_value("uncertainty_l1a")
@@ -148,14 +140,7 @@ class Calibrate:
                 ),
             )
 
-        prop = punpy.MCPropagation(
-            self.context.get_config_value("mcsteps"), dtype="float32", MCdimlast=True
-        )
-        calibrate_function = self._measurement_function_factory(
-            prop=prop, repeat_dims="series", yvariable=measurandstring
-        ).get_measurement_function(
-            self.context.get_config_value("measurement_function_calibrate")
-        )
+        calibrate_function = self.get_calibrate_function(measurandstring, "series")
 
         if self.context.get_config_value("mcsteps") > 0:
             dataset_l1b = calibrate_function.propagate_ds_specific(
@@ -230,27 +215,143 @@ class Calibrate:
 
         return dataset_l1b
 
+    def get_calibrate_function(self, measurandstring, repeat_dims):
+        """
+        Returns calibration measurement function, set up for uncertainty propagation
+
+        By default, Monte Carlo samples are drawn and propagated separately for each
+        index of repeat_dims. If calibration_batched_mc is set, samples are instead drawn
+        once for the whole sequence and the measurement function is evaluated over all
+        scans/series in a single stacked array, with error-correlation of the output
+        calculated along wavelength. If calibration_float32 is set, the measurement
+        function is calculated in single precision.
+
+        :type measurandstring: str
+        :param measurandstring: measurand, "radiance" or "irradiance"
+        :type repeat_dims: str
+        :param repeat_dims: dimension of repeated measurements ("scan" or "series")
+        :return: calibration measurement function
+        :rtype: punpy.MeasurementFunction
+        """
+
+        prop = punpy.MCPropagation(
+            self.context.get_config_value("mcsteps"), dtype="float32", MCdimlast=True
+        )
+
+        if self.context.get_config_value("calibration_batched_mc"):
+            kwargs = dict(repeat_dims=None, corr_dims="wavelength")
+        else:
+            kwargs = dict(repeat_dims=repeat_dims)
+
+        calibrate_function = self._measurement_function_factory(
+            prop=prop, yvariable=measurandstring, **kwargs
+        ).get_measurement_function(
+            self.context.get_config_value("measurement_function_calibrate")
+        )
+
+        if self.context.get_config_value("calibration_float32"):
+            calibrate_function.dtype = np.float32
+
+        return calibrate_function
+
     def find_nearest_black(self, dataset, acq_time, int_time):
-        ids = np.where(
-            (
-                abs(dataset["acquisition_time"] - acq_time)
-                == min(abs(dataset["acquisition_time"] - acq_time))
+        avg_black, std_black, dark_outlier = self.find_nearest_blacks(
+            dataset, np.array([acq_time]), np.array([int_time])
+        )
+        return avg_black[:, 0], std_black[:, 0], dark_outlier[0]
+
+    @staticmethod
+    def match_blacks(dataset, acq_times, int_times):
+        """
+        Returns black scans nearest in acquisition time, with same integration time, for
+        each given time
+
+        Nearest acquisition time is found over all black scans, irrespective of
+        integration time. Differences of unsigned acquisition times wrap around, so for
+        unsigned times the nearest black is the first at or after the given time (or the
+        first black if there is none after).
+
+        :type dataset: xarray.Dataset
+        :param dataset: black dataset
+        :type acq_times: numpy.ndarray
+        :param acq_times: acquisition times to match
+        :type int_times: numpy.ndarray
+        :param int_times: integration times to match
+        :return: matched black scans, shape (len(acq_times), len(dataset["scan"]))
+        :rtype: numpy.ndarray
+        """
+
+        times_black = dataset["acquisition_time"].values
+        times = np.unique(times_black)
+        acq_times = np.asarray(acq_times)
+
+        if len(times) == 0:
+            return np.zeros((len(acq_times), 0), dtype=bool)
+
+        after = np.searchsorted(times, acq_times)
+        if np.issubdtype(times_black.dtype, np.unsignedinteger):
+            nearest = times[np.where(after < len(times), after, 0)]
+            match = times_black[None, :] == nearest[:, None]
+        else:
+            before = times[np.maximum(after - 1, 0)].astype(np.float64)
+            after = times[np.minimum(after, len(times) - 1)].astype(np.float64)
+            acq_times = acq_times.astype(np.float64)
+            distance = np.minimum(np.abs(before - acq_times), np.abs(after - acq_times))
+            match = (
+                np.abs(times_black[None, :].astype(np.float64) - acq_times[:, None])
+                == distance[:, None]
             )
-            & (dataset["integration_time"] == int_time)
-        )[0]
+
+        return match & (
+            dataset["integration_time"].values[None, :] == np.asarray(int_times)[:, None]
+        )
+
+    def find_nearest_blacks(self, dataset, acq_times, int_times):
+        """
+        Returns mean and standard deviation of nearest black scans (with outliers removed)
+        for each given acquisition and integration time
+
+        :type dataset: xarray.Dataset
+        :param dataset: black dataset
+        :type acq_times: numpy.ndarray
+        :param acq_times: acquisition times to match
+        :type int_times: numpy.ndarray
+        :param int_times: integration times to match
+        :return: mean black (wavelength, time), standard deviation of black (wavelength,
+        time), whether outliers were found in black (time)
+        :rtype: tuple
+        """
+
+        match = self.match_blacks(dataset, acq_times, int_times)
+
+        # statistics are computed once per unique set of black scans
+        match_unique, match_index = np.unique(match, axis=0, return_inverse=True)
+        match_index = match_index.reshape(-1)
+
+        # matched sets of black scans are disjoint, so outliers are found for all at once
+        group, scans = np.nonzero(match_unique)
+        dn_black = dataset["digital_number"].values[:, scans]
         # todo check if integration time always has to be same
-        dark_mask = self.qual.outlier_checks(dataset["digital_number"].values[:, ids])
-        if np.sum(dark_mask) > 0:
-            dark_outlier = 1
-        else:
-            dark_outlier = 0
-        avg_black_series = np.mean(
-            dataset["digital_number"].values[:, ids[np.where(dark_mask == 0)]], axis=1
+        dark_mask = self.qual.grouped_outlier_checks(
+            dn_black, group, len(match_unique)
         )
-        std_black_series = np.std(
-            dataset["digital_number"].values[:, ids[np.where(dark_mask == 0)]], axis=1
+        dark_outlier = 1 * (
+            np.bincount(group, weights=dark_mask, minlength=len(match_unique)) > 0
+        )
+
+        # sets without matching black scans have nan statistics
+        grouping = Grouping(group, mask=dark_mask)
+        avg_black = np.full((len(dn_black), len(match_unique)), np.nan)
+        std_black = np.full((len(dn_black), len(match_unique)), np.nan)
+        avg_black[:, grouping.ids], std_black[:, grouping.ids] = grouping.mean_std(
+            dn_black
+        )
+
+        return (
+            avg_black[:, match_index],
+            std_black[:, match_index],
+            dark_outlier[match_index],
         )
-        return avg_black_series, std_black_series, dark_outlier
 
     def preprocess_l0(self, datasetl0, datasetl0_bla, dataset_calib):
         """
@@ -274,14 +375,14 @@ class Calibrate:
         #        datasetl0masked = datasetl0masked.assign_coords(wavelength=wavs)
         #        datasetl0masked_bla = datasetl0masked_bla.assign_coords(wavelength=wavs)
 
-        series_ids = np.unique(datasetl0masked["series_id"])
-        series_ids_bla = np.unique(datasetl0masked["series_id"] + 1)
-        scanids = np.concatenate(
-            [
-                np.where(datasetl0masked_bla["series_id"].values == sid)[0]
-                for sid in series_ids_bla
-            ]
+        # scans are grouped by series once, and blacks are the series following each
+        series_ids, series_index, series_first = group_index(
+            datasetl0masked["series_id"].values
         )
+        series_ids_bla = np.unique(series_ids + 1)
+        bla_series = datasetl0masked_bla["series_id"].values
+        scanids = np.flatnonzero(np.isin(bla_series, series_ids_bla))
+        scanids = scanids[np.argsort(bla_series[scanids], kind="stable")]
         datasetl0masked_bla = datasetl0masked_bla.isel(scan=scanids)
 
         # add variables for dark and uncertainties
@@ -347,31 +448,22 @@ class Calibrate:
         urand_dark_signals_radscans = np.zeros_like(
             datasetl0masked["digital_number"].values, dtype=np.float32
         )
-        dark_outliers_radscans = np.zeros_like(datasetl0masked["quality_flag"].values)
-
-        for i in range(len(series_ids)):
-            ids = np.where(datasetl0masked["series_id"] == series_ids[i])[0]
-            (
-                dark_signal_rad,
-                std_dark_signal_rad,
-                dark_outlier_rad,
-            ) = self.find_nearest_black(
-                datasetl0masked_bla,
-                datasetl0masked["acquisition_time"].values[ids[0]],
-                datasetl0masked["integration_time"].values[ids[0]],
-            )
-            # plt.plot(dark_signal)
-            # plt.savefig("plot_dark_test.png")
-            for id in ids:
-                (
-                    dark_signals_radscans[:, id],
-                    urand_dark_signals_radscans[:, id],
-                    dark_outliers_radscans[id],
-                ) = (
-                    dark_signal_rad,
-                    np.abs(std_dark_signal_rad / dark_signal_rad * 100),
-                    dark_outlier_rad,
-                )
+
+        # match darks for first scan of each series
+        (
+            dark_signal_series,
+            std_dark_signal_series,
+            dark_outlier_series,
+        ) = self.find_nearest_blacks(
+            datasetl0masked_bla,
+            datasetl0masked["acquisition_time"].values[series_first],
+            datasetl0masked["integration_time"].values[series_first],
+        )
+        dark_signals_radscans[:] = dark_signal_series[:, series_index]
+        urand_dark_signals_radscans[:] = np.abs(
+            std_dark_signal_series / dark_signal_series * 100
+        )[:, series_index]
+        dark_outlier_rad = dark_outlier_series[-1] if len(series_ids) > 0 else 0
 
         datasetl0masked, mask = self.qual.perform_quality_check_L0A(
             datasetl0masked, series_ids
@@ -383,35 +475,12 @@ class Calibrate:
             "dark_masked",
         )  # for i in range(len(mask))]
 
-        # calculate and store random uncertainties on radiance/irradiance
-        rand = np.zeros_like(datasetl0masked["digital_number"].values, dtype=np.float32)
-        for i in range(len(series_ids)):
-            ids = np.where(datasetl0masked["series_id"] == series_ids[i])[0]
-            ids_notmasked = np.where(
-                (datasetl0masked["series_id"] == series_ids[i]) & (mask == 0)
-            )[0]
-            if len(ids_notmasked) > 0:
-                std = np.std(
-                    (
-                        datasetl0masked["digital_number"].values[:, ids_notmasked]
-                        - dark_signals_radscans[:, ids_notmasked]
-                    ),
-                    axis=1,
-                    dtype=np.float32,
-                )
-                avg = np.mean(
-                    (
-                        datasetl0masked["digital_number"].values[:, ids_notmasked]
-                        - dark_signals_radscans[:, ids_notmasked]
-                    ),
-                    axis=1,
-                    dtype=np.float32,
-                )
-                for ii, id in enumerate(ids):
-                    rand[:, id] = np.abs(std / avg * 100)
-            else:
-                for ii, id in enumerate(ids):
-                    rand[:, id] = np.nan
+        # calculate and store random uncertainties on radiance/irradiance, from the
+        # unmasked scans of each series
+        avg, std = Grouping(datasetl0masked["series_id"].values, mask=mask).mean_std(
+            datasetl0masked["digital_number"].values - dark_signals_radscans
+        )
+        rand = np.abs(std / avg * 100)[:, series_index].astype(np.float32)
 
         datasetl0masked["u_rel_random_digital_number"].values = rand
         datasetl0masked["dark_signal"].values = dark_signals_radscans
@@ -439,27 +508,10 @@ class Calibrate:
         datasetl0masked_bla["u_rel_random_digital_number"] = DN_rand_bla
 
         # now calculate random uncertainties for blacks
-        rand = np.zeros_like(datasetl0masked_bla["u_rel_random_digital_number"].values)
-        for i in range(len(series_ids_bla)):
-            ids = np.where(datasetl0masked_bla["series_id"] == series_ids_bla[i])[0]
-            ids_masked = np.where(
-                (datasetl0masked_bla["series_id"] == series_ids_bla[i]) & (mask == 0)
-            )[0]
-            if len(ids_masked) > 0:
-                std = np.std(
-                    (datasetl0masked_bla["digital_number"].values[:, ids_masked]),
-                    axis=1,
-                )
-                avg = np.mean(
-                    (datasetl0masked_bla["digital_number"].values[:, ids_masked]),
-                    axis=1,
-                )
-                for ii, id in enumerate(ids):
-                    rand[:, id] = np.abs(std / avg * 100)
-            else:
-                for ii, id in enumerate(ids):
-                    rand[:, id] = np.nan
-
-            datasetl0masked_bla["u_rel_random_digital_number"].values = rand
+        grouping_bla = Grouping(datasetl0masked_bla["series_id"].values, mask=mask)
+        avg, std = grouping_bla.mean_std(datasetl0masked_bla["digital_number"].values)
+        datasetl0masked_bla["u_rel_random_digital_number"].values = np.abs(
+            std / avg * 100
+        )[:, grouping_bla.index].astype(np.float32)
 
         return datasetl0masked, datasetl0masked_bla
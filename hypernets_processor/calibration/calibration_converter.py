@@ -14,6 +14,7 @@ import os.path
 import glob
 import comet_maths as cm
 import xarray
+from collections import OrderedDict
 from configparser import ConfigParser
 from datetime import datetime
 
@@ -25,6 +26,75 @@ __maintainer__ = "Pieter De Vis"
 __email__ = "Pieter.De.Vis@npl.co.uk"
 __status__ = "Development"
 
+# default memory cap of the calibration dataset cache (MB)
+CALIBRATION_CACHE_SIZE = 512
+
+
+class CalibrationCache:
+    """
+    Least recently used cache of interpolated calibration datasets, shared by all
+    CalibrationConverter instances of a process
+
+    :type max_size: float
+    :param max_size: memory cap of cached datasets (MB)
+    """
+
+    def __init__(self, max_size=CALIBRATION_CACHE_SIZE):
+        self.max_size = max_size
+        self.datasets = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns cached dataset for key, or None if not cached
+
+        :param key: cache key
+        :return: calibration dataset
+        :rtype: xarray.Dataset
+        """
+
+        ds = self.datasets.get(key)
+        if ds is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.datasets.move_to_end(key)
+        return ds
+
+    def put(self, key, ds):
+        """
+        Adds dataset to cache, evicting least recently used datasets above the memory cap
+
+        :param key: cache key
+        :type ds: xarray.Dataset
+        :param ds: calibration dataset
+        """
+
+        if key in self.datasets:
+            self.nbytes -= self.datasets.pop(key).nbytes
+
+        self.datasets[key] = ds
+        self.nbytes += ds.nbytes
+
+        while self.datasets and self.nbytes > self.max_size * 1e6:
+            self.nbytes -= self.datasets.popitem(last=False)[1].nbytes
+
+    def clear(self):
+        """
+        Removes all datasets from cache and resets counters
+        """
+
+        self.datasets.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+
+CALIBRATION_CACHE = CalibrationCache()
+
 
 class CalibrationConverter:
     def __init__(self, context):
@@ -37,7 +107,6 @@ class CalibrationConverter:
         self.path_netcdf = os.path.join(
             dir_path, "hypernets_processor/calibration/calibration_files", "HYPSTAR_cal"
         )
-        context.set_config_value("product_format", "netcdf")
         self.templ = DataTemplates(context)
         self.writer = HypernetsWriter(context)
         self.context = context
@@ -60,26 +129,123 @@ class CalibrationConverter:
         return ds
 
 
-    def interpolate_calibration_ds(self,ds,sequence_dt64):
-        ds = self.convert_coordinates_dt64(ds)
+    def calibration_date_indexers(self, ds, sequence_dt64):
+        """
+        Returns, for each date coordinate of calibration dataset, the index of the
+        calibration to use or the date to interpolate the calibrations to
+
+        :type ds: xarray.Dataset
+        :param ds: calibration dataset, with datetime date coordinates
+        :type sequence_dt64: numpy.datetime64
+        :param sequence_dt64: sequence datetime
+        :return: index or date per date coordinate
+        :rtype: dict
+        """
+
+        indexers = {}
         for coord in ["calibrationdates","nonlineardates","wavdates"]:
             dt64s=ds[coord].values
             if self.context.get_config_value("calibration_interpolation_method")=="previous" or sequence_dt64>np.max(dt64s):
-                i = [
+                indexers[coord] = [
                     x
                     for x, date in enumerate(dt64s)
                     if date < sequence_dt64
                 ][-1]
+            elif sequence_dt64<=np.max(dt64s) and sequence_dt64>=np.min(dt64s):
+                indexers[coord] = sequence_dt64
+            else:
+                raise NotImplementedError
+        return indexers
+
+    def interpolate_calibration_ds(self,ds,sequence_dt64):
+        ds = self.convert_coordinates_dt64(ds)
+        return self.select_calibration_ds(
+            ds, self.calibration_date_indexers(ds, sequence_dt64)
+        )
+
+    def select_calibration_ds(self, ds, indexers):
+        """
+        Returns calibration dataset at given calibration indices or interpolation dates
+
+        :type ds: xarray.Dataset
+        :param ds: calibration dataset, with datetime date coordinates
+        :type indexers: dict
+        :param indexers: index or date per date coordinate, from calibration_date_indexers
+        :return: calibration dataset
+        :rtype: xarray.Dataset
+        """
+
+        for coord, i in indexers.items():
+            if isinstance(i, int):
                 ds = ds.isel(
                     indexers={coord: i}
                 )
-            elif sequence_dt64<=np.max(dt64s) and sequence_dt64>=np.min(dt64s):
-                ds = ds.interp(coords={coord:sequence_dt64},
-                               method=self.context.get_config_value("calibration_interpolation_method"))
             else:
-                raise NotImplementedError
+                ds = ds.interp(coords={coord:i},
+                               method=self.context.get_config_value("calibration_interpolation_method"))
         return ds
 
+    def read_calib_file(self, instrument_id, path, sequence_dt64, swir=False):
+        """
+        Returns calibration dataset from file, interpolated to sequence datetime.
+
+        Interpolated datasets are cached by CALIBRATION_CACHE, keyed by instrument,
+        calibration file and modification time, swir flag and calibration dates used,
+        so sequences sharing a calibration epoch reuse the same read-only dataset.
+
+        :type instrument_id: int
+        :param instrument_id: hypstar serial number
+        :type path: str
+        :param path: calibration file path
+        :type sequence_dt64: numpy.datetime64
+        :param sequence_dt64: sequence datetime
+        :type swir: bool
+        :param swir: (optional) switch for swir calibration file, default False
+        :return: calibration dataset
+        :rtype: xarray.Dataset
+        """
+
+        if not os.path.exists(path):
+            raise IOError(path + " calibration file does not exist")
+
+        cache_size = self.context.get_config_value("calibration_cache_size")
+        CALIBRATION_CACHE.max_size = (
+            CALIBRATION_CACHE_SIZE if cache_size is None else cache_size
+        )
+        if CALIBRATION_CACHE.max_size <= 0:
+            return self.interpolate_calibration_ds(
+                xarray.open_dataset(path), sequence_dt64
+            )
+
+        with xarray.open_dataset(path) as ds:
+            ds = self.convert_coordinates_dt64(ds)
+            indexers = self.calibration_date_indexers(ds, sequence_dt64)
+            key = (
+                instrument_id,
+                os.path.basename(path),
+                os.path.getmtime(path),
+                swir,
+                self.context.get_config_value("calibration_interpolation_method"),
+                tuple(indexers.items()),
+            )
+
+            calibration_data = CALIBRATION_CACHE.get(key)
+            if calibration_data is None:
+                calibration_data = self.select_calibration_ds(ds, indexers).load()
+                for var in calibration_data.variables.values():
+                    if isinstance(var.data, np.ndarray):
+                        var.data.flags.writeable = False
+                CALIBRATION_CACHE.put(key, calibration_data)
+
+        if self.context.logger is not None:
+            self.context.logger.debug(
+                "Calibration cache: {} hits, {} misses".format(
+                    CALIBRATION_CACHE.hits, CALIBRATION_CACHE.misses
+                )
+            )
+
+        return calibration_data
+
     def read_calib_files(self, sequence_path):
 
         metadata = ConfigParser()
@@ -106,30 +272,19 @@ class CalibrationConverter:
             instrument_id
         )  # self.context.get_config_value("hypstar_cal_number"))
         hypstar_path = os.path.join(self.path_netcdf, hypstar)
-        name = "HYPERNETS_CAL_" + hypstar.upper() + "_RAD_v" + str(self.version) + ".nc"
+        sequence_dt64 = np.datetime64(parse_sequence_path(sequence_path)["datetime"])
 
         # print("using calibration file:", name)
 
-        if os.path.exists(os.path.join(hypstar_path, name)):
-            calibration_data_rad = xarray.open_dataset(os.path.join(hypstar_path, name))
-        else:
-            raise IOError(
-                os.path.join(hypstar_path, name) + " calibration file does not exist"
-            )
+        name = "HYPERNETS_CAL_" + hypstar.upper() + "_RAD_v" + str(self.version) + ".nc"
+        calibration_data_rad = self.read_calib_file(
+            instrument_id, os.path.join(hypstar_path, name), sequence_dt64
+        )
 
         name = "HYPERNETS_CAL_" + hypstar.upper() + "_IRR_v" + str(self.version) + ".nc"
-
-        if os.path.exists(os.path.join(hypstar_path, name)):
-            calibration_data_irr = xarray.open_dataset(os.path.join(hypstar_path, name))
-        else:
-            raise IOError(
-                os.path.join(hypstar_path, name) + " calibration file does not exist"
-            )
-
-        sequence_dt64 = np.datetime64(parse_sequence_path(sequence_path)["datetime"])
-
-        calibration_data_rad = self.interpolate_calibration_ds(calibration_data_rad,sequence_dt64)
-        calibration_data_irr = self.interpolate_calibration_ds(calibration_data_irr,sequence_dt64)
+        calibration_data_irr = self.read_calib_file(
+            instrument_id, os.path.join(hypstar_path, name), sequence_dt64
+        )
 
         if self.context.get_config_value("network") == "l":
             name = (
@@ -139,15 +294,9 @@ class CalibrationConverter:
                     + str(self.version)
                     + ".nc"
             )
-            if os.path.exists(os.path.join(hypstar_path, name)):
-                calibration_data_rad_swir = xarray.open_dataset(
-                    os.path.join(hypstar_path, name)
-                )
-            else:
-                raise IOError(
-                    os.path.join(hypstar_path, name)
-                    + " calibration file does not exist"
-                )
+            calibration_data_rad_swir = self.read_calib_file(
+                instrument_id, os.path.join(hypstar_path, name), sequence_dt64, swir=True
+            )
 
             name = (
                     "HYPERNETS_CAL_"
@@ -156,18 +305,9 @@ class CalibrationConverter:
                     + str(self.version)
                     + ".nc"
             )
-            if os.path.exists(os.path.join(hypstar_path, name)):
-                calibration_data_irr_swir = xarray.open_dataset(
-                    os.path.join(hypstar_path, name)
-                )
-            else:
-                raise IOError(
-                    os.path.join(hypstar_path, name)
-                    + " calibration file does not exist"
-                )
-
-            calibration_data_rad_swir = self.interpolate_calibration_ds(calibration_data_rad_swir,sequence_dt64)
-            calibration_data_irr_swir = self.interpolate_calibration_ds(calibration_data_irr_swir,sequence_dt64)
+            calibration_data_irr_swir = self.read_calib_file(
+                instrument_id, os.path.join(hypstar_path, name), sequence_dt64, swir=True
+            )
 
         #
         # if self.context.get_config_value("calibration_interpolation_method")=="previous" or sequence_datetime>np.max(calibration_data_times):
@@ -334,6 +474,7 @@ class CalibrationConverter:
                     calib_data,
                     directory=hypstar_path,
                     overwrite=True,
+                    fmt="netcdf",
                     encodefloat32=False,
                 )
                 if hypstar[8] == "2":
@@ -352,6 +493,7 @@ class CalibrationConverter:
                         calib_data,
                         directory=hypstar_path,
                         overwrite=True,
+                        fmt="netcdf",
                         encodefloat32=False,
                     )
 
@@ -3,34 +3,51 @@ import numpy as np
 
 
 class StandardMeasurementFunction(MeasurementFunction):
+    # dtype of calculation (e.g. np.float32), if None dtype of inputs
+    dtype = None
+
     def meas_function(self, digital_number, gains, dark_signal, non_linear, int_time):
         """
         This function implements the measurement function.
         Each of the arguments can be either a scalar or a vector (1D-array).
         """
-        DN = digital_number - dark_signal
+        DN = np.subtract(digital_number, dark_signal, dtype=self.dtype)
         DN[DN == 0] = 1
 
         corrected_DN = self.correct_nonlin(DN, non_linear)
 
         gains = np.squeeze(gains)
-        if gains.ndim == 1:
-            return gains[:, None] * corrected_DN / int_time * 1000
-        else:
-            return gains * corrected_DN / int_time * 1000
+        if gains.ndim < corrected_DN.ndim:
+            # gains have no series/scan dimension, but may have trailing MC dimension
+            gains = np.expand_dims(gains, 1)
+
+        # gains * corrected_DN / int_time * 1000, calculated in place
+        dtype = self.dtype
+        if dtype is None:
+            dtype = np.result_type(corrected_DN, gains, int_time)
+        corrected_DN = corrected_DN.astype(dtype, copy=False)
+        corrected_DN *= gains
+        corrected_DN /= int_time
+        corrected_DN *= 1000
+        return corrected_DN
 
     def correct_nonlin(self, DN, non_linear):
-        corrected_DN = np.zeros_like(DN)
-        if non_linear.ndim > 1:
-            for i in range(len(non_linear[0])):
-                corrected_DN[..., i] = self.correct_nonlin(DN[..., i], non_linear[:, i])
+        """
+        Returns digital numbers corrected for non-linearity, i.e. divided by the
+        non-linearity polynomial (coefficients in increasing order). The polynomial is
+        evaluated with Horner's scheme for all samples at once, where coefficients have
+        a trailing MC dimension matching that of the digital numbers.
+        """
+        if not np.issubdtype(DN.dtype, np.floating):
+            DN = DN.astype(np.float64)
 
-        else:
-            non_lin_func = np.poly1d(np.flip(non_linear))
-            corrected_DN = DN / non_lin_func(DN)
+        coefficients = np.asarray(non_linear, dtype=DN.dtype)
+        polynomial = np.zeros_like(DN)
+        for coefficient in coefficients[::-1]:
+            polynomial *= DN
+            polynomial += coefficient
 
-            # print(np.mean((corrected_DN)/DN),non_linear,non_linear.dtype)
-        return corrected_DN
+        return np.divide(DN, polynomial, out=polynomial)
 
     @staticmethod
     def get_name():
@@ -3,13 +3,23 @@ Tests for Calibrate class
 """
 
 import unittest
+import os
+import shutil
+import tempfile
 from unittest.mock import MagicMock, patch, call
 from hypernets_processor.version import __version__
 from hypernets_processor.test.test_functions import (
     setup_test_job_config,
     setup_test_processor_config,
 )
+from hypernets_processor.context import Context
 from hypernets_processor.calibration.calibrate import Calibrate
+from hypernets_processor.calibration.calibration_converter import CalibrationConverter
+from hypernets_processor.calibration.tests.test_calibration_converter import (
+    hypstar_directory,
+    setup_sequence,
+)
+from obsarray.templater.dataset_util import DatasetUtil
 import xarray as xr
 import numpy as np
 
@@ -32,10 +42,168 @@ def setup_test_files():
     ds_bla["digital_number"].values = np.ones(["digital_number"].values.shape)
 
 
+def setup_l0b(wavelengths, n_series=4):
+    """
+    Returns synthetic L0B dataset, with random uncertainties on the digital numbers
+    """
+
+    n_wav = len(wavelengths)
+    rng = np.random.default_rng(0)
+    ds = xr.Dataset(coords={"wavelength": wavelengths, "series": np.arange(n_series)})
+
+    for var in ["digital_number", "dark_signal"]:
+        ds[var] = DatasetUtil.create_variable(
+            [n_wav, n_series],
+            dim_names=["wavelength", "series"],
+            dtype=np.float32,
+            attributes={"unc_comps": ["u_rel_random_" + var]},
+        )
+        ds["u_rel_random_" + var] = DatasetUtil.create_unc_variable(
+            [n_wav, n_series],
+            dim_names=["wavelength", "series"],
+            dtype=np.float32,
+            attributes={"units": "%"},
+            err_corr=[
+                {"dim": "wavelength", "form": "random", "params": [], "units": []},
+                {"dim": "series", "form": "random", "params": [], "units": []},
+            ],
+        )
+
+    ds["digital_number"].values = rng.uniform(20000, 30000, (n_wav, n_series))
+    ds["dark_signal"].values = rng.uniform(2000, 3000, (n_wav, n_series))
+    ds["u_rel_random_digital_number"].values = rng.uniform(0.5, 1, (n_wav, n_series))
+    ds["u_rel_random_dark_signal"].values = rng.uniform(1, 2, (n_wav, n_series))
+
+    ds["integration_time"] = DatasetUtil.create_variable(
+        [n_series], dim_names=["series"], dtype=np.uint32
+    )
+    ds["integration_time"].values = np.array([64, 128, 256, 512])[:n_series]
+    return ds
+
+
 class TestCalibrate(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        shutil.copytree(
+            hypstar_directory, os.path.join(self.tmpdir, "cal", "hypstar_122241")
+        )
+
+        self.context = Context()
+        self.context.set_config_value("network", "w")
+        self.context.set_config_value("archive_directory", self.tmpdir)
+        self.context.set_config_value("calibration_file_version", 2.1)
+        self.context.set_config_value("calibration_interpolation_method", "previous")
+        self.context.set_config_value("calibration_cache_size", 0)
+        self.context.set_config_value(
+            "measurement_function_calibrate", "StandardMeasurementFunction"
+        )
+        self.context.set_config_value("mcsteps", 500)
+
+        calcon = CalibrationConverter(self.context)
+        calcon.path_netcdf = os.path.join(self.tmpdir, "cal")
+        # every 8th wavelength, to keep output error-correlation calculation fast
+        self.calibration_data = [
+            ds.isel(
+                {"wavelength": slice(None, None, 8), "wavelength'": slice(None, None, 8)}
+            )
+            for ds in calcon.read_calib_files(
+                setup_sequence(self.tmpdir, "SEQ20230301T120000")
+            )
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
     def test_here(self):
         self.assertEqual(1 + 1, 2)
 
+    def propagate(self, comps, batched, measurandstring, calibration_data):
+        self.context.set_config_value("calibration_batched_mc", batched)
+        dataset_l0b = setup_l0b(calibration_data["wavelength"].values)
+        calibrate_function = Calibrate(self.context).get_calibrate_function(
+            measurandstring, "series"
+        )
+        np.random.seed(12345)
+        return calibrate_function.propagate_ds_specific(
+            comps, dataset_l0b, calibration_data, store_unc_percent=True
+        )
+
+    def test_calibrate_function_batched_random(self):
+        for measurandstring, calibration_data in zip(
+            ["radiance", "irradiance"], self.calibration_data
+        ):
+            ds = self.propagate(["random"], False, measurandstring, calibration_data)
+            ds_batched = self.propagate(
+                ["random"], True, measurandstring, calibration_data
+            )
+
+            np.testing.assert_allclose(
+                ds_batched[measurandstring].values,
+                ds[measurandstring].values,
+                rtol=1e-6,
+            )
+            np.testing.assert_allclose(
+                np.mean(ds_batched["u_rel_random_" + measurandstring].values, axis=0),
+                np.mean(ds["u_rel_random_" + measurandstring].values, axis=0),
+                rtol=0.03,
+            )
+
+    def test_calibrate_function_batched_systematic(self):
+        for measurandstring, calibration_data in zip(
+            ["radiance", "irradiance"], self.calibration_data
+        ):
+            ds_batched = self.propagate(
+                ["systematic_indep", "systematic_corr_rad_irr"],
+                True,
+                measurandstring,
+                calibration_data,
+            )
+
+            # the measurement function is linear in the gains, so relative systematic
+            # uncertainties are those of the gains, for all series
+            for comp in ["systematic_indep", "systematic_corr_rad_irr"]:
+                u_rel = ds_batched["u_rel_%s_%s" % (comp, measurandstring)].values
+                u_rel_gains = calibration_data["u_rel_%s_gains" % comp].values
+                valid = u_rel_gains > 0
+                self.assertEqual(u_rel.shape, (len(u_rel_gains), 4))
+                np.testing.assert_allclose(
+                    np.mean(u_rel[valid], axis=0),
+                    np.mean(u_rel_gains[valid]),
+                    rtol=0.05,
+                )
+                self.assertEqual(
+                    ds_batched[
+                        "err_corr_%s_%s_wavelength" % (comp, measurandstring)
+                    ].shape,
+                    (len(u_rel_gains), len(u_rel_gains)),
+                )
+
+    def test_match_blacks(self):
+        for dtype in [np.uint32, np.float64]:
+            dataset = xr.Dataset(
+                {
+                    "acquisition_time": (
+                        "scan",
+                        np.array([100, 100, 100, 160, 160, 220, 220], dtype=dtype),
+                    ),
+                    "integration_time": (
+                        "scan",
+                        np.array([64, 64, 128, 64, 128, 64, 64], dtype=np.uint32),
+                    ),
+                }
+            )
+            acq_times = np.array([90, 100, 130, 150, 190, 250], dtype=dtype)
+            int_times = np.array([64, 128, 64, 128, 64, 64], dtype=np.uint32)
+
+            match = Calibrate.match_blacks(dataset, acq_times, int_times)
+
+            for i in range(len(acq_times)):
+                distance = abs(dataset["acquisition_time"] - acq_times[i])
+                expected = (distance == min(distance)) & (
+                    dataset["integration_time"] == int_times[i]
+                )
+                np.testing.assert_array_equal(match[i], expected.values)
+
 
 #
 # def test_calibrate_l1a(self,measurandstring,dataset_l0,dataset_l0_bla,calibration_data,
@@ -0,0 +1,124 @@
+"""
+Tests for CalibrationConverter class
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from hypernets_processor.version import __version__
+from hypernets_processor.context import Context
+from hypernets_processor.calibration.calibration_converter import (
+    CalibrationConverter,
+    CalibrationCache,
+    CALIBRATION_CACHE,
+)
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+this_directory = os.path.dirname(__file__)
+hypstar_directory = os.path.join(
+    os.path.dirname(this_directory),
+    "calibration_files",
+    "HYPSTAR_cal",
+    "hypstar_122241",
+)
+
+
+def setup_sequence(directory, name):
+    sequence_path = os.path.join(directory, name)
+    os.makedirs(sequence_path, exist_ok=True)
+    with open(os.path.join(sequence_path, "metadata.txt"), "w") as f:
+        f.write("[Metadata]\nhypstar_sn = 122241\n")
+    return sequence_path
+
+
+class TestCalibrationConverter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        shutil.copytree(
+            hypstar_directory, os.path.join(self.tmpdir, "cal", "hypstar_122241")
+        )
+        CALIBRATION_CACHE.clear()
+
+        self.context = Context()
+        self.context.set_config_value("network", "w")
+        self.context.set_config_value("calibration_file_version", 2.1)
+        self.context.set_config_value("calibration_interpolation_method", "previous")
+
+    def tearDown(self):
+        CALIBRATION_CACHE.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def read_calib_files(self, name):
+        calcon = CalibrationConverter(self.context)
+        calcon.path_netcdf = os.path.join(self.tmpdir, "cal")
+        return calcon.read_calib_files(setup_sequence(self.tmpdir, name))
+
+    def test_read_calib_files_cache(self):
+        rad, irr = self.read_calib_files("SEQ20230301T120000")
+        self.assertEqual((CALIBRATION_CACHE.hits, CALIBRATION_CACHE.misses), (0, 2))
+        self.assertFalse(rad["gains"].values.flags.writeable)
+
+        # same calibration epoch
+        rad2, irr2 = self.read_calib_files("SEQ20230401T093000")
+        self.assertEqual((CALIBRATION_CACHE.hits, CALIBRATION_CACHE.misses), (2, 2))
+        self.assertIs(rad2, rad)
+        self.assertIs(irr2, irr)
+
+        # different calibration epoch
+        rad3, irr3 = self.read_calib_files("SEQ20240601T120000")
+        self.assertEqual(CALIBRATION_CACHE.misses, 4)
+        self.assertFalse(np.array_equal(rad3["gains"].values, rad["gains"].values))
+
+        # uncached read gives same result
+        self.context.set_config_value("calibration_cache_size", 0)
+        rad4, irr4 = self.read_calib_files("SEQ20230302T120000")
+        self.assertEqual(CALIBRATION_CACHE.misses, 4)
+        np.testing.assert_array_equal(rad4["gains"].values, rad["gains"].values)
+        np.testing.assert_array_equal(irr4["gains"].values, irr["gains"].values)
+
+    def test_read_calib_files_modified(self):
+        rad, irr = self.read_calib_files("SEQ20230301T120000")
+
+        path = os.path.join(
+            self.tmpdir,
+            "cal",
+            "hypstar_122241",
+            "HYPERNETS_CAL_HYPSTAR_122241_RAD_v2.1.nc",
+        )
+        mtime = os.path.getmtime(path) + 10
+        os.utime(path, (mtime, mtime))
+
+        rad2, irr2 = self.read_calib_files("SEQ20230301T120000")
+        self.assertIsNot(rad2, rad)
+        self.assertIs(irr2, irr)
+
+
+class TestCalibrationCache(unittest.TestCase):
+    def test_put_eviction(self):
+        ds = {"a": np.zeros(1000), "b": np.zeros(1000), "c": np.zeros(1000)}
+        cache = CalibrationCache(max_size=0.02)
+
+        cache.put("a", ds["a"])
+        cache.put("b", ds["b"])
+        self.assertIs(cache.get("a"), ds["a"])
+
+        # "b" is least recently used
+        cache.put("c", ds["c"])
+        self.assertIsNone(cache.get("b"))
+        self.assertIs(cache.get("a"), ds["a"])
+        self.assertIs(cache.get("c"), ds["c"])
+        self.assertEqual(cache.nbytes, 16000)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Tests for StandardMeasurementFunction class
+"""
+
+import unittest
+import numpy as np
+from hypernets_processor.version import __version__
+from hypernets_processor.calibration.measurement_functions.standard_measurement_function import (
+    StandardMeasurementFunction,
+)
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+NON_LINEAR = np.array([1.0, 2e-6, -3e-11, 1e-16, 2e-21, -1e-26, 3e-31, 1e-36])
+
+
+def calibrate_loop(digital_number, gains, dark_signal, non_linear, int_time):
+    """
+    Reference calibration, with a non-linearity polynomial per MC sample, as done by
+    StandardMeasurementFunction prior to vectorisation
+    """
+
+    DN = digital_number - dark_signal
+    DN[DN == 0] = 1
+
+    corrected_DN = np.zeros_like(DN)
+    for i in range(non_linear.shape[1]):
+        corrected_DN[..., i] = DN[..., i] / np.poly1d(np.flip(non_linear[:, i]))(
+            DN[..., i]
+        )
+
+    return np.expand_dims(gains, 1) * corrected_DN / int_time * 1000
+
+
+class TestStandardMeasurementFunction(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        n_mc = 20
+        self.digital_number = rng.random((50, 4, n_mc)) * 50000 + 5000
+        self.dark_signal = rng.random((50, 4, n_mc)) * 1000
+        self.dark_signal[0, 0, :] = self.digital_number[0, 0, :]
+        self.gains = rng.random((50, n_mc))
+        self.non_linear = NON_LINEAR[:, None] * (
+            1 + 0.01 * rng.standard_normal((len(NON_LINEAR), n_mc))
+        )
+        self.int_time = np.full((4, n_mc), 64.0)
+
+    def test_meas_function(self):
+        args = (
+            self.digital_number,
+            self.gains,
+            self.dark_signal,
+            self.non_linear,
+            self.int_time,
+        )
+
+        out = StandardMeasurementFunction().meas_function(*args)
+
+        self.assertEqual(out.dtype, np.float64)
+        np.testing.assert_array_equal(out, calibrate_loop(*args))
+
+    def test_meas_function_float32(self):
+        args = (
+            self.digital_number,
+            self.gains,
+            self.dark_signal,
+            self.non_linear,
+            self.int_time,
+        )
+        function = StandardMeasurementFunction()
+        function.dtype = np.float32
+
+        out = function.meas_function(*args)
+
+        self.assertEqual(out.dtype, np.float32)
+        np.testing.assert_allclose(out, calibrate_loop(*args), rtol=1e-5)
+
+    def test_correct_nonlin(self):
+        DN = np.array([[1000, 20000], [40000, 60000]], dtype=np.uint16)
+
+        np.testing.assert_array_equal(
+            StandardMeasurementFunction().correct_nonlin(DN, NON_LINEAR),
+            DN / np.poly1d(np.flip(NON_LINEAR))(DN),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+cli for merging databases
+"""
+
+from hypernets_processor.version import __version__
+import argparse
+from hypernets_processor.main.merge_db_main import main
+
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def configure_parser():
+    """
+    Configure parser
+
+    :return: parser
+    :rtype: argparse.ArgumentParser
+    """
+
+    description = (
+        "Tool for merging hypernets_processor archive, anomaly or metadata databases "
+        "(e.g. of different sites or jobs) into one database. Products already in the "
+        "output database (by site, sequence and product level) and identical rows are "
+        "not merged again, so merging may be rerun."
+    )
+
+    # Initialise argument parser
+    parser = argparse.ArgumentParser(
+        description=description, formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "input_paths", nargs="+", help="Paths of databases to merge (same format)"
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        action="store",
+        required=True,
+        help="Path of database to merge into, created if it does not exist",
+    )
+
+    parser.add_argument(
+        "-f",
+        "--format",
+        action="store",
+        choices=["archive", "anomaly", "metadata"],
+        default=None,
+        help="Database format of output database if created, if omitted determined "
+        "from input databases",
+    )
+
+    return parser
+
+
+parser = configure_parser()
+parsed_args = parser.parse_args()
+
+
+def cli():
+    """
+    Command line interface for merging databases
+    """
+
+    merged = main(parsed_args.output, parsed_args.input_paths, parsed_args.format)
+
+    for table_name, n_rows in merged.items():
+        print("%s: %s rows merged" % (table_name, n_rows))
+
+
+if __name__ == "__main__":
+    cli()
@@ -139,7 +139,7 @@ def cli():
 
     if parsed_args.write_all:
         for key in job_config["Output"].keys():
-            if key[:5] == "write":
+            if key[:7] == "write_l":
                 job_config["Output"][key] = "True"
 
     if parsed_args.no_unc:
@@ -0,0 +1,87 @@
+"""
+Tests for start up time of the command line interface modules
+"""
+
+import unittest
+import subprocess
+import sys
+from hypernets_processor.version import __version__
+
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+CLI_MODULES = [
+    "hypernets_processor.cli.sequence_processor_cli",
+    "hypernets_processor.cli.scheduler_cli",
+    "hypernets_processor.cli.init_job_cli",
+    "hypernets_processor.cli.merge_db_cli",
+]
+
+# processing dependencies which must not be imported on start up
+HEAVY_MODULES = [
+    "punpy",
+    "obsarray",
+    "comet_maths",
+    "matplotlib",
+    "xarray",
+    "scipy",
+    "netCDF4",
+    "sqlalchemy",
+    "dataset",
+]
+
+# import time budget of each cli, in seconds (including numpy)
+IMPORT_TIME_BUDGET = 1.0
+
+
+def import_times(module):
+    """
+    Returns modules imported by running given cli module with ``--help`` in a new
+    interpreter and total import time (in s), from ``python -X importtime``
+    """
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys; sys.argv = ['cli', '--help']; import " + module,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    modules = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            self_time, _, name = line[len("import time:") :].split("|")
+            if self_time.strip().isdigit():
+                modules.append(name.strip())
+                total += int(self_time) * 1e-6
+    return modules, total
+
+
+class TestStartup(unittest.TestCase):
+    def test_cli_imports(self):
+        for module in CLI_MODULES:
+            modules, total = import_times(module)
+
+            self.assertIn(module, modules)
+            self.assertLess(total, IMPORT_TIME_BUDGET, msg=module)
+            for heavy_module in HEAVY_MODULES:
+                self.assertNotIn(heavy_module, modules, msg=module)
+
+
+if __name__ == "__main__":
+    unittest.main()
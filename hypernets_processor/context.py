@@ -4,10 +4,12 @@ Context class
 from hypernets_processor.version import __version__
 from hypernets_processor.utils.config import get_config_value
 from hypernets_processor.data_io.format.databases import DB_DICT_DEFS
-from hypernets_processor.data_io.hypernets_db_builder import open_database
 from hypernets_processor.anomaly_handler import AnomalyHandler
+from hypernets_processor.utils.paths import parse_sequence_path
 
+from collections.abc import Mapping
 import configparser
+import os
 
 """___Authorship___"""
 __author__ = "Sam Hunt"
@@ -19,6 +21,130 @@ __status__ = "Development"
 
 PROCESSOR_CONFIG_PROTECTED_VALUES = []
 
+# state of the sequence being processed, kept separate from the (job constant) config
+SEQUENCE_STATE_NAMES = frozenset(
+    ["time", "sequence_path", "sequence_name", "start_time_processing_sequence"]
+)
+
+# config values that may be set for the sequence being processed once the config is
+# frozen (e.g. site_id read from sequence metadata), kept in the sequence state
+SEQUENCE_OVERRIDE_NAMES = frozenset(["site_id"])
+
+# expected types of config values, validated when the config is frozen at job start
+CONFIG_VALUE_TYPES = {
+    "mcsteps": int,
+    "max_workers": int,
+    "db_commit_sequences": int,
+    "n_valid_irr": int,
+    "n_valid_rad": int,
+    "n_valid_dark": int,
+    "calibration_cache_size": int,
+    "write_queue_size": int,
+    "l0_threshold": (int, float),
+    "l0_discontinuity": (int, float),
+    "bad_pointing_threshold_zenith": (int, float),
+    "bad_pointing_threshold_azimuth": (int, float),
+    "irradiance_zenith_treshold": (int, float),
+    "irr_variability_percent": (int, float),
+    "vnir_swir_discontinuity_percent": (int, float),
+    "combine_lim_wav": (int, float),
+    "delay_hours": (int, float),
+    "checkpoint_max_age": (int, float),
+    "verbose": bool,
+    "to_archive": bool,
+    "uncertainty_l1a": bool,
+    "clear_sky_check": bool,
+    "calibration_batched_mc": bool,
+    "calibration_float32": bool,
+    "write_async": bool,
+    "write_l0a": bool,
+    "write_l0b": bool,
+    "write_l1a": bool,
+    "write_l1b": bool,
+    "write_l1c": bool,
+    "write_l2a": bool,
+}
+
+
+class ConfigSnapshot(Mapping):
+    """
+    Frozen snapshot of processor config values, with item and attribute access (e.g.
+    ``config["mcsteps"]`` or ``config.mcsteps``). Values not set are None.
+
+    :type config_values: dict
+    :param config_values: config values
+    """
+
+    def __init__(self, config_values):
+        object.__setattr__(self, "_values", dict(config_values))
+
+    def __getitem__(self, name):
+        return self._values[name]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._values.get(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is frozen")
+
+    def __reduce__(self):
+        return ConfigSnapshot, (self._values,)
+
+    def __repr__(self):
+        return "ConfigSnapshot(" + repr(self._values) + ")"
+
+    def validate(self):
+        """
+        Checks config values have expected types, raising ValueError if not
+        """
+
+        for name, dtype in CONFIG_VALUE_TYPES.items():
+            value = self._values.get(name)
+            if value is None:
+                continue
+            if (not isinstance(value, dtype)) or (
+                isinstance(value, bool) and dtype is not bool
+            ):
+                raise ValueError(
+                    "Invalid config value for "
+                    + name
+                    + ": "
+                    + repr(value)
+                    + " (must be "
+                    + str(dtype)
+                    + ")"
+                )
+
+
+class SequenceState:
+    """
+    Class to store state of the sequence being processed
+
+    :type sequence_path: str
+    :param sequence_path: (optional) sequence path
+    """
+
+    __slots__ = tuple(sorted(SEQUENCE_STATE_NAMES)) + ("overrides",)
+
+    def __init__(self, sequence_path=None):
+        self.time = None
+        self.sequence_path = sequence_path
+        self.sequence_name = None
+        self.start_time_processing_sequence = None
+        self.overrides = {}
+
+        if sequence_path is not None:
+            self.time = parse_sequence_path(sequence_path)["datetime"]
+            self.sequence_name = os.path.basename(sequence_path)
+
 
 class Context:
     """
@@ -33,11 +159,14 @@ class Context:
 
         # Initialise attributes
         self.config_values = {}
+        self.config = None
+        self.sequence = SequenceState()
         self.logger = logger
         self.metadata_db = None
         self.anomaly_db = None
         self.archive_db = None
         self.anomaly_handler = AnomalyHandler(self)
+        self.write_queue = None
 
         # Set defaults - to be overwritten
         self.set_defaults()
@@ -54,8 +183,12 @@ class Context:
         # Connect to databases
         db_fmts = DB_DICT_DEFS.keys()
         for db_fmt in db_fmts:
-            if db_fmt + "_db_url" in self.get_config_names():
+            if db_fmt + "_db_url" in self.config_values:
                 if self.get_config_value(db_fmt + "_db_url") is not None:
+                    from hypernets_processor.data_io.hypernets_db_builder import (
+                        open_database,
+                    )
+
                     setattr(
                         self,
                         db_fmt + "_db",
@@ -86,12 +219,26 @@ class Context:
 
     def set_config_value(self, name, value):
         """
-        Sets config data to values instance attribute
+        Sets config data to values instance attribute (or sequence state for sequence
+        state names). Once the config is frozen, only sequence override names may be set,
+        for the sequence being processed, and setting other values raises AttributeError.
         :type name: str
         :param name: config data name
         :param value: config data value
         """
 
+        if name in SEQUENCE_STATE_NAMES:
+            setattr(self.sequence, name, value)
+            return
+
+        if self.config is not None:
+            if name not in SEQUENCE_OVERRIDE_NAMES:
+                raise AttributeError(
+                    "Config is frozen, cannot set config value for " + name
+                )
+            self.sequence.overrides[name] = value
+            return
+
         self.config_values[name] = value
 
     def get_config_value(self, name):
@@ -102,7 +249,38 @@ class Context:
         :return: config value
         """
 
-        return self.config_values[name] if name in self.get_config_names() else None
+        if name in SEQUENCE_STATE_NAMES:
+            return getattr(self.sequence, name)
+        if name in self.sequence.overrides:
+            return self.sequence.overrides[name]
+        if self.config is not None:
+            return self.config.get(name)
+        return self.config_values.get(name)
+
+    def freeze_config(self):
+        """
+        Validates config values and sets frozen snapshot of them to config instance
+        attribute, e.g. at job start. Config values are then read from the snapshot.
+        :return: config snapshot
+        :rtype: ConfigSnapshot
+        """
+
+        config = ConfigSnapshot(self.config_values)
+        config.validate()
+        self.config = config
+        return config
+
+    def start_sequence(self, sequence_path):
+        """
+        Resets sequence state for processing of new sequence
+        :type sequence_path: str
+        :param sequence_path: sequence path
+        :return: sequence state
+        :rtype: SequenceState
+        """
+
+        self.sequence = SequenceState(sequence_path)
+        return self.sequence
 
     def get_config_names(self):
         """
@@ -111,6 +289,8 @@ class Context:
         :rtype: list
         """
 
+        if self.config is not None:
+            return list(self.config.keys())
         return list(self.config_values.keys())
 
     def set_defaults(self):
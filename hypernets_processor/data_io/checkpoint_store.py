@@ -0,0 +1,692 @@
+"""
+CheckpointStore class
+"""
+
+from hypernets_processor.version import __version__
+from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
+from hypernets_processor.data_io.format.databases import DB_DICT_DEFS
+from hypernets_processor.utils.paths import atomic_write
+from hypernets_processor.utils.config import (
+    read_config_file,
+    PROCESSOR_LAND_DEFAULTS_CONFIG_PATH,
+    PROCESSOR_WATER_DEFAULTS_CONFIG_PATH,
+    JOB_CONFIG_TEMPLATE_PATH,
+)
+from datetime import datetime
+import functools
+import os
+import time
+import json
+import hashlib
+import numpy as np
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+PROCESSING_LEVELS = ["L0A", "L0B", "L1A", "L1B", "L1C", "L2A"]
+
+# processing level from which processing depends on the config values of each section of
+# the default config files - checkpoints of earlier levels stay valid if these change
+# (None for sections of config values that do not change processed data)
+CONFIG_SECTION_LEVELS = {
+    "Job": "L0A",
+    "Input": "L0A",
+    "Log": None,
+    "Site_specific": "L0A",
+    "Processor": "L0A",
+    "Databases": None,
+    "Metadata": "L0A",
+    "Reading": "L0A",
+    "Quality": "L0A",
+    "Calibration": "L1A",
+    "CombineSWIR": "L1B",
+    "Interpolate": "L1C",
+    "WaterStandardProtocol": "L1C",
+    "Air_water_inter_correction": "L1C",
+    "VariabilityCheck": "L1C",
+    "SimSpecSettings": "L1C",
+    "SurfaceReflectance": "L2A",
+    "WaterFinalMeasurementTest": "L2A",
+    "Output": "L0A",
+    "Plotting": "L0A",
+}
+
+# default config files, config values set by these are classified by section
+DEFAULT_CONFIG_PATHS = [
+    PROCESSOR_LAND_DEFAULTS_CONFIG_PATH,
+    PROCESSOR_WATER_DEFAULTS_CONFIG_PATH,
+    JOB_CONFIG_TEMPLATE_PATH,
+]
+
+# config values of other sections that do not change processed data
+IGNORED_CONFIG_NAMES = [
+    "job_name",
+    "job_working_directory",
+    "max_workers",
+    "db_commit_sequences",
+    "discovery_state_path",
+    "archive_directory",
+    "max_level",
+    "verbose",
+    "delay_hours",
+    "checkpoint_directory",
+    "checkpoint_max_age",
+    "clear_sky_cache_directory",
+    "calibration_cache_size",
+    "write_async",
+    "write_queue_size",
+]
+
+# default age (in days) after which checkpoints are pruned
+CHECKPOINT_MAX_AGE = 7.0
+
+# columns identifying database rows stored with checkpoints, to find if committed
+ROW_KEYS = {
+    "archive": ["product_name"],
+    "metadata": ["product_name"],
+    "anomaly": [
+        "anomaly_id",
+        "site_id",
+        "sequence_name",
+        "product_level_last",
+        "product_path_last",
+    ],
+}
+
+
+@functools.lru_cache(maxsize=None)
+def return_config_levels():
+    """
+    Returns processing level from which processing depends on each config value of the
+    default config files, the earliest level of the sections it is set in (None if it
+    does not change processed data). Config values of sections not classified in
+    CONFIG_SECTION_LEVELS are taken to be used from L0A.
+
+    :return: processing levels, by config value name
+    :rtype: dict
+    """
+
+    levels = {}
+    for path in DEFAULT_CONFIG_PATHS:
+        config = read_config_file(path)
+        for section in config.sections():
+            level = CONFIG_SECTION_LEVELS.get(section, "L0A")
+            for name in config[section].keys():
+                if (level is None) or (name in IGNORED_CONFIG_NAMES):
+                    levels.setdefault(name, None)
+                elif (levels.get(name) is None) or (
+                    PROCESSING_LEVELS.index(level)
+                    < PROCESSING_LEVELS.index(levels[name])
+                ):
+                    levels[name] = level
+    return levels
+
+
+def encode_json_value(value):
+    """
+    Returns JSON serialisable form of value not serialisable by json module, for
+    checkpoint files
+
+    :param value: value, e.g. datetime of database row or dtype of variable encoding
+
+    :return: serialisable value
+    """
+
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (type, np.dtype)):
+        return np.dtype(value).name
+    raise TypeError("%s is not JSON serialisable" % type(value).__name__)
+
+
+def decode_json_object(obj):
+    """
+    Returns object decoded from checkpoint file, restoring values encoded by
+    encode_json_value
+
+    :type obj: dict
+    :param obj: decoded JSON object
+
+    :return: decoded object
+    """
+
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def return_list_attrs(attrs):
+    """
+    Returns list attributes, which netCDF files do not store as lists (e.g. single item
+    lists are read as their item)
+
+    :type attrs: dict
+    :param attrs: attributes
+
+    :return: list attributes
+    :rtype: dict
+    """
+
+    return {name: value for name, value in attrs.items() if isinstance(value, list)}
+
+
+class CheckpointStore:
+    """
+    Class to store the intermediate products of the sequence being processed as
+    checkpoints, so if processing of the sequence fails or is interrupted it may resume
+    from the highest checkpointed level rather than from the raw data
+
+    Checkpoints are written to the checkpoint_directory, and not stored if this is not
+    set. Each product is written as an uncompressed netCDF file, with its variable
+    encodings and the state of processing in a JSON file written last, so products are
+    restored exactly. They are keyed by site and sequence name, processor version and a
+    hash of the config values processing to the checkpointed level depends on, so e.g.
+    a change of L2A processing config does not invalidate L1B checkpoints.
+
+    With a checkpoint, the database rows of the products and anomalies of the sequence
+    so far are stored. These are written by the run that stored it, but only committed
+    by the end of the sequence, so on resume rows not found in the databases (e.g. if
+    the process was killed) are written again.
+
+    :type context: hypernets_processor.context.Context
+    :param context: processor context
+    """
+
+    def __init__(self, context=None):
+        self.context = context
+        self.directory = None
+        self.prefix = None
+        self.initial_values = {}
+        self.n_anomalies = 0
+        self.n_rows = {}
+        self.level = None
+
+    def set_config(self):
+        """
+        Sets checkpoint directory and config values checkpoints are keyed by from the
+        context
+
+        :return: True if checkpoints are stored
+        :rtype: bool
+        """
+
+        self.directory = None
+        self.initial_values = {}
+        if self.context is not None:
+            self.directory = self.context.get_config_value("checkpoint_directory")
+
+        if not self.directory:
+            self.directory = None
+            return False
+
+        self.initial_values = {
+            name: self.context.get_config_value(name)
+            for name in self.context.get_config_names()
+        }
+        return True
+
+    def start_sequence(self):
+        """
+        Sets up store for the sequence of the context, with config values, anomalies and
+        database rows at the start of its processing
+        """
+
+        self.level = None
+        if not self.set_config():
+            return
+
+        self.n_anomalies = len(self.context.anomaly_handler.anomalies_added)
+        self.n_rows = {}
+        for db_fmt in DB_DICT_DEFS.keys():
+            db = getattr(self.context, db_fmt + "_db")
+            if (db is not None) and (db.deferred_rows is not None):
+                self.n_rows[db_fmt] = len(db.deferred_rows)
+
+        self.prefix = "%s_%s_" % (
+            self.context.get_config_value("site_id"),
+            self.context.get_config_value("sequence_name"),
+        )
+
+    def is_needed(self, level):
+        """
+        Returns True if processing continues beyond level, so its checkpoint is of use
+
+        :type level: str
+        :param level: processing level
+
+        :rtype: bool
+        """
+
+        max_level = self.context.get_config_value("max_level")
+        max_level = "L2A" if max_level is None else max_level.upper()
+        return PROCESSING_LEVELS.index(max_level) > PROCESSING_LEVELS.index(level)
+
+    def return_config_hash(self, level):
+        """
+        Returns hash of config values processing to level depends on
+
+        :type level: str
+        :param level: processing level
+
+        :return: config hash
+        :rtype: str
+        """
+
+        # config values not in the default config files are taken to be used from L0A
+        config_levels = return_config_levels()
+        config_values = {}
+        for name, value in self.initial_values.items():
+            config_level = config_levels.get(name, "L0A")
+            if (config_level is not None) and (
+                PROCESSING_LEVELS.index(config_level) <= PROCESSING_LEVELS.index(level)
+            ):
+                config_values[name] = value
+        return hashlib.sha1(
+            json.dumps(config_values, sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+
+    def return_path(self, level):
+        """
+        Returns path of checkpoint of level for the sequence
+
+        :type level: str
+        :param level: processing level
+
+        :return: checkpoint path
+        :rtype: str
+        """
+
+        return os.path.join(
+            self.directory, self.prefix + self.return_filename_suffix(level)
+        )
+
+    def return_dataset_path(self, level, name):
+        """
+        Returns path of product of checkpoint of level for the sequence
+
+        :type level: str
+        :param level: processing level
+        :type name: str
+        :param name: product name
+
+        :return: product path
+        :rtype: str
+        """
+
+        return os.path.splitext(self.return_path(level))[0] + "_" + name + ".nc"
+
+    def return_filename_suffix(self, level):
+        """
+        Returns checkpoint filename of level, after site and sequence name
+
+        :type level: str
+        :param level: processing level
+
+        :return: checkpoint filename suffix
+        :rtype: str
+        """
+
+        return "%s_v%s_%s.json" % (level, __version__, self.return_config_hash(level))
+
+    def return_failed_path(self):
+        """
+        Returns path of file marking that processing of the sequence failed after
+        resuming from a checkpoint, with the current config
+
+        :return: failed marker path
+        :rtype: str
+        """
+
+        return os.path.join(
+            self.directory, self.prefix + "failed_" + self.return_config_hash("L2A")
+        )
+
+    def return_sequence_paths(self, level=None):
+        """
+        Returns paths of checkpoint files stored for the sequence, for any key
+
+        :type level: str
+        :param level: (optional) processing level, if omitted checkpoints of all levels
+
+        :return: checkpoint file paths
+        :rtype: list
+        """
+
+        if not os.path.isdir(self.directory):
+            return []
+
+        prefix = self.prefix + ("" if level is None else level + "_")
+        return [
+            os.path.join(self.directory, filename)
+            for filename in sorted(os.listdir(self.directory))
+            if filename.startswith(prefix)
+        ]
+
+    def return_sequence_rows(self):
+        """
+        Returns database rows written for the sequence, that are not yet committed
+
+        :return: rows, as (table_name, row) tuples, by database format
+        :rtype: dict
+        """
+
+        rows = {}
+        for db_fmt, n_rows in self.n_rows.items():
+            db = getattr(self.context, db_fmt + "_db")
+            rows[db_fmt] = list(db.deferred_rows[n_rows:])
+        return rows
+
+    def return_resumable_sequences(self):
+        """
+        Returns names of sequences of the site with a checkpoint valid for the current
+        config, that processing has not already failed to resume from with it
+
+        :return: sequence names
+        :rtype: set
+        """
+
+        if (not self.set_config()) or (not os.path.isdir(self.directory)):
+            return set()
+
+        site_prefix = "%s_" % self.context.get_config_value("site_id")
+        suffixes = {
+            self.return_filename_suffix(level)
+            for level in PROCESSING_LEVELS
+            if self.is_needed(level)
+        }
+        failed_suffix = "failed_" + self.return_config_hash("L2A")
+
+        names = set()
+        failed_names = set()
+        for filename in os.listdir(self.directory):
+            if not filename.startswith(site_prefix):
+                continue
+
+            sequence_name, _, suffix = filename[len(site_prefix) :].partition("_")
+            if suffix in suffixes:
+                names.add(sequence_name)
+            elif suffix == failed_suffix:
+                failed_names.add(sequence_name)
+
+        return names - failed_names
+
+    def save(self, level, datasets):
+        """
+        Stores checkpoint of level for the sequence, replacing any earlier checkpoint of
+        the level. Products being written in the background are written first, so their
+        database rows are stored with the checkpoint. Failure to store is only logged.
+
+        :type level: str
+        :param level: processing level
+
+        :type datasets: dict
+        :param datasets: products of processing to level, by name
+        """
+
+        if (self.directory is None) or (not self.is_needed(level)):
+            return
+
+        HypernetsWriter(self.context).flush()
+
+        path = self.return_path(level)
+        anomalies = self.context.anomaly_handler.anomalies_added[self.n_anomalies :]
+        checkpoint = {
+            "datasets": {},
+            "anomalies": anomalies,
+            "rows": self.return_sequence_rows(),
+            "config_values": {
+                name: self.context.get_config_value(name)
+                for name, value in self.initial_values.items()
+                if self.context.get_config_value(name) != value
+            },
+        }
+        dataset_paths = [
+            self.return_dataset_path(level, name)
+            for name, ds in datasets.items()
+            if ds is not None
+        ]
+
+        # checkpoint only valid once its JSON file is written, after its products
+        self.remove(path)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for name, ds in datasets.items():
+                checkpoint["datasets"][name] = None
+                if ds is not None:
+                    checkpoint["datasets"][name] = self.write_dataset(
+                        ds, self.return_dataset_path(level, name)
+                    )
+            atomic_write(
+                path,
+                lambda f: json.dump(checkpoint, f, default=encode_json_value),
+                mode="w",
+            )
+        except (OSError, TypeError, ValueError) as e:
+            self.context.logger.warning(
+                "Failed to store %s checkpoint: %s" % (level, repr(e))
+            )
+            for dataset_path in dataset_paths:
+                self.remove(dataset_path)
+            return
+
+        for checkpoint_path in self.return_sequence_paths(level):
+            if (checkpoint_path != path) and (checkpoint_path not in dataset_paths):
+                self.remove(checkpoint_path)
+
+    def write_dataset(self, ds, path):
+        """
+        Writes product of checkpoint to uncompressed netCDF file, as stored in memory
+        (i.e. unscaled and unpacked)
+
+        :type ds: xarray.Dataset
+        :param ds: product
+        :type path: str
+        :param path: product path
+
+        :return: variable encodings and list attributes of product, to restore it with
+        :rtype: dict
+        """
+
+        ds_checkpoint = ds.copy()
+        ds_checkpoint.encoding = {}
+        variables = {}
+        for var_name, variable in ds_checkpoint.variables.items():
+            variables[var_name] = {
+                "encoding": variable.encoding,
+                "attrs": return_list_attrs(variable.attrs),
+            }
+            variable.encoding = {}
+            if "_FillValue" not in variable.attrs:
+                variable.encoding["_FillValue"] = None
+
+        ds_checkpoint.to_netcdf(path)
+        return {"variables": variables, "attrs": return_list_attrs(ds.attrs)}
+
+    def read_dataset(self, path, dataset_info):
+        """
+        Reads product of checkpoint from netCDF file
+
+        :type path: str
+        :param path: product path
+        :type dataset_info: dict
+        :param dataset_info: variable encodings and list attributes of product
+
+        :return: product
+        :rtype: xarray.Dataset
+        """
+
+        # xarray imported when first needed, to keep cli start up fast
+        import xarray as xr
+
+        with xr.open_dataset(path, mask_and_scale=False, decode_times=False) as ds:
+            ds = ds.load()
+
+        ds.encoding = {}
+        ds.attrs.update(dataset_info["attrs"])
+        for var_name, variable_info in dataset_info["variables"].items():
+            variable = ds.variables[var_name]
+            variable.attrs.update(variable_info["attrs"])
+            variable.encoding = variable_info["encoding"]
+            if "dtype" in variable.encoding:
+                variable.encoding["dtype"] = np.dtype(variable.encoding["dtype"])
+        return ds
+
+    def load(self, levels):
+        """
+        Returns checkpoint of highest of levels stored for the sequence with the current
+        key, restoring the anomalies and config values set by processing to the level
+        and writing its database rows not found in the databases. Unreadable
+        checkpoints are removed.
+
+        :type levels: list
+        :param levels: processing levels processing may resume from
+
+        :return: checkpoint level and products by name (None and empty dict if no
+        checkpoint)
+        :rtype: tuple
+        """
+
+        if self.directory is None:
+            return None, {}
+
+        for level in sorted(levels, key=PROCESSING_LEVELS.index, reverse=True):
+            path = self.return_path(level)
+            if (not self.is_needed(level)) or (not os.path.exists(path)):
+                continue
+
+            # any error reading checkpoint (e.g. truncated file) invalidates it
+            try:
+                with open(path, "r") as f:
+                    checkpoint = json.load(f, object_hook=decode_json_object)
+
+                datasets = {}
+                for name, dataset_info in checkpoint["datasets"].items():
+                    datasets[name] = None
+                    if dataset_info is not None:
+                        datasets[name] = self.read_dataset(
+                            self.return_dataset_path(level, name), dataset_info
+                        )
+            except Exception as e:
+                self.context.logger.warning(
+                    "Failed to read %s checkpoint: %s" % (level, repr(e))
+                )
+                checkpoint_prefix = os.path.splitext(path)[0] + "_"
+                self.remove(path)
+                for checkpoint_path in self.return_sequence_paths(level):
+                    if checkpoint_path.startswith(checkpoint_prefix):
+                        self.remove(checkpoint_path)
+                continue
+
+            for name, value in checkpoint["config_values"].items():
+                self.context.set_config_value(name, value)
+            self.context.anomaly_handler.anomalies_added.extend(
+                checkpoint["anomalies"]
+            )
+            self.write_rows(checkpoint["rows"])
+
+            self.context.logger.info("Resuming from %s checkpoint" % level)
+            self.level = level
+            return level, datasets
+
+        return None, {}
+
+    def write_rows(self, rows):
+        """
+        Writes database rows stored with checkpoint, that are not found in the databases
+
+        :type rows: dict
+        :param rows: rows, as (table_name, row) tuples, by database format
+        """
+
+        for db_fmt, db_rows in rows.items():
+            db = getattr(self.context, db_fmt + "_db")
+            if db is None:
+                continue
+
+            tables = db.tables
+            for table_name, row in db_rows:
+                keys = {name: row[name] for name in ROW_KEYS[db_fmt] if name in row}
+                if (
+                    (len(keys) > 0)
+                    and (table_name in tables)
+                    and (db[table_name].find_one(**keys) is not None)
+                ):
+                    continue
+                db.insert_row(table_name, row)
+
+    def fail(self):
+        """
+        Marks processing of sequence as failed after resuming from a checkpoint, so it
+        is not resumed again (e.g. by SequenceDiscovery) unless the config changes
+        """
+
+        if (self.directory is None) or (self.level is None):
+            return
+
+        try:
+            open(self.return_failed_path(), "w").close()
+        except OSError as e:
+            self.context.logger.warning("Failed to mark checkpoint: %s" % repr(e))
+
+    def evict(self):
+        """
+        Removes checkpoints stored for the sequence, e.g. once it is archived
+        """
+
+        if self.directory is None:
+            return
+
+        for path in self.return_sequence_paths():
+            self.remove(path)
+
+    def prune(self):
+        """
+        Removes files in checkpoint directory older than checkpoint_max_age (in days),
+        e.g. checkpoints of sequences that are not resumed or of previous keys
+        """
+
+        if (not self.set_config()) or (not os.path.isdir(self.directory)):
+            return
+
+        max_age = self.context.get_config_value("checkpoint_max_age")
+        max_age = CHECKPOINT_MAX_AGE if max_age is None else max_age
+        oldest = time.time() - max_age * 86400
+
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            try:
+                if os.path.getmtime(path) < oldest:
+                    self.remove(path)
+            except OSError:
+                continue
+
+    def remove(self, path):
+        """
+        Removes checkpoint file, logging if not possible
+
+        :type path: str
+        :param path: checkpoint path
+        """
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.context.logger.warning(
+                "Failed to remove checkpoint %s: %s" % (path, repr(e))
+            )
+
+
+if __name__ == "__main__":
+    pass
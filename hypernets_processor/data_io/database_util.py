@@ -145,6 +145,8 @@ class DatabaseUtil:
            - other entries may be kwargs supported by dataset.table.Table.create_column
 
         * "primary_key" - defines the tables primary key, value is the column name.
+        * "indexes" (optional) - defines the tables indexes, value is list of the column
+          names of each index.
         * other entries may be kwargs supported by dataset.database.Database.create_table
         """
 
@@ -194,6 +196,11 @@ class DatabaseUtil:
                     column_dict["foreign_key"] = fk_val
         db.commit()
 
+        # Add indexes
+        for table_name in table_names:
+            for index_columns in schema_dict[table_name].get("indexes", []):
+                db[table_name].create_index(index_columns)
+
         # Update with foreign keys
         for table_name in table_names:
             table_dict = schema_dict[table_name]
@@ -97,4 +97,9 @@ ANOMALIES_DICT = {
         "error": ValueError,
         "error_msg": "Invalid sequence,files mentioned in metadatafile are missing in DATA directory",
     },
+    "w": {
+        "description": "Error writing product files",
+        "error": IOError,
+        "error_msg": "Error writing product files",
+    },
 }
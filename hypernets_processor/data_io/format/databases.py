@@ -26,6 +26,7 @@ Database schema specification for Hypernets land and water network
 #    - other entries may be kwargs supported by dataset.table.Table.create_column
 #
 # * "primary_key" - defines the tables primary key, value is the column name.
+# * "indexes" (optional) - defines the tables indexes, value is list of the column names of each index.
 # * other entries may be kwargs supported by dataset.database.Database.create_table
 #
 # b. SQL definition
@@ -69,7 +70,8 @@ ANOMALY_DB = {
             "viewing_zenith_angle_max": {"type": str},
             "viewing_azimuth_angle_min": {"type": str},
             "viewing_azimuth_angle_max": {"type": str},
-        }
+        },
+        "indexes": [["site_id", "sequence_name"]],
     }
 }
 
@@ -99,7 +101,8 @@ ARCHIVE_DB = {
             "viewing_azimuth_angle_min": {"type": float},
             "viewing_azimuth_angle_max": {"type": float},
             "percent_zero_flags": {"type": float},
-        }
+        },
+        "indexes": [["site_id", "sequence_name", "product_level"]],
     }
 }
 
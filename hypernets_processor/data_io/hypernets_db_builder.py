@@ -10,7 +10,9 @@ from hypernets_processor.data_io.format.anomalies import ANOMALIES_DICT
 
 from sqlalchemy_utils import database_exists
 from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import OperationalError
 import dataset
+import time
 from os import makedirs
 from os.path import dirname
 import numpy as np
@@ -25,6 +27,15 @@ __email__ = "sam.hunt@npl.co.uk"
 __status__ = "Development"
 
 
+# maximum number of values of "in" query filters, below the parameter limit of sqlite
+QUERY_CHUNK_SIZE = 500
+
+# number of retries of database writes while the database is locked by another writer,
+# and delay before first retry (in s), doubled for each further retry
+DB_WRITE_RETRIES = 6
+DB_WRITE_RETRY_DELAY = 0.1
+
+
 def open_database(url, db_format=None, context=None):
     """
     Opens database, creates if doesn't exist
@@ -62,6 +73,26 @@ def open_database(url, db_format=None, context=None):
     return None
 
 
+def chunk_list(values, chunk_size=None):
+    """
+    Returns list split into chunks, e.g. to limit the number of parameters of queries
+
+    :type values: list
+    :param values: values to split
+
+    :type chunk_size: int
+    :param chunk_size: (optional) maximum number of values per chunk, default
+    QUERY_CHUNK_SIZE
+
+    :return: chunks
+    :rtype: list
+    """
+
+    chunk_size = QUERY_CHUNK_SIZE if chunk_size is None else chunk_size
+    values = list(values)
+    return [values[i : i + chunk_size] for i in range(0, len(values), chunk_size)]
+
+
 class HypernetsDBBuilder:
     """
     Class to generate SQL database in the Hypernets database format specification
@@ -115,7 +146,115 @@ class HypernetsDBBuilder:
         return db
 
 
-class ArchiveDB(dataset.Database):
+class HypernetsDB(dataset.Database):
+    """
+    Base class for Hypernets databases, inherits from dataset.Databases
+
+    Writes may be deferred, in which case rows are held in memory, e.g. to be written
+    together in one transaction per sequence with flush, or to be written by the process
+    owning the database when processing in a worker process
+    """
+
+    deferred_rows = None
+
+    def defer_writes(self):
+        """
+        Hold subsequently written rows in memory rather than inserting to database
+        """
+
+        self.deferred_rows = []
+
+    def insert_row(self, table_name, row):
+        """
+        Inserts row to database table, or holds it in memory if writes deferred
+
+        :type table_name: str
+        :param table_name: name of table
+
+        :type row: dict
+        :param row: row to insert
+        """
+
+        with self.lock:
+            if self.deferred_rows is not None:
+                self.deferred_rows.append((table_name, row))
+                return
+
+        self.insert_rows([(table_name, row)])
+
+    def pop_deferred_rows(self):
+        """
+        Returns rows held in memory since last call and clears them
+
+        :return: rows, as (table_name, row) tuples
+        :rtype: list
+        """
+
+        with self.lock:
+            rows = [] if self.deferred_rows is None else self.deferred_rows
+            if self.deferred_rows is not None:
+                self.deferred_rows = []
+        return rows
+
+    def insert_rows(self, rows):
+        """
+        Inserts rows to database in one transaction, retrying with increasing delay
+        while the database is locked by another writer
+
+        :type rows: list
+        :param rows: rows, as (table_name, row) tuples
+        """
+
+        if len(rows) == 0:
+            return
+
+        table_rows = {}
+        for table_name, row in rows:
+            table_rows.setdefault(table_name, []).append(row)
+
+        for attempt in range(DB_WRITE_RETRIES + 1):
+            try:
+                with self:
+                    for table_name, rows_i in table_rows.items():
+                        self.get_table(table_name).insert_many(rows_i)
+                return
+
+            except OperationalError as e:
+                if ("locked" not in str(e)) or (attempt == DB_WRITE_RETRIES):
+                    raise
+                time.sleep(DB_WRITE_RETRY_DELAY * 2**attempt)
+
+    def flush(self):
+        """
+        Inserts rows held in memory to database in one transaction. If the insert fails
+        the rows are held again, to be written by a later flush.
+        """
+
+        rows = self.pop_deferred_rows()
+        try:
+            self.insert_rows(rows)
+        except Exception:
+            with self.lock:
+                self.deferred_rows = rows + (self.deferred_rows or [])
+            raise
+
+    def create_indexes(self, db_format):
+        """
+        Creates indexes defined in database format schema that do not exist yet, e.g. for
+        databases created before the indexes were defined
+
+        :type db_format: str
+        :param db_format: database format string
+        """
+
+        tables = self.tables
+        for table_name, table_dict in DB_DICT_DEFS[db_format].items():
+            if table_name in tables:
+                for index_columns in table_dict.get("indexes", []):
+                    self[table_name].create_index(index_columns)
+
+
+class ArchiveDB(HypernetsDB):
     """
     Class for handling Archive Database in memory, inherits from dataset.Databases
 
@@ -130,6 +269,43 @@ class ArchiveDB(dataset.Database):
         self.context = context
         self.writer = HypernetsWriter(context)
         super().__init__(url)
+        self.create_indexes("archive")
+
+    def get_processed_sequences(self, sequence_names, site_id=None, product_level="L2A"):
+        """
+        Returns names of sequences of given sequence names with archived products of
+        given product level
+
+        :type sequence_names: list
+        :param sequence_names: names of sequences to lookup
+
+        :type site_id: str
+        :param site_id: (optional) name of site to lookup, if omitted gets site id from
+        context
+
+        :type product_level: str
+        :param product_level: (optional) product level, matched as substring of archived
+        product levels (default: "L2A")
+
+        :return: names of processed sequences
+        :rtype: set
+        """
+
+        if site_id is None:
+            site_id = self.context.get_config_value("site_id")
+
+        processed = set()
+        for names in chunk_list(sequence_names):
+            processed.update(
+                product["sequence_name"]
+                for product in self["products"].distinct(
+                    "sequence_name",
+                    site_id=site_id,
+                    sequence_name={"in": names},
+                    product_level={"like": "%" + product_level + "%"},
+                )
+            )
+        return processed
 
     def archive_product(self, ds, path):
         """
@@ -142,8 +318,8 @@ class ArchiveDB(dataset.Database):
         :param path: path product is being written to
         """
 
-        tbl = self.get_table("products")
-        tbl.insert(
+        self.insert_row(
+            "products",
             dict(
                 product_name=ds.attrs["product_name"],
                 product_path=path,
@@ -175,7 +351,7 @@ class ArchiveDB(dataset.Database):
         )
 
 
-class AnomalyDB(dataset.Database):
+class AnomalyDB(HypernetsDB):
     """
     Class for handling Anomaly Database in memory, inherits from dataset.Databases
 
@@ -190,6 +366,7 @@ class AnomalyDB(dataset.Database):
         self.context = context
         self.writer = HypernetsWriter(context)
         super().__init__(url)
+        self.create_indexes("anomaly")
 
     def add_anomaly(self, anomaly_id, ds=None):
         """
@@ -202,10 +379,9 @@ class AnomalyDB(dataset.Database):
         """
 
         # Add anomaly to db
-        tbl = self.get_table("anomalies")
-
         if ds:
-            tbl.insert(
+            self.insert_row(
+                "anomalies",
                 dict(
                     anomaly_id=anomaly_id,
                     sequence_name=self.context.get_config_value("sequence_name"),
@@ -235,7 +411,8 @@ class AnomalyDB(dataset.Database):
                 )
             )
         else:
-            tbl.insert(
+            self.insert_row(
+                "anomalies",
                 dict(
                     anomaly_id=anomaly_id,
                     sequence_name=self.context.get_config_value("sequence_name"),
@@ -276,10 +453,45 @@ class AnomalyDB(dataset.Database):
             )
         ]
 
+        # include anomalies not yet written to db
+        anomalies += [
+            row["anomaly_id"]
+            for table_name, row in (self.deferred_rows or [])
+            if (row["site_id"] == site_id) and (row["sequence_name"] == sequence_name)
+        ]
+
+        return anomalies
+
+    def get_sequences_anomalies(self, sequence_names, site_id=None):
+        """
+        Returns anomaly ids of anomalies registered for each of given sequences
+
+        :type sequence_names: list
+        :param sequence_names: names of sequences to lookup anomaly ids for
+
+        :type site_id: str
+        :param site_id: (optional) name of site to lookup anomaly ids for, if omitted gets
+        site id from context
+
+        :return: anomaly ids for each sequence name with registered anomalies
+        :rtype: dict
+        """
+
+        if site_id is None:
+            site_id = self.context.get_config_value("site_id")
+
+        anomalies = {}
+        for names in chunk_list(sequence_names):
+            for anomaly in self["anomalies"].find(
+                site_id=site_id, sequence_name={"in": names}
+            ):
+                anomalies.setdefault(anomaly["sequence_name"], []).append(
+                    anomaly["anomaly_id"]
+                )
         return anomalies
 
 
-class MetadataDB(dataset.Database):
+class MetadataDB(HypernetsDB):
     """
     Class for handling Metadata Database in memory, inherits from dataset.Databases
 
@@ -305,8 +517,7 @@ class MetadataDB(dataset.Database):
         :param path: path product is being written to
         """
 
-        tbl = self.get_table(ds.attrs["product_level"])
-        tbl.insert(ds.attrs)
+        self.insert_row(ds.attrs["product_level"], dict(ds.attrs))
 
 
 if __name__ == "__main__":
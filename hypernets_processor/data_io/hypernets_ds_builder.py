@@ -7,8 +7,12 @@ from hypernets_processor.data_io.product_name_util import ProductNameUtil
 from hypernets_processor.data_io.format.metadata import METADATA_DEFS
 from hypernets_processor.data_io.format.variables import VARIABLES_DICT_DEFS
 
+from collections import namedtuple
 from datetime import datetime
-import obsarray
+from types import MappingProxyType
+import numpy as np
+import xarray
+from obsarray.templater.template_util import TemplateUtil
 import copy
 
 """___Authorship___"""
@@ -22,6 +26,113 @@ __status__ = "Development"
 version = __version__
 
 
+VariableBlueprint = namedtuple(
+    "VariableBlueprint", ["name", "dims", "dtype", "fill_value", "attrs", "encoding"]
+)
+
+
+def compile_blueprint(variables_dict):
+    """
+    Returns immutable blueprint of template dataset variables from variables definition
+    dictionary, with the dims, dtype, fill value, attributes (including error-correlation
+    attributes) and encoding of each variable, as created by obsarray
+
+    :type variables_dict: dict
+    :param variables_dict: variables definition dictionary of product format
+
+    :return: variable blueprints, in order of definition
+    :rtype: tuple
+    """
+
+    blueprint = []
+    for name, var_def in variables_dict.items():
+        # obsarray pops entries from (and appends to) definitions, so create each
+        # variable once from a copy, at minimal size
+        variable = TemplateUtil._create_var(
+            name, copy.deepcopy(var_def), {dim: 1 for dim in var_def["dim"]}
+        )
+        blueprint.append(
+            VariableBlueprint(
+                name,
+                tuple(var_def["dim"]),
+                variable.dtype,
+                variable.values.flat[0],
+                MappingProxyType(dict(variable.attrs)),
+                MappingProxyType(dict(variable.encoding)),
+            )
+        )
+    return tuple(blueprint)
+
+
+def create_ds_from_blueprint(blueprint, dim_sizes_dict, metadata=None, propagate_ds=None):
+    """
+    Returns template dataset stamped out from blueprint, equivalent to
+    ``obsarray.create_ds`` of the variables definition dictionary it was compiled from
+
+    :type blueprint: tuple
+    :param blueprint: variable blueprints, from ``compile_blueprint``
+    :type dim_sizes_dict: dict
+    :param dim_sizes_dict: entry per dataset dimension with value of size as int
+    :type metadata: dict
+    :param metadata: (optional) dataset metadata
+    :type propagate_ds: xarray.Dataset
+    :param propagate_ds: (optional) dataset to take data from for variables with common
+    names and dimensions (data only, not attributes)
+
+    :return: template dataset
+    :rtype: xarray.Dataset
+    """
+
+    variables = {}
+    for var in blueprint:
+        try:
+            shape = tuple(dim_sizes_dict[dim] for dim in var.dims)
+        except KeyError:
+            raise KeyError(
+                "Dim Name Error - Variable "
+                + var.name
+                + " defined with dim not in dim_sizes_dict"
+            )
+
+        # data is taken from propagate_ds by reference, as obsarray propagate_values,
+        # for data variables (not dimension coordinates) with same dims and shape
+        data = None
+        if (
+            propagate_ds is not None
+            and var.dims != (var.name,)
+            and var.name in propagate_ds.data_vars
+            and propagate_ds[var.name].dims == var.dims
+            and propagate_ds[var.name].shape == shape
+        ):
+            data = propagate_ds[var.name].values
+
+        if data is None:
+            data = np.full(shape, var.fill_value, dtype=var.dtype)
+
+        variables[var.name] = xarray.Variable(
+            var.dims,
+            data,
+            attrs={
+                key: list(value) if isinstance(value, list) else value
+                for key, value in var.attrs.items()
+            },
+            encoding=dict(var.encoding),
+        )
+
+    ds = xarray.Dataset(variables)
+    if metadata is not None:
+        ds.attrs.update(metadata)
+
+    return ds
+
+
+# blueprints of the Hypernets formats, compiled once at import
+DS_BLUEPRINTS = {
+    ds_format: compile_blueprint(variables_dict)
+    for ds_format, variables_dict in VARIABLES_DICT_DEFS.items()
+}
+
+
 class HypernetsDSBuilder:
     """
     Class to generate xarray Datasets in the Hypernets file format specification, handling the library of defined file
@@ -47,6 +158,11 @@ class HypernetsDSBuilder:
         self.variables_dict_defs = variables_dict_defs
         self.metadata_defs = metadata_defs
 
+        # blueprints of other format definitions are compiled on first use
+        self.blueprints = (
+            DS_BLUEPRINTS if variables_dict_defs is VARIABLES_DICT_DEFS else {}
+        )
+
     def create_ds_template(
         self,
         dim_sizes_dict: object,
@@ -79,7 +195,7 @@ class HypernetsDSBuilder:
 
         # Find variables
         if ds_format in self.return_ds_formats():
-            variables_dict = copy.deepcopy(self.variables_dict_defs[ds_format])
+            blueprint = self.return_ds_format_blueprint(ds_format)
         else:
             raise NameError(
                 "Invalid format name: "
@@ -212,8 +328,8 @@ class HypernetsDSBuilder:
         if (metadata_db is not None) and (metadata_db_query is not None):
             metadata = self.find_metadata(metadata, metadata_db, metadata_db_query)
 
-        return obsarray.create_ds(
-            variables_dict, dim_sizes_dict, metadata=metadata, propagate_ds=propagate_ds
+        return create_ds_from_blueprint(
+            blueprint, dim_sizes_dict, metadata=metadata, propagate_ds=propagate_ds
         )
 
     def return_ds_formats(self):
@@ -226,6 +342,23 @@ class HypernetsDSBuilder:
 
         return list(self.variables_dict_defs.keys())
 
+    def return_ds_format_blueprint(self, ds_format):
+        """
+        Returns compiled blueprint of variables of specified ds format
+
+        :type ds_format: str
+        :param ds_format: product format string
+
+        :return: variable blueprints
+        :rtype: tuple
+        """
+
+        if ds_format not in self.blueprints:
+            self.blueprints[ds_format] = compile_blueprint(
+                self.variables_dict_defs[ds_format]
+            )
+        return self.blueprints[ds_format]
+
     def return_ds_format_variable_names(self, ds_format):
         """
         Returns variables for specified ds format
@@ -9,14 +9,13 @@ from struct import unpack
 from sys import version_info  # noqa
 import pandas as pd
 
-import matplotlib.pyplot as plt
 import numpy as np
 import math
 from pysolar.solar import *
 
 from hypernets_processor.data_io.format.header import HEADER_DEF
 from hypernets_processor.data_io.data_templates import DataTemplates
-from hypernets_processor.data_io.spectrum import Spectrum
+from hypernets_processor.data_io.spectrum import SpeFile
 from hypernets_processor.data_io.format.flags import FLAG_COMMON
 
 from hypernets_processor.version import __version__
@@ -24,6 +23,7 @@ from hypernets_processor.data_io.product_name_util import ProductNameUtil
 from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
 from hypernets_processor.data_io.normalize_360 import normalizedeg
 from hypernets_processor.data_utils.quality_checks import QualityChecks
+from hypernets_processor.data_utils.solar_geometry import solar_position
 
 """___Authorship___"""
 __author__ = "ClÃ©mence Goyens"
@@ -61,6 +61,8 @@ class HypernetsReader:
     # new functions: read_header, read_data, read_footer, read_seq, read_wavelength
 
     def plot_spectra(self, spectra, dataSpectra):
+        import matplotlib.pyplot as plt
+
         plt.clf()
         plt.title(spectra)
         plt.plot([i for i in range(len(dataSpectra))], dataSpectra)
@@ -173,6 +175,14 @@ class HypernetsReader:
     def read_angles(
             self, ds, scan_number, specattr, offset_pan, offset_tilt, angle2use, land=False
     ):
+        """
+        Sets pointing and viewing angles of scans from spectra attributes
+
+        :type ds: xarray.Dataset
+        :param ds: L0A dataset
+        :type scan_number: int/slice
+        :param scan_number: index of scan, or slice of scans sharing spectra attributes and acquisition time
+        """
 
         paa_ask, vza_ask = map(float, specattr["pt_ask"].split(";"))
         paa_abs, vza_abs = map(float, specattr["pt_abs"].split(";"))
@@ -202,9 +212,8 @@ class HypernetsReader:
                 & (angle2use == "pt_ask")
                 & (not land)
         ):
-            paa = normalizedeg(
-                float(paa_ask) + ds["solar_azimuth_angle"][scan_number], 0, 360
-            )
+            saa = np.atleast_1d(ds["solar_azimuth_angle"].values[scan_number])[0]
+            paa = normalizedeg(float(paa_ask) + saa, 0, 360)
             vza = vza_ask
         elif (
                 ((offset_pan is None) or (offset_tilt is None))
@@ -236,16 +245,16 @@ class HypernetsReader:
             vza_ask = 360 - vza_ask
             paa_ask = paa_ask + 180
 
-        ds["paa_ref"][scan_number] = normalizedeg(float(paa_ref), 0, 360)
-        ds["paa_ask"][scan_number] = normalizedeg(float(paa_ask), 0, 360)
-        ds["paa_abs"][scan_number] = normalizedeg(float(paa_abs), 0, 360)
+        ds["paa_ref"].values[scan_number] = normalizedeg(float(paa_ref), 0, 360)
+        ds["paa_ask"].values[scan_number] = normalizedeg(float(paa_ask), 0, 360)
+        ds["paa_abs"].values[scan_number] = normalizedeg(float(paa_abs), 0, 360)
 
         # convert from pointing azimuth angle to viewing azimuth angle
         vaa = normalizedeg(paa - 180, 0, 360)
 
-        ds["pointing_azimuth_angle"][scan_number] = paa
-        ds["viewing_azimuth_angle"][scan_number] = vaa
-        ds["viewing_zenith_angle"][scan_number] = vza
+        ds["pointing_azimuth_angle"].values[scan_number] = paa
+        ds["viewing_azimuth_angle"].values[scan_number] = vaa
+        ds["viewing_zenith_angle"].values[scan_number] = vza
 
         return ds
 
@@ -492,28 +501,27 @@ class HypernetsReader:
     #
     #     return ds
 
-    def read_series(
-            self,
-            seq_dir,
-            series,
-            lat,
-            lon,
-            metadata,
-            flag,
-            fileformat,
-            cal_data,
-            instrument_id,
-            site_id,
-            azimuth_switch,
-            offset_tilt,
-            offset_pan,
-            angle2use,
-    ):
+    def read_series_files(self, seq_dir, series, metadata, missing_anomaly=False):
+        """
+        Reads each spectra file of a series once, returning one scan block per file
+
+        :type seq_dir: str
+        :param seq_dir: sequence directory
+        :type series: list
+        :param series: names of spectra files in series
+        :type metadata: configparser.ConfigParser
+        :param metadata: sequence metadata
+        :type missing_anomaly: bool
+        :param missing_anomaly: if True add "mf" anomaly for files listed in metadata but missing
+
+        :return: scan blocks, as (series_id, spectra attributes, acquisition time, spe file) tuples
+        :rtype: list
+        """
         FOLDER_NAME = os.path.join(seq_dir, "RADIOMETER/")
         model_name = self.model
 
         # read all spectra (== spe files with concanated files) in a series
-        vnir = []
+        blocks = []
         for spectra in series:
             self.context.logger.debug("processing " + spectra)
             model = dict(zip(model_name, spectra.split("_")[:-1]))
@@ -541,192 +549,152 @@ class HypernetsReader:
             # read the file
             # -----------------------
             if os.path.exists(FOLDER_NAME + spectra):
-                with open(FOLDER_NAME + spectra, "rb") as f:
-                    f.seek(0, 2)
-                    file_size = f.tell()
-                    f.seek(0)
-                    byte_pointer = 0
-                    chunk_size = 1
-                    chunk_counter = 1
-                    while file_size - byte_pointer:
-                        try:
-                            self.context.logger.debug(
-                                "Parsing chunk No {}, size {} bytes, bytes left: {}".format(
-                                    chunk_counter, chunk_size, file_size - byte_pointer
-                                )
-                            )
-                            chunk_size = unpack("<H", f.read(2))[0]
-                            if chunk_size == 4119:
-                                chunk_size = 4131
-                            f.seek(byte_pointer)
-                            chunk_body = f.read(chunk_size)
-                            spectrum = Spectrum.parse_raw(chunk_body)
-                            if len(vnir) == 0:
-                                vnir = np.array(spectrum.body)
-                            else:
-                                vnir = np.vstack([vnir, spectrum.body])
-
-                        except:
-                            self.context.logger.warning("reading of spectrum failed")
-                            break
-                        byte_pointer = f.tell()
-                        chunk_counter += 1
+                spe = SpeFile(FOLDER_NAME + spectra)
+                if spe.truncated:
+                    self.context.logger.warning("reading of spectrum failed")
+                self.context.logger.debug(
+                    "{} chunks read, {} with valid CRC32".format(
+                        len(spe), np.sum(spe.crc_valid)
+                    )
+                )
+                blocks.append((model["series_id"], specattr, acquisitionTime, spe))
             else:
                 self.context.logger.warning(
                     "A file (%s) listed in the metadata.txt is missing." % (spectra)
                 )
-                self.context.anomaly_handler.add_anomaly("mf")
-                #break
+                if missing_anomaly:
+                    self.context.anomaly_handler.add_anomaly("mf")
+
+        return blocks
+
+    def read_series_scans(
+            self,
+            seq_dir,
+            blocks,
+            lat,
+            lon,
+            flag,
+            fileformat,
+            cal_data,
+            instrument_id,
+            site_id,
+            offset_tilt,
+            offset_pan,
+            angle2use,
+            land=False,
+            swir=False,
+            integration_time_default=None,
+    ):
+        """
+        Builds L0A dataset from the VNIR or SWIR scans of the given scan blocks
+
+        :type blocks: list
+        :param blocks: scan blocks, as returned by read_series_files
+        :type swir: bool
+        :param swir: if True build dataset from SWIR scans, else from VNIR scans
+        :type integration_time_default: float
+        :param integration_time_default: (optional) integration time for scans without recorded exposure time
+
+        :return: L0A dataset, None if no scans in blocks
+        :rtype: xarray.Dataset
+        """
+
+        # gather the scans of each block, for assignment to dataset in bulk
+        chunks = [
+            np.flatnonzero((spe.pixel_count > 500) != swir)
+            for series_id, specattr, acquisitionTime, spe in blocks
+        ]
+        blocks = [(b, c) for b, c in zip(blocks, chunks) if len(c) > 0]
+        if len(blocks) == 0:
+            return None
 
-        if len(vnir.shape) == 1:
-            vnir = vnir[None, :]
+        nscans = np.array([len(c) for b, c in blocks])
+        bounds = np.concatenate(([0], np.cumsum(nscans)))
+        headers = np.concatenate([b[3].headers[c] for b, c in blocks])
+        dn = np.concatenate([b[3].bodies(c) for b, c in blocks])
 
         self.context.logger.debug(
-            "vnir data shape in combined raw files: {}".format(vnir.shape)
+            "{} data shape in combined raw files: {}".format(
+                "swir" if swir else "vnir", dn.shape
+            )
         )
 
-        scanDim = vnir.shape[0]
-        wvl = self.read_wavelength(vnir.shape[1], cal_data)
-        ds = self.templ.l0a_template_dataset(wvl, scanDim, fileformat)
+        scanDim = dn.shape[0]
+        wvl = self.read_wavelength(dn.shape[1], cal_data)
+        if swir:
+            ds = self.templ.l0a_template_dataset(wvl, scanDim, fileformat, swir=True)
+        else:
+            ds = self.templ.l0a_template_dataset(wvl, scanDim, fileformat)
 
         ds.attrs["sequence_id"] = str(os.path.basename(seq_dir))
         ds.attrs["instrument_id"] = str(instrument_id)
         ds.attrs["site_id"] = str(site_id)
         ds.attrs["source_file"] = str(os.path.basename(seq_dir))
-        ds["bandwidth"].values = 3 * np.ones_like(wvl)
+        ds["bandwidth"].values = (10 if swir else 3) * np.ones_like(wvl)
 
-        scan_number = 0
-        for spectra in series:
-            model = dict(zip(model_name, spectra.split("_")[:-1]))
-            specBlock = (
-                    model["series_rep"]
-                    + "_"
-                    + model["series_id"]
-                    + "_"
-                    + model["vaa"]
-                    + "_"
-                    + model["azimuth_ref"]
-                    + "_"
-                    + model["vza"]
+        (series_id, specattr, acquisitionTime, spe), chunk = blocks[0]
+        print(spe.spectrum(chunk[0]).return_header())
+
+        # all scans in a block share series and acquisition time
+        acquisition_time = np.repeat(
+            [datetime.datetime.timestamp(b[2]) for b, c in blocks], nscans
+        )
+        ds["series_id"].values[:] = np.repeat([b[0] for b, c in blocks], nscans)
+        ds["acquisition_time"].values[:] = acquisition_time
+        if lat is not None:
+            ds.attrs["site_latitude"] = lat
+            ds.attrs["site_longitude"] = lon
+            sza, saa = solar_position(float(lat), float(lon), acquisition_time)
+            ds["solar_zenith_angle"].values[:] = sza
+            ds["solar_azimuth_angle"].values[:] = saa
+        else:
+            self.context.logger.warning(
+                "Latitude is not found, using default values instead for lat, lon, sza and saa."
             )
-            # spectra attributes from metadata file
-            specattr = dict(metadata[specBlock])
+        ds["quality_flag"].values[:] = flag
+
+        integration_time = headers["exposure_time"].astype(np.float64)
+        if swir and (integration_time_default is not None):
+            integration_time[integration_time <= 0] = integration_time_default
+        ds["integration_time"].values[:] = integration_time
+        ds["temperature"].values[:] = headers["temperature"]
+
+        # accelaration:
+        # Reference acceleration data contains 3x 16 bit signed integers with X, Y and Z
+        # acceleration measurements respectively. These are factory-calibrated steady-state
+        # reference acceleration measurements of the gravity vector when instrument is in
+        # horizontal position. Due to device manufacturing tolerances, these are
+        # device-specific and should be applied, when estimating tilt from the measured
+        # acceleration data. Each measurement is bit count of full range Â±19.6 m sâˆ’2 .
+        # Acceleration for each axis can be calculated per Eq. (4).
+
+        a = 19.6
+        b = 2 ** 15
+        for axis in ["x", "y", "z"]:
+            ds["acceleration_%s_mean" % axis].values[:] = (
+                    headers["accel_mean_%s" % axis] * a / b
+            )
+            ds["acceleration_%s_std" % axis].values[:] = (
+                    headers["accel_std_%s" % axis] * a / b
+            )
+        ds["digital_number"].values[:] = dn.T
 
-            # name of spectra file
-            acquisitionTime = specattr[spectra]
-            acquisitionTime = datetime.datetime.strptime(
-                acquisitionTime + "UTC", "%Y%m%dT%H%M%S%Z"
+        for i, ((series_id, specattr, acquisitionTime, spe), chunk) in enumerate(
+                blocks
+        ):
+            ds = self.read_angles(
+                ds,
+                slice(bounds[i], bounds[i + 1]),
+                specattr,
+                offset_pan,
+                offset_tilt,
+                angle2use,
+                land=land,
             )
-            acquisitionTime = acquisitionTime.replace(tzinfo=timezone.utc)
-            # -----------------------
-            # read the file
-            # -----------------------
-            if os.path.exists(FOLDER_NAME + spectra):
-                with open(FOLDER_NAME + spectra, "rb") as f:
-                    f.seek(0, 2)
-                    file_size = f.tell()
-                    f.seek(0)
-                    byte_pointer = 0
-                    chunk_size = 1
-                    chunk_counter = 1
-                    while file_size - byte_pointer:
-                        chunk_size = unpack("<H", f.read(2))[0]
-                        if chunk_size == 4119:
-                            chunk_size = 4131
-                        f.seek(byte_pointer)
-                        chunk_body = f.read(chunk_size)
-                        try:
-                            spectrum = Spectrum.parse_raw(chunk_body)
-                            if scan_number == 0:
-                                print(spectrum.return_header())
-                            scan = (
-                                spectrum.body
-                            )  # should include this back again when crc32 is in the headers!  #crc32 = self.read_footer(f, 4)
-
-                            series_id = model["series_id"]
-                            ds["series_id"][scan_number] = series_id
-
-                            # estimate time based on timestamp
-                            ds["acquisition_time"][
-                                scan_number
-                            ] = datetime.datetime.timestamp(acquisitionTime)
-                            if lat is not None:
-                                ds.attrs["site_latitude"] = lat
-                                ds.attrs["site_longitude"] = lon
-                                ds["solar_zenith_angle"][
-                                    scan_number
-                                ] = 90 - get_altitude(
-                                    float(lat), float(lon), acquisitionTime
-                                )
-                                ds["solar_azimuth_angle"][
-                                    scan_number
-                                ] = get_azimuth(
-                                    float(lat), float(lon), acquisitionTime
-                                )
-                            elif scan_number == 0:
-                                self.context.logger.warning(
-                                    "Lattitude is not found, using default values instead for lat, lon, sza and saa."
-                                )
-                            ds["quality_flag"][scan_number] = flag
-                            ds["integration_time"][
-                                scan_number
-                            ] = spectrum.header.exposure_time
-                            ds["temperature"][
-                                scan_number
-                            ] = spectrum.header.temperature
-
-                            ds = self.read_angles(
-                                ds,
-                                scan_number,
-                                specattr,
-                                offset_pan,
-                                offset_tilt,
-                                angle2use,
-                                land=False,
-                            )
-
-                            # accelaration:
-                            # Reference acceleration data contains 3x 16 bit signed integers with X, Y and Z
-                            # acceleration measurements respectively. These are factory-calibrated steady-state
-                            # reference acceleration measurements of the gravity vector when instrument is in
-                            # horizontal position. Due to device manufacturing tolerances, these are
-                            # device-specific and should be applied, when estimating tilt from the measured
-                            # acceleration data. Each measurement is bit count of full range Â±19.6 m sâˆ’2 .
-                            # Acceleration for each axis can be calculated per Eq. (4).
-
-                            a = 19.6
-                            b = 2 ** 15
-                            ds["acceleration_x_mean"][scan_number] = (
-                                    spectrum.header.accel_stats.mean_x * a / b
-                            )
-                            ds["acceleration_x_std"][scan_number] = (
-                                    spectrum.header.accel_stats.std_x * a / b
-                            )
-                            ds["acceleration_y_mean"][scan_number] = (
-                                    spectrum.header.accel_stats.mean_y * a / b
-                            )
-                            ds["acceleration_y_std"][scan_number] = (
-                                    spectrum.header.accel_stats.std_y * a / b
-                            )
-                            ds["acceleration_z_mean"][scan_number] = (
-                                    spectrum.header.accel_stats.mean_z * a / b
-                            )
-                            ds["acceleration_z_std"][scan_number] = (
-                                    spectrum.header.accel_stats.std_z * a / b
-                            )
-                            ds["digital_number"][:, scan_number] = scan
-                            scan_number += 1
-                        except:
-                            self.context.logger.warning(
-                                "reading of spectrum for series %s failed" % series_id
-                            )
-                            break
-
-                        byte_pointer = f.tell()
-                        chunk_counter += 1
+
         return ds
 
-    def read_series_L(
+    def read_series(
             self,
             seq_dir,
             series,
@@ -736,367 +704,88 @@ class HypernetsReader:
             flag,
             fileformat,
             cal_data,
-            cal_data_swir,
             instrument_id,
             site_id,
+            azimuth_switch,
             offset_tilt,
             offset_pan,
             angle2use,
     ):
-        FOLDER_NAME = os.path.join(seq_dir, "RADIOMETER/")
-        model_name = self.model
-
-        # read all spectra (== spe files with concanated files) in a series
-        vnir = []
-        swir = []
-        for spectra in series:
-            self.context.logger.debug("processing " + spectra)
-            model = dict(zip(model_name, spectra.split("_")[:-1]))
-            specBlock = (
-                    model["series_rep"]
-                    + "_"
-                    + model["series_id"]
-                    + "_"
-                    + model["vaa"]
-                    + "_"
-                    + model["azimuth_ref"]
-                    + "_"
-                    + model["vza"]
-            )
-            # spectra attributes from metadata file
-            specattr = dict(metadata[specBlock])
-
-            # name of spectra file
-            acquisitionTime = specattr[spectra]
-            acquisitionTime = datetime.datetime.strptime(
-                acquisitionTime + "UTC", "%Y%m%dT%H%M%S%Z"
-            )
-            acquisitionTime = acquisitionTime.replace(tzinfo=timezone.utc)
-            # -----------------------
-            # read the file
-            # -----------------------
-            if os.path.exists(FOLDER_NAME + spectra):
-                with open(FOLDER_NAME + spectra, "rb") as f:
-                    f.seek(0, 2)
-                    file_size = f.tell()
-                    f.seek(0)
-                    byte_pointer = 0
-                    chunk_size = 1
-                    chunk_counter = 1
-                    while file_size - byte_pointer:
-                        try:
-                            self.context.logger.debug(
-                                "Parsing chunk No {}, size {} bytes, bytes left: {}".format(
-                                    chunk_counter, chunk_size, file_size - byte_pointer
-                                )
-                            )
-                            chunk_size = unpack("<H", f.read(2))[0]
-                            if chunk_size == 4119:
-                                chunk_size = 4131
-                            f.seek(byte_pointer)
-                            chunk_body = f.read(chunk_size)
-                            spectrum = Spectrum.parse_raw(chunk_body)
-                            if len(spectrum.body) > 500:
-                                if len(vnir) == 0:
-                                    vnir = np.array(spectrum.body)
-                                else:
-                                    vnir = np.vstack([vnir, spectrum.body])
-                            else:
-                                if len(swir) == 0:
-                                    swir = np.array(spectrum.body)
-                                else:
-                                    swir = np.vstack([swir, spectrum.body])
-                        except:
-                            self.context.logger.warning("reading of spectrum failed")
-                            break
-                        byte_pointer = f.tell()
-                        chunk_counter += 1
-            else:
-                self.context.logger.warning(
-                    "A file (%s) listed in the metadata.txt is missing." % (spectra)
-                )
-
-        if len(vnir)>0:
-            if len(vnir.shape) == 1:
-                vnir = vnir[None, :]
-
-
-            scanDim = vnir.shape[0]
-            wvl = self.read_wavelength(vnir.shape[1], cal_data)
-            ds = self.templ.l0a_template_dataset(wvl, scanDim, fileformat)
-
-            ds.attrs["sequence_id"] = str(os.path.basename(seq_dir))
-            ds.attrs["instrument_id"] = str(instrument_id)
-            ds.attrs["site_id"] = str(site_id)
-            ds.attrs["source_file"] = str(os.path.basename(seq_dir))
-            ds["bandwidth"].values = 3 * np.ones_like(wvl)
-
-        else:
-            ds=None
-
-        if len(swir) > 0:
-            if len(swir.shape) == 1:
-                swir = swir[None, :]
-
-            self.context.logger.debug(
-                "vnir data shape in combined raw files: %s \n "
-                "swir data shape in combined raw files: %s" % (vnir.shape, swir.shape)
-            )
+        blocks = self.read_series_files(
+            seq_dir, series, metadata, missing_anomaly=True
+        )
 
-            scanDim = swir.shape[0]
-            wvl_swir = self.read_wavelength(swir.shape[1], cal_data_swir)
-            ds_swir = self.templ.l0a_template_dataset(
-                wvl_swir, scanDim, fileformat, swir=True
-            )
+        return self.read_series_scans(
+            seq_dir,
+            blocks,
+            lat,
+            lon,
+            flag,
+            fileformat,
+            cal_data,
+            instrument_id,
+            site_id,
+            offset_tilt,
+            offset_pan,
+            angle2use,
+            land=False,
+        )
 
-            ds_swir.attrs["sequence_id"] = str(os.path.basename(seq_dir))
-            ds_swir.attrs["instrument_id"] = str(instrument_id)
-            ds_swir.attrs["site_id"] = str(site_id)
-            ds_swir.attrs["source_file"] = str(os.path.basename(seq_dir))
-            ds_swir["bandwidth"].values = 10 * np.ones_like(wvl_swir)
+    def read_series_L(
+            self,
+            seq_dir,
+            series,
+            lat,
+            lon,
+            metadata,
+            flag,
+            fileformat,
+            cal_data,
+            cal_data_swir,
+            instrument_id,
+            site_id,
+            offset_tilt,
+            offset_pan,
+            angle2use,
+    ):
+        blocks = self.read_series_files(seq_dir, series, metadata)
 
-        else:
-            ds_swir = None
+        ds = self.read_series_scans(
+            seq_dir,
+            blocks,
+            lat,
+            lon,
+            flag,
+            fileformat,
+            cal_data,
+            instrument_id,
+            site_id,
+            offset_tilt,
+            offset_pan,
+            angle2use,
+            land=True,
+        )
 
-        scan_number = 0
-        scan_number_swir = 0
-        for spectra in series:
-            model = dict(zip(model_name, spectra.split("_")[:-1]))
-            specBlock = (
-                    model["series_rep"]
-                    + "_"
-                    + model["series_id"]
-                    + "_"
-                    + model["vaa"]
-                    + "_"
-                    + model["azimuth_ref"]
-                    + "_"
-                    + model["vza"]
-            )
-            # spectra attributes from metadata file
-            specattr = dict(metadata[specBlock])
+        ds_swir = self.read_series_scans(
+            seq_dir,
+            blocks,
+            lat,
+            lon,
+            flag,
+            fileformat,
+            cal_data_swir,
+            instrument_id,
+            site_id,
+            offset_tilt,
+            offset_pan,
+            angle2use,
+            land=True,
+            swir=True,
+            integration_time_default=(
+                ds["integration_time"].values[0] if ds is not None else None
+            ),
+        )
 
-            # name of spectra file
-            acquisitionTime = specattr[spectra]
-            acquisitionTime = datetime.datetime.strptime(
-                acquisitionTime + "UTC", "%Y%m%dT%H%M%S%Z"
-            )
-            acquisitionTime = acquisitionTime.replace(tzinfo=timezone.utc)
-            # -----------------------
-            # read the file
-            # -----------------------
-            if os.path.exists(FOLDER_NAME + spectra):
-                with open(FOLDER_NAME + spectra, "rb") as f:
-                    f.seek(0, 2)
-                    file_size = f.tell()
-                    f.seek(0)
-                    byte_pointer = 0
-                    chunk_size = 1
-                    chunk_counter = 1
-                    while file_size - byte_pointer:
-                        chunk_size = unpack("<H", f.read(2))[0]
-                        if chunk_size == 4119:
-                            chunk_size = 4131
-                        f.seek(byte_pointer)
-                        chunk_body = f.read(chunk_size)
-                        try:
-                            spectrum = Spectrum.parse_raw(chunk_body)
-
-                            if len(spectrum.body) > 500:
-                                if scan_number == 0:
-                                    print(spectrum.return_header())
-                                scan = (
-                                    spectrum.body
-                                )  # should include this back again when crc32 is in the headers!  #crc32 = self.read_footer(f, 4)
-
-                                series_id = model["series_id"]
-                                ds["series_id"][scan_number] = series_id
-
-                                # estimate time based on timestamp
-                                ds["acquisition_time"][
-                                    scan_number
-                                ] = datetime.datetime.timestamp(acquisitionTime)
-                                if lat is not None:
-                                    ds.attrs["site_latitude"] = lat
-                                    ds.attrs["site_longitude"] = lon
-                                    ds["solar_zenith_angle"][
-                                        scan_number
-                                    ] = 90 - get_altitude(
-                                        float(lat), float(lon), acquisitionTime
-                                    )
-                                    ds["solar_azimuth_angle"][
-                                        scan_number
-                                    ] = get_azimuth(
-                                        float(lat), float(lon), acquisitionTime
-                                    )
-                                elif scan_number == 0:
-                                    self.context.logger.warning(
-                                        "Lattitude is not found, using default values instead for lat, lon, sza and saa."
-                                    )
-                                ds["quality_flag"][scan_number] = flag
-                                ds["integration_time"][
-                                    scan_number
-                                ] = spectrum.header.exposure_time
-                                ds["temperature"][
-                                    scan_number
-                                ] = spectrum.header.temperature
-
-                                ds = self.read_angles(
-                                    ds,
-                                    scan_number,
-                                    specattr,
-                                    offset_pan,
-                                    offset_tilt,
-                                    angle2use,
-                                    land=True,
-                                )
-
-                                # accelaration:
-                                # Reference acceleration data contains 3x 16 bit signed integers with X, Y and Z
-                                # acceleration measurements respectively. These are factory-calibrated steady-state
-                                # reference acceleration measurements of the gravity vector when instrument is in
-                                # horizontal position. Due to device manufacturing tolerances, these are
-                                # device-specific and should be applied, when estimating tilt from the measured
-                                # acceleration data. Each measurement is bit count of full range Â±19.6 m sâˆ’2 .
-                                # Acceleration for each axis can be calculated per Eq. (4).
-
-                                a = 19.6
-                                b = 2 ** 15
-                                ds["acceleration_x_mean"][scan_number] = (
-                                        spectrum.header.accel_stats.mean_x * a / b
-                                )
-                                ds["acceleration_x_std"][scan_number] = (
-                                        spectrum.header.accel_stats.std_x * a / b
-                                )
-                                ds["acceleration_y_mean"][scan_number] = (
-                                        spectrum.header.accel_stats.mean_y * a / b
-                                )
-                                ds["acceleration_y_std"][scan_number] = (
-                                        spectrum.header.accel_stats.std_y * a / b
-                                )
-                                ds["acceleration_z_mean"][scan_number] = (
-                                        spectrum.header.accel_stats.mean_z * a / b
-                                )
-                                ds["acceleration_z_std"][scan_number] = (
-                                        spectrum.header.accel_stats.std_z * a / b
-                                )
-                                ds["digital_number"][:, scan_number] = scan
-                                scan_number += 1
-
-                            else:
-                                if scan_number_swir == 0:
-                                    print(spectrum.return_header())
-
-                                scan = (
-                                    spectrum.body
-                                )  # should include this back again when crc32 is in the headers!  #crc32 = self.read_footer(f, 4)
-
-                                series_id = model["series_id"]
-                                ds_swir["series_id"][scan_number_swir] = series_id
-
-                                # estimate time based on timestamp
-                                ds_swir["acquisition_time"][
-                                    scan_number_swir
-                                ] = datetime.datetime.timestamp(acquisitionTime)
-                                #            #print(datetime.fromtimestamp(acquisitionTime))
-
-                                #             # didn't use acquisition time from instrument
-                                #             # possibility that acquisition time is time since reboot, but how to now reboot time?
-                                #             # if we use the metadata time header
-                                #             timestamp=header['acquisition_time']
-                                #             ts = int(timestamp)/1000
-
-                                #             date_time_str = timereboot+'UTC'
-                                #             print(date_time_str)
-                                #             date_time_obj = datetime.strptime(date_time_str, '%Y%m%dT%H%M%S%Z')
-                                #             print(date_time_obj)
-
-                                #             timereboot = datetime.timestamp(date_time_obj)
-                                #             print("timereboot =", timereboot)
-                                #             print(datetime.fromtimestamp(timereboot))
-
-                                #             print(datetime.fromtimestamp(int(ts+timereboot)))
-                                #             print(datetime.fromtimestamp(int(ts+timereboot))-date_time_obj)
-                                if lat is not None:
-                                    ds_swir.attrs["site_latitude"] = lat
-                                    ds_swir.attrs["site_longitude"] = lon
-                                    ds_swir["solar_zenith_angle"][
-                                        scan_number_swir
-                                    ] = 90 - get_altitude(
-                                        float(lat), float(lon), acquisitionTime
-                                    )
-                                    ds_swir["solar_azimuth_angle"][
-                                        scan_number_swir
-                                    ] = get_azimuth(
-                                        float(lat), float(lon), acquisitionTime
-                                    )
-
-                                elif scan_number_swir == 0:
-                                    self.context.logger.warning(
-                                        "Latitude is not found, using default values instead for lat, lon, sza and saa."
-                                    )
-                                ds_swir["quality_flag"][scan_number_swir] = flag
-                                if spectrum.header.exposure_time > 0:
-                                    ds_swir["integration_time"][
-                                        scan_number_swir
-                                    ] = spectrum.header.exposure_time
-                                else:
-                                    ds_swir["integration_time"][scan_number_swir] = ds[
-                                        "integration_time"
-                                    ][0]
-                                ds_swir["temperature"][
-                                    scan_number_swir
-                                ] = spectrum.header.temperature
-
-                                ds_swir = self.read_angles(
-                                    ds_swir,
-                                    scan_number_swir,
-                                    specattr,
-                                    offset_pan,
-                                    offset_tilt,
-                                    angle2use,
-                                    land=True,
-                                )
-
-                                # accelaration:
-                                # Reference acceleration data contains 3x 16 bit signed integers with X, Y and Z
-                                # acceleration measurements respectively. These are factory-calibrated steady-state
-                                # reference acceleration measurements of the gravity vector when instrument is in
-                                # horizontal position. Due to device manufacturing tolerances, these are
-                                # device-specific and should be applied, when estimating tilt from the measured
-                                # acceleration data. Each measurement is bit count of full range Â±19.6 m sâˆ’2 .
-                                # Acceleration for each axis can be calculated per Eq. (4).
-
-                                a = 19.6
-                                b = 2 ** 15
-                                ds_swir["acceleration_x_mean"][scan_number_swir] = (
-                                        spectrum.header.accel_stats.mean_x * a / b
-                                )
-                                ds_swir["acceleration_x_std"][scan_number_swir] = (
-                                        spectrum.header.accel_stats.std_x * a / b
-                                )
-                                ds_swir["acceleration_y_mean"][scan_number_swir] = (
-                                        spectrum.header.accel_stats.mean_y * a / b
-                                )
-                                ds_swir["acceleration_y_std"][scan_number_swir] = (
-                                        spectrum.header.accel_stats.std_y * a / b
-                                )
-                                ds_swir["acceleration_z_mean"][scan_number_swir] = (
-                                        spectrum.header.accel_stats.mean_z * a / b
-                                )
-                                ds_swir["acceleration_z_std"][scan_number_swir] = (
-                                        spectrum.header.accel_stats.std_z * a / b
-                                )
-                                ds_swir["digital_number"][:, scan_number_swir] = scan
-                                scan_number_swir += 1
-                        except:
-                            self.context.logger.warning(
-                                "reading of spectrum for series %s failed" % series_id
-                            )
-                            break
-
-                        byte_pointer = f.tell()
-                        chunk_counter += 1
         return ds, ds_swir
 
     def read_metadata(self, seq_dir):
@@ -1546,14 +1235,16 @@ class HypernetsReader:
                 )
                 date_time_obj = date_time_obj.replace(tzinfo=timezone.utc)
 
-                if aa == "-001":
-                    aa = get_azimuth(
+                if aa == "-001" or va == "-001":
+                    sza, saa = solar_position(
                         float(lat),
                         float(lon),
-                        date_time_obj,
+                        datetime.datetime.timestamp(date_time_obj),
                     )
+                if aa == "-001":
+                    aa = saa
                 if va == "-001":
-                    va = 90 - get_altitude(float(lat), float(lon), date_time_obj)
+                    va = sza
                 angles = "{}_{}_{}".format(seriesid, round(float(aa)), round(float(va)))
                 imagename = self.produt.create_product_name(
                     "IMG",
@@ -4,10 +4,10 @@ HypernetsWriter class
 
 from hypernets_processor.version import __version__
 import os
+import atexit
+import queue
+import threading
 import numpy as np
-from obsarray.templater.template_util import DatasetUtil
-
-import xarray as xr
 
 """___Authorship___"""
 __author__ = "Sam Hunt"
@@ -18,6 +18,103 @@ __email__ = "sam.hunt@npl.co.uk"
 __status__ = "Development"
 
 
+WRITE_QUEUE_SIZE = 4
+
+# product variables archive database rows are made from, kept for written products
+# until they are archived
+ARCHIVE_VARIABLES = [
+    "acquisition_time",
+    "solar_zenith_angle",
+    "solar_azimuth_angle",
+    "viewing_zenith_angle",
+    "viewing_azimuth_angle",
+    "quality_flag",
+]
+
+
+def return_archive_ds(ds):
+    """
+    Returns dataset reduced to the attributes and variables needed to add it to archive
+    databases, so written products need not be held in memory until archived
+
+    :type ds: xarray.Dataset
+    :param ds: dataset
+
+    :return: reduced dataset
+    :rtype: xarray.Dataset
+    """
+
+    ds_archive = ds[[name for name in ARCHIVE_VARIABLES if name in ds.variables]]
+    ds_archive.attrs = dict(ds.attrs)
+    return ds_archive
+
+
+class WriteQueue:
+    """
+    Bounded queue of products to be written to file by a background thread, in the order
+    they are queued
+
+    :type max_size: int
+    :param max_size: maximum number of products waiting to be written, when full adding
+    further products blocks until a product has been written. Once written, only the
+    part of a product needed to archive it is kept (see return_archive_ds).
+    """
+
+    def __init__(self, max_size=WRITE_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=max(int(max_size), 1))
+        self.jobs = []
+        self.thread = None
+
+    def put(self, write_function, ds, path, *args):
+        """
+        Adds product to queue, starting the writing thread if not running
+
+        :param write_function: function to write product, called as
+        ``write_function(ds, path, *args)``
+        :type ds: xarray.Dataset
+        :param ds: dataset
+        :type path: str
+        :param path: file path
+        """
+
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            atexit.register(self.queue.join)
+
+        job = {"ds": ds, "path": path, "error": None}
+        self.jobs.append(job)
+        self.queue.put((job, write_function, args))
+
+    def _run(self):
+        while True:
+            job, write_function, args = self.queue.get()
+            try:
+                write_function(job["ds"], job["path"], *args)
+                if job["ds"] is not None:
+                    job["ds"] = return_archive_ds(job["ds"])
+            except Exception as e:
+                job["error"] = e
+                job["ds"] = None
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """
+        Waits for all queued products to be written
+
+        :return: written products, as dictionaries with entries ds (reduced to what is
+        needed to archive it, None if not written), path and error (None if written
+        successfully), in the order queued
+        :rtype: list
+        """
+
+        self.queue.join()
+        jobs = self.jobs
+        self.jobs = []
+        return jobs
+
+
 class HypernetsWriter:
     """
     Class to write Hypernets output files
@@ -60,11 +157,8 @@ class HypernetsWriter:
 
         path = self.return_path(ds, directory, fmt)
 
-        if os.path.isfile(path):
-            if overwrite is True:
-                os.remove(path)
-            else:
-                raise IOError("The file already exists: " + path)
+        if os.path.isfile(path) and (overwrite is not True):
+            raise IOError("The file already exists: " + path)
 
         if self.context.get_config_value("mcsteps") < 2:
             vars_with_unc_comps=[var for var in ds.keys()
@@ -87,21 +181,69 @@ class HypernetsWriter:
                     if remove_var_string.strip() in var_name:
                         ds = ds.drop_vars(var_name)
 
-        # ds = HypernetsWriter.fill_ds(ds)
-        if fmt == "nc":
-            HypernetsWriter._write_netcdf(
-                ds,
+        # Write in background if enabled, copying dataset as it may be changed by later
+        # processing - dataset is added to archive db when flushed
+        write_queue = self.return_write_queue()
+        if write_queue is not None:
+            write_queue.put(
+                HypernetsWriter._write_file,
+                ds.copy(deep=True),
                 path,
-                compression_level=compression_level,
-                encodefloat32=encodefloat32,
+                fmt,
+                compression_level,
+                encodefloat32,
             )
+            return
 
-        elif fmt == "csv":
-            HypernetsWriter._write_csv(ds, path)
+        HypernetsWriter._write_file(ds, path, fmt, compression_level, encodefloat32)
 
         # Add dataset set to archive db if required
         self.archive_ds(ds, path)
 
+    def return_write_queue(self):
+        """
+        Return queue for writing products in background, if write_async set in context
+        (created on first use and kept in context)
+
+        :return: write queue, None if writing synchronously
+        :rtype: WriteQueue
+        """
+
+        if (self.context is None) or (not self.context.get_config_value("write_async")):
+            return None
+
+        if self.context.write_queue is None:
+            max_size = self.context.get_config_value("write_queue_size")
+            self.context.write_queue = WriteQueue(
+                WRITE_QUEUE_SIZE if max_size is None else max_size
+            )
+
+        return self.context.write_queue
+
+    def flush(self):
+        """
+        Waits for products queued for background writing to be written and adds them to
+        archive db, in the order they were written. Raises write error anomaly if any
+        product could not be written.
+        """
+
+        if (self.context is None) or (self.context.write_queue is None):
+            return
+
+        failed = False
+        for job in self.context.write_queue.flush():
+            if job["error"] is None:
+                self.archive_ds(job["ds"], job["path"])
+            else:
+                failed = True
+                if self.context.logger is not None:
+                    self.context.logger.error(
+                        "Failed to write " + job["path"] + ": " + repr(job["error"])
+                    )
+
+        if failed:
+            self.context.anomaly_handler.add_anomaly("w")
+
     def return_fmt(self, fmt=None):
         """
         Return product fmt, with respect to context and specified value
@@ -244,6 +386,39 @@ class HypernetsWriter:
 
         return os.path.join(self.return_directory(directory), "image")
 
+    @staticmethod
+    def _write_file(ds, path, fmt, compression_level=None, encodefloat32=True):
+        """
+        Write xarray dataset to file, replacing existing file
+
+        :type ds: xarray.Dataset
+        :param ds: dataset
+
+        :type path: str
+        :param path: file path
+
+        :type fmt: str
+        :param fmt: format to write to, may be 'nc' or 'csv'
+
+        :type compression_level: int
+        :param compression_level: the file compression level if 'netCDF4' fmt, 0 - 9 (default is 5)
+        """
+
+        if os.path.isfile(path):
+            os.remove(path)
+
+        # ds = HypernetsWriter.fill_ds(ds)
+        if fmt == "nc":
+            HypernetsWriter._write_netcdf(
+                ds,
+                path,
+                compression_level=compression_level,
+                encodefloat32=encodefloat32,
+            )
+
+        elif fmt == "csv":
+            HypernetsWriter._write_csv(ds, path)
+
     @staticmethod
     def _write_netcdf(ds, path, compression_level=None, encodefloat32=True):
         """
@@ -271,6 +446,8 @@ class HypernetsWriter:
             if ds[var_name].values.dtype == np.float64 and encodefloat32:
                 var_encoding["dtype"] = np.float32
             if "dtype" in var_encoding.keys():
+                from obsarray.templater.template_util import DatasetUtil
+
                 var_encoding.update(
                     {
                         "_FillValue": DatasetUtil.get_default_fill_value(
@@ -0,0 +1,366 @@
+"""
+SequenceDiscovery class
+"""
+
+from hypernets_processor.version import __version__
+from hypernets_processor.utils.paths import parse_sequence_path, atomic_write
+from hypernets_processor.data_io.checkpoint_store import CheckpointStore
+import os
+import json
+import time
+import datetime
+import threading
+from fnmatch import fnmatch
+import numpy as np
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+# patterns of the date directories of raw data directories laid out as
+# raw_data_directory/YYYY/mm/DD/SEQ*
+DATE_DIRECTORY_PATTERNS = ["20*", "*", "*"]
+
+# listings of directories modified less than this time (in s) before they were listed
+# are listed again, as later changes within the file system mtime resolution would not
+# change the directory mtime
+MTIME_RESOLUTION = 2.0
+
+
+class SequenceDiscovery:
+    """
+    Class to find sequences to process in the raw data directory incrementally, such that
+    each search only checks new or unresolved sequences rather than the full archive
+
+    Between searches the following state is persisted (as json):
+
+    * directory listings with directory mtime - only directories modified since the
+      previous search are listed again
+    * high-water mark - name of the latest sequence found by the previous search
+    * pending - names of sequences up to the high-water mark that are not resolved, i.e.
+      not processed to L2A and not failed with an anomaly
+
+    Sequences newer than the high-water mark, newly listed or pending are checked against
+    the archive and anomaly databases, with indexed queries for those sequences only.
+    To reprocess sequences that are already resolved the state file must be removed.
+    Failed sequences with a checkpoint to resume from are processed again (see
+    CheckpointStore.return_resumable_sequences).
+
+    :type context: hypernets_processor.context.Context
+    :param context: processor context
+
+    :type state_path: str
+    :param state_path: (optional) path of json file state is persisted to, if omitted
+    taken from context ("discovery_state_path" config value, else "<job_name>.sequences.json"
+    in job working directory). If no path is available state is only kept in memory.
+    """
+
+    def __init__(self, context, state_path=None):
+        self.context = context
+        self.state_path = self.return_state_path() if state_path is None else state_path
+        self.state = self.load_state()
+
+    def return_state_path(self):
+        """
+        Returns default state file path for context
+
+        :return: state file path (None if not defined)
+        :rtype: str
+        """
+
+        if self.context.get_config_value("discovery_state_path") is not None:
+            return self.context.get_config_value("discovery_state_path")
+
+        job_working_directory = self.context.get_config_value("job_working_directory")
+        if job_working_directory is None:
+            return None
+
+        job_name = self.context.get_config_value("job_name")
+        return os.path.join(
+            job_working_directory,
+            ("" if job_name is None else job_name + ".") + "sequences.json",
+        )
+
+    def return_state_key(self):
+        """
+        Returns config values state is valid for, state is reset if any change
+
+        :return: state key
+        :rtype: dict
+        """
+
+        return {
+            name: self.context.get_config_value(name)
+            for name in ["raw_data_directory", "site_id", "archive_db_url"]
+        }
+
+    def load_state(self):
+        """
+        Returns state persisted by previous search, or empty state if none or if
+        persisted for different job
+
+        :return: state
+        :rtype: dict
+        """
+
+        state = {
+            "key": self.return_state_key(),
+            "directories": {},
+            "resolved_until": None,
+            "pending": [],
+        }
+
+        if (self.state_path is None) or (not os.path.exists(self.state_path)):
+            return state
+
+        try:
+            with open(self.state_path) as f:
+                persisted_state = json.load(f)
+        except ValueError:
+            self.context.logger.warning(
+                "Sequence discovery state file %s unreadable, it will be reset"
+                % self.state_path
+            )
+            return state
+
+        if persisted_state.get("key") != state["key"]:
+            return state
+        return persisted_state
+
+    def save_state(self):
+        """
+        Writes state to state file, if defined
+        """
+
+        if self.state_path is None:
+            return
+
+        directory = os.path.dirname(self.state_path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+
+        atomic_write(self.state_path, lambda f: json.dump(self.state, f), mode="w")
+
+    def list_directory(self, directory, listings):
+        """
+        Returns directory entries, reusing the listing of the previous search if the
+        directory has not been modified since
+
+        :type directory: str
+        :param directory: directory path
+
+        :type listings: dict
+        :param listings: listings of current search, updated with directory listing
+
+        :return: directory entries, entries not in listing of previous search
+        :rtype: tuple
+        """
+
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            return [], []
+
+        listing = self.state["directories"].get(directory)
+        if (
+            (listing is not None)
+            and (listing[0] == mtime)
+            and (listing[1] - mtime > MTIME_RESOLUTION)
+        ):
+            listings[directory] = listing
+            return listing[2], []
+
+        listed_at = time.time()
+        try:
+            entries = sorted(os.listdir(directory))
+        except OSError:
+            entries = []
+        listings[directory] = [mtime, listed_at, entries]
+
+        previous_entries = set() if listing is None else set(listing[2])
+        return entries, [entry for entry in entries if entry not in previous_entries]
+
+    def find_sequences(self):
+        """
+        Returns sequences in raw data directory, from raw_data_directory/SEQ* and
+        raw_data_directory/YYYY/mm/DD/SEQ*
+
+        :return: sequence names and paths (sorted by name), names of sequences not found
+        by previous search
+        :rtype: tuple
+        """
+
+        listings = {}
+        sequences = []
+        new_names = set()
+
+        directories = [(self.context.get_config_value("raw_data_directory"), 0)]
+        while directories:
+            directory, depth = directories.pop()
+            entries, new_entries = self.list_directory(directory, listings)
+            new_entries = set(new_entries)
+
+            for entry in entries:
+                path = os.path.join(directory, entry)
+
+                if (depth in [0, len(DATE_DIRECTORY_PATTERNS)]) and (
+                    entry[:3] == "SEQ"
+                ):
+                    if parse_sequence_path(path, self.context) is not None:
+                        sequences.append((entry, path))
+                        if entry in new_entries:
+                            new_names.add(entry)
+
+                elif (depth < len(DATE_DIRECTORY_PATTERNS)) and (entry[0] != "."):
+                    if fnmatch(entry, DATE_DIRECTORY_PATTERNS[depth]):
+                        directories.append((path, depth + 1))
+
+        self.state["directories"] = listings
+        return sorted(sequences), new_names
+
+    def target_sequences(self, to_archive):
+        """
+        Returns paths of sequences to process, checking against previous archived data if
+        adding to archive
+
+        :type to_archive: bool
+        :param to_archive: switch for if to add processed data to data archive
+
+        :return: sequence paths
+        :rtype: list
+        """
+
+        # raw_data_directory may either be a sequence path or directory of sequence paths
+        raw_data_directory = self.context.get_config_value("raw_data_directory")
+        if parse_sequence_path(raw_data_directory) is not None:
+            return [raw_data_directory]
+
+        sequences, new_names = self.find_sequences()
+
+        if not to_archive:
+            self.save_state()
+            return [path for name, path in sequences if is_complete(path)]
+
+        if self.context.archive_db is None:
+            raise ValueError("archive db has not been set!")
+
+        checkpoints = CheckpointStore(self.context)
+        checkpoints.prune()
+        resumable = checkpoints.return_resumable_sequences()
+
+        # Only sequences not known to be resolved are checked
+        resolved_until = self.state["resolved_until"]
+        pending = set(self.state["pending"])
+        candidates = [
+            (name, path)
+            for name, path in sequences
+            if (resolved_until is None)
+            or (name > resolved_until)
+            or (name in pending)
+            or (name in new_names)
+            or (name in resumable)
+        ]
+
+        site_id = self.context.get_config_value("site_id")
+        candidate_names = sorted({name for name, path in candidates})
+        processed = self.context.archive_db.get_processed_sequences(
+            candidate_names, site_id=site_id
+        )
+        anomalies = self.context.anomaly_db.get_sequences_anomalies(
+            candidate_names, site_id=site_id
+        )
+
+        delay_hours = self.context.get_config_value("delay_hours")
+
+        paths_to_process = []
+        unresolved = set()
+        for name, path in candidates:
+            anomaly_ids = anomalies.get(name, [])
+
+            if not is_complete(path):
+                unresolved.add(name)
+
+                # add anomaly for incomplete downloads, if not already added
+                if "m" not in anomaly_ids:
+                    self.context.start_sequence(path)
+                    self.context.logger.error(
+                        "metadata.txt not found in directory %s, will try processing "
+                        "again later" % path
+                    )
+                    self.context.anomaly_handler.anomaly_db.add_anomaly("m")
+
+            elif (name not in processed) and (
+                (name in resumable)
+                or all(anomaly_id == "m" for anomaly_id in anomaly_ids)
+            ):
+                unresolved.add(name)
+
+                sequence_datetime = parse_sequence_path(name)["datetime"]
+                if delay_hours is not None and np.abs(
+                    sequence_datetime - datetime.datetime.now()
+                ) < datetime.timedelta(hours=delay_hours):
+                    self.context.logger.info(
+                        "%s is not processed yet due to not having reached required "
+                        "delay (%s hours)" % (name, delay_hours)
+                    )
+                else:
+                    paths_to_process.append(path)
+
+        if len(sequences) > 0:
+            self.state["resolved_until"] = max(resolved_until or "", sequences[-1][0])
+        self.state["pending"] = sorted(unresolved)
+        self.save_state()
+
+        return paths_to_process
+
+    def watch(self, callback, interval=60.0, to_archive=True, stop_event=None):
+        """
+        Watches raw data directory for sequences to process, polling it at the given
+        interval and calling callback with the paths of the sequences to process when
+        any are found
+
+        :type callback: function
+        :param callback: function called with list of sequence paths to process
+
+        :type interval: float
+        :param interval: (optional) time between searches (in s), default 60 s
+
+        :type to_archive: bool
+        :param to_archive: (optional) switch for if to add processed data to data
+        archive, default True
+
+        :type stop_event: threading.Event
+        :param stop_event: (optional) event to stop watching, if omitted watches
+        indefinitely
+        """
+
+        stop_event = threading.Event() if stop_event is None else stop_event
+
+        while not stop_event.is_set():
+            paths_to_process = self.target_sequences(to_archive)
+            if len(paths_to_process) > 0:
+                callback(paths_to_process)
+            stop_event.wait(interval)
+
+
+def is_complete(sequence_path):
+    """
+    Returns True if sequence download is complete, i.e. the sequence metadata file exists
+
+    :type sequence_path: str
+    :param sequence_path: sequence path
+
+    :return: sequence complete
+    :rtype: bool
+    """
+
+    return os.path.exists(os.path.join(sequence_path, "metadata.txt"))
+
+
+if __name__ == "__main__":
+    pass
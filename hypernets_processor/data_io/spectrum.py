@@ -4,12 +4,40 @@ Spectrum class, written by Kaspars Laizans at Tartu University
 
 
 import struct
+import zlib
 from enum import Enum
 
 import os
 
 import time
 
+import numpy as np
+
+
+# binary layout of the 31 byte spectrum header (see format/header.py)
+SPECTRUM_HEADER_DTYPE = np.dtype(
+    [
+        ("total_length", "<u2"),
+        ("spectrum_type", "u1"),
+        ("timestamp", "<u8"),
+        ("exposure_time", "<u2"),
+        ("temperature", "<f4"),
+        ("pixel_count", "<u2"),
+        ("accel_mean_x", "<i2"),
+        ("accel_std_x", "<i2"),
+        ("accel_mean_y", "<i2"),
+        ("accel_std_y", "<i2"),
+        ("accel_mean_z", "<i2"),
+        ("accel_std_z", "<i2"),
+    ]
+)
+HEADER_LENGTH = SPECTRUM_HEADER_DTYPE.itemsize
+PIXEL_DTYPE = np.dtype("<u2")
+CRC_LENGTH = 4
+
+# some firmware versions report a total length of 4119 bytes for 4131 byte VNIR chunks
+MISREPORTED_CHUNK_LENGTHS = {4119: 4131}
+
 
 class EntranceType(Enum):
     RADIANCE = 0x02
@@ -23,6 +51,10 @@ class Radiometer(Enum):
     BOTH = 0x03
 
 
+VALID_RADIOMETER_CODES = {r.value for r in Radiometer}
+VALID_OPTICS_CODES = {o.value for o in EntranceType}
+
+
 class Spectrum:
     class SpectrumHeader:
         class AccelStats:
@@ -167,9 +199,9 @@ class Spectrum:
     def parse_raw(cls, data, save_raw=False, slot=0):
         s = Spectrum()
         s.header = Spectrum.SpectrumHeader.parse_header(data)
-        for i in range(s.header.pixel_count):
-            (pixel,) = struct.unpack("<H", data[31 + i * 2 : 33 + i * 2])
-            s.body.append(pixel)
+        s.body = np.frombuffer(
+            data, dtype=PIXEL_DTYPE, count=s.header.pixel_count, offset=HEADER_LENGTH
+        )
         s.crc32 = struct.unpack("<I", data[len(data) - 4 :])
         if save_raw:
             save_path = os.path.join(
@@ -187,5 +219,246 @@ class Spectrum:
         return s
 
 
+class SpeFile:
+    """
+    Decoder for Hypernets '.spe' raw data files, which contain one or more
+    concatenated spectrum chunks (header, pixel body and CRC32).
+
+    The file is memory-mapped and chunk boundaries are found in a single pass over
+    the chunk length fields. Headers and pixel bodies are then exposed as numpy
+    views onto the mapped file, so no per-pixel Python work is done.
+
+    Decoding stops at the first chunk that is truncated, too short for its declared
+    pixel count or has an invalid spectrum type (i.e. chunks that could not be
+    parsed with Spectrum.parse_raw), in which case ``truncated`` is set.
+
+    :type path: str
+    :param path: path of .spe file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.truncated = False
+
+        if os.path.getsize(path) > 0:
+            self.buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        else:
+            self.buffer = np.zeros(0, dtype=np.uint8)
+
+        self.offsets, self.lengths = self._find_chunks()
+        self.headers = self._read_headers()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _find_chunks(self):
+        """
+        Walks the chunk length fields to find the offset and length of each valid chunk
+
+        :return: chunk offsets, chunk lengths
+        :rtype: tuple
+        """
+
+        buffer = self.buffer
+        file_size = len(buffer)
+        offsets = []
+        lengths = []
+
+        pointer = 0
+        while pointer < file_size:
+            if file_size - pointer < HEADER_LENGTH:
+                self.truncated = True
+                break
+
+            chunk_length, spectrum_type = struct.unpack_from("<HB", buffer, pointer)
+            (pixel_count,) = struct.unpack_from("<H", buffer, pointer + 17)
+            chunk_length = MISREPORTED_CHUNK_LENGTHS.get(chunk_length, chunk_length)
+
+            if (
+                (pointer + chunk_length > file_size)
+                or (
+                    chunk_length
+                    < HEADER_LENGTH + PIXEL_DTYPE.itemsize * pixel_count + CRC_LENGTH
+                )
+                or ((spectrum_type >> 6) & 0x03) not in VALID_RADIOMETER_CODES
+                or ((spectrum_type >> 3) & 0x03) not in VALID_OPTICS_CODES
+            ):
+                self.truncated = True
+                break
+
+            offsets.append(pointer)
+            lengths.append(chunk_length)
+            pointer += chunk_length
+
+        return np.array(offsets, dtype=np.int64), np.array(lengths, dtype=np.int64)
+
+    def _runs(self, index=None):
+        """
+        Splits chunks into runs of consecutive, equal length chunks, which can each be
+        described by a single strided view on the file buffer
+
+        :type index: numpy.ndarray
+        :param index: (optional) chunk indices to consider, defaults to all chunks
+
+        :return: list of (first chunk offset, chunk length, number of chunks)
+        :rtype: list
+        """
+
+        index = np.arange(len(self)) if index is None else np.asarray(index)
+        if len(index) == 0:
+            return []
+
+        offsets = self.offsets[index]
+        lengths = self.lengths[index]
+
+        # a new run starts wherever the next chunk is not directly adjacent
+        breaks = np.flatnonzero(
+            (np.diff(offsets) != lengths[:-1]) | (np.diff(lengths) != 0)
+        ) + 1
+        starts = np.concatenate(([0], breaks))
+        ends = np.concatenate((breaks, [len(index)]))
+
+        return [
+            (int(offsets[start]), int(lengths[start]), int(end - start))
+            for start, end in zip(starts, ends)
+        ]
+
+    def _strided_view(self, dtype, shape, offset, stride):
+        return np.ndarray(
+            shape=shape,
+            dtype=dtype,
+            buffer=self.buffer,
+            offset=offset,
+            strides=(stride,) + ((dtype.itemsize,) if len(shape) > 1 else ()),
+        )
+
+    def _read_headers(self):
+        views = [
+            self._strided_view(SPECTRUM_HEADER_DTYPE, (n,), offset, length)
+            for offset, length, n in self._runs()
+        ]
+
+        if len(views) == 1:
+            return views[0]
+        elif len(views) == 0:
+            return np.zeros(0, dtype=SPECTRUM_HEADER_DTYPE)
+        return np.concatenate(views)
+
+    @property
+    def pixel_count(self):
+        return self.headers["pixel_count"]
+
+    @property
+    def radiometer(self):
+        """
+        Radiometer code of each chunk (see Radiometer)
+        """
+        return (self.headers["spectrum_type"] >> 6) & 0x03
+
+    @property
+    def optics(self):
+        """
+        Entrance type code of each chunk (see EntranceType)
+        """
+        return (self.headers["spectrum_type"] >> 3) & 0x03
+
+    @property
+    def crc32(self):
+        """
+        CRC32 stored at the end of each chunk
+        """
+        ends = self.offsets + self.lengths - CRC_LENGTH
+        crc_bytes = np.ascontiguousarray(
+            self.buffer[ends[:, None] + np.arange(CRC_LENGTH)]
+        )
+        return crc_bytes.view("<u4").reshape(len(self)).astype(np.uint32)
+
+    @property
+    def crc_valid(self):
+        """
+        Whether the CRC32 stored for each chunk matches the CRC32 of the chunk content
+        """
+        computed = np.array(
+            [
+                zlib.crc32(self.buffer[offset : offset + length - CRC_LENGTH])
+                for offset, length in zip(self.offsets, self.lengths)
+            ],
+            dtype=np.uint32,
+        )
+        return computed == self.crc32
+
+    def body(self, i):
+        """
+        Returns pixel body of chunk as view on file buffer
+
+        :type i: int
+        :param i: chunk index
+
+        :return: pixel values
+        :rtype: numpy.ndarray
+        """
+
+        return np.frombuffer(
+            self.buffer,
+            dtype=PIXEL_DTYPE,
+            count=int(self.pixel_count[i]),
+            offset=int(self.offsets[i]) + HEADER_LENGTH,
+        )
+
+    def bodies(self, index=None):
+        """
+        Returns pixel bodies of chunks as 2D array (chunk, pixel). Where the selected
+        chunks are stored contiguously this is a view on the file buffer.
+
+        :type index: numpy.ndarray
+        :param index: (optional) chunk indices or boolean mask, defaults to all
+        chunks. Selected chunks must have the same pixel count
+
+        :return: pixel values
+        :rtype: numpy.ndarray
+        """
+
+        index = np.arange(len(self)) if index is None else np.asarray(index)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+
+        pixel_counts = np.unique(self.pixel_count[index])
+        if len(pixel_counts) > 1:
+            raise ValueError(
+                "chunks with different pixel counts cannot be combined: "
+                + str(pixel_counts)
+            )
+        pixel_count = int(pixel_counts[0]) if len(pixel_counts) else 0
+
+        views = [
+            self._strided_view(
+                PIXEL_DTYPE, (n, pixel_count), offset + HEADER_LENGTH, length
+            )
+            for offset, length, n in self._runs(index)
+        ]
+
+        if len(views) == 1:
+            return views[0]
+        elif len(views) == 0:
+            return np.zeros((0, pixel_count), dtype=PIXEL_DTYPE)
+        return np.concatenate(views)
+
+    def spectrum(self, i):
+        """
+        Returns chunk parsed as Spectrum object
+
+        :type i: int
+        :param i: chunk index
+
+        :return: spectrum
+        :rtype: Spectrum
+        """
+
+        offset = int(self.offsets[i])
+        return Spectrum.parse_raw(
+            self.buffer[offset : offset + int(self.lengths[i])].tobytes()
+        )
+
+
 def pack_optics(radiometer: Radiometer, optics: EntranceType):
     return (radiometer.value << 6) | (optics.value << 3)
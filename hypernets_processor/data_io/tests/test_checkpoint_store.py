@@ -0,0 +1,305 @@
+"""
+Tests for CheckpointStore class
+"""
+
+import unittest
+from unittest.mock import MagicMock
+import os
+import json
+import time
+import shutil
+import tempfile
+import numpy as np
+import xarray as xr
+from hypernets_processor.version import __version__
+from hypernets_processor.context import Context
+from hypernets_processor.data_io.hypernets_db_builder import open_database
+from hypernets_processor.utils.config import read_config_file
+from hypernets_processor.data_io.checkpoint_store import (
+    CheckpointStore,
+    CONFIG_SECTION_LEVELS,
+    DEFAULT_CONFIG_PATHS,
+    return_config_levels,
+)
+
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def create_dataset(value):
+    """
+    Creates test dataset
+
+    :rtype: xarray.Dataset
+    """
+
+    ds = xr.Dataset(
+        {"irradiance": (["wavelength"], np.full(3, value, dtype=np.float32))},
+        coords={"wavelength": [400.0, 500.0, 600.0]},
+    )
+    ds["irradiance"].attrs["unc_comps"] = ["u_rel_random_irradiance"]
+    ds["irradiance"].attrs["err_corr_1_params"] = []
+    ds["irradiance"].encoding = {"dtype": np.uint16, "scale_factor": 0.01}
+    return ds
+
+
+class TestCheckpointStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.context = Context(logger=MagicMock())
+        self.context.set_config_value("checkpoint_directory", self.tmpdir)
+        self.context.set_config_value("max_level", "L2A")
+        self.context.set_config_value("mcsteps", 100)
+        self.context.set_config_value("measurement_function_surface_reflectance", "a")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def start_store(self, sequence_name="SEQ20210403T112115"):
+        self.context.start_sequence("data/" + sequence_name)
+        store = CheckpointStore(self.context)
+        store.start_sequence()
+        return store
+
+    def test_save_load(self):
+        store = self.start_store()
+        ds = create_dataset(1.0)
+        store.save("L1B", {"L1b_irr": ds, "L1b_rad": None})
+
+        level, datasets = self.start_store().load(["L1B"])
+        self.assertEqual(level, "L1B")
+        self.assertIsNone(datasets["L1b_rad"])
+        xr.testing.assert_identical(datasets["L1b_irr"], ds)
+        self.assertEqual(
+            datasets["L1b_irr"]["irradiance"].encoding, ds["irradiance"].encoding
+        )
+
+        # valid if only config of later levels changed
+        self.context.set_config_value("measurement_function_surface_reflectance", "b")
+        self.context.set_config_value("test_sun_threshold", 0.1)
+        self.assertEqual(self.start_store().load(["L1B"])[0], "L1B")
+
+        self.context.set_config_value("mcsteps", 10)
+        self.assertEqual(self.start_store().load(["L1B"]), (None, {}))
+
+    def test_load_highest_level(self):
+        store = self.start_store()
+        store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+        store.save("L1C", {"L1c": create_dataset(2.0)})
+
+        level, datasets = self.start_store().load(["L1B", "L1C"])
+        self.assertEqual(level, "L1C")
+        self.assertIn("L1c", datasets)
+
+        # L1C checkpoint invalid, L1B checkpoint still valid
+        self.context.set_config_value("measurement_function_interpolate_time", "b")
+        self.assertEqual(self.start_store().load(["L1B", "L1C"])[0], "L1B")
+
+        # no resume from level not below max level
+        self.context.set_config_value("measurement_function_interpolate_time", None)
+        self.context.set_config_value("max_level", "L1C")
+        self.assertEqual(self.start_store().load(["L1B", "L1C"])[0], "L1B")
+
+    def test_config_sections_classified(self):
+        for path in DEFAULT_CONFIG_PATHS:
+            config = read_config_file(path)
+            for section in config.sections():
+                for name in config[section].keys():
+                    self.assertIn(
+                        section,
+                        CONFIG_SECTION_LEVELS,
+                        msg="%s of %s not classified" % (name, path),
+                    )
+                    self.assertIn(name, return_config_levels())
+
+    def test_return_config_levels(self):
+        levels = return_config_levels()
+        self.assertEqual(levels["mcsteps"], "L0A")
+        self.assertEqual(levels["measurement_function_calibrate"], "L1A")
+        self.assertEqual(levels["measurement_function_interpolate_time"], "L1C")
+        self.assertEqual(levels["rhof_option"], "L1C")
+        self.assertEqual(levels["test_sun_threshold"], "L2A")
+        self.assertIsNone(levels["anomaly_db_url"])
+        self.assertIsNone(levels["checkpoint_directory"])
+
+        # set in sections of different levels
+        self.assertEqual(levels["use_config_latlon"], "L0A")
+        self.assertIsNone(levels["verbose"])
+
+    def test_save_replaces(self):
+        store = self.start_store()
+        store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+        store.save("L1C", {"L1c": create_dataset(2.0)})
+
+        # checkpoint of level with earlier key replaced
+        self.context.set_config_value("mcsteps", 10)
+        store = self.start_store()
+        store.save("L1B", {"L1b_irr": create_dataset(3.0)})
+
+        self.assertEqual(
+            store.return_sequence_paths("L1B"),
+            [store.return_path("L1B"), store.return_dataset_path("L1B", "L1b_irr")],
+        )
+        self.assertEqual(len(store.return_sequence_paths("L1C")), 2)
+
+    def test_load_restores_state(self):
+        self.context.freeze_config()
+
+        # anomalies added before sequence not part of checkpoint
+        self.context.anomaly_handler.anomalies_added.append("x")
+        store = self.start_store()
+        self.context.set_config_value("site_id", "BSBE")
+        self.context.anomaly_handler.add_anomaly("nld")
+        store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+
+        self.context.anomaly_handler.anomalies_added = []
+        self.assertEqual(self.start_store().load(["L1B"])[0], "L1B")
+        self.assertEqual(self.context.get_config_value("site_id"), "BSBE")
+        self.assertEqual(self.context.anomaly_handler.anomalies_added, ["nld"])
+
+    def test_load_writes_rows(self):
+        self.context.archive_db = open_database(
+            "sqlite:///" + self.tmpdir + "/archive.db", "archive", self.context
+        )
+        self.context.archive_db.defer_writes()
+        self.context.archive_db.insert_row("products", dict(product_name="previous"))
+
+        store = self.start_store()
+        self.context.archive_db.insert_row("products", dict(product_name="L1A"))
+        self.context.archive_db.insert_row("products", dict(product_name="L1B"))
+        store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+
+        # rows not committed (e.g. process killed), written again on resume
+        self.context.archive_db.pop_deferred_rows()
+        self.assertEqual(self.start_store().load(["L1B"])[0], "L1B")
+        rows = self.context.archive_db.deferred_rows
+        self.assertEqual([row["product_name"] for table, row in rows], ["L1A", "L1B"])
+
+        # rows committed (e.g. by failed run), not written again
+        self.context.archive_db.flush()
+        self.assertEqual(self.start_store().load(["L1B"])[0], "L1B")
+        self.assertEqual(self.context.archive_db.deferred_rows, [])
+        self.assertEqual(len(self.context.archive_db["products"]), 2)
+
+        self.context.archive_db.close()
+
+    def test_save_format(self):
+        store = self.start_store()
+        store.save("L1B", {"L1b_irr": create_dataset(1.0), "L1b_rad": None})
+
+        self.assertEqual(
+            store.return_sequence_paths("L1B"),
+            [store.return_path("L1B"), store.return_dataset_path("L1B", "L1b_irr")],
+        )
+        with open(store.return_path("L1B")) as f:
+            self.assertEqual(set(json.load(f)["datasets"]), {"L1b_irr", "L1b_rad"})
+
+        # products stored unscaled
+        with xr.open_dataset(store.return_dataset_path("L1B", "L1b_irr")) as ds:
+            self.assertEqual(ds["irradiance"].encoding["dtype"], np.float32)
+            self.assertNotIn("scale_factor", ds["irradiance"].encoding)
+
+    def test_save_failed(self):
+        store = self.start_store()
+        ds = create_dataset(1.0)
+        ds.attrs["invalid"] = {"a": 1}
+        store.save("L1B", {"L1b_irr": ds})
+
+        self.context.logger.warning.assert_called_once()
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_return_resumable_sequences(self):
+        self.start_store().save("L1B", {"L1b_irr": create_dataset(1.0)})
+        store = self.start_store("SEQ20210403T113115")
+        store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+        self.assertEqual(
+            CheckpointStore(self.context).return_resumable_sequences(),
+            {"SEQ20210403T112115", "SEQ20210403T113115"},
+        )
+
+        # failed after resuming, only resumed again if config changed
+        store.fail()
+        self.assertFalse(os.path.exists(store.return_failed_path()))
+        store = self.start_store("SEQ20210403T113115")
+        store.load(["L1B"])
+        store.fail()
+        self.assertEqual(
+            CheckpointStore(self.context).return_resumable_sequences(),
+            {"SEQ20210403T112115"},
+        )
+
+        self.context.set_config_value("measurement_function_surface_reflectance", "b")
+        self.assertEqual(
+            len(CheckpointStore(self.context).return_resumable_sequences()), 2
+        )
+
+        self.context.set_config_value("mcsteps", 10)
+        self.assertEqual(
+            CheckpointStore(self.context).return_resumable_sequences(), set()
+        )
+
+    def test_prune(self):
+        store = self.start_store()
+        store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+        store.save("L1C", {"L1c": create_dataset(2.0)})
+        mtime = time.time() - 8 * 86400
+        for path in store.return_sequence_paths("L1B"):
+            os.utime(path, (mtime, mtime))
+
+        store.prune()
+        self.assertEqual(
+            store.return_sequence_paths(), store.return_sequence_paths("L1C")
+        )
+        self.assertEqual(len(store.return_sequence_paths()), 2)
+
+        self.context.set_config_value("checkpoint_max_age", 0)
+        store.prune()
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_load_unreadable(self):
+        store = self.start_store()
+        store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+        with open(store.return_path("L1B"), "w") as f:
+            f.write('{"datasets": ')
+
+        self.assertEqual(self.start_store().load(["L1B"]), (None, {}))
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+        # truncated product
+        store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+        with open(store.return_dataset_path("L1B", "L1b_irr"), "wb") as f:
+            f.write(b"CDF\x01")
+
+        self.assertEqual(self.start_store().load(["L1B"]), (None, {}))
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_evict(self):
+        store = self.start_store()
+        store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+        store.save("L1C", {"L1c": create_dataset(2.0)})
+        other_store = self.start_store("SEQ20210403T113115")
+        other_store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+
+        store.evict()
+
+        self.assertEqual(store.return_sequence_paths(), [])
+        self.assertEqual(len(other_store.return_sequence_paths()), 2)
+
+    def test_no_directory(self):
+        self.context.set_config_value("checkpoint_directory", None)
+        store = self.start_store()
+        store.save("L1B", {"L1b_irr": create_dataset(1.0)})
+        store.evict()
+
+        self.assertEqual(store.load(["L1B"]), (None, {}))
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
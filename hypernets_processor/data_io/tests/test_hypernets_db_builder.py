@@ -7,11 +7,16 @@ from unittest.mock import patch
 from hypernets_processor.data_io.database_util import DatabaseUtil
 from hypernets_processor.data_io.hypernets_db_builder import HypernetsDBBuilder
 from hypernets_processor.data_io.hypernets_db_builder import open_database
+from hypernets_processor.context import Context
 from hypernets_processor.version import __version__
 import os
 import string
 import random
+import shutil
+import tempfile
+import datetime
 from copy import deepcopy
+from sqlalchemy.exc import OperationalError
 
 
 """___Authorship___"""
@@ -114,5 +119,193 @@ class TestHypernetsDBBuilder(unittest.TestCase):
         self.assertEqual(db, mock_create_template_dataset.return_value)
 
 
+class TestAnomalyDB(unittest.TestCase):
+    def test_defer_writes(self):
+        tmpdir = tempfile.mkdtemp()
+        url = "sqlite:///" + tmpdir + "/anomaly.db"
+
+        context = Context()
+        context.set_config_value("archive_directory", tmpdir)
+        context.set_config_value("network", "w")
+        context.set_config_value("time", datetime.datetime(2021, 4, 3, 11, 21, 15))
+        context.set_config_value("sequence_name", "SEQ20210403T112115")
+
+        db = open_database(url, db_format="anomaly", context=context)
+        db.defer_writes()
+        db.add_anomaly("a")
+
+        # anomaly not written, but visible for sequence
+        self.assertEqual(len(list(db["anomalies"].all())), 0)
+        self.assertEqual(db.get_sequence_anomalies(), ["a"])
+
+        rows = db.pop_deferred_rows()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(db.pop_deferred_rows(), [])
+
+        db_main = open_database(url, db_format="anomaly", context=context)
+        db_main.insert_rows(rows)
+        self.assertEqual(db_main.get_sequence_anomalies(), ["a"])
+
+        db.close()
+        db_main.close()
+        shutil.rmtree(tmpdir)
+
+    def test_flush(self):
+        tmpdir = tempfile.mkdtemp()
+        url = "sqlite:///" + tmpdir + "/anomaly.db"
+
+        context = Context()
+        context.set_config_value("archive_directory", tmpdir)
+        context.set_config_value("time", datetime.datetime(2021, 4, 3, 11, 21, 15))
+        context.set_config_value("sequence_name", "SEQ20210403T112115")
+
+        db = open_database(url, db_format="anomaly", context=context)
+        db.defer_writes()
+        db.add_anomaly("a")
+        db.add_anomaly("x")
+
+        # failed write held for next flush
+        with patch.object(
+            db, "insert_rows", side_effect=OperationalError("", {}, "disk I/O error")
+        ):
+            self.assertRaises(OperationalError, db.flush)
+        self.assertEqual(len(db.deferred_rows), 2)
+
+        db.flush()
+        self.assertEqual(db.deferred_rows, [])
+        self.assertEqual(
+            [anomaly["anomaly_id"] for anomaly in db["anomalies"].all()], ["a", "x"]
+        )
+
+        db.close()
+        shutil.rmtree(tmpdir)
+
+    @patch("hypernets_processor.data_io.hypernets_db_builder.time.sleep")
+    def test_insert_rows_locked(self, mock_sleep):
+        tmpdir = tempfile.mkdtemp()
+        url = "sqlite:///" + tmpdir + "/anomaly.db"
+
+        context = Context()
+        context.set_config_value("archive_directory", tmpdir)
+        db = open_database(url, db_format="anomaly", context=context)
+
+        locked = OperationalError("", {}, "database is locked")
+        get_table = db.get_table
+        with patch.object(
+            db, "get_table", side_effect=[locked, locked, get_table("anomalies")]
+        ):
+            db.insert_rows([("anomalies", dict(anomaly_id="a"))])
+
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(len(list(db["anomalies"].all())), 1)
+
+        with patch.object(db, "get_table", side_effect=locked):
+            self.assertRaises(
+                OperationalError, db.insert_rows, [("anomalies", dict(anomaly_id="a"))]
+            )
+
+        db.close()
+        shutil.rmtree(tmpdir)
+
+    def test_get_sequences_anomalies(self):
+        tmpdir = tempfile.mkdtemp()
+        url = "sqlite:///" + tmpdir + "/anomaly.db"
+
+        context = Context()
+        context.set_config_value("archive_directory", tmpdir)
+        db = open_database(url, db_format="anomaly", context=context)
+        self.assertTrue(db["anomalies"].has_index(["site_id", "sequence_name"]))
+
+        for sequence_name, anomaly_id in [
+            ("SEQ20210403T112115", "m"),
+            ("SEQ20210403T112115", "x"),
+            ("SEQ20210403T113115", "a"),
+            ("SEQ20210403T114115", "a"),
+        ]:
+            context.start_sequence(sequence_name)
+            db.add_anomaly(anomaly_id)
+
+        anomalies = db.get_sequences_anomalies(
+            ["SEQ20210403T112115", "SEQ20210403T113115", "SEQ20210403T115115"]
+        )
+
+        self.assertEqual(
+            anomalies,
+            {"SEQ20210403T112115": ["m", "x"], "SEQ20210403T113115": ["a"]},
+        )
+        self.assertEqual(
+            db.get_sequences_anomalies(["SEQ20210403T112115"], site_id="OTHER"), {}
+        )
+
+        db.close()
+        shutil.rmtree(tmpdir)
+
+
+class TestArchiveDB(unittest.TestCase):
+    def test_get_processed_sequences(self):
+        tmpdir = tempfile.mkdtemp()
+        url = "sqlite:///" + tmpdir + "/archive.db"
+
+        context = Context()
+        context.set_config_value("archive_directory", tmpdir)
+        db = open_database(url, db_format="archive", context=context)
+        self.assertTrue(
+            db["products"].has_index(["site_id", "sequence_name", "product_level"])
+        )
+
+        sequence_names = ["SEQ202104%02dT112115" % day for day in range(1, 30)]
+        for sequence_name in sequence_names[::2]:
+            for product_level in ["L1B", "L2A"]:
+                db["products"].insert(
+                    dict(
+                        sequence_name=sequence_name,
+                        site_id="TEST",
+                        product_level=product_level,
+                    )
+                )
+        db["products"].insert(
+            dict(sequence_name=sequence_names[1], site_id="TEST", product_level="L1B")
+        )
+
+        with patch(
+            "hypernets_processor.data_io.hypernets_db_builder.QUERY_CHUNK_SIZE", 4
+        ):
+            processed = db.get_processed_sequences(sequence_names[:-1])
+
+        self.assertEqual(processed, set(sequence_names[:-1:2]))
+        self.assertEqual(
+            db.get_processed_sequences(sequence_names, product_level="L1B"),
+            set(sequence_names[::2] + [sequence_names[1]]),
+        )
+
+        db.close()
+        shutil.rmtree(tmpdir)
+
+    def test_create_indexes(self):
+        tmpdir = tempfile.mkdtemp()
+        url = "sqlite:///" + tmpdir + "/archive.db"
+
+        # database created before indexes defined
+        db = DatabaseUtil.create_db(url)
+        db["products"].insert(dict(sequence_name="SEQ20210403T112115"))
+        db["products"].create_column("site_id", db.types.text)
+        db["products"].create_column("product_level", db.types.text)
+        self.assertFalse(
+            db["products"].has_index(["site_id", "sequence_name", "product_level"])
+        )
+        db.close()
+
+        context = Context()
+        context.set_config_value("archive_directory", tmpdir)
+        db = open_database(url, db_format="archive", context=context)
+
+        self.assertTrue(
+            db["products"].has_index(["site_id", "sequence_name", "product_level"])
+        )
+
+        db.close()
+        shutil.rmtree(tmpdir)
+
+
 if __name__ == "__main__":
     unittest.main()
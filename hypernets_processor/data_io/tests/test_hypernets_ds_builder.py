@@ -6,11 +6,20 @@ import unittest
 from unittest.mock import patch
 import random
 import string
+import copy
+import numpy as np
+import obsarray
 from hypernets_processor.test.test_functions import (
     setup_test_context,
     teardown_test_context,
 )
-from hypernets_processor.data_io.hypernets_ds_builder import HypernetsDSBuilder
+from hypernets_processor.data_io.hypernets_ds_builder import (
+    HypernetsDSBuilder,
+    DS_BLUEPRINTS,
+    compile_blueprint,
+    create_ds_from_blueprint,
+)
+from hypernets_processor.data_io.format.variables import VARIABLES_DICT_DEFS
 from hypernets_processor.version import __version__
 
 
@@ -247,6 +256,73 @@ class TestHypernetsDSBuilder(unittest.TestCase):
 
         self.assertDictEqual(dim_sizes_dict, expect_dim_sizes_dict)
 
+    def test_create_ds_from_blueprint(self):
+        for ds_format, variables_dict in VARIABLES_DICT_DEFS.items():
+            dim_sizes_dict = {
+                dim: 4
+                for var_def in variables_dict.values()
+                for dim in var_def["dim"]
+            }
+
+            expected_ds = obsarray.create_ds(
+                copy.deepcopy(variables_dict), dim_sizes_dict, metadata={"a": 1}
+            )
+            ds = create_ds_from_blueprint(
+                DS_BLUEPRINTS[ds_format], dim_sizes_dict, metadata={"a": 1}
+            )
+
+            self.assertTrue(ds.identical(expected_ds), msg=ds_format)
+            self.assertListEqual(list(ds.variables), list(expected_ds.variables))
+            for name in ds.variables:
+                self.assertEqual(ds[name].dtype, expected_ds[name].dtype)
+                self.assertDictEqual(ds[name].encoding, expected_ds[name].encoding)
+
+    def test_create_ds_from_blueprint_propagate(self):
+        variables_dict = VARIABLES_DICT_DEFS["L_L1B_RAD"]
+        dim_sizes_dict = {"wavelength": 5, "series": 3}
+
+        propagate_ds = obsarray.create_ds(copy.deepcopy(variables_dict), dim_sizes_dict)
+        for name in propagate_ds.data_vars:
+            propagate_ds[name].values = np.ones(
+                propagate_ds[name].shape, dtype=propagate_ds[name].dtype
+            )
+
+        expected_ds = obsarray.create_ds(
+            copy.deepcopy(variables_dict), dim_sizes_dict, propagate_ds=propagate_ds
+        )
+        ds = create_ds_from_blueprint(
+            compile_blueprint(variables_dict),
+            dim_sizes_dict,
+            propagate_ds=propagate_ds,
+        )
+
+        self.assertTrue(ds.identical(expected_ds))
+
+    def test_create_ds_from_blueprint_independent(self):
+        dim_sizes_dict = {"wavelength": 5, "series": 3}
+        blueprint = DS_BLUEPRINTS["L_L1B_RAD"]
+
+        ds1 = create_ds_from_blueprint(blueprint, dim_sizes_dict)
+        ds1["u_rel_systematic_indep_radiance"].attrs["err_corr_1_params"].append("x")
+        ds1["radiance"].values[:] = 1.0
+
+        ds2 = create_ds_from_blueprint(blueprint, dim_sizes_dict)
+        self.assertTrue(
+            ds2.identical(
+                obsarray.create_ds(
+                    copy.deepcopy(VARIABLES_DICT_DEFS["L_L1B_RAD"]), dim_sizes_dict
+                )
+            )
+        )
+
+    def test_create_ds_from_blueprint_dim_error(self):
+        self.assertRaises(
+            KeyError,
+            create_ds_from_blueprint,
+            DS_BLUEPRINTS["L_L1B_RAD"],
+            {"wavelength": 5},
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -3,14 +3,17 @@ Tests for HypernetsWriter class
 """
 
 import unittest
-from unittest.mock import patch, MagicMock
-from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
+from unittest.mock import patch, MagicMock, call
+from hypernets_processor.data_io.hypernets_writer import HypernetsWriter, WriteQueue
 from hypernets_processor.context import Context
 from hypernets_processor.version import __version__
 
-from xarray import Dataset
+from xarray import Dataset, open_dataset
 import numpy as np
 import os
+import shutil
+import tempfile
+import threading
 from datetime import datetime as dt
 import obsarray
 
@@ -150,5 +153,110 @@ class TestHypernetsWriter(unittest.TestCase):
         self.assertTrue(np.all(ds["array_variable2"] == 9.96921e36))
 
 
+class TestHypernetsWriterAsync(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.context = Context(logger=MagicMock())
+        self.context.set_config_value("archive_directory", self.tmpdir)
+        self.context.set_config_value("product_format", "netcdf")
+        self.context.set_config_value("mcsteps", 0)
+        self.context.set_config_value("write_async", True)
+        self.context.set_config_value("write_queue_size", 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @staticmethod
+    def create_ds(name, value):
+        ds = Dataset()
+        ds["variable"] = ("x",), np.full(5, value, dtype=np.float32)
+        ds.attrs["product_name"] = name
+        return ds
+
+    @patch("hypernets_processor.data_io.hypernets_writer.HypernetsWriter.archive_ds")
+    def test_write_async(self, mock_archive):
+        hw = HypernetsWriter(self.context)
+
+        for i in range(5):
+            ds = self.create_ds("test_%s" % i, i)
+            hw.write(ds, overwrite=True)
+
+            # dataset changed after queued, not written
+            ds["variable"].values[:] = -1
+
+        hw.write(self.create_ds("test_0", 10), overwrite=True)
+        hw.flush()
+
+        paths = [os.path.join(self.tmpdir, "test_%s.nc" % i) for i in range(5)]
+        self.assertEqual(
+            [c.args[1] for c in mock_archive.call_args_list], paths + paths[:1]
+        )
+
+        for i, path in enumerate(paths):
+            with open_dataset(path) as ds:
+                expected = 10 if i == 0 else i
+                np.testing.assert_array_equal(ds["variable"].values, expected)
+
+        self.assertEqual(self.context.write_queue.jobs, [])
+
+    @patch("hypernets_processor.data_io.hypernets_writer.HypernetsWriter.archive_ds")
+    def test_write_async_archive_ds(self, mock_archive):
+        hw = HypernetsWriter(self.context)
+        ds = self.create_ds("test_0", 0)
+        ds["acquisition_time"] = ("x",), np.arange(5.0)
+        ds.attrs["product_level"] = "L1A"
+
+        hw.write(ds)
+        self.context.write_queue.queue.join()
+
+        # only what is needed to archive product kept once written
+        ds_archive = self.context.write_queue.jobs[0]["ds"]
+        self.assertEqual(list(ds_archive.data_vars), ["acquisition_time"])
+        self.assertEqual(ds_archive.attrs, ds.attrs)
+
+        hw.flush()
+        self.assertIs(mock_archive.call_args.args[0], ds_archive)
+
+    @patch("hypernets_processor.data_io.hypernets_writer.HypernetsWriter.archive_ds")
+    def test_write_async_error(self, mock_archive):
+        hw = HypernetsWriter(self.context)
+
+        hw.write(self.create_ds("test_0", 0))
+        hw.write(self.create_ds(os.path.join("missing", "test_1"), 1))
+        hw.write(self.create_ds("test_2", 2))
+
+        self.assertRaises(IOError, hw.flush)
+        self.assertEqual(self.context.anomaly_handler.anomalies_added, ["w"])
+        self.assertEqual(
+            [c.args[1] for c in mock_archive.call_args_list],
+            [os.path.join(self.tmpdir, "test_%s.nc" % i) for i in [0, 2]],
+        )
+
+    def test_write_queue_blocks(self):
+        write_queue = WriteQueue(max_size=1)
+        release = threading.Event()
+        written = []
+
+        def write_function(ds, path):
+            release.wait()
+            written.append(path)
+
+        # first product is taken by writing thread, second fills queue, so third blocks
+        write_queue.put(write_function, None, "a")
+        write_queue.put(write_function, None, "b")
+        thread = threading.Thread(
+            target=write_queue.put, args=(write_function, None, "c")
+        )
+        thread.start()
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+
+        release.set()
+        thread.join()
+        jobs = write_queue.flush()
+        self.assertEqual(written, ["a", "b", "c"])
+        self.assertEqual([job["path"] for job in jobs], ["a", "b", "c"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,216 @@
+"""
+Tests for SequenceDiscovery class
+"""
+
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import json
+import shutil
+import tempfile
+from hypernets_processor.version import __version__
+from hypernets_processor.context import Context
+from hypernets_processor.data_io.hypernets_db_builder import open_database
+from hypernets_processor.data_io.sequence_discovery import SequenceDiscovery
+from hypernets_processor.data_io.checkpoint_store import CheckpointStore
+
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def make_sequence(raw_data_directory, sequence_name, dated=False, complete=True):
+    """
+    Creates raw sequence directory, with metadata file if complete
+
+    :return: sequence path
+    :rtype: str
+    """
+
+    directory = raw_data_directory
+    if dated:
+        directory = os.path.join(
+            raw_data_directory, sequence_name[3:7], sequence_name[7:9], sequence_name[9:11]
+        )
+    path = os.path.join(directory, sequence_name)
+    os.makedirs(path)
+    if complete:
+        open(os.path.join(path, "metadata.txt"), "w").close()
+    return path
+
+
+class TestSequenceDiscovery(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.raw_data_directory = os.path.join(self.tmpdir, "data")
+        os.makedirs(self.raw_data_directory)
+
+        self.context = Context(logger=MagicMock())
+        self.context.set_config_value("archive_directory", self.tmpdir)
+        self.context.set_config_value("raw_data_directory", self.raw_data_directory)
+        self.context.set_config_value("job_working_directory", self.tmpdir)
+        self.context.set_config_value("job_name", "test")
+        self.context.archive_db = open_database(
+            "sqlite:///" + self.tmpdir + "/archive.db", "archive", self.context
+        )
+        self.context.anomaly_db = open_database(
+            "sqlite:///" + self.tmpdir + "/anomaly.db", "anomaly", self.context
+        )
+        self.context.anomaly_handler.anomaly_db = self.context.anomaly_db
+
+    def tearDown(self):
+        self.context.archive_db.close()
+        self.context.anomaly_db.close()
+        shutil.rmtree(self.tmpdir)
+
+    def archive_product(self, sequence_name, product_level="L2A"):
+        self.context.archive_db["products"].insert(
+            dict(sequence_name=sequence_name, site_id="TEST", product_level=product_level)
+        )
+
+    def add_anomaly(self, sequence_path, anomaly_id):
+        self.context.start_sequence(sequence_path)
+        self.context.anomaly_db.add_anomaly(anomaly_id)
+
+    def test_return_state_path(self):
+        sd = SequenceDiscovery(self.context)
+        self.assertEqual(
+            sd.state_path, os.path.join(self.tmpdir, "test.sequences.json")
+        )
+
+        self.context.set_config_value("discovery_state_path", "state.json")
+        self.assertEqual(SequenceDiscovery(self.context).state_path, "state.json")
+
+        self.context.set_config_value("discovery_state_path", None)
+        self.context.set_config_value("job_working_directory", None)
+        self.assertIsNone(SequenceDiscovery(self.context).state_path)
+
+    def test_target_sequences(self):
+        processed = make_sequence(self.raw_data_directory, "SEQ20210401T100000")
+        failed = make_sequence(self.raw_data_directory, "SEQ20210401T110000", True)
+        new = make_sequence(self.raw_data_directory, "SEQ20210402T100000", True)
+        level1 = make_sequence(self.raw_data_directory, "SEQ20210402T110000")
+        incomplete = make_sequence(
+            self.raw_data_directory, "SEQ20210403T100000", True, complete=False
+        )
+        os.makedirs(os.path.join(self.raw_data_directory, "other"))
+        self.archive_product("SEQ20210401T100000")
+        self.archive_product("SEQ20210402T110000", "L1B")
+        self.add_anomaly(failed, "x")
+
+        sd = SequenceDiscovery(self.context)
+        sequences = sd.target_sequences(True)
+
+        self.assertCountEqual(sequences, [new, level1])
+        self.assertEqual(
+            self.context.anomaly_db.get_sequences_anomalies(["SEQ20210403T100000"]),
+            {"SEQ20210403T100000": ["m"]},
+        )
+        self.assertEqual(sd.state["resolved_until"], "SEQ20210403T100000")
+        self.assertEqual(
+            sd.state["pending"],
+            ["SEQ20210402T100000", "SEQ20210402T110000", "SEQ20210403T100000"],
+        )
+
+        # incomplete download anomaly only added once
+        SequenceDiscovery(self.context).target_sequences(True)
+        self.assertEqual(
+            len(list(self.context.anomaly_db["anomalies"].find(anomaly_id="m"))), 1
+        )
+
+        self.assertCountEqual(
+            SequenceDiscovery(self.context).target_sequences(False),
+            [processed, failed, new, level1],
+        )
+
+    def test_target_sequences_checkpoint(self):
+        self.context.set_config_value(
+            "checkpoint_directory", os.path.join(self.tmpdir, "checkpoints")
+        )
+        failed = make_sequence(self.raw_data_directory, "SEQ20210401T110000")
+        self.add_anomaly(failed, "x")
+        self.assertEqual(SequenceDiscovery(self.context).target_sequences(True), [])
+
+        # failed sequence with checkpoint resumed, until failed after resuming
+        store = CheckpointStore(self.context)
+        store.start_sequence()
+        store.save("L1B", {"L1b_irr": None})
+        self.assertEqual(
+            SequenceDiscovery(self.context).target_sequences(True), [failed]
+        )
+
+        store.start_sequence()
+        store.load(["L1B"])
+        store.fail()
+        self.assertEqual(SequenceDiscovery(self.context).target_sequences(True), [])
+
+    def test_target_sequences_incremental(self):
+        old = make_sequence(self.raw_data_directory, "SEQ20210401T100000", True)
+        pending = make_sequence(self.raw_data_directory, "SEQ20210401T110000", True)
+        self.archive_product("SEQ20210401T100000")
+
+        self.assertEqual(SequenceDiscovery(self.context).target_sequences(True), [pending])
+
+        # state persisted between searches, only new and pending sequences are checked
+        late = make_sequence(self.raw_data_directory, "SEQ20210331T100000", True)
+        new = make_sequence(self.raw_data_directory, "SEQ20210402T100000")
+
+        sd = SequenceDiscovery(self.context)
+        get_processed_sequences = self.context.archive_db.get_processed_sequences
+        with patch.object(
+            self.context.archive_db,
+            "get_processed_sequences",
+            wraps=get_processed_sequences,
+        ) as mock_gps:
+            sequences = sd.target_sequences(True)
+
+        self.assertCountEqual(sequences, [late, pending, new])
+        self.assertCountEqual(
+            mock_gps.call_args[0][0],
+            ["SEQ20210331T100000", "SEQ20210401T110000", "SEQ20210402T100000"],
+        )
+
+        # listings of directories not modified since previous search are reused
+        self.archive_product("SEQ20210331T100000")
+        self.archive_product("SEQ20210401T110000")
+        self.archive_product("SEQ20210402T100000")
+        sd = SequenceDiscovery(self.context)
+        for listing in sd.state["directories"].values():
+            listing[1] = listing[0] + 10
+        with patch("os.listdir") as mock_listdir:
+            self.assertEqual(sd.target_sequences(True), [])
+        mock_listdir.assert_not_called()
+        self.assertEqual(sd.state["pending"], [])
+
+        with open(sd.state_path) as f:
+            self.assertEqual(json.load(f)["resolved_until"], "SEQ20210402T100000")
+
+    def test_target_sequences_reset(self):
+        path = make_sequence(self.raw_data_directory, "SEQ20210401T100000")
+        self.archive_product("SEQ20210401T100000")
+        self.assertEqual(SequenceDiscovery(self.context).target_sequences(True), [])
+
+        # state of other site not used
+        self.context.set_config_value("site_id", "OTHER")
+        self.assertEqual(SequenceDiscovery(self.context).target_sequences(True), [path])
+
+    def test_watch(self):
+        path = make_sequence(self.raw_data_directory, "SEQ20210401T100000")
+        stop_event = MagicMock()
+        stop_event.is_set.side_effect = [False, False, True]
+
+        callback = MagicMock()
+        SequenceDiscovery(self.context).watch(callback, 0.0, stop_event=stop_event)
+
+        self.assertEqual(callback.call_count, 2)
+        callback.assert_called_with([path])
+        stop_event.wait.assert_called_with(0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+Tests for spectrum module
+"""
+
+import unittest
+import os
+import glob
+import struct
+import shutil
+import tempfile
+import numpy as np
+from hypernets_processor.version import __version__
+from hypernets_processor.data_io.spectrum import (
+    Spectrum,
+    SpeFile,
+    Radiometer,
+    EntranceType,
+)
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+this_directory = os.path.dirname(__file__)
+reader_directory = os.path.join(this_directory, "reader")
+
+
+def parse_chunks(path):
+    """
+    Reference chunk parsing, as done by HypernetsReader prior to SpeFile
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    spectra = []
+    pointer = 0
+    while len(data) - pointer:
+        try:
+            chunk_size = struct.unpack("<H", data[pointer : pointer + 2])[0]
+            if chunk_size == 4119:
+                chunk_size = 4131
+            spectra.append(Spectrum.parse_raw(data[pointer : pointer + chunk_size]))
+        except:
+            break
+        pointer += chunk_size
+    return spectra
+
+
+class TestSpeFile(unittest.TestCase):
+    def test_vnir_file(self):
+        path = glob.glob(
+            os.path.join(
+                reader_directory, "SEQ20201117T144353", "RADIOMETER", "*_128_16_*.spe"
+            )
+        )[0]
+
+        spe = SpeFile(path)
+        spectra = parse_chunks(path)
+
+        self.assertEqual(len(spe), len(spectra))
+        self.assertFalse(spe.truncated)
+
+        bodies = spe.bodies()
+        self.assertEqual(bodies.shape, (len(spectra), 2048))
+        self.assertTrue(np.shares_memory(bodies, spe.buffer))
+
+        for i, spectrum in enumerate(spectra):
+            np.testing.assert_array_equal(bodies[i], spectrum.body)
+            np.testing.assert_array_equal(spe.body(i), spectrum.body)
+            self.assertEqual(
+                spe.headers["exposure_time"][i], spectrum.header.exposure_time
+            )
+            self.assertEqual(
+                spe.headers["temperature"][i], np.float32(spectrum.header.temperature)
+            )
+            self.assertEqual(
+                spe.headers["accel_mean_z"][i], spectrum.header.accel_stats.mean_z
+            )
+            self.assertEqual(spe.crc32[i], spectrum.crc32[0])
+            self.assertEqual(
+                spe.radiometer[i], spectrum.header.spectrum_type.radiometer.value
+            )
+            self.assertEqual(spe.optics[i], spectrum.header.spectrum_type.optics.value)
+
+        np.testing.assert_array_equal(spe.radiometer, Radiometer.VIS.value)
+        np.testing.assert_array_equal(spe.optics, EntranceType.RADIANCE.value)
+        self.assertEqual(spe.crc_valid.shape, (len(spectra),))
+
+    def test_mixed_file(self):
+        radiometer_directory = os.path.join(
+            reader_directory, "SEQ20200715T133429", "RADIOMETER"
+        )
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, "mixed.spe")
+
+        # concatenate VNIR and SWIR chunks, as written by the instrument in
+        # combined mode
+        with open(path, "wb") as f:
+            for i in [1, 2, 4, 5, 3, 6]:
+                with open(
+                    os.path.join(
+                        radiometer_directory,
+                        "01_002_0090_1_0180_192_00_1024_03_0000_%s.spe" % i,
+                    ),
+                    "rb",
+                ) as chunk:
+                    f.write(chunk.read())
+
+        spe = SpeFile(path)
+        spectra = parse_chunks(path)
+
+        self.assertEqual(len(spe), 6)
+        self.assertEqual(len(spe), len(spectra))
+        self.assertRaises(ValueError, spe.bodies)
+
+        for swir in [True, False]:
+            mask = (spe.pixel_count < 500) == swir
+            np.testing.assert_array_equal(
+                spe.bodies(mask),
+                np.array([s.body for s in spectra if (len(s.body) < 500) == swir]),
+            )
+
+        del spe
+        shutil.rmtree(tmpdir)
+
+    def test_truncated_file(self):
+        path = os.path.join(
+            reader_directory,
+            "SEQ20200312T135926",
+            "RADIOMETER",
+            "01_001_0045_2_057_8_01_0000.spe",
+        )
+
+        spe = SpeFile(path)
+
+        self.assertEqual(len(spe), len(parse_chunks(path)))
+        self.assertTrue(spe.truncated)
+        self.assertEqual(spe.bodies().shape[0], len(spe))
+
+    def test_empty_file(self):
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, "empty.spe")
+        open(path, "wb").close()
+
+        spe = SpeFile(path)
+
+        self.assertEqual(len(spe), 0)
+        self.assertFalse(spe.truncated)
+        self.assertEqual(spe.bodies().shape[0], 0)
+
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ from hypernets_processor.version import __version__
 from hypernets_processor.data_io.data_templates import DataTemplates
 from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
 from hypernets_processor.data_utils.quality_checks import QualityChecks
+from hypernets_processor.data_utils.grouping import Grouping
 from hypernets_processor.calibration.measurement_functions.measurement_function_factory import (
     MeasurementFunctionFactory,
 )
@@ -72,37 +73,10 @@ class Average:
         #first do fast averaging of 1d variables
         flags = ["outliers", "L0_threshold", "L0_discontinuity", "bad_pointing"]
 
-        flagged = DatasetUtil.get_flags_mask_or(
-            dataset_l0["quality_flag"], flags
-        )
-
-        flags_ds = DatasetUtil.unpack_flags(dataset_l0["quality_flag"])
-        mask_flags = np.array([flags_ds[flag].values for flag in flags_ds.data_vars])
-
-        series_id = np.unique(dataset_l0["series_id"])
-
-        for i in range(len(series_id)):
-            ids = np.where(
-                dataset_l0["series_id"] == series_id[i]
-            )
-
-            ids_flagged = np.where(
-                (dataset_l0["series_id"] == series_id[i]) & (flagged == False)
-            )
-
-            for variablestring in dataset_l0.keys():
-                if variablestring=="series_id":
-                    dataset_l0b[variablestring].values[i] = series_id[i]
+        grouping = self.series_grouping(dataset_l0, flags)
+        grouping_bla = self.series_grouping(dataset_l0_bla, flags)
 
-                elif variablestring=="quality_flag":
-                    #set quality flag of series if any of quality flag of scan has been raised
-                    dataset_l0b[variablestring].values[i] = sum([2**i for i,n in enumerate(
-                        np.logical_or.reduce(mask_flags[:,ids].T)[0]) if n])
-
-                elif (dataset_l0[variablestring].dims == ("scan",)) and (
-                        variablestring in dataset_l0b.keys()
-                ):
-                    dataset_l0b[variablestring].values[i] = np.mean(dataset_l0[variablestring].values[ids_flagged])
+        self.average_scan_variables(dataset_l0, dataset_l0b, grouping)
 
         #next 2d variables are averaged
         for variablestring in dataset_l0b.variables:
@@ -113,6 +87,7 @@ class Average:
                     flags,
                     return_std=True,
                     return_total=True,
+                    grouping=grouping,
                 )
                 dataset_l0b["digital_number"].values = measurand
                 dataset_l0b["std_digital_number"].values = measurand_std.astype(
@@ -124,11 +99,10 @@ class Average:
                 dataset_l0b["n_total_scans"].values = n_total.astype(
                     dataset_l0b["n_total_scans"].values.dtype
                 )
-                for i in range(len(n_valid)):
-                    if n_valid[i] < 0.5 * n_total[i]:
-                        dataset_l0b["quality_flag"][i] = DatasetUtil.set_flag(
-                            dataset_l0b["quality_flag"][i], "half_of_scans_masked"
-                        )
+                half_masked = np.flatnonzero(n_valid < 0.5 * n_total)
+                dataset_l0b["quality_flag"][half_masked] = DatasetUtil.set_flag(
+                    dataset_l0b["quality_flag"][half_masked], "half_of_scans_masked"
+                )
                 dataset_l0b = self.qual.check_valid_scans(
                     dataset_l0b, n_valid, n_total, measurandstring
                 )
@@ -140,6 +114,7 @@ class Average:
                     flags,
                     return_std=True,
                     return_total=True,
+                    grouping=grouping_bla,
                 )
                 dataset_l0b["dark_signal"].values = measurand
                 dataset_l0b["std_dark_signal"].values = measurand_std.astype(
@@ -149,11 +124,15 @@ class Average:
 
             elif variablestring == "u_rel_random_dark_signal":
                 dataset_l0b["u_rel_random_dark_signal"].values = self.calc_mean_masked(
-                    dataset_l0_bla, "u_rel_random_digital_number", flags, rand_unc=True
+                    dataset_l0_bla,
+                    "u_rel_random_digital_number",
+                    flags,
+                    rand_unc=True,
+                    grouping=grouping_bla,
                 )
             elif "u_rel_random" in variablestring:
                 dataset_l0b[variablestring].values = self.calc_mean_masked(
-                    dataset_l0, variablestring, flags, rand_unc=True
+                    dataset_l0, variablestring, flags, rand_unc=True, grouping=grouping
                 )
             elif "err_corr_" in variablestring:
                 dataset_l0b[variablestring].values = dataset_l0[variablestring].values
@@ -168,37 +147,9 @@ class Average:
         # first do fast averaging of 1d variables
         flags = ["outliers", "L0_threshold", "L0_discontinuity", "bad_pointing"]
 
-        flagged = DatasetUtil.get_flags_mask_or(
-            dataset_l1a["quality_flag"], flags
-        )
-
-        flags_ds = DatasetUtil.unpack_flags(dataset_l1a["quality_flag"])
-        mask_flags = np.array([flags_ds[flag].values for flag in flags_ds.data_vars])
+        grouping = self.series_grouping(dataset_l1a, flags)
 
-        series_id = np.unique(dataset_l1a["series_id"])
-
-        for i in range(len(series_id)):
-            ids = np.where(
-                dataset_l1a["series_id"] == series_id[i]
-            )
-
-            ids_flagged = np.where(
-                (dataset_l1a["series_id"] == series_id[i]) & (flagged == False)
-            )
-
-            for variablestring in dataset_l1a.keys():
-                if variablestring == "series_id":
-                    dataset_l1b[variablestring].values[i] = series_id[i]
-
-                elif variablestring == "quality_flag":
-                    # set quality flag of series if any of quality flag of scan has been raised
-                    dataset_l1b[variablestring].values[i] = sum(
-                        [2 ** i for i, n in enumerate(np.logical_or.reduce(mask_flags[:, ids].T)[0]) if n])
-
-                elif (dataset_l1a[variablestring].dims == ("scan",)) and (
-                        variablestring in dataset_l1b.keys()
-                ):
-                    dataset_l1b[variablestring].values[i] = np.mean(dataset_l1a[variablestring].values[ids_flagged])
+        self.average_scan_variables(dataset_l1a, dataset_l1b, grouping)
 
         #next 2d variables are averaged
         for var in dataset_l1b.variables:
@@ -209,6 +160,7 @@ class Average:
                     flags,
                     return_std=True,
                     return_total=True,
+                    grouping=grouping,
                 )
                 dataset_l1b[measurandstring].values = measurand
                 dataset_l1b["std_" + measurandstring].values = measurand_std.astype(
@@ -225,19 +177,19 @@ class Average:
                 if "u_rel_random" in var:
                     if self.context.get_config_value("mcsteps")>0:
                         dataset_l1b[var].values = self.calc_mean_masked(
-                            dataset_l1a, var, flags, rand_unc=True
+                            dataset_l1a, var, flags, rand_unc=True, grouping=grouping
                         )
                 elif "u_rel_" in var:
                     if self.context.get_config_value("mcsteps")>0:
                         dataset_l1b[var].values = self.calc_mean_masked(
-                            dataset_l1a, var, flags
+                            dataset_l1a, var, flags, grouping=grouping
                         )
                 elif "err_corr_" in var:
                     if self.context.get_config_value("mcsteps")>0:
                         dataset_l1b[var].values = dataset_l1a[var].values
                 elif (not "std" in var) and (not "n_valid" in var):
                     dataset_l1b[var].values = self.calc_mean_masked(
-                        dataset_l1a, var, flags
+                        dataset_l1a, var, flags, grouping=grouping
                     )
 
         return dataset_l1b
@@ -262,41 +214,18 @@ class Average:
 
         # first do fast averaging of 1d variables
 
-        flagged = DatasetUtil.get_flags_mask_or(
-            dataset["quality_flag"], flags
-        )
-
-        flags_ds = DatasetUtil.unpack_flags(dataset["quality_flag"])
-        mask_flags = np.array([flags_ds[flag].values for flag in flags_ds.data_vars])
-
-        series_id = np.unique(dataset["series_id"])
-
-        for i in range(len(series_id)):
-            ids = np.where(
-                dataset["series_id"] == series_id[i]
-            )
-
-            ids_flagged = np.where(
-                (dataset["series_id"] == series_id[i]) & (flagged == False)
-            )
+        grouping = self.series_grouping(dataset, flags)
 
-            for variablestring in dataset.keys():
-                if variablestring == "series_id":
-                    dataset_l2a[variablestring].values[i] = series_id[i]
-
-                elif variablestring == "quality_flag":
-                    # set quality flag of series if any of quality flag of scan has been raised
-                    dataset_l2a[variablestring].values[i] = sum(
-                        [2 ** i for i, n in enumerate(np.logical_or.reduce(mask_flags[:, ids].T)[0]) if n])
-
-                elif (dataset[variablestring].dims == ("scan",)) and (
-                        variablestring in dataset_l2a.keys()
-                ):
-                    dataset_l2a[variablestring].values[i] = np.mean(dataset[variablestring].values[ids_flagged])
+        self.average_scan_variables(dataset, dataset_l2a, grouping)
 
         # next 2d variables are averaged
         measurand, measurand_std, n_valid, n_total = self.calc_mean_masked(
-            dataset, "water_leaving_radiance", flags, return_std=True, return_total=True
+            dataset,
+            "water_leaving_radiance",
+            flags,
+            return_std=True,
+            return_total=True,
+            grouping=grouping,
         )
         dataset_l2a["water_leaving_radiance"].values = measurand
         dataset_l2a["std_water_leaving_radiance"].values = measurand_std.astype(
@@ -312,12 +241,19 @@ class Average:
             dataset_l2a[
                 "u_rel_random_water_leaving_radiance"
             ].values = self.calc_mean_masked(
-                dataset, "u_rel_random_water_leaving_radiance", flags, rand_unc=True
+                dataset,
+                "u_rel_random_water_leaving_radiance",
+                flags,
+                rand_unc=True,
+                grouping=grouping,
             )
             dataset_l2a[
                 "u_rel_systematic_indep_water_leaving_radiance"
             ].values = self.calc_mean_masked(
-                dataset, "u_rel_systematic_indep_water_leaving_radiance", flags
+                dataset,
+                "u_rel_systematic_indep_water_leaving_radiance",
+                flags,
+                grouping=grouping,
             )
             dataset_l2a[
                 "err_corr_systematic_indep_water_leaving_radiance"
@@ -325,7 +261,10 @@ class Average:
             dataset_l2a[
                 "u_rel_systematic_corr_rad_irr_water_leaving_radiance"
             ].values = self.calc_mean_masked(
-                dataset, "u_rel_systematic_corr_rad_irr_water_leaving_radiance", flags
+                dataset,
+                "u_rel_systematic_corr_rad_irr_water_leaving_radiance",
+                flags,
+                grouping=grouping,
             )
             dataset_l2a[
                 "err_corr_systematic_corr_rad_irr_water_leaving_radiance"
@@ -335,7 +274,12 @@ class Average:
 
         for measurandstring in ["reflectance_nosc", "reflectance", "epsilon"]:
             measurand, measurand_std, n_valid, n_total = self.calc_mean_masked(
-                dataset, measurandstring, flags, return_std=True, return_total=True
+                dataset,
+                measurandstring,
+                flags,
+                return_std=True,
+                return_total=True,
+                grouping=grouping,
             )
             dataset_l2a[measurandstring].values = measurand
             dataset_l2a["std_" + measurandstring].values = measurand_std.astype(
@@ -351,12 +295,19 @@ class Average:
                 dataset_l2a[
                     "u_rel_random_" + measurandstring
                 ].values = self.calc_mean_masked(
-                    dataset, "u_rel_random_" + measurandstring, flags, rand_unc=True
+                    dataset,
+                    "u_rel_random_" + measurandstring,
+                    flags,
+                    rand_unc=True,
+                    grouping=grouping,
                 )
                 dataset_l2a[
                     "u_rel_systematic_" + measurandstring
                 ].values = self.calc_mean_masked(
-                    dataset, "u_rel_systematic_" + measurandstring, flags
+                    dataset,
+                    "u_rel_systematic_" + measurandstring,
+                    flags,
+                    grouping=grouping,
                 )
                 if not measurandstring == "epsilon":
                     dataset_l2a["err_corr_systematic_" + measurandstring].values = dataset[
@@ -390,6 +341,52 @@ class Average:
         dataset_bla = dataset_bla.isel(scan=scan_bla_found)
         return dataset, dataset_bla
 
+    def series_grouping(self, dataset, flags):
+        """
+        Returns grouping of the scans of dataset by series, with scans with any of the
+        given flags masked
+
+        :param dataset: dataset with series_id and quality_flag per scan
+        :type dataset: xarray.Dataset
+        :param flags: flags for which scans are masked
+        :type flags: list
+        :return: grouping of scans by series
+        :rtype: hypernets_processor.data_utils.grouping.Grouping
+        """
+        return Grouping(
+            dataset["series_id"].values,
+            mask=DatasetUtil.get_flags_mask_or(dataset["quality_flag"], flags),
+        )
+
+    def average_scan_variables(self, dataset, dataset_avg, grouping):
+        """
+        Sets series_id, quality_flag and the other variables with only scan dimension of
+        averaged dataset from the scans of each series
+
+        :param dataset: dataset with scans
+        :type dataset: xarray.Dataset
+        :param dataset_avg: averaged dataset, with series dimension
+        :type dataset_avg: xarray.Dataset
+        :param grouping: grouping of scans by series
+        :type grouping: hypernets_processor.data_utils.grouping.Grouping
+        """
+        for variablestring in dataset.keys():
+            if variablestring == "series_id":
+                dataset_avg[variablestring].values[:] = grouping.ids
+
+            elif variablestring == "quality_flag":
+                # set quality flag of series if any of quality flag of scan has been raised
+                dataset_avg[variablestring].values[:] = grouping.bitwise_or(
+                    dataset[variablestring].values
+                )
+
+            elif (dataset[variablestring].dims == ("scan",)) and (
+                variablestring in dataset_avg.keys()
+            ):
+                dataset_avg[variablestring].values[:] = grouping.mean(
+                    dataset[variablestring].values
+                )
+
     def calc_mean_masked(
         self,
         dataset,
@@ -399,6 +396,7 @@ class Average:
         corr=False,
         return_std=False,
         return_total=False,
+        grouping=None,
     ):
         """
 
@@ -412,98 +410,33 @@ class Average:
         :type rand_unc:
         :param corr:
         :type corr:
+        :param grouping: (optional) grouping of scans by series, as returned by series_grouping
+        :type grouping: hypernets_processor.data_utils.grouping.Grouping
         :return:
         :rtype:
         """
-        series_id = np.unique(dataset["series_id"])
+        if grouping is None:
+            grouping = self.series_grouping(dataset, flags)
         vals = dataset[var].values
-        flagged = DatasetUtil.get_flags_mask_or(dataset["quality_flag"], flags)
 
         if corr:
-            out = np.empty(
-                (
-                    len(series_id),
-                    len(dataset["wavelength"]),
-                    len(dataset["wavelength"]),
-                ),
-                dtype=dataset[var].values.dtype,
-            )
-            for i in range(len(series_id)):
-                ids = np.where(
-                    (dataset["series_id"] == series_id[i]) & (flagged == False)
-                )
-                out[i] = np.mean(vals[:, :, ids], axis=3)[:, :, 0]
-
-            out = np.mean(out, axis=0)
-
-        elif vals.ndim == 1:
-            out = np.empty((len(series_id),), dtype=dataset[var].values.dtype)
-            if return_std:
-                out_std = np.empty((len(series_id),), dtype=np.float32)
-                n_valid = np.empty((len(series_id),), dtype=np.uint8)
-                n_total = np.empty((len(series_id),), dtype=np.uint8)
-
-            for i in range(len(series_id)):
-                ids = np.where(
-                    (dataset["series_id"] == series_id[i]) & (flagged == False)
-                )
-                ids_total = np.where((dataset["series_id"] == series_id[i]))
-                out[i] = np.mean(dataset[var].values[ids])
-                if return_std:
-                    out_std[i] = np.std(dataset[var].values[ids])
-                    n_valid[i] = len(ids[0])
-                    n_total[i] = len(ids_total[0])
-                if rand_unc:
-                    out[i] = (np.sum(dataset[var].values[ids] ** 2)) ** 0.5 / len(
-                        ids[0]
-                    )
+            out = np.mean(grouping.mean(vals).astype(vals.dtype), axis=-1).T
+        elif rand_unc:
+            out = grouping.mean_random(vals).astype(vals.dtype)
         else:
-            out = np.empty(
-                (len(series_id), len(dataset["wavelength"])),
-                dtype=dataset[var].values.dtype,
-            )
-            if return_std:
-                out_std = np.empty(
-                    (len(series_id), len(dataset["wavelength"])), dtype=np.float32
-                )
-                n_valid = np.empty((len(series_id),), dtype=np.uint8)
-                n_total = np.empty((len(series_id),), dtype=np.uint8)
-
-            for i in range(len(series_id)):
-                ids = np.where(
-                    (dataset["series_id"] == series_id[i]) & (flagged == False)
-                )
-                ids_total = np.where((dataset["series_id"] == series_id[i]))
-                out[i] = np.mean(dataset[var].values[:, ids], axis=2)[:, 0]
-                if return_std:
-                    out_std[i] = np.std(dataset[var].values[:, ids], axis=2)[:, 0]
-                    n_valid[i] = len(ids[0])
-                    n_total[i] = len(ids_total[0])
-
-                if rand_unc:
-                    out[i] = (
-                        np.sum(dataset[var].values[:, ids] ** 2, axis=2)[:, 0]
-                    ) ** 0.5 / len(ids[0])
+            out = grouping.mean(vals).astype(vals.dtype)
 
         if return_std:
+            out_std = grouping.mean_std(vals)[1].astype(np.float32)
+            n_valid = grouping.count().astype(np.uint8)
+            n_total = grouping.count(masked=False).astype(np.uint8)
             if return_total:
-                return out.T, out_std.T, n_valid, n_total
+                return out, out_std, n_valid, n_total
             else:
-                return out.T, out_std.T, n_valid
+                return out, out_std, n_valid
         else:
-            return out.T
+            return out
 
     def calc_std_masked(self, dataset, var, flags, rand_unc=False, corr=False):
-        series_id = np.unique(dataset["series_id"])
-
-        out = np.empty((len(series_id), len(dataset["wavelength"])))
-
-        for i in range(len(series_id)):
-            flagged = np.any(
-                [DatasetUtil.unpack_flags(dataset["quality_flag"])[x] for x in flags],
-                axis=0,
-            )
-            ids = np.where((dataset["series_id"] == series_id[i]) & (flagged == False))
-            out[i] = np.std(dataset[var].values[:, ids], axis=2)[:, 0]
-
-        return out.T
+        grouping = self.series_grouping(dataset, flags)
+        return grouping.mean_std(dataset[var].values)[1]
@@ -0,0 +1,264 @@
+"""
+Module of clear-sky reference irradiances, band integrated to instrument wavelengths,
+for clear-sky quality checks and interpolation of irradiance along clear-sky spectra
+"""
+
+import os
+import hashlib
+from functools import cached_property
+
+import numpy as np
+import scipy.sparse
+import xarray as xr
+import comet_maths as cm
+from matheo.utils.function_def import f_gaussian
+
+from hypernets_processor.version import __version__
+from hypernets_processor.utils.paths import atomic_write
+
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+dir_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+refdat_path = os.path.join(dir_path, "data", "quality_comparison_data")
+
+# clear-sky references set up in this process, by (reference sza, network, wavelength
+# hash, bandwidth hash)
+CLEAR_SKY_REFERENCES = {}
+
+
+def band_int_kernel(x_pixel, width_pixel, x, f):
+    """
+    Returns sparse matrix of band integration weights, such that ``kernel @ d`` equals
+    matheo ``band_int(d, x, r, x)``, with ``r = return_r_pixel(x_pixel, width_pixel, x, f)``.
+
+    Weights are built one pixel at a time, following the response cut-out and trapezium
+    integration of matheo, so the full response matrix is never held in memory.
+
+    :type x_pixel: numpy.ndarray
+    :param x_pixel: centre of band response per pixel
+    :type width_pixel: numpy.ndarray
+    :param width_pixel: width of band response per pixel
+    :type x: numpy.ndarray
+    :param x: data and band response function coordinates
+    :param f: functional shape of response band, with interface ``f(x, centre, width)``
+    :return: band integration weights, shape (len(x_pixel), len(x))
+    :rtype: scipy.sparse.csr_matrix
+    """
+
+    x_sampling = np.diff(x)
+    regular = np.all(x_sampling == x_sampling[0])
+    res_d = (np.max(x) - np.min(x)) / len(x)
+
+    indices = []
+    weights = []
+    for x_pixel_i, width_pixel_i in zip(x_pixel, width_pixel):
+        r = f(x, x_pixel_i, width_pixel_i)
+
+        if regular:
+            idx = np.flatnonzero(r)
+            indices.append(idx)
+            weights.append(r[idx] / np.sum(r))
+            continue
+
+        # non-zero part of response, with 20% buffer either side
+        nonzero = np.flatnonzero(r > 0)
+        imin = nonzero[0]
+        imax = nonzero[-1] + 1
+        width = imax - imin
+        imin = max(imin - int(width * 0.2), 0)
+        imax = min(imax + int(width * 0.2), len(x))
+
+        x_r = x[imin:imax]
+        if (np.max(x_r) - np.min(x_r)) / len(x_r) < res_d:
+            idx = np.arange(imin, imax)
+        else:
+            idx = np.flatnonzero((x < np.max(x_r)) & (x > np.min(x_r)))
+
+        # trapezium rule weights
+        x_sampling_i = np.diff(x[idx])
+        w = np.zeros(len(idx))
+        w[:-1] += x_sampling_i / 2
+        w[1:] += x_sampling_i / 2
+
+        indices.append(idx)
+        weights.append(r[idx] * w / np.sum(r[idx] * w))
+
+    indptr = np.append(0, np.cumsum([len(idx) for idx in indices]))
+    return scipy.sparse.csr_matrix(
+        (np.concatenate(weights), np.concatenate(indices), indptr),
+        shape=(len(x_pixel), len(x)),
+    )
+
+
+def interpolation_kernel(x_i, x):
+    """
+    Returns sparse matrix of linear interpolation weights from x_i to x, with nearest
+    value extrapolation, such that ``kernel @ y_i`` equals
+    ``cm.interpolate_1d(x_i, y_i, x, extrapolate="nearest")``
+
+    :type x_i: numpy.ndarray
+    :param x_i: coordinates of data to interpolate
+    :type x: numpy.ndarray
+    :param x: coordinates to interpolate to
+    :return: interpolation weights, shape (len(x), len(x_i))
+    :rtype: scipy.sparse.csr_matrix
+    """
+
+    order = np.argsort(x_i)
+    x_sorted = x_i[order]
+
+    lo = np.clip(np.searchsorted(x_sorted, x) - 1, 0, len(x_i) - 2)
+    t = np.clip((x - x_sorted[lo]) / (x_sorted[lo + 1] - x_sorted[lo]), 0.0, 1.0)
+
+    return scipy.sparse.csr_matrix(
+        (
+            np.concatenate([1 - t, t]),
+            (np.tile(np.arange(len(x)), 2), np.concatenate([order[lo], order[lo + 1]])),
+        ),
+        shape=(len(x), len(x_i)),
+    )
+
+
+def return_clear_sky_reference(
+    ref_sza, network, wavelength, bandwidth, cache_directory=None, logger=None
+):
+    """
+    Returns clear-sky reference for given reference solar zenith angle and network, band
+    integrated to given instrument wavelengths and bandwidths. References are kept in
+    memory and, if cache_directory is given, their band integration kernel is stored in
+    that directory for following processing runs.
+
+    :type ref_sza: int
+    :param ref_sza: reference solar zenith angle
+    :type network: str
+    :param network: network ("w" or "l")
+    :type wavelength: numpy.ndarray
+    :param wavelength: instrument wavelengths
+    :type bandwidth: numpy.ndarray
+    :param bandwidth: instrument bandwidths
+    :type cache_directory: str
+    :param cache_directory: (optional) directory to store band integration kernels in
+    :type logger: logging.Logger
+    :param logger: (optional) logger
+
+    :return: clear-sky reference
+    :rtype: ClearSkyReference
+    """
+
+    wavelength = np.asarray(wavelength, dtype=np.float64)
+    bandwidth = np.asarray(bandwidth, dtype=np.float64)
+    key = (
+        int(ref_sza),
+        network,
+        hashlib.sha1(np.ascontiguousarray(wavelength).tobytes()).hexdigest(),
+        hashlib.sha1(np.ascontiguousarray(bandwidth).tobytes()).hexdigest(),
+    )
+    if key in CLEAR_SKY_REFERENCES:
+        return CLEAR_SKY_REFERENCES[key]
+
+    cache_path = None
+    r_kernel = None
+    if cache_directory:
+        cache_path = os.path.join(cache_directory, "clear_sky_sza%s_%s_%s_%s.npz" % key)
+        if os.path.exists(cache_path):
+            # any error reading cache (e.g. truncated file) means kernel is built again
+            try:
+                r_kernel = scipy.sparse.load_npz(cache_path)
+            except Exception:
+                if logger is not None:
+                    logger.debug(
+                        "Could not read clear-sky reference cache %s" % cache_path
+                    )
+
+    reference = ClearSkyReference(ref_sza, network, wavelength, bandwidth, r_kernel)
+
+    if (cache_path is not None) and (r_kernel is None):
+        try:
+            os.makedirs(cache_directory, exist_ok=True)
+            atomic_write(
+                cache_path, lambda f: scipy.sparse.save_npz(f, reference.r_kernel)
+            )
+        except OSError as e:
+            if logger is not None:
+                logger.warning(
+                    "Clear-sky reference not cached to %s: %s" % (cache_path, e)
+                )
+
+    CLEAR_SKY_REFERENCES[key] = reference
+    return reference
+
+
+class ClearSkyReference:
+    """
+    High resolution clear-sky reference irradiance, with its band integration to
+    instrument wavelengths
+
+    :type ref_sza: int
+    :param ref_sza: reference solar zenith angle
+    :type network: str
+    :param network: network ("w" or "l")
+    :type wavelength: numpy.ndarray
+    :param wavelength: instrument wavelengths
+    :type bandwidth: numpy.ndarray
+    :param bandwidth: instrument bandwidths
+    :type r_kernel: scipy.sparse.csr_matrix
+    :param r_kernel: (optional) band integration kernel, built if omitted
+    """
+
+    def __init__(self, ref_sza, network, wavelength, bandwidth, r_kernel=None):
+        with xr.open_dataset(
+            os.path.join(
+                refdat_path,
+                "solar_irradiance_hypernets_sza%s_highres_%s.nc"
+                % (int(ref_sza), network),
+            )
+        ) as ds:
+            self.clear_sky = ds.load()
+
+        self.wavelength = wavelength
+        self.bandwidth = bandwidth
+        self.highres_wavelength = self.clear_sky["wavelength"].values
+        self.highres_irradiance = self.clear_sky["solar_irradiance_BOA"].values
+
+        if r_kernel is None:
+            r_kernel = band_int_kernel(
+                wavelength, bandwidth, self.highres_wavelength, f_gaussian
+            )
+        self.r_kernel = r_kernel
+
+        # reference irradiance band integrated to instrument wavelengths
+        self.irradiance = self.r_kernel @ self.highres_irradiance
+
+    @cached_property
+    def interpolation_kernels(self):
+        """
+        Kernels of interpolation of irradiance at the instrument wavelengths along the
+        clear-sky reference, followed by band integration. This is linear in irradiance,
+        so is collapsed into ``irr_kernel @ irr + irr_offset``.
+
+        :return: clear-sky correction, irradiance kernel, irradiance offset
+        :rtype: tuple
+        """
+
+        wavs = self.highres_wavelength
+        boa = self.highres_irradiance
+
+        corr_irrs = self.irradiance - cm.interpolate_1d(wavs, boa, self.wavelength)
+
+        boa_irrs = cm.interpolate_1d(wavs, boa, self.wavelength, extrapolate="nearest")
+        irr_kernel = self.r_kernel @ interpolation_kernel(self.wavelength, wavs)
+        irr_kernel = irr_kernel.toarray()
+        irr_offset = self.irradiance - irr_kernel @ (corr_irrs + boa_irrs)
+
+        return corr_irrs, irr_kernel, irr_offset
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,213 @@
+"""
+Module for grouped (segmented) reductions of arrays, e.g. over the scans of each
+series
+"""
+
+import numpy as np
+
+from hypernets_processor.version import __version__
+
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def group_index(ids):
+    """
+    Returns unique group ids, index of group for each element and index of first element of
+    each group
+
+    :type ids: numpy.ndarray
+    :param ids: group id of each element (e.g. series_id of each scan)
+
+    :return: unique group ids (sorted), group index per element, first element per group
+    :rtype: tuple
+    """
+
+    unique_ids, first, index = np.unique(
+        np.asarray(ids), return_index=True, return_inverse=True
+    )
+    return unique_ids, index.reshape(-1), first
+
+
+def grouped_matrix(values, index, n_groups, fill_value=np.nan):
+    """
+    Returns values arranged with one row per group, in order of occurrence within each
+    group, padded with fill_value to the size of the largest group
+
+    :type values: numpy.ndarray
+    :param values: 1D array of values
+    :type index: numpy.ndarray
+    :param index: group index of each value
+    :type n_groups: int
+    :param n_groups: number of groups
+    :type fill_value: float
+    :param fill_value: (optional) value of padding elements, default nan
+
+    :return: values per group, shape (n_groups, size of largest group)
+    :rtype: numpy.ndarray
+    """
+
+    index = np.asarray(index)
+    counts = np.bincount(index, minlength=n_groups)
+
+    order = np.argsort(index, kind="stable")
+    position = np.arange(len(index)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    matrix = np.full((n_groups, np.max(counts, initial=0)), fill_value, dtype=np.float64)
+    matrix[index[order], position] = np.asarray(values)[order]
+    return matrix
+
+
+class Grouping:
+    """
+    Segment index of elements by group, computed once and reused for reductions over the
+    elements of each group of any number of variables (e.g. averaging of the scans of
+    each series)
+
+    Reductions are along the last axis of the given values. Masked reductions exclude
+    the masked elements.
+
+    :type ids: numpy.ndarray
+    :param ids: group id of each element (e.g. series_id of each scan)
+    :type mask: numpy.ndarray
+    :param mask: (optional) elements to exclude from masked reductions (where mask is
+    non-zero)
+    """
+
+    def __init__(self, ids, mask=None):
+        self.ids, self.index, self.first = group_index(ids)
+        self.n_groups = len(self.ids)
+
+        # elements sorted by group, with start of each group
+        self.order = np.argsort(self.index, kind="stable")
+        self.n_total = np.bincount(self.index, minlength=self.n_groups)
+        self.starts = np.cumsum(self.n_total) - self.n_total
+
+        if mask is None:
+            self.valid = np.ones(len(self.index), dtype=bool)
+        else:
+            self.valid = np.asarray(mask).reshape(-1) == 0
+        self.n_valid = np.bincount(
+            self.index, weights=self.valid, minlength=self.n_groups
+        ).astype(int)
+
+    def _reduceat(self, ufunc, values):
+        if self.n_groups == 0:
+            return np.zeros(values.shape[:-1] + (0,), dtype=values.dtype)
+        return ufunc.reduceat(values[..., self.order], self.starts, axis=-1)
+
+    def sum(self, values, masked=True):
+        """
+        Returns sum of values of each group
+
+        :type values: numpy.ndarray
+        :param values: values, last axis is grouped
+        :type masked: bool
+        :param masked: (optional) if True (default) exclude masked elements
+
+        :return: sum per group
+        :rtype: numpy.ndarray
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        if masked:
+            values = np.where(self.valid, values, 0.0)
+        return self._reduceat(np.add, values)
+
+    def count(self, masked=True):
+        """
+        Returns number of elements of each group
+
+        :type masked: bool
+        :param masked: (optional) if True (default) exclude masked elements
+
+        :return: number of elements per group
+        :rtype: numpy.ndarray
+        """
+
+        return self.n_valid if masked else self.n_total
+
+    def mean(self, values, masked=True):
+        """
+        Returns mean of values of each group, nan for groups without elements
+
+        :type values: numpy.ndarray
+        :param values: values, last axis is grouped
+        :type masked: bool
+        :param masked: (optional) if True (default) exclude masked elements
+
+        :return: mean per group
+        :rtype: numpy.ndarray
+        """
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sum(values, masked) / self.count(masked)
+
+    def mean_std(self, values, masked=True):
+        """
+        Returns mean and standard deviation of values of each group, nan for groups
+        without elements
+
+        :type values: numpy.ndarray
+        :param values: values, last axis is grouped
+        :type masked: bool
+        :param masked: (optional) if True (default) exclude masked elements
+
+        :return: mean per group, standard deviation per group
+        :rtype: tuple
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        mean = self.mean(values, masked)
+
+        # two-pass standard deviation, as numpy.std
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(
+                self.sum((values - mean[..., self.index]) ** 2, masked)
+                / self.count(masked)
+            )
+        return mean, std
+
+    def mean_random(self, values, masked=True):
+        """
+        Returns uncertainty of mean of each group for values which are uncertainties
+        with random error correlation, i.e. root sum square of values divided by number
+        of elements
+
+        :type values: numpy.ndarray
+        :param values: uncertainty values, last axis is grouped
+        :type masked: bool
+        :param masked: (optional) if True (default) exclude masked elements
+
+        :return: uncertainty of mean per group
+        :rtype: numpy.ndarray
+        """
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sum(np.asarray(values, dtype=np.float64) ** 2, masked) ** 0.5 / (
+                self.count(masked)
+            )
+
+    def bitwise_or(self, values):
+        """
+        Returns bitwise or of values (e.g. flag words) of all elements of each group,
+        including masked elements
+
+        :type values: numpy.ndarray
+        :param values: integer values, last axis is grouped
+
+        :return: bitwise or per group
+        :rtype: numpy.ndarray
+        """
+
+        return self._reduceat(np.bitwise_or, np.asarray(values))
+
+
+if __name__ == "__main__":
+    pass
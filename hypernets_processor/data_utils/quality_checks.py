@@ -13,7 +13,6 @@ import numpy as np
 import warnings
 import os
 import xarray as xr
-import matplotlib.pyplot as plt
 import pysolar
 import datetime
 import math
@@ -22,6 +21,8 @@ import math
 import punpy
 from obsarray.templater.dataset_util import DatasetUtil
 import matheo.band_integration as bi
+from hypernets_processor.data_utils.grouping import grouped_matrix
+from hypernets_processor.data_utils.clear_sky import return_clear_sky_reference
 
 """___Authorship___"""
 __author__ = "Pieter De Vis"
@@ -110,85 +111,135 @@ class QualityChecks:
         return datasetl0
 
     def perform_quality_check_L0A(self, datasetl0, series_ids):
-        mask = []
-        mask_threshold = []
-        mask_outliers = []
-        mask_discontinuity = []
-        raise_mask_anomaly = False
-        for i in range(len(series_ids)):
-            ids = np.where(datasetl0["series_id"] == series_ids[i])[0]
-            data_subset = datasetl0["digital_number"].values[:, ids]
-            intsig = np.nanmean(data_subset, axis=0)
-            mask_all_i = np.zeros_like(intsig)  # mask the columns that have NaN
-            mask_threshold_i = self.threshold_checks(data_subset)
-            mask_outliers_i = self.outlier_checks(data_subset)
-            mask_discontinuity_i = self.discontinuity_checks(data_subset)
-            mask_all_i[np.where(mask_threshold_i == 1)] = 1
-            mask_all_i[np.where(mask_outliers_i == 1)] = 1
-            mask_all_i[np.where(mask_discontinuity_i == 1)] = 1
-
-            if all(mask_all_i == 1):
-                self.context.logger.warning(
-                    "None of the scans for series passed the quality control criteria"
-                )
-                raise_mask_anomaly = True
-
-            mask = np.append(mask, mask_all_i)
-            mask_threshold = np.append(mask_threshold, mask_threshold_i)
-            mask_outliers = np.append(mask_outliers, mask_outliers_i)
-            mask_discontinuity = np.append(mask_discontinuity, mask_discontinuity_i)
-        datasetl0["quality_flag"][np.where(mask_outliers == 1)] = DatasetUtil.set_flag(
-            datasetl0["quality_flag"][np.where(mask_outliers == 1)], "outliers"
-        )  # for i in range(len(mask))]
-        datasetl0["quality_flag"][np.where(mask_threshold == 1)] = DatasetUtil.set_flag(
-            datasetl0["quality_flag"][np.where(mask_threshold == 1)], "L0_threshold"
-        )  # for i in range(len(mask))]
-        datasetl0["quality_flag"][
-            np.where(mask_discontinuity == 1)
-        ] = DatasetUtil.set_flag(
-            datasetl0["quality_flag"][np.where(mask_discontinuity == 1)],
-            "L0_discontinuity",
-        )  # for i in range(len(mask))]
+        ids, series_index = self.series_index(datasetl0, series_ids)
+        mask_threshold, mask_outliers, mask_discontinuity = self.l0_checks(
+            datasetl0["digital_number"].values[:, ids], series_index, len(series_ids)
+        )
+        mask = 1.0 * (
+            (mask_threshold == 1) | (mask_outliers == 1) | (mask_discontinuity == 1)
+        )
+
+        for i in self.masked_series(mask, series_index, len(series_ids)):
+            self.context.logger.warning(
+                "None of the scans for series passed the quality control criteria"
+            )
+
+        flagged = ids[mask_outliers == 1]
+        datasetl0["quality_flag"][flagged] = DatasetUtil.set_flag(
+            datasetl0["quality_flag"][flagged], "outliers"
+        )
+        flagged = ids[mask_threshold == 1]
+        datasetl0["quality_flag"][flagged] = DatasetUtil.set_flag(
+            datasetl0["quality_flag"][flagged], "L0_threshold"
+        )
+        flagged = ids[mask_discontinuity == 1]
+        datasetl0["quality_flag"][flagged] = DatasetUtil.set_flag(
+            datasetl0["quality_flag"][flagged], "L0_discontinuity"
+        )
 
         return datasetl0, mask
 
     def perform_quality_check_black(self, datasetl0, series_ids):
-        mask = []
-        mask_outliers = []
-        mask_threshold = []
-        mask_discontinuity = []
-        raise_mask_anomaly = False
-        for i in range(len(series_ids)):
-            ids = np.where(datasetl0["series_id"] == series_ids[i])[0]
-
-            data_subset = datasetl0["digital_number"].values[:, ids]
-            intsig = np.nanmean(data_subset, axis=0)
-            mask_all_i = np.zeros_like(intsig)  # mask the columns that have NaN
-            mask_threshold_i = self.threshold_checks(data_subset)
-            mask_outliers_i = self.outlier_checks(data_subset)
-            mask_discontinuity_i = self.discontinuity_checks(data_subset)
-            mask_all_i[np.where(mask_threshold_i == 1)] = 1
-            mask_all_i[np.where(mask_outliers_i == 1)] = 1
-            # mask_all_i[np.where(mask_discontinuity_i==1)] = 1
-
-            if all(mask_all_i == 1):
-                self.context.logger.warning(
-                    "None of the dark scans for series passed the quality control criteria"
-                )
-                raise_mask_anomaly = True
+        ids, series_index = self.series_index(datasetl0, series_ids)
+        mask_threshold, mask_outliers, mask_discontinuity = self.l0_checks(
+            datasetl0["digital_number"].values[:, ids], series_index, len(series_ids)
+        )
+        # discontinuities are not masked for dark scans
+        mask = 1.0 * ((mask_threshold == 1) | (mask_outliers == 1))
+
+        for i in self.masked_series(mask, series_index, len(series_ids)):
+            self.context.logger.warning(
+                "None of the dark scans for series passed the quality control criteria"
+            )
 
-            mask = np.append(mask, mask_all_i)
-            mask_threshold = np.append(mask_threshold, mask_threshold_i)
-            mask_outliers = np.append(mask_outliers, mask_outliers_i)
-        datasetl0["quality_flag"][np.where(mask == 1)] = DatasetUtil.set_flag(
-            datasetl0["quality_flag"][np.where(mask == 1)], "dark_masked"
+        flagged = ids[mask == 1]
+        datasetl0["quality_flag"][flagged] = DatasetUtil.set_flag(
+            datasetl0["quality_flag"][flagged], "dark_masked"
         )
-        # datasetl0["quality_flag"][np.where(mask_threshold == 1)] = DatasetUtil.set_flag(
-        #     datasetl0["quality_flag"][np.where(mask_threshold == 1)], "L0_threshold"
-        # )  # for i in range(len(mask))]
 
         return datasetl0, mask
 
+    @staticmethod
+    def series_index(datasetl0, series_ids):
+        """
+        Returns scans of dataset in given series and the index in series_ids of the series
+        of each of these scans
+
+        :type datasetl0: xarray.Dataset
+        :param datasetl0: L0 dataset
+        :type series_ids: numpy.ndarray
+        :param series_ids: series ids
+
+        :return: scans in series, series index of each scan
+        :rtype: tuple
+        """
+
+        series_id = datasetl0["series_id"].values
+        series_ids = np.asarray(series_ids)
+        if len(series_ids) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+        order = np.argsort(series_ids, kind="stable")
+        position = np.minimum(
+            np.searchsorted(series_ids, series_id, sorter=order), len(series_ids) - 1
+        )
+        ids = np.flatnonzero(series_ids[order[position]] == series_id)
+        return ids, order[position[ids]]
+
+    @staticmethod
+    def masked_series(mask, series_index, n_series):
+        """
+        Returns series without any unmasked scans
+
+        :type mask: numpy.ndarray
+        :param mask: mask of each scan
+        :type series_index: numpy.ndarray
+        :param series_index: series index of each scan
+        :type n_series: int
+        :param n_series: number of series
+
+        :return: indices of series without unmasked scans
+        :rtype: numpy.ndarray
+        """
+
+        n_valid = np.bincount(series_index, weights=mask == 0, minlength=n_series)
+        return np.flatnonzero(n_valid == 0)
+
+    def l0_checks(self, data, series_index, n_series, k_unc=3):
+        """
+        Returns threshold, outlier and discontinuity masks of all scans at once, as
+        threshold_checks, outlier_checks and discontinuity_checks applied to the scans of
+        each series
+
+        :type data: numpy.ndarray
+        :param data: digital numbers, shape (wavelength, scan)
+        :type series_index: numpy.ndarray
+        :param series_index: series index of each scan
+        :type n_series: int
+        :param n_series: number of series
+        :type k_unc: float
+        :param k_unc: (optional) outlier threshold, in standard deviations of series
+
+        :return: threshold mask, outlier mask, discontinuity mask
+        :rtype: tuple
+        """
+
+        l0_threshold = self.context.get_config_value("l0_threshold")
+        l0_discontinuity = self.context.get_config_value("l0_discontinuity")
+
+        mask_threshold = np.any(data < 0, axis=0)
+        if l0_threshold:
+            mask_threshold |= np.any(data > l0_threshold, axis=0)
+
+        mask_discontinuity = np.zeros(data.shape[1], dtype=bool)
+        if l0_discontinuity:
+            diff = abs(np.diff(data.astype(int), axis=0))
+            mask_discontinuity = np.any(diff > l0_discontinuity, axis=0)
+
+        mask_outliers = self.grouped_outlier_checks(data, series_index, n_series, k_unc)
+
+        return 1.0 * mask_threshold, mask_outliers, 1.0 * mask_discontinuity
+
     def perform_quality_check_rand_unc(self, dataset, measurandstring):
 
         if np.count_nonzero(dataset["u_rel_random_" + measurandstring].values < 0) > 0:
@@ -261,23 +312,49 @@ class QualityChecks:
                 )
         return dataset_l1b, dataset_l1b_swir
 
+    def return_clear_sky_reference(self, ref_sza, band_centres, bandwidth):
+        """
+        Returns clear-sky reference irradiance, band integrated to instrument
+        wavelengths, from the clear-sky references of the process (and of
+        clear_sky_cache_directory, if set)
+
+        :type ref_sza: int
+        :param ref_sza: reference solar zenith angle
+        :type band_centres: numpy.ndarray
+        :param band_centres: instrument wavelengths
+        :type bandwidth: numpy.ndarray
+        :param bandwidth: instrument bandwidths
+        :return: band integrated clear-sky irradiance
+        :rtype: numpy.ndarray
+        """
+
+        return return_clear_sky_reference(
+            ref_sza,
+            self.context.get_config_value("network"),
+            band_centres,
+            bandwidth,
+            self.context.get_config_value("clear_sky_cache_directory"),
+            self.context.logger,
+        ).irradiance
+
     def perform_quality_irradiance(self, dataset_l1b_irr):
         # todo add further checks
         vzas = dataset_l1b_irr["viewing_zenith_angle"].values
         szas = dataset_l1b_irr["solar_zenith_angle"].values
 
         print("Check if vza=180")
-        for i, vza in enumerate(vzas):
-            if np.abs(vza - 180) > self.context.get_config_value(
-                "irradiance_zenith_treshold"
-            ):
-                self.context.logger.warning(
-                    "One of the irradiance measurements did not have vza=180 (tolerance of %s), so has been masked"
-                    % self.context.get_config_value("irradiance_zenith_treshold")
-                )
-                dataset_l1b_irr["quality_flag"][i] = DatasetUtil.set_flag(
-                    dataset_l1b_irr["quality_flag"][i], "vza_irradiance"
-                )  # for i in range(len(mask))]
+        flagged = np.where(
+            np.abs(vzas - 180)
+            > self.context.get_config_value("irradiance_zenith_treshold")
+        )[0]
+        for i in flagged:
+            self.context.logger.warning(
+                "One of the irradiance measurements did not have vza=180 (tolerance of %s), so has been masked"
+                % self.context.get_config_value("irradiance_zenith_treshold")
+            )
+        dataset_l1b_irr["quality_flag"][flagged] = DatasetUtil.set_flag(
+            dataset_l1b_irr["quality_flag"][flagged], "vza_irradiance"
+        )
 
         if self.context.get_config_value("clear_sky_check"):
             print("Clearsky check")
@@ -286,47 +363,27 @@ class QualityChecks:
             ref_sza = ref_szas[np.argmin(np.abs(ref_szas - np.mean(szas)))]
 
             t1 = datetime.datetime.now()
-            ref_data = xr.open_dataset(
-                os.path.join(
-                    refdat_path,
-                    "solar_irradiance_hypernets_sza%s_highres_%s.nc"
-                    % (ref_sza, self.context.get_config_value("network")),
-                )
-            )
-
-            band_centres = dataset_l1b_irr["wavelength"].values
-            bandwidth = dataset_l1b_irr["bandwidth"].values
-
-            ref_data_irr = bi.pixel_int(
-                d=ref_data["solar_irradiance_BOA"].values,
-                x=ref_data["wavelength"].values,
-                x_pixel=band_centres,
-                width_pixel=bandwidth,
-                d_axis_x=0,
-                band_shape="gaussian",
+            ref_data_irr = self.return_clear_sky_reference(
+                ref_sza,
+                dataset_l1b_irr["wavelength"].values,
+                dataset_l1b_irr["bandwidth"].values,
             )
 
             self.context.logger.debug(
                 "band integration took:", datetime.datetime.now() - t1
             )
 
-            irr_scaled = np.zeros_like(dataset_l1b_irr["irradiance"].values)
-            for i, vza in enumerate(vzas):
+            # irradiance of all series scaled to reference solar zenith angle, flagged
+            # if more than 10% of wavelengths are below half the clear-sky reference
+            irr = dataset_l1b_irr["irradiance"].values
+            irr_scaled = irr / np.cos(np.pi / 180.0 * szas).astype(irr.dtype)
+            irr_scaled *= np.cos(np.pi / 180.0 * ref_sza)
 
-                # irrtot=pysolar.radiation.get_radiation_direct(datetime.datetime.fromtimestamp(dataset_l1b_irr["acquisition_time"][i]),90-dataset_l1b_irr["solar_zenith_angle"].values[i])
-                irr_scaled[:, i] = (
-                    dataset_l1b_irr["irradiance"].values[:, i]
-                    / np.cos(
-                        np.pi / 180.0 * dataset_l1b_irr["solar_zenith_angle"].values[i]
-                    )
-                    * np.cos(np.pi / 180.0 * ref_sza)
-                )
-                if np.count_nonzero(irr_scaled[:, i] < 0.5 * ref_data_irr) > 0.1 * len(
-                    irr_scaled[:, i]
-                ):
-                    dataset_l1b_irr["quality_flag"][i] = DatasetUtil.set_flag(
-                        dataset_l1b_irr["quality_flag"][i], "no_clear_sky_irradiance"
-                    )
+            n_below = np.count_nonzero(irr_scaled < 0.5 * ref_data_irr[:, None], axis=0)
+            flagged = np.where(n_below > 0.1 * len(irr_scaled))[0]
+            dataset_l1b_irr["quality_flag"][flagged] = DatasetUtil.set_flag(
+                dataset_l1b_irr["quality_flag"][flagged], "no_clear_sky_irradiance"
+            )
 
             if self.context.get_config_value("plot_clear_sky_check"):
                 self.plot.plot_quality_irradiance(
@@ -570,6 +627,80 @@ class QualityChecks:
             mask[np.where(np.abs(intsig - noiseavg) >= 0.25 * intsig)] = 1
         return mask
 
+    def grouped_outlier_checks(self, data, index, n_groups, k_unc=3):
+        """
+        Returns outlier mask of all scans at once, as outlier_checks applied to the scans
+        of each group
+
+        :type data: numpy.ndarray
+        :param data: digital numbers, shape (wavelength, scan)
+        :type index: numpy.ndarray
+        :param index: group index of each scan
+        :type n_groups: int
+        :param n_groups: number of groups
+        :type k_unc: float
+        :param k_unc: (optional) outlier threshold, in standard deviations of group
+
+        :return: outlier mask
+        :rtype: numpy.ndarray
+        """
+
+        intsig = np.nanmean(data, axis=0)
+        counts = np.bincount(index, minlength=n_groups)
+        noisestd, noiseavg = self.grouped_sigma_clip(intsig, index, n_groups)
+
+        deviation = np.abs(intsig - noiseavg[index])
+        mask = (deviation >= k_unc * noisestd[index]) | (deviation >= 0.25 * intsig)
+        return 1.0 * (mask & (counts[index] > 1))
+
+    def grouped_sigma_clip(
+        self, values, index, n_groups, tolerance=0.01, median=True, sigma_thresh=3.0
+    ):
+        """
+        Returns clipped standard deviation and average of values of each group, as
+        sigma_clip applied to the values of each group, iterating all groups together
+        until each has converged
+
+        :type values: numpy.ndarray
+        :param values: 1D array of values
+        :type index: numpy.ndarray
+        :param index: group index of each value
+        :type n_groups: int
+        :param n_groups: number of groups
+
+        :return: standard deviation, average of each group
+        :rtype: tuple
+        """
+
+        values = grouped_matrix(values, index, n_groups)
+        sigma_new = np.full(n_groups, np.nan)
+        average = np.full(n_groups, np.nan)
+
+        active = np.ones(n_groups, dtype=bool)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            while np.any(active):
+                values_active = values[active]
+                if median == False:
+                    average[active] = np.nanmean(values_active, axis=1)
+                elif median == True:
+                    average[active] = np.nanmedian(values_active, axis=1)
+                sigma_old = np.nanstd(values_active, axis=1)
+
+                # Mask those pixels that lie more than 3 stdev away from mean
+                values_active[
+                    values_active
+                    > (average[active] + sigma_thresh * sigma_old)[:, None]
+                ] = np.nan
+                values[active] = values_active
+
+                # Re-measure sigma and test for convergence
+                sigma_new[active] = np.nanstd(values_active, axis=1)
+                diff = abs(sigma_old - sigma_new[active]) / sigma_old
+                active[active] = diff > tolerance
+
+        return sigma_new, average
+
     def threshold_checks(self, data_subset):
         mask = np.zeros_like(data_subset[0])  # mask the columns that have NaN
         for i in range(len(data_subset[0])):
@@ -0,0 +1,173 @@
+"""
+Module of functions for solar and viewing geometry of series of scans
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+from pysolar import constants, numeric
+from pysolar import solar
+from pysolar import solartime as stime
+
+from hypernets_processor.version import __version__
+
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def julian_days(acquisition_time):
+    """
+    Returns UT and TT Julian days of given times, as computed by pysolar for each time
+
+    Leap seconds and delta T only change between months, so are evaluated once per month in
+    acquisition_time.
+
+    :type acquisition_time: numpy.ndarray
+    :param acquisition_time: times, as seconds since 1970-01-01T00:00:00 UTC
+
+    :return: UT Julian day, TT Julian (ephemeris) day
+    :rtype: tuple
+    """
+
+    acquisition_time = np.asarray(acquisition_time, dtype=np.float64)
+
+    months, month_index = np.unique(
+        acquisition_time.astype("datetime64[s]").astype("datetime64[M]"),
+        return_inverse=True,
+    )
+    month_index = month_index.reshape(acquisition_time.shape)
+
+    leap_seconds = np.zeros(len(months))
+    delta_t = np.zeros(len(months))
+    for i, month in enumerate(months.astype(datetime)):
+        when = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+        leap_seconds[i] = stime.get_leap_seconds(when)
+        delta_t[i] = stime.get_delta_t(when)
+
+    jde = (
+        acquisition_time + leap_seconds[month_index] + stime.tt_offset
+    ) / constants.seconds_per_day
+    jde += stime.gregorian_day_offset + stime.julian_day_offset
+    jd = jde - delta_t[month_index] / constants.seconds_per_day
+
+    return jd, jde
+
+
+def solar_position(latitude, longitude, acquisition_time, elevation=0):
+    """
+    Returns solar zenith and azimuth angles for given site and times, using the pysolar
+    implementation of the NREL solar position algorithm evaluated on arrays
+
+    :type latitude: float/numpy.ndarray
+    :param latitude: site latitude (degrees)
+    :type longitude: float/numpy.ndarray
+    :param longitude: site longitude (degrees)
+    :type acquisition_time: numpy.ndarray
+    :param acquisition_time: times, as seconds since 1970-01-01T00:00:00 UTC
+    :type elevation: float
+    :param elevation: (optional) site elevation (m), default 0
+
+    :return: solar zenith angle, solar azimuth angle (degrees)
+    :rtype: tuple
+    """
+
+    if numeric.current_mod != "numpy":
+        numeric.use_numpy()
+
+    latitude = float(latitude) if np.ndim(latitude) == 0 else np.asarray(latitude)
+    longitude = float(longitude) if np.ndim(longitude) == 0 else np.asarray(longitude)
+
+    jd, jde = julian_days(acquisition_time)
+
+    # location-dependent calculations
+    projected_radial_distance = solar.get_projected_radial_distance(elevation, latitude)
+    projected_axial_distance = solar.get_projected_axial_distance(elevation, latitude)
+
+    # time-dependent calculations
+    jce = stime.get_julian_ephemeris_century(jde)
+    jme = stime.get_julian_ephemeris_millennium(jce)
+    geocentric_latitude = solar.get_geocentric_latitude(jme)
+    geocentric_longitude = solar.get_geocentric_longitude(jme)
+    sun_earth_distance = solar.get_sun_earth_distance(jme)
+    aberration_correction = solar.get_aberration_correction(sun_earth_distance)
+    equatorial_horizontal_parallax = solar.get_equatorial_horizontal_parallax(
+        sun_earth_distance
+    )
+    nutation = solar.get_nutation(jce)
+    apparent_sidereal_time = solar.get_apparent_sidereal_time(jd, jme, nutation)
+    true_ecliptic_obliquity = solar.get_true_ecliptic_obliquity(jme, nutation)
+
+    # calculations dependent on location and time
+    apparent_sun_longitude = solar.get_apparent_sun_longitude(
+        geocentric_longitude, nutation, aberration_correction
+    )
+    geocentric_sun_right_ascension = solar.get_geocentric_sun_right_ascension(
+        apparent_sun_longitude, true_ecliptic_obliquity, geocentric_latitude
+    )
+    geocentric_sun_declination = solar.get_geocentric_sun_declination(
+        apparent_sun_longitude, true_ecliptic_obliquity, geocentric_latitude
+    )
+    local_hour_angle = solar.get_local_hour_angle(
+        apparent_sidereal_time, longitude, geocentric_sun_right_ascension
+    )
+    parallax_sun_right_ascension = solar.get_parallax_sun_right_ascension(
+        projected_radial_distance,
+        equatorial_horizontal_parallax,
+        local_hour_angle,
+        geocentric_sun_declination,
+    )
+    topocentric_local_hour_angle = solar.get_topocentric_local_hour_angle(
+        local_hour_angle, parallax_sun_right_ascension
+    )
+    topocentric_sun_declination = solar.get_topocentric_sun_declination(
+        geocentric_sun_declination,
+        projected_axial_distance,
+        equatorial_horizontal_parallax,
+        parallax_sun_right_ascension,
+        local_hour_angle,
+    )
+
+    topocentric_elevation_angle = solar.get_topocentric_elevation_angle(
+        latitude, topocentric_sun_declination, topocentric_local_hour_angle
+    )
+    refraction_correction = solar.get_refraction_correction(
+        constants.standard_pressure,
+        constants.standard_temperature,
+        topocentric_elevation_angle,
+    )
+    altitude = topocentric_elevation_angle + refraction_correction
+
+    azimuth = solar.get_topocentric_azimuth_angle(
+        topocentric_local_hour_angle, latitude, topocentric_sun_declination
+    )
+
+    return 90 - np.asarray(altitude), np.asarray(azimuth)
+
+
+def relative_azimuth_angle(pointing_azimuth_angle, solar_azimuth_angle):
+    """
+    Returns relative azimuth angle between pointing and sun, in range [-180, 180)
+
+    :type pointing_azimuth_angle: float/numpy.ndarray
+    :param pointing_azimuth_angle: pointing azimuth angle (degrees)
+    :type solar_azimuth_angle: float/numpy.ndarray
+    :param solar_azimuth_angle: solar azimuth angle (degrees)
+
+    :return: relative azimuth angle (degrees)
+    :rtype: float/numpy.ndarray
+    """
+
+    ra = (
+        np.asarray(pointing_azimuth_angle) - np.asarray(solar_azimuth_angle)
+    ) % 360
+    return ((ra - 180) % 360) - 180
+
+
+if __name__ == "__main__":
+    pass
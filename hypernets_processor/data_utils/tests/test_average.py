@@ -0,0 +1,134 @@
+"""
+Tests for Average class
+"""
+
+import unittest
+import shutil
+import tempfile
+from unittest.mock import MagicMock
+import numpy as np
+import xarray as xr
+from obsarray.templater.dataset_util import DatasetUtil
+from hypernets_processor.version import __version__
+from hypernets_processor.context import Context
+from hypernets_processor.data_utils.average import Average
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+FLAG_MEANINGS = ["outliers", "L0_threshold", "L0_discontinuity", "bad_pointing", "x"]
+FLAGS = ["outliers", "L0_threshold", "L0_discontinuity", "bad_pointing"]
+
+
+def setup_l1a(n_wav=5, n_scan=30):
+    """
+    Returns synthetic L1A radiance dataset, with unsorted series and flagged scans
+    """
+
+    rng = np.random.default_rng(0)
+    ds = xr.Dataset(coords={"wavelength": np.linspace(400, 900, n_wav)})
+
+    ds["series_id"] = DatasetUtil.create_variable(
+        [n_scan], dim_names=["scan"], dtype=np.uint16
+    )
+    ds["series_id"].values = rng.choice([3, 7, 11, 19], n_scan)
+    ds["quality_flag"] = DatasetUtil.create_flags_variable(
+        [n_scan], FLAG_MEANINGS, dim_names=["scan"]
+    )
+    ds["quality_flag"].values = rng.choice([0, 0, 0, 1, 4, 16, 24], n_scan)
+    ds["acquisition_time"] = DatasetUtil.create_variable(
+        [n_scan], dim_names=["scan"], dtype=np.uint32
+    )
+    ds["acquisition_time"].values = 1600000000 + np.arange(n_scan) * 7
+
+    for var in ["radiance", "u_rel_random_radiance"]:
+        ds[var] = DatasetUtil.create_variable(
+            [n_wav, n_scan], dim_names=["wavelength", "scan"], dtype=np.float32
+        )
+    ds["radiance"].values[:] = rng.normal(100, 5, (n_wav, n_scan))
+    ds["u_rel_random_radiance"].values[:] = rng.uniform(1, 2, (n_wav, n_scan))
+    return ds
+
+
+class TestAverage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.context = Context(logger=MagicMock())
+        self.context.set_config_value("archive_directory", self.tmpdir)
+        self.avg = Average(self.context)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_calc_mean_masked(self):
+        ds = setup_l1a()
+        flagged = DatasetUtil.get_flags_mask_or(ds["quality_flag"], FLAGS)
+
+        mean, std, n_valid, n_total = self.avg.calc_mean_masked(
+            ds, "radiance", FLAGS, return_std=True, return_total=True
+        )
+        mean_random = self.avg.calc_mean_masked(
+            ds, "u_rel_random_radiance", FLAGS, rand_unc=True
+        )
+        std_masked = self.avg.calc_std_masked(ds, "radiance", FLAGS)
+
+        self.assertEqual(mean.dtype, np.float32)
+        for i, series_id in enumerate(np.unique(ds["series_id"].values)):
+            ids_total = ds["series_id"].values == series_id
+            ids = ids_total & ~flagged
+            self.assertEqual(n_valid[i], np.sum(ids))
+            self.assertEqual(n_total[i], np.sum(ids_total))
+            np.testing.assert_allclose(
+                mean[:, i], np.mean(ds["radiance"].values[:, ids], axis=1), rtol=1e-6
+            )
+            np.testing.assert_allclose(
+                std[:, i], np.std(ds["radiance"].values[:, ids], axis=1), rtol=1e-5
+            )
+            np.testing.assert_allclose(std_masked[:, i], std[:, i], rtol=1e-6)
+            np.testing.assert_allclose(
+                mean_random[:, i],
+                np.sum(ds["u_rel_random_radiance"].values[:, ids] ** 2, axis=1) ** 0.5
+                / np.sum(ids),
+                rtol=1e-6,
+            )
+
+    def test_average_scan_variables(self):
+        ds = setup_l1a()
+        flagged = DatasetUtil.get_flags_mask_or(ds["quality_flag"], FLAGS)
+        series_ids = np.unique(ds["series_id"].values)
+
+        ds_avg = xr.Dataset()
+        ds_avg["series_id"] = DatasetUtil.create_variable(
+            [len(series_ids)], dim_names=["series"], dtype=np.uint16
+        )
+        ds_avg["quality_flag"] = DatasetUtil.create_flags_variable(
+            [len(series_ids)], FLAG_MEANINGS, dim_names=["series"]
+        )
+        ds_avg["acquisition_time"] = DatasetUtil.create_variable(
+            [len(series_ids)], dim_names=["series"], dtype=np.uint32
+        )
+
+        self.avg.average_scan_variables(ds, ds_avg, self.avg.series_grouping(ds, FLAGS))
+
+        np.testing.assert_array_equal(ds_avg["series_id"].values, series_ids)
+        self.assertEqual(ds_avg["acquisition_time"].dtype, np.uint32)
+        for i, series_id in enumerate(series_ids):
+            ids_total = ds["series_id"].values == series_id
+            ids = ids_total & ~flagged
+            self.assertEqual(
+                ds_avg["quality_flag"].values[i],
+                np.bitwise_or.reduce(ds["quality_flag"].values[ids_total]),
+            )
+            self.assertEqual(
+                ds_avg["acquisition_time"].values[i],
+                np.uint32(np.mean(ds["acquisition_time"].values[ids])),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Tests for clear_sky module
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+from unittest.mock import MagicMock, patch
+import numpy as np
+import comet_maths as cm
+import matheo.band_integration as bi
+from matheo.utils.function_def import f_gaussian
+from hypernets_processor.version import __version__
+from hypernets_processor.data_utils.clear_sky import (
+    CLEAR_SKY_REFERENCES,
+    return_clear_sky_reference,
+    band_int_kernel,
+    interpolation_kernel,
+)
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+class TestClearSky(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.wavs = np.arange(400.0, 1600.0, 5.0)
+        self.bandwidth = np.where(self.wavs < 1000, 3.0, 10.0)
+        CLEAR_SKY_REFERENCES.clear()
+
+    def tearDown(self):
+        CLEAR_SKY_REFERENCES.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def test_band_int_kernel(self):
+        x = np.arange(300, 1000, 0.1)
+        d = np.cos(x / 50.0) + 2
+        x_pixel = np.array([400.0, 650.2, 999.0])
+        width_pixel = np.array([3.0, 3.0, 10.0])
+
+        r = np.array([f_gaussian(x, c, w) for c, w in zip(x_pixel, width_pixel)])
+        kernel = band_int_kernel(x_pixel, width_pixel, x, f_gaussian)
+
+        np.testing.assert_allclose(
+            kernel @ d, bi.band_int(d=d, x=x, r=r, x_r=x), rtol=1e-12
+        )
+
+    def test_interpolation_kernel(self):
+        x_i = np.array([0.0, 1.0, 2.0, 4.0])
+        y_i = np.array([[2.0, 4.0], [3.0, 3.0], [1.0, 5.0], [0.0, 1.0]])
+        x = np.array([-1.0, 0.0, 0.5, 2.5, 4.0, 6.0])
+
+        np.testing.assert_allclose(
+            interpolation_kernel(x_i, x) @ y_i,
+            cm.interpolate_1d(x_i, y_i, x, extrapolate="nearest"),
+        )
+
+    def test_return_clear_sky_reference(self):
+        reference = return_clear_sky_reference(40, "w", self.wavs, self.bandwidth)
+
+        np.testing.assert_allclose(
+            reference.irradiance,
+            bi.pixel_int(
+                d=reference.highres_irradiance,
+                x=reference.highres_wavelength,
+                x_pixel=self.wavs,
+                width_pixel=self.bandwidth,
+                band_shape="gaussian",
+            ),
+            rtol=1e-10,
+        )
+
+        # kept by sza, network, wavelengths and bandwidths
+        self.assertIs(
+            return_clear_sky_reference(40, "w", self.wavs.copy(), self.bandwidth),
+            reference,
+        )
+        self.assertIsNot(
+            return_clear_sky_reference(40, "w", self.wavs, self.bandwidth * 2),
+            reference,
+        )
+        self.assertIsNot(
+            return_clear_sky_reference(40, "l", self.wavs, self.bandwidth), reference
+        )
+        self.assertEqual(len(CLEAR_SKY_REFERENCES), 3)
+
+    def test_return_clear_sky_reference_cache(self):
+        cache_directory = os.path.join(self.tmpdir, "clear_sky")
+
+        reference = return_clear_sky_reference(
+            40, "w", self.wavs, self.bandwidth, cache_directory
+        )
+        cache_files = os.listdir(cache_directory)
+        self.assertEqual(len(cache_files), 1)
+
+        # kernel read from cache directory in a new process
+        CLEAR_SKY_REFERENCES.clear()
+        with patch(
+            "hypernets_processor.data_utils.clear_sky.band_int_kernel"
+        ) as mock_kernel:
+            cached = return_clear_sky_reference(
+                40, "w", self.wavs, self.bandwidth, cache_directory
+            )
+        mock_kernel.assert_not_called()
+        np.testing.assert_array_equal(cached.irradiance, reference.irradiance)
+
+        # unreadable cache (e.g. partially written by other process) replaced
+        CLEAR_SKY_REFERENCES.clear()
+        cache_path = os.path.join(cache_directory, cache_files[0])
+        with open(cache_path, "wb") as f:
+            f.write(b"PK\x03\x04truncated")
+        logger = MagicMock()
+        rebuilt = return_clear_sky_reference(
+            40, "w", self.wavs, self.bandwidth, cache_directory, logger
+        )
+        logger.debug.assert_called_once()
+        np.testing.assert_array_equal(rebuilt.irradiance, reference.irradiance)
+        self.assertEqual(os.listdir(cache_directory), cache_files)
+
+        CLEAR_SKY_REFERENCES.clear()
+        np.testing.assert_array_equal(
+            return_clear_sky_reference(
+                40, "w", self.wavs, self.bandwidth, cache_directory
+            ).irradiance,
+            reference.irradiance,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for grouping module
+"""
+
+import unittest
+import numpy as np
+from hypernets_processor.version import __version__
+from hypernets_processor.data_utils.grouping import (
+    group_index,
+    grouped_matrix,
+    Grouping,
+)
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+class TestGrouping(unittest.TestCase):
+    def test_group_index(self):
+        unique_ids, index, first = group_index(np.array([5, 5, 2, 2, 2, 9]))
+
+        np.testing.assert_array_equal(unique_ids, [2, 5, 9])
+        np.testing.assert_array_equal(index, [1, 1, 0, 0, 0, 2])
+        np.testing.assert_array_equal(first, [2, 0, 5])
+
+    def test_grouped_matrix(self):
+        matrix = grouped_matrix(np.array([1.0, 2.0, 3.0, 4.0]), np.array([1, 0, 1, 1]), 3)
+
+        np.testing.assert_array_equal(
+            matrix, [[2, np.nan, np.nan], [1, 3, 4], [np.nan, np.nan, np.nan]]
+        )
+
+    def test_grouping(self):
+        rng = np.random.default_rng(1)
+        ids = rng.integers(10, 15, 40)
+        mask = rng.integers(0, 3, 40) == 0
+        values = rng.normal(50, 5, (3, 40)).astype(np.float32)
+        flags = rng.integers(0, 2**16, 40).astype(np.uint32)
+
+        grouping = Grouping(ids, mask=mask)
+
+        np.testing.assert_array_equal(grouping.ids, np.unique(ids))
+        mean, std = grouping.mean_std(values)
+        mean_total = grouping.mean(values, masked=False)
+        mean_random = grouping.mean_random(values)
+        flags_or = grouping.bitwise_or(flags)
+        for i, id in enumerate(grouping.ids):
+            ids_total = ids == id
+            ids_valid = ids_total & ~mask
+            self.assertEqual(grouping.count()[i], np.sum(ids_valid))
+            self.assertEqual(grouping.count(masked=False)[i], np.sum(ids_total))
+            np.testing.assert_allclose(
+                mean[:, i], np.mean(values[:, ids_valid], axis=1), rtol=1e-6
+            )
+            np.testing.assert_allclose(
+                std[:, i], np.std(values[:, ids_valid], axis=1), rtol=1e-5
+            )
+            np.testing.assert_allclose(
+                mean_total[:, i], np.mean(values[:, ids_total], axis=1), rtol=1e-6
+            )
+            np.testing.assert_allclose(
+                mean_random[:, i],
+                np.sum(values[:, ids_valid] ** 2, axis=1) ** 0.5 / np.sum(ids_valid),
+                rtol=1e-6,
+            )
+            self.assertEqual(flags_or[i], np.bitwise_or.reduce(flags[ids_total]))
+
+    def test_grouping_empty(self):
+        grouping = Grouping(np.zeros(0, dtype=int))
+
+        self.assertEqual(grouping.n_groups, 0)
+        self.assertEqual(grouping.mean(np.zeros((3, 0))).shape, (3, 0))
+        self.assertEqual(grouping.bitwise_or(np.zeros(0, dtype=np.uint8)).shape, (0,))
+
+    def test_grouping_all_masked(self):
+        values = np.array([[1.0, np.nan, 3.0, 5.0]])
+        grouping = Grouping(np.array([0, 1, 1, 1]), mask=np.array([1, 1, 0, 0]))
+
+        mean, std = grouping.mean_std(values)
+
+        np.testing.assert_array_equal(grouping.count(), [0, 2])
+        self.assertTrue(np.isnan(mean[0, 0]) and np.isnan(std[0, 0]))
+        np.testing.assert_allclose(mean[0, 1], 4.0)
+        np.testing.assert_allclose(std[0, 1], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,291 @@
+"""
+Tests for QualityChecks class
+"""
+
+import unittest
+import os
+import glob
+import shutil
+import tempfile
+from unittest.mock import MagicMock, patch
+import numpy as np
+import xarray as xr
+from obsarray.templater.dataset_util import DatasetUtil
+from hypernets_processor.version import __version__
+from hypernets_processor.context import Context
+from hypernets_processor.data_io.spectrum import SpeFile
+from hypernets_processor.data_utils.quality_checks import QualityChecks
+from hypernets_processor.data_utils.clear_sky import CLEAR_SKY_REFERENCES
+import matheo.band_integration as bi
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+this_directory = os.path.dirname(__file__)
+reader_directory = os.path.join(
+    os.path.dirname(this_directory), "..", "data_io", "tests", "reader"
+)
+
+FLAG_MEANINGS = ["outliers", "L0_threshold", "L0_discontinuity", "dark_masked"]
+
+# (l0_threshold, l0_discontinuity) settings, including settings which flag recorded scans
+CHECK_SETTINGS = [(64000, 10000), (None, 10000), (20000, 1000), (None, None)]
+
+
+def read_recorded_sequences():
+    """
+    Returns digital numbers (wavelength, scan) and series id of each scan of the VNIR and
+    SWIR scans of each recorded test sequence, with the scans of each spectra file as one
+    series
+    """
+
+    recorded = []
+    for seq_dir in sorted(glob.glob(os.path.join(reader_directory, "SEQ*"))):
+        spe_files = [
+            SpeFile(path)
+            for path in sorted(
+                glob.glob(os.path.join(seq_dir, "RADIOMETER", "*.spe"))
+            )
+        ]
+        for swir in [False, True]:
+            dn = []
+            series_id = []
+            for i, spe in enumerate(spe_files):
+                chunks = np.flatnonzero((spe.pixel_count > 500) != swir)
+                if len(chunks) > 0:
+                    dn.append(spe.bodies(chunks).astype(np.int32))
+                    series_id.append(np.full(len(chunks), i, dtype=np.uint16))
+            if len(dn) > 0:
+                recorded.append(
+                    (
+                        os.path.basename(seq_dir),
+                        np.concatenate(dn).T,
+                        np.concatenate(series_id),
+                    )
+                )
+    return recorded
+
+
+def setup_l0(dn, series_id):
+    """
+    Returns L0 dataset with given digital numbers and series ids
+    """
+
+    ds = xr.Dataset()
+    ds["digital_number"] = DatasetUtil.create_variable(
+        list(dn.shape), dim_names=["wavelength", "scan"], dtype=np.int32
+    )
+    ds["digital_number"].values = dn
+    ds["series_id"] = DatasetUtil.create_variable(
+        [dn.shape[1]], dim_names=["scan"], dtype=np.uint16
+    )
+    ds["series_id"].values = series_id
+    ds["quality_flag"] = DatasetUtil.create_flags_variable(
+        [dn.shape[1]], FLAG_MEANINGS, dim_names=["scan"]
+    )
+    return ds
+
+
+class TestQualityChecks(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.recorded = read_recorded_sequences()
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.context = Context(logger=MagicMock())
+        self.context.set_config_value("archive_directory", self.tmpdir)
+        self.qual = QualityChecks(self.context)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def reference_l0_checks(self, dn, series_id, series_ids):
+        """
+        Returns threshold, outlier and discontinuity masks from the checks of each series
+        """
+
+        masks = [[], [], []]
+        for series in series_ids:
+            data_subset = dn[:, series_id == series]
+            masks[0] = np.append(masks[0], self.qual.threshold_checks(data_subset))
+            masks[1] = np.append(masks[1], self.qual.outlier_checks(data_subset))
+            masks[2] = np.append(masks[2], self.qual.discontinuity_checks(data_subset))
+        return masks
+
+    def test_l0_checks_recorded(self):
+        self.assertGreater(len(self.recorded), 0)
+        flagged = np.zeros(3)
+        for l0_threshold, l0_discontinuity in CHECK_SETTINGS:
+            self.context.set_config_value("l0_threshold", l0_threshold)
+            self.context.set_config_value("l0_discontinuity", l0_discontinuity)
+            for name, dn, series_id in self.recorded:
+                series_ids, series_index = np.unique(series_id, return_inverse=True)
+
+                masks = self.qual.l0_checks(dn, series_index, len(series_ids))
+
+                expected = self.reference_l0_checks(dn, series_id, series_ids)
+                for mask, expected_mask in zip(masks, expected):
+                    np.testing.assert_array_equal(mask, expected_mask, err_msg=name)
+                flagged += [np.sum(mask) for mask in masks]
+
+        # checks must have flagged some of the recorded scans
+        self.assertTrue(np.all(flagged > 0))
+
+    def test_grouped_sigma_clip(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(1000, 10, 60)
+        values[[3, 17, 40]] = [2000, 1500, 5000]
+        values[25] = np.nan
+        index = rng.integers(0, 7, 60)
+        index[index == 5] = 6
+
+        sigma, average = self.qual.grouped_sigma_clip(values, index, 7)
+
+        for i in range(7):
+            if np.any(index == i):
+                expected_sigma, expected_average = self.qual.sigma_clip(
+                    values[index == i]
+                )
+                self.assertAlmostEqual(sigma[i], expected_sigma, 8)
+                self.assertAlmostEqual(average[i], expected_average, 8)
+            else:
+                self.assertTrue(np.isnan(sigma[i]))
+
+    def test_perform_quality_check_L0A(self):
+        self.context.set_config_value("l0_threshold", 20000)
+        self.context.set_config_value("l0_discontinuity", 1000)
+        for name, dn, series_id in self.recorded:
+            series_ids = np.unique(series_id)
+            ds, mask = self.qual.perform_quality_check_L0A(
+                setup_l0(dn, series_id), series_ids
+            )
+
+            (
+                mask_threshold,
+                mask_outliers,
+                mask_discontinuity,
+            ) = self.reference_l0_checks(dn, series_id, series_ids)
+            np.testing.assert_array_equal(
+                mask,
+                np.maximum.reduce([mask_threshold, mask_outliers, mask_discontinuity]),
+            )
+            for flag, expected_mask in zip(
+                ["outliers", "L0_threshold", "L0_discontinuity"],
+                [mask_outliers, mask_threshold, mask_discontinuity],
+            ):
+                np.testing.assert_array_equal(
+                    DatasetUtil.unpack_flags(ds["quality_flag"])[flag].values,
+                    expected_mask == 1,
+                    err_msg=name,
+                )
+
+    def test_perform_quality_check_black(self):
+        self.context.set_config_value("l0_threshold", 20000)
+        self.context.set_config_value("l0_discontinuity", 1000)
+        for name, dn, series_id in self.recorded:
+            series_ids = np.unique(series_id)
+            ds, mask = self.qual.perform_quality_check_black(
+                setup_l0(dn, series_id), series_ids
+            )
+
+            mask_threshold, mask_outliers, _ = self.reference_l0_checks(
+                dn, series_id, series_ids
+            )
+            expected_mask = np.maximum(mask_threshold, mask_outliers)
+            np.testing.assert_array_equal(mask, expected_mask)
+            np.testing.assert_array_equal(
+                DatasetUtil.unpack_flags(ds["quality_flag"])["dark_masked"].values,
+                expected_mask == 1,
+                err_msg=name,
+            )
+
+    @patch.dict(CLEAR_SKY_REFERENCES, clear=True)
+    def test_return_clear_sky_reference(self):
+        self.context.set_config_value("network", "w")
+        cache_directory = os.path.join(self.tmpdir, "clear_sky")
+        self.context.set_config_value("clear_sky_cache_directory", cache_directory)
+        wavs = np.arange(400.0, 900.0, 4.7)
+        bandwidth = np.full(len(wavs), 3.0)
+
+        ref = self.qual.return_clear_sky_reference(40, wavs, bandwidth)
+
+        ref_data = xr.open_dataset(
+            os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(this_directory))),
+                "data",
+                "quality_comparison_data",
+                "solar_irradiance_hypernets_sza40_highres_w.nc",
+            )
+        )
+        np.testing.assert_allclose(
+            ref,
+            bi.pixel_int(
+                d=ref_data["solar_irradiance_BOA"].values,
+                x=ref_data["wavelength"].values,
+                x_pixel=wavs,
+                width_pixel=bandwidth,
+                d_axis_x=0,
+                band_shape="gaussian",
+            ),
+            rtol=1e-10,
+        )
+        self.assertEqual(len(CLEAR_SKY_REFERENCES), 1)
+        self.assertEqual(len(os.listdir(cache_directory)), 1)
+        self.assertIs(self.qual.return_clear_sky_reference(40, wavs, bandwidth), ref)
+
+    @patch.dict(CLEAR_SKY_REFERENCES, clear=True)
+    def test_perform_quality_irradiance(self):
+        for name, value in [
+            ("network", "w"),
+            ("clear_sky_check", True),
+            ("plot_clear_sky_check", False),
+            ("irradiance_zenith_treshold", 2),
+            ("irr_variability_percent", 10),
+        ]:
+            self.context.set_config_value(name, value)
+        wavs = np.arange(400.0, 900.0)
+        szas = np.array([38.0, 40.0, 42.0, 41.0])
+        ref = self.qual.return_clear_sky_reference(40, wavs, np.full(len(wavs), 3.0))
+
+        ds = xr.Dataset()
+        ds["wavelength"] = ("wavelength", wavs)
+        ds["bandwidth"] = ("wavelength", np.full(len(wavs), 3.0))
+        ds["viewing_zenith_angle"] = ("series", np.array([180.0, 180.0, 170.0, 181.0]))
+        ds["solar_zenith_angle"] = ("series", szas)
+        # second series overcast, below half of clear-sky reference
+        ds["irradiance"] = (
+            ("wavelength", "series"),
+            (
+                ref[:, None]
+                * np.cos(np.pi / 180.0 * szas)
+                / np.cos(np.pi / 180.0 * 40)
+                * np.array([1.0, 0.4, 1.0, 0.9])
+            ).astype(np.float32),
+        )
+        ds["quality_flag"] = DatasetUtil.create_flags_variable(
+            [len(szas)],
+            ["vza_irradiance", "no_clear_sky_irradiance", "variable_irradiance"],
+            dim_names=["series"],
+        )
+
+        flags = DatasetUtil.unpack_flags(
+            self.qual.perform_quality_irradiance(ds)["quality_flag"]
+        )
+
+        np.testing.assert_array_equal(
+            flags["vza_irradiance"].values, [False, False, True, False]
+        )
+        np.testing.assert_array_equal(
+            flags["no_clear_sky_irradiance"].values, [False, True, False, False]
+        )
+        np.testing.assert_array_equal(flags["variable_irradiance"].values, [True] * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
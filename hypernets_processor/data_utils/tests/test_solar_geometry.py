@@ -0,0 +1,55 @@
+"""
+Tests for solar_geometry module
+"""
+
+import unittest
+from datetime import datetime, timezone
+import numpy as np
+from pysolar.solar import get_altitude, get_azimuth
+from hypernets_processor.version import __version__
+from hypernets_processor.data_utils.solar_geometry import (
+    solar_position,
+    relative_azimuth_angle,
+)
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+class TestSolarGeometry(unittest.TestCase):
+    def test_solar_position(self):
+        rng = np.random.default_rng(0)
+        acquisition_time = rng.uniform(1.5e9, 1.78e9, 50)
+
+        for lat, lon in [(43.7, 7.3), (-33.9, 18.4), (51.2, 2.9), (-70.0, -170.0)]:
+            sza, saa = solar_position(lat, lon, acquisition_time)
+
+            self.assertEqual(sza.shape, acquisition_time.shape)
+            for i, t in enumerate(acquisition_time):
+                when = datetime.fromtimestamp(t, timezone.utc)
+                self.assertAlmostEqual(sza[i], 90 - get_altitude(lat, lon, when), 5)
+                self.assertAlmostEqual(saa[i], get_azimuth(lat, lon, when), 5)
+
+    def test_solar_position_scalar(self):
+        when = datetime(2020, 11, 17, 14, 43, 53, tzinfo=timezone.utc)
+
+        sza, saa = solar_position(43.7, 7.3, when.timestamp())
+
+        self.assertAlmostEqual(float(sza), 90 - get_altitude(43.7, 7.3, when), 5)
+        self.assertAlmostEqual(float(saa), get_azimuth(43.7, 7.3, when), 5)
+
+    def test_relative_azimuth_angle(self):
+        raa = relative_azimuth_angle(
+            np.array([0.0, 90.0, 350.0, 180.0]), np.array([180.0, 45.0, 10.0, 0.0])
+        )
+
+        np.testing.assert_array_almost_equal(raa, [-180.0, 45.0, -20.0, -180.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
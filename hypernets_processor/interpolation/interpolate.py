@@ -150,8 +150,9 @@ class Interpolate:
         measurement_function_interpolate_wav = self.context.get_config_value(
             "measurement_function_interpolate_wav"
         )
+        # all MC samples are passed to the wavelength interpolation in one call
         prop = punpy.MCPropagation(
-            self.context.get_config_value("mcsteps"), dtype="float32", parallel_cores=1, verbose=False
+            self.context.get_config_value("mcsteps"), dtype="float32", MCdimlast=True, verbose=False
         )
         if self.context.get_config_value("network") == "w":
             interpolation_function_wav = self._measurement_function_factory(
@@ -166,6 +167,7 @@ class Interpolate:
             np.nanmean(dataset_l1b_irr["solar_zenith_angle"].values),
             self.context.get_config_value("network"),
             dataset_l1b_irr["wavelength"].values,
+            cache_directory=self.context.get_config_value("clear_sky_cache_directory"),
         )
 
         dataset_l1c_temp = self.templ.l1ctemp_dataset(
@@ -4,6 +4,103 @@ import scipy.interpolate
 import numpy as np
 
 
+def time_interpolation_indices(input_time, output_time, clamp_first=False):
+    """
+    Returns bracketing input indices and weights for linear interpolation in time, per
+    batch (e.g. per output time or MC sample), following ``scipy.interpolate.interp1d``.
+    Output times not within the input times are clamped to the mean of the values at the
+    last (or first) input time, or with ``clamp_first`` to the first of these values.
+
+    :type input_time: numpy.ndarray
+    :param input_time: input times (not necessarily sorted), shape (n_in, n_batch)
+    :type output_time: numpy.ndarray
+    :param output_time: output times, shape (n_out, n_batch)
+    :type clamp_first: bool
+    :param clamp_first: (optional) clamp to the first value at the last (or first) input
+    time, rather than the mean of these values (default: False)
+    :return: lower and upper input indices, time step and offset from lower input time
+    (shape (n_out, n_batch)), masks of output times clamped to the mean of several
+    values above and below (shape (n_out, n_batch)) and masks of inputs clamped to above
+    and below (shape (n_in, n_batch))
+    :rtype: tuple
+    """
+
+    input_time = np.asarray(input_time)
+    output_time = np.asarray(output_time)
+    n_in = input_time.shape[0]
+
+    time_min = np.min(input_time, axis=0)
+    time_max = np.max(input_time, axis=0)
+    above = output_time >= time_max
+    below = ~above & (output_time <= time_min)
+    inside = ~(above | below)
+
+    at_max = input_time == time_max
+    at_min = input_time == time_min
+    if clamp_first:
+        at_max = np.arange(n_in)[:, None] == np.argmax(at_max, axis=0)
+        at_min = np.arange(n_in)[:, None] == np.argmax(at_min, axis=0)
+
+    # as interp1d, stable sort of input times and index of first input time not less
+    # than output time (i.e. searchsorted), clipped to bracket output time
+    order = np.argsort(input_time, axis=0, kind="mergesort")
+    time_sorted = np.take_along_axis(input_time, order, axis=0)
+    hi = np.sum(time_sorted[:, None, :] < output_time[None, :, :], axis=0)
+    hi = np.minimum(np.maximum(hi, 1), n_in - 1)
+    lo = np.maximum(hi - 1, 0)
+
+    time_lo = np.take_along_axis(time_sorted, lo, axis=0)
+    time_hi = np.take_along_axis(time_sorted, hi, axis=0)
+    time_step = np.where(inside, time_hi - time_lo, 1)
+    offset = np.where(inside, output_time - time_lo, 0)
+    lo = np.take_along_axis(order, lo, axis=0)
+    hi = np.take_along_axis(order, hi, axis=0)
+
+    # output times clamped to a single input value are gathered with zero offset, only
+    # output times clamped to the mean of several input values remain flagged
+    for clamped, at in [(above, at_max), (below, at_min)]:
+        single = clamped & (np.sum(at, axis=0) == 1)
+        lo = np.where(single, np.argmax(at, axis=0), lo)
+        hi = np.where(single, lo, hi)
+        clamped &= ~single
+
+    return lo, hi, time_step, offset, above, below, at_max, at_min
+
+
+def interpolate_time(values, indices):
+    """
+    Returns values linearly interpolated in time, as one gather of bracketing values
+    over all wavelengths and batches
+
+    :type values: numpy.ndarray
+    :param values: values at input times, shape (n_wav, n_in, n_batch)
+    :type indices: tuple
+    :param indices: interpolation indices, from ``time_interpolation_indices``
+    :return: values at output times, shape (n_wav, n_out, n_batch)
+    :rtype: numpy.ndarray
+    """
+
+    lo, hi, time_step, offset, above, below, at_max, at_min = indices
+
+    if lo.shape[1] == 1:
+        # indices shared by all batches
+        values_lo = values[:, lo[:, 0], :]
+        values_hi = values[:, hi[:, 0], :]
+    else:
+        values_lo = np.take_along_axis(values, lo[None], axis=1)
+        values_hi = np.take_along_axis(values, hi[None], axis=1)
+    out = values_lo + (values_hi - values_lo) / time_step * offset
+
+    for clamped, at in [(above, at_max), (below, at_min)]:
+        if np.any(clamped):
+            values_at = np.sum(
+                np.where(at[None], values, 0), axis=1, keepdims=True
+            ) / np.sum(at, axis=0)
+            out = np.where(clamped[None], values_at, out)
+
+    return out
+
+
 class InterpolationTimeLinear(MeasurementFunction):
     def meas_function(self, output_time, input_time, irradiance):
         """
@@ -11,54 +108,79 @@ class InterpolationTimeLinear(MeasurementFunction):
         Each of the arguments can be either a scalar or a vector (1D-array).
         """
 
-        simpleint = True
-        if len(input_time.shape) > 1:
-            simpleint = False
-            out = np.empty((len(irradiance), len(output_time)))
-            for i in range(len(output_time)):
-                if output_time[i] >= np.max(input_time[:, i]):
-                    out[:, i] = irradiance[
-                        :, input_time[:, i] == np.max(input_time[:, i]), i
-                    ][:, 0]
-                elif output_time[i] <= np.min(input_time[:, i]):
-                    out[:, i] = irradiance[
-                        :, input_time[:, i] == np.min(input_time[:, i]), i
-                    ][:, 0]
-                else:
-                    irradiance_intfunc = scipy.interpolate.interp1d(
-                        input_time[:, i], irradiance[:, :, i]
-                    )
-                    out[:, i] = irradiance_intfunc(output_time[i])
-
-        elif hasattr(output_time, "__len__"):
-            if len(output_time) > 1:
-                simpleint = False
-                out = np.empty((len(irradiance), len(output_time)))
-                for i in range(len(output_time)):
-                    if output_time[i] >= np.max(input_time):
-                        out[:, i] = np.mean(
-                            irradiance[:, input_time == np.max(input_time)], axis=1
-                        ).squeeze()
-                    elif output_time[i] <= np.min(input_time):
-                        out[:, i] = np.mean(
-                            irradiance[:, input_time == np.min(input_time)], axis=1
-                        ).squeeze()
-                    else:
-                        irradiance_intfunc = scipy.interpolate.interp1d(
-                            input_time, irradiance
-                        )
-                        out[:, i] = irradiance_intfunc(output_time[i])
-
-        if simpleint:
-            if output_time >= max(input_time):
-                out = irradiance[:, input_time == max(input_time)]
-            elif output_time <= min(input_time):
-                out = irradiance[:, input_time == min(input_time)]
-            else:
-                irradiance_intfunc = scipy.interpolate.interp1d(input_time, irradiance)
-                out = irradiance_intfunc(output_time)
+        return self.interpolate(output_time, input_time, irradiance)
+
+    def interpolate(self, output_time, input_time, values):
+        """
+        Interpolates values linearly in time. Arguments are either per MC sample (times
+        1D-arrays, values of shape (n_wav, n_in)), with input times per output time
+        (input times of shape (n_in, n_out), values of shape (n_wav, n_in, n_out)), or
+        for all MC samples, with MC dimension last (output times of shape (n_out, n_MC)).
+        Interpolation indices are reused for following calls with the same times.
+        """
+
+        input_time = np.asarray(input_time)
+
+        if input_time.ndim > 1:
+            if np.ndim(output_time) > 1:
+                return interpolate_time(
+                    values, self.interpolation_indices(output_time, input_time)
+                )
+
+            # input times per output time, clamped to first value
+            indices = self.interpolation_indices(
+                np.reshape(output_time, (1, -1)), input_time, clamp_first=True
+            )
+            return interpolate_time(values, indices)[:, 0, :]
+
+        if np.ndim(output_time) > 0 and len(output_time) > 1:
+            indices = self.interpolation_indices(
+                np.reshape(output_time, (-1, 1)), input_time[:, None]
+            )
+            return interpolate_time(values[..., None], indices)[..., 0]
+
+        if output_time >= max(input_time):
+            return values[:, input_time == max(input_time)]
+        elif output_time <= min(input_time):
+            return values[:, input_time == min(input_time)]
+
+        indices = self.interpolation_indices(
+            np.reshape(output_time, (-1, 1)), input_time[:, None]
+        )
+        out = interpolate_time(values[..., None], indices)[..., 0]
+        if np.ndim(output_time) == 0:
+            return out[:, 0]
         return out
 
+    def interpolation_indices(self, output_time, input_time, clamp_first=False):
+        """
+        Returns interpolation indices for times, reused from the previous call if times
+        are unchanged (e.g. for each MC sample). If times are the same for all batches,
+        indices are computed once and broadcast.
+        """
+
+        output_time = np.asarray(output_time)
+        key = (
+            input_time.shape,
+            input_time.tobytes(),
+            output_time.shape,
+            output_time.tobytes(),
+            clamp_first,
+        )
+        if getattr(self, "_indices_key", None) != key:
+            if np.all(input_time == input_time[:, :1]) and np.all(
+                output_time == output_time[:, :1]
+            ):
+                self._indices = time_interpolation_indices(
+                    input_time[:, :1], output_time[:, :1], clamp_first
+                )
+            else:
+                self._indices = time_interpolation_indices(
+                    input_time, output_time, clamp_first
+                )
+            self._indices_key = key
+        return self._indices
+
     @staticmethod
     def get_name():
         return "InterpolationTimeLinear"
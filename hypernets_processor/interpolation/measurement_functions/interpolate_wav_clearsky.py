@@ -1,89 +1,73 @@
 from punpy import MeasurementFunction
 
-import scipy.interpolate
 import numpy as np
-import os.path
 import comet_maths as cm
-import matheo.band_integration as bi
-import xarray as xr
-import matplotlib.pyplot as plt
-
-dir_path = os.path.dirname(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
-)
-refdat_path = os.path.join(dir_path, "data", "quality_comparison_data")
+from hypernets_processor.data_utils.clear_sky import return_clear_sky_reference
 
 
 class InterpolationWavClearSky(MeasurementFunction):
-    def setup(self, szas, network, irr_wavs):
+    def setup(self, szas, network, irr_wavs, cache_directory=None):
         ref_szas = np.array([0, 10, 20, 40, 60, 70, 80])
         ref_sza = ref_szas[np.argmin(np.abs(ref_szas - np.mean(szas)))]
-        self.clear_sky = xr.open_dataset(
-            os.path.join(
-                refdat_path,
-                "solar_irradiance_hypernets_sza%s_highres_%s.nc"
-                % (int(ref_sza), network),
-            )
-        )
-        self.bandwidth = np.append(
+        irr_wavs = np.asarray(irr_wavs, dtype=np.float64)
+        bandwidth = np.append(
             3.0 * np.ones_like(irr_wavs[irr_wavs < 1000]),
             10.0 * np.ones_like(irr_wavs[irr_wavs > 1000]),
         )
 
-        self.r_pixel_irrs = bi.return_r_pixel(
-            irr_wavs,
-            self.bandwidth,
-            self.clear_sky["wavelength"].values,
-            bi.f_gaussian,
+        reference = return_clear_sky_reference(
+            ref_sza, network, irr_wavs, bandwidth, cache_directory
         )
 
-        self.corr_irrs = bi.band_int(
-            d=self.clear_sky["solar_irradiance_BOA"].values,
-            x=self.clear_sky["wavelength"].values,
-            r=self.r_pixel_irrs,
-            x_r=self.clear_sky["wavelength"].values,
-        ) - cm.interpolate_1d(
-            self.clear_sky["wavelength"].values,
-            self.clear_sky["solar_irradiance_BOA"].values,
-            irr_wavs,
+        self.clear_sky = reference.clear_sky
+        self.bandwidth = bandwidth
+        self.r_kernel = reference.r_kernel
+        self.corr_irrs, self.irr_kernel, self.irr_offset = (
+            reference.interpolation_kernels
         )
+        self.irr_wavs = irr_wavs
 
     def meas_function(self, rad_wavs, irr_wavs, irr):
         """
         This function implements the measurement function.
         Each of the arguments can be either a scalar or a vector (1D-array).
+        Irradiance may have further dimensions after wavelength (e.g. series and stacked
+        MC samples), which are processed in one batch.
         """
-        if len(irr.shape) > 1:
-            intp_highres = np.empty(
-                (len(self.clear_sky["wavelength"].values), len(irr[0]))
-            )
-            for i in range(len(irr[0])):
-                intp_highres[:, i] = cm.interpolate_1d_along_example(
-                    irr_wavs,
-                    irr[:, i] - self.corr_irrs,
-                    self.clear_sky["wavelength"].values,
-                    self.clear_sky["solar_irradiance_BOA"].values,
-                    self.clear_sky["wavelength"].values,
-                    relative=False,
+        irr_wavs = np.asarray(irr_wavs)
+        irr = np.asarray(irr)
+
+        if irr_wavs.ndim > 1:
+            wavs = irr_wavs.reshape((len(irr_wavs), -1))
+            if np.all(wavs == wavs[:, :1]):
+                irr_wavs = wavs[:, 0]
+            else:
+                return np.stack(
+                    [
+                        self.meas_function(rad_wavs, irr_wavs[..., i], irr[..., i])
+                        for i in range(irr.shape[-1])
+                    ],
+                    axis=-1,
                 )
+
+        irr_2d = irr.reshape((len(irr_wavs), -1))
+
+        if np.array_equal(irr_wavs, self.irr_wavs) and np.all(np.isfinite(irr_2d)):
+            intp_irr = self.irr_kernel @ irr_2d + self.irr_offset[:, None]
+
         else:
-            intp_highres = cm.interpolate_1d_along_example(
+            wavs = self.clear_sky["wavelength"].values
+            boa = self.clear_sky["solar_irradiance_BOA"].values
+            boa_irrs = cm.interpolate_1d(wavs, boa, irr_wavs, extrapolate="nearest")
+            intp_highres = cm.interpolate_1d(
                 irr_wavs,
-                irr - self.corr_irrs,
-                self.clear_sky["wavelength"].values,
-                self.clear_sky["solar_irradiance_BOA"].values,
-                self.clear_sky["wavelength"].values,
-                relative=False,
-            )
-
-        intp_irr = bi.band_int(
-            d=intp_highres,
-            x=self.clear_sky["wavelength"].values,
-            r=self.r_pixel_irrs,
-            x_r=self.clear_sky["wavelength"].values,
-        )
+                irr_2d - (self.corr_irrs + boa_irrs)[:, None],
+                wavs,
+                extrapolate="nearest",
+            ).reshape((len(wavs), -1)) + boa[:, None]
+            intp_irr = self.r_kernel @ intp_highres
 
-        return intp_irr
+        return intp_irr.reshape((len(intp_irr),) + irr.shape[1:])
 
     @staticmethod
     def get_name():
@@ -0,0 +1,153 @@
+"""
+Tests for InterpolationTimeLinear classes
+"""
+
+import unittest
+import numpy as np
+import scipy.interpolate
+from hypernets_processor.version import __version__
+from hypernets_processor.interpolation.measurement_functions.interpolate_time_linear import (
+    InterpolationTimeLinear,
+)
+from hypernets_processor.interpolation.measurement_functions.interpolate_time_linear_coscorrected import (
+    InterpolationTimeLinearCoscorrected,
+)
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def interpolate_time_loop(output_time, input_time, values):
+    """
+    Reference time interpolation, looping over output times with interp1d, as done by
+    InterpolationTimeLinear prior to vectorisation
+    """
+
+    out = np.empty((len(values), len(output_time)))
+    for i in range(len(output_time)):
+        if output_time[i] >= np.max(input_time):
+            out[:, i] = np.mean(values[:, input_time == np.max(input_time)], axis=1)
+        elif output_time[i] <= np.min(input_time):
+            out[:, i] = np.mean(values[:, input_time == np.min(input_time)], axis=1)
+        else:
+            out[:, i] = scipy.interpolate.interp1d(input_time, values)(output_time[i])
+    return out
+
+
+class TestInterpolationTimeLinear(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        # unsorted input times, with repeated first and last times
+        self.input_time = np.array(
+            [1622019920, 1622019800, 1622019860, 1622019920, 1622019800, 1622019830]
+        )
+        self.output_time = np.array(
+            [
+                1622019700,
+                1622019800,
+                1622019815,
+                1622019830,
+                1622019900,
+                1622019920,
+                1622020000,
+            ]
+        )
+        self.values = rng.random((5, len(self.input_time)))
+
+    def test_meas_function(self):
+        intp = InterpolationTimeLinear()
+
+        np.testing.assert_array_equal(
+            intp.meas_function(self.output_time, self.input_time, self.values),
+            interpolate_time_loop(self.output_time, self.input_time, self.values),
+        )
+
+        # single output time
+        np.testing.assert_array_equal(
+            intp.meas_function(self.output_time[2], self.input_time, self.values),
+            scipy.interpolate.interp1d(self.input_time, self.values)(
+                self.output_time[2]
+            ),
+        )
+        np.testing.assert_array_equal(
+            intp.meas_function(self.output_time[-1:], self.input_time, self.values),
+            self.values[:, self.input_time == np.max(self.input_time)],
+        )
+
+    def test_meas_function_input_time_per_output(self):
+        input_time = np.stack(
+            [np.roll(self.input_time, i) for i in range(len(self.output_time))], axis=1
+        )
+        values = np.stack(
+            [np.roll(self.values, i, axis=1) for i in range(len(self.output_time))],
+            axis=2,
+        )
+
+        out = InterpolationTimeLinear().meas_function(
+            self.output_time, input_time, values
+        )
+
+        self.assertEqual(out.shape, (5, len(self.output_time)))
+        for i in range(len(self.output_time)):
+            time_i = input_time[:, i]
+            if self.output_time[i] >= np.max(time_i):
+                expected = values[:, np.argmax(time_i == np.max(time_i)), i]
+            elif self.output_time[i] <= np.min(time_i):
+                expected = values[:, np.argmax(time_i == np.min(time_i)), i]
+            else:
+                expected = scipy.interpolate.interp1d(time_i, values[:, :, i])(
+                    self.output_time[i]
+                )
+            np.testing.assert_array_equal(out[:, i], expected)
+
+    def test_meas_function_mc(self):
+        rng = np.random.default_rng(2)
+        n_mc = 4
+        input_sza = np.linspace(30, 40, len(self.input_time))
+        output_sza = np.linspace(29, 41, len(self.output_time))
+        values = rng.random((5, len(self.input_time), n_mc))
+
+        intp = InterpolationTimeLinearCoscorrected()
+        for input_time in [
+            np.repeat(self.input_time[:, None], n_mc, axis=1),
+            self.input_time[:, None]
+            + rng.integers(-20, 20, (len(self.input_time), n_mc)),
+        ]:
+            out = intp.meas_function(
+                np.repeat(self.output_time[:, None], n_mc, axis=1),
+                input_time,
+                values,
+                np.repeat(output_sza[:, None], n_mc, axis=1),
+                np.repeat(input_sza[:, None], n_mc, axis=1),
+            )
+
+            for i in range(n_mc):
+                np.testing.assert_array_equal(
+                    out[..., i],
+                    intp.meas_function(
+                        self.output_time,
+                        input_time[:, i],
+                        values[..., i],
+                        output_sza,
+                        input_sza,
+                    ),
+                )
+                np.testing.assert_allclose(
+                    out[..., i],
+                    interpolate_time_loop(
+                        self.output_time,
+                        input_time[:, i],
+                        values[..., i] / np.cos(np.pi / 180.0 * input_sza),
+                    )
+                    * np.cos(np.pi / 180.0 * output_sza),
+                    rtol=1e-12,
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
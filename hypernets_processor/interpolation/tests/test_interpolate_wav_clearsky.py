@@ -0,0 +1,111 @@
+"""
+Tests for InterpolationWavClearSky class
+"""
+
+import unittest
+import os
+import numpy as np
+import xarray as xr
+import comet_maths as cm
+import matheo.band_integration as bi
+from matheo.utils.function_def import f_gaussian
+from hypernets_processor.version import __version__
+from hypernets_processor.interpolation.measurement_functions.interpolate_wav_clearsky import (
+    InterpolationWavClearSky,
+)
+from hypernets_processor.data_utils.clear_sky import CLEAR_SKY_REFERENCES, refdat_path
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def clear_sky_interpolation(irr_wavs, irr, network="w", ref_sza=40):
+    """
+    Reference clear-sky interpolation, as done by InterpolationWavClearSky prior to
+    band integration kernels
+    """
+    clear_sky = xr.open_dataset(
+        os.path.join(
+            refdat_path,
+            "solar_irradiance_hypernets_sza%s_highres_%s.nc" % (ref_sza, network),
+        )
+    )
+    wavs = clear_sky["wavelength"].values
+    boa = clear_sky["solar_irradiance_BOA"].values
+
+    bandwidth = np.where(irr_wavs < 1000, 3.0, 10.0)
+    r_pixel_irrs = np.array(
+        [f_gaussian(wavs, c, w) for c, w in zip(irr_wavs, bandwidth)]
+    )
+    corr_irrs = bi.band_int(d=boa, x=wavs, r=r_pixel_irrs, x_r=wavs) - cm.interpolate_1d(
+        wavs, boa, irr_wavs
+    )
+
+    intp_highres = np.empty((len(wavs), irr.shape[1]))
+    for i in range(irr.shape[1]):
+        intp_highres[:, i] = cm.interpolate_1d_along_example(
+            irr_wavs, irr[:, i] - corr_irrs, wavs, boa, wavs, relative=False
+        )
+
+    return bi.band_int(d=intp_highres, x=wavs, r=r_pixel_irrs, x_r=wavs)
+
+
+class TestInterpolationWavClearSky(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.irr_wavs = np.sort(rng.uniform(400, 1600, 30))
+        self.irr = (
+            np.interp(self.irr_wavs, [400, 700, 1600], [1.2, 1.6, 0.3])[:, None]
+            * rng.uniform(0.9, 1.1, (30, 3))
+        )
+        CLEAR_SKY_REFERENCES.clear()
+
+    def tearDown(self):
+        CLEAR_SKY_REFERENCES.clear()
+
+    def test_meas_function(self):
+        mf = InterpolationWavClearSky.__new__(InterpolationWavClearSky)
+        mf.setup(np.array([38.0, 42.0]), "w", self.irr_wavs)
+        self.assertEqual(len(CLEAR_SKY_REFERENCES), 1)
+
+        expected = clear_sky_interpolation(self.irr_wavs, self.irr)
+
+        np.testing.assert_allclose(
+            mf.meas_function(None, self.irr_wavs, self.irr), expected, rtol=1e-8
+        )
+        np.testing.assert_allclose(
+            mf.meas_function(None, self.irr_wavs, self.irr[:, 1]),
+            expected[:, 1],
+            rtol=1e-8,
+        )
+
+        # MC samples stacked along last dimension
+        mc_irr = np.stack([self.irr, 2 * self.irr], axis=-1)
+        mc_irr_wavs = np.stack([self.irr_wavs, self.irr_wavs], axis=-1)
+        mc_intp = mf.meas_function(None, mc_irr_wavs, mc_irr)
+        self.assertEqual(mc_intp.shape, (30, 3, 2))
+        np.testing.assert_allclose(mc_intp[:, :, 0], expected, rtol=1e-8)
+
+        # non-finite irradiances are only propagated to nearby wavelengths
+        irr = self.irr.copy()
+        irr[5, 0] = np.nan
+        intp = mf.meas_function(None, self.irr_wavs, irr)
+        np.testing.assert_array_equal(
+            np.isnan(intp), np.isnan(clear_sky_interpolation(self.irr_wavs, irr))
+        )
+        np.testing.assert_allclose(intp[:, 1:], expected[:, 1:], rtol=1e-8)
+
+        # reference is reused
+        mf2 = InterpolationWavClearSky.__new__(InterpolationWavClearSky)
+        mf2.setup(np.array([35.0]), "w", self.irr_wavs.copy())
+        self.assertEqual(len(CLEAR_SKY_REFERENCES), 1)
+        self.assertIs(mf2.irr_kernel, mf.irr_kernel)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,343 @@
+"""
+Main function to merge sqlite databases of the same format, e.g. the archive, anomaly or
+metadata databases of different sites or processing jobs
+"""
+
+from hypernets_processor.version import __version__
+import os
+import sqlite3
+
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+# columns identifying rows of tables, rows of input databases with the key of a row in
+# the output database are not merged. Rows of other tables are merged if not identical to
+# a row in the output database.
+MERGE_KEYS = {"products": ["site_id", "sequence_name", "product_level"]}
+
+# number of input databases merged per transaction, below the sqlite default limit of
+# 10 attached databases
+MAX_ATTACHED = 8
+
+
+def main(output_path, input_paths, db_format=None):
+    """
+    Main function to merge databases. Merging is idempotent, so may be rerun with the
+    same or additional input databases.
+
+    :type output_path: str
+    :param output_path: path (or sqlite url) of database to merge into, created if it
+    does not exist
+
+    :type input_paths: list
+    :param input_paths: paths (or sqlite urls) of databases to merge
+
+    :type db_format: str
+    :param db_format: (optional) database format of output database if created (one of
+    "archive", "anomaly" or "metadata"), if omitted determined from input database tables
+
+    :return: number of rows merged into each table
+    :rtype: dict
+    """
+
+    output_path = sqlite_path(output_path)
+    input_paths = [sqlite_path(input_path) for input_path in input_paths]
+
+    for input_path in input_paths:
+        if not os.path.exists(input_path):
+            raise FileNotFoundError("No database at " + input_path)
+
+    if not os.path.exists(output_path):
+        create_output_db(output_path, input_paths, db_format)
+
+    merged = {}
+    connection = sqlite3.connect(output_path, isolation_level=None)
+    try:
+        for i in range(0, len(input_paths), MAX_ATTACHED):
+            merge_databases(connection, input_paths[i : i + MAX_ATTACHED], merged)
+    finally:
+        connection.close()
+
+    return merged
+
+
+def sqlite_path(url):
+    """
+    Returns path of sqlite database
+
+    :type url: str
+    :param url: database path or sqlite url
+
+    :return: database path
+    :rtype: str
+    """
+
+    if url.startswith("sqlite:///"):
+        return url[len("sqlite:///") :]
+    return url
+
+
+def quote(name):
+    """
+    Returns quoted sql identifier
+
+    :type name: str
+    :param name: table or column name
+
+    :return: quoted name
+    :rtype: str
+    """
+
+    return '"' + name.replace('"', '""') + '"'
+
+
+def return_table_names(cursor, schema="main"):
+    """
+    Returns names and sql definition of tables of attached database
+
+    :type cursor: sqlite3.Cursor
+    :param cursor: database cursor
+
+    :type schema: str
+    :param schema: (optional) name of attached database (default: "main")
+
+    :return: table names and sql definitions
+    :rtype: list
+    """
+
+    return cursor.execute(
+        "SELECT name, sql FROM %s.sqlite_master WHERE type = 'table' "
+        "AND name NOT LIKE 'sqlite_%%' ORDER BY name" % quote(schema)
+    ).fetchall()
+
+
+def return_table_columns(cursor, table_name, schema="main"):
+    """
+    Returns columns of table of attached database
+
+    :type cursor: sqlite3.Cursor
+    :param cursor: database cursor
+
+    :type table_name: str
+    :param table_name: table name
+
+    :type schema: str
+    :param schema: (optional) name of attached database (default: "main")
+
+    :return: column names, types and if part of primary key
+    :rtype: list
+    """
+
+    return [
+        (row[1], row[2], row[5] > 0)
+        for row in cursor.execute(
+            "PRAGMA %s.table_info(%s)" % (quote(schema), quote(table_name))
+        )
+    ]
+
+
+def has_index(cursor, table_name, columns):
+    """
+    Returns True if output database table has an index starting with given columns
+
+    :type cursor: sqlite3.Cursor
+    :param cursor: database cursor
+
+    :type table_name: str
+    :param table_name: table name
+
+    :type columns: list
+    :param columns: column names
+
+    :rtype: bool
+    """
+
+    for index in cursor.execute("PRAGMA index_list(%s)" % quote(table_name)).fetchall():
+        index_columns = [
+            row[2]
+            for row in cursor.execute("PRAGMA index_info(%s)" % quote(index[1]))
+        ]
+        if index_columns[: len(columns)] == list(columns):
+            return True
+    return False
+
+
+def create_output_db(output_path, input_paths, db_format=None):
+    """
+    Creates output database with schema of database format
+
+    :type output_path: str
+    :param output_path: path of database to create
+
+    :type input_paths: list
+    :param input_paths: paths of databases to merge, to determine database format from
+    if not defined
+
+    :type db_format: str
+    :param db_format: (optional) database format
+    """
+
+    from hypernets_processor.data_io.database_util import create_template_db
+    from hypernets_processor.data_io.format.databases import DB_DICT_DEFS
+
+    if (db_format is None) and (len(input_paths) > 0):
+        connection = sqlite3.connect(input_paths[0])
+        table_names = [name for name, sql in return_table_names(connection.cursor())]
+        connection.close()
+
+        db_format = "metadata"
+        for db_format_i, schema_dict in DB_DICT_DEFS.items():
+            if set(schema_dict.keys()) == set(table_names):
+                db_format = db_format_i
+
+    directory = os.path.dirname(output_path)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+
+    db = create_template_db(
+        "sqlite:///" + output_path, schema_dict=DB_DICT_DEFS[db_format]
+    )
+    db.close()
+
+
+def merge_databases(connection, input_paths, merged):
+    """
+    Merges input databases into output database in one transaction
+
+    :type connection: sqlite3.Connection
+    :param connection: output database connection, in autocommit mode
+
+    :type input_paths: list
+    :param input_paths: paths of input databases (no more than MAX_ATTACHED)
+
+    :type merged: dict
+    :param merged: number of rows merged into each table, updated with merged rows
+    """
+
+    cursor = connection.cursor()
+
+    schemas = []
+    for i, input_path in enumerate(input_paths):
+        schemas.append("input" + str(i))
+        cursor.execute("ATTACH DATABASE ? AS %s" % schemas[-1], (input_path,))
+
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for schema in schemas:
+                for table_name, sql in return_table_names(cursor, schema):
+                    n_rows = merge_table(cursor, schema, table_name, sql)
+                    merged[table_name] = merged.get(table_name, 0) + n_rows
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+    finally:
+        for schema in schemas:
+            cursor.execute("DETACH DATABASE %s" % schema)
+
+
+def merge_table(cursor, schema, table_name, sql):
+    """
+    Merges rows of table of attached input database into output database table, with
+    new ids. Rows with the key of a row of the output table are not merged, and of rows
+    of the input table with the same key only the last is merged.
+
+    :type cursor: sqlite3.Cursor
+    :param cursor: database cursor
+
+    :type schema: str
+    :param schema: name of attached input database
+
+    :type table_name: str
+    :param table_name: table name
+
+    :type sql: str
+    :param sql: sql definition of input table, to create output table if it does not
+    exist
+
+    :return: number of merged rows
+    :rtype: int
+    """
+
+    table = quote(table_name)
+
+    output_columns = return_table_columns(cursor, table_name)
+    if len(output_columns) == 0:
+        cursor.execute(sql)
+        output_columns = return_table_columns(cursor, table_name)
+
+    # add columns missing from output table (e.g. added to input table on insert)
+    output_column_names = [name for name, dtype, pk in output_columns]
+    input_columns = return_table_columns(cursor, table_name, schema)
+    for name, dtype, pk in input_columns:
+        if name not in output_column_names:
+            cursor.execute(
+                "ALTER TABLE %s ADD COLUMN %s %s" % (table, quote(name), dtype)
+            )
+
+    # integer primary keys are reassigned by the output table
+    primary_key = [(name, dtype) for name, dtype, pk in output_columns if pk]
+    remapped = []
+    if (len(primary_key) == 1) and ("INT" in primary_key[0][1].upper()):
+        remapped = [primary_key[0][0]]
+
+    columns = [name for name, dtype, pk in input_columns if name not in remapped]
+    if len(columns) == 0:
+        return 0
+    column_list = ", ".join(quote(name) for name in columns)
+
+    key = MERGE_KEYS.get(table_name)
+    if (key is not None) and all(name in columns for name in key):
+        if not has_index(cursor, table_name, key):
+            cursor.execute(
+                "CREATE INDEX %s ON %s (%s)"
+                % (
+                    quote("ix_" + table_name + "_merge_key"),
+                    table,
+                    ", ".join(quote(name) for name in key),
+                )
+            )
+
+        key_list = ", ".join(quote(name) for name in key)
+        key_match = " AND ".join(
+            "m.%s IS s.%s" % (quote(name), quote(name)) for name in key
+        )
+        cursor.execute(
+            "INSERT INTO main.%s (%s) SELECT %s FROM %s.%s AS s "
+            "WHERE s.rowid IN (SELECT MAX(rowid) FROM %s.%s GROUP BY %s) "
+            "AND NOT EXISTS (SELECT 1 FROM main.%s AS m WHERE %s) "
+            "ORDER BY s.rowid"
+            % (
+                table,
+                column_list,
+                ", ".join("s." + quote(name) for name in columns),
+                schema,
+                table,
+                schema,
+                table,
+                key_list,
+                table,
+                key_match,
+            )
+        )
+
+    else:
+        cursor.execute(
+            "INSERT INTO main.%s (%s) SELECT %s FROM %s.%s EXCEPT SELECT %s FROM main.%s"
+            % (table, column_list, column_list, schema, table, column_list, table)
+        )
+
+    return cursor.rowcount
+
+
+if __name__ == "__main__":
+    pass
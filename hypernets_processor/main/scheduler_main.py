@@ -7,10 +7,17 @@ from hypernets_processor.utils.config import read_config_file, read_jobs_list
 from hypernets_processor.utils.logging import configure_logging
 from hypernets_processor.utils.config import get_config_value, JOBS_FILE_PATH
 from hypernets_processor import Scheduler
-from hypernets_processor.main.sequence_processor_main import main as processor_main
-
-import numpy as np
-from multiprocessing import Pool
+from hypernets_processor.scheduler import SequenceScheduler, return_pool_workers
+from hypernets_processor.context import Context
+from hypernets_processor.main import sequence_processor_main
+from hypernets_processor.main.sequence_processor_main import (
+    main as processor_main,
+    get_target_sequences,
+    defer_database_writes,
+    flush_databases,
+)
+from hypernets_processor.data_io.format.databases import DB_DICT_DEFS
+from collections import OrderedDict
 
 """___Authorship___"""
 __author__ = "Sam Hunt"
@@ -35,7 +42,9 @@ def unpack_scheduler_config(scheduler_config):
     * minutes (int) - Scheduled job repeat interval in minutes, default None (if not None seconds and hours are None)
     * hours (int) - Scheduled job repeat interval in hour, default None (if not None seconds and minutes are None)
     * start_time (datetime.datetime) - Scheduled time to start running tasks, default None (means start now)
-    * parallel (bool) - Switch to run scheduled jobs on different threads, default False
+    * parallel (bool) - Switch to process the sequences of scheduled jobs on a shared pool of worker processes, default False
+    * max_workers (int) - Maximum number of worker processes if parallel, default None (one per core)
+    * worker_memory (float) - Memory required per worker process in GB if parallel (processing sequences of up to WORKER_JOBS_SIZE jobs), to limit number of worker processes to available memory, default None (not limited)
     * jobs_list (str) - Path of jobs list file, to run on schedule
 
     """
@@ -65,6 +74,12 @@ def unpack_scheduler_config(scheduler_config):
         scheduler_config_dict[sch]["parallel"] = get_config_value(
             scheduler_config, sch, "parallel", dtype=bool
         )
+        scheduler_config_dict[sch]["max_workers"] = get_config_value(
+            scheduler_config, sch, "max_workers", dtype=int
+        )
+        scheduler_config_dict[sch]["worker_memory"] = get_config_value(
+            scheduler_config, sch, "worker_memory", dtype=float
+        )
 
         # Use custom jobs list provided, else use default
         scheduler_config_dict[sch]["jobs_list"] = get_config_value(
@@ -91,6 +106,187 @@ def unpack_scheduler_config(scheduler_config):
     return scheduler_config_dict
 
 
+# number of jobs each scheduler worker process keeps the context and sequence processor
+# (with their database connections and caches) of, least recently used first evicted -
+# worker_memory must cover this many jobs
+WORKER_JOBS_SIZE = 2
+
+# processor and job configuration of each job, and context and sequence processor of
+# most recently processed jobs, of scheduler worker process, set by
+# init_scheduler_worker
+worker_job_configs = {}
+worker_jobs = OrderedDict()
+
+
+def init_scheduler_worker(job_configs):
+    """
+    Initialises worker process of parallel scheduler. The context of a job is set up
+    when processing its first sequence, as by sequence_processor_main.init_worker, and
+    kept for up to WORKER_JOBS_SIZE jobs.
+
+    :type job_configs: dict
+    :param job_configs: processor and job configuration of each job, by job name
+    """
+
+    worker_job_configs.clear()
+    worker_job_configs.update(job_configs)
+    worker_jobs.clear()
+
+
+def run_job_sequence(job_name, target_sequence):
+    """
+    Runs sequence processing of job in worker process initialised by
+    init_scheduler_worker
+
+    :type job_name: str
+    :param job_name: job name
+
+    :type target_sequence: str
+    :param target_sequence: sequence path
+
+    :return: target sequence, success (1 or 0), deferred database rows for each database
+    format
+    :rtype: tuple
+    """
+
+    if job_name in worker_jobs:
+        worker_jobs.move_to_end(job_name)
+
+    else:
+        while len(worker_jobs) >= WORKER_JOBS_SIZE:
+            close_databases(worker_jobs.popitem(last=False)[1][0])
+
+        processor_config, job_config = worker_job_configs[job_name]
+        sequence_processor_main.init_worker(
+            processor_config, job_config, True, job_name
+        )
+        worker_jobs[job_name] = (
+            sequence_processor_main.worker_context,
+            sequence_processor_main.worker_processor,
+        )
+
+    (
+        sequence_processor_main.worker_context,
+        sequence_processor_main.worker_processor,
+    ) = worker_jobs[job_name]
+
+    return sequence_processor_main.run_sequence_worker(target_sequence)
+
+
+def close_databases(context):
+    """
+    Closes database connections of context, once no longer used
+
+    :type context: hypernets_processor.context.Context
+    :param context: processor context
+    """
+
+    for db_fmt in DB_DICT_DEFS.keys():
+        db = getattr(context, db_fmt + "_db")
+        if db is not None:
+            db.close()
+
+
+class ScheduledJob:
+    """
+    Class for job of parallel scheduler, finding the sequences to process and writing
+    the database rows of processed sequences on the scheduler process (see
+    hypernets_processor.scheduler.SequenceScheduler)
+
+    :type name: str
+    :param name: job name
+
+    :type processor_config: configparser.RawConfigParser
+    :param processor_config: processor configuration
+
+    :type job_config: configparser.RawConfigParser
+    :param job_config: job configuration
+    """
+
+    def __init__(self, name, processor_config, job_config):
+        """
+        Initialises class
+        """
+
+        self.name = name
+        self.logger = configure_logging(config=job_config, name=name)
+        self.context = Context(
+            processor_config=processor_config, job_config=job_config, logger=self.logger
+        )
+        self.context.set_config_value("to_archive", True)
+        self.context.freeze_config()
+        defer_database_writes(self.context)
+
+        commit_sequences = self.context.get_config_value("db_commit_sequences")
+        self.commit_sequences = (
+            1 if commit_sequences is None else max(commit_sequences, 1)
+        )
+
+        self.n_sequences = 0
+        self.n_success = 0
+
+    def find_sequences(self):
+        """
+        Returns paths of sequences to process
+
+        :return: sequence paths
+        :rtype: list
+        """
+
+        self.n_sequences = 0
+        self.n_success = 0
+        try:
+            target_sequences = get_target_sequences(self.context, True)
+        finally:
+            flush_databases(self.context)
+
+        return target_sequences
+
+    def completed(self, target_sequence, result):
+        """
+        Writes database rows of processed sequence, committed every db_commit_sequences
+        sequences
+
+        :type target_sequence: str
+        :param target_sequence: sequence path
+
+        :param result: return value of run_job_sequence, or exception raised
+        """
+
+        self.n_sequences += 1
+
+        if isinstance(result, Exception):
+            self.logger.error(target_sequence + " Failed: " + repr(result))
+
+        else:
+            target_sequence, success, rows = result
+            self.n_success += success
+            for db_fmt, db_rows in rows.items():
+                db = getattr(self.context, db_fmt + "_db")
+                if db is not None:
+                    for table_name, row in db_rows:
+                        db.insert_row(table_name, row)
+
+        if self.n_sequences % self.commit_sequences == 0:
+            flush_databases(self.context)
+
+    def finished(self):
+        """
+        Writes remaining database rows and logs result of job run
+        """
+
+        flush_databases(self.context)
+
+        if self.n_sequences == 0:
+            msg = "No sequences to process"
+        else:
+            msg = "%s/%s sequences successfully processed" % (
+                self.n_success,
+                self.n_sequences,
+            )
+        self.logger.info("Completed: " + self.name + " (" + msg + ")")
+
+
 def main(scheduler_config, processor_config):
     """
     Main function to schedule automated hypernets_processor jobs
@@ -111,7 +307,8 @@ def main(scheduler_config, processor_config):
     # schedule jobs
     processor_sch = Scheduler(logger=logger)
 
-    inputs = np.empty(len(jobs_list), dtype=object)
+    # processor and job configuration of each job, by job name, if parallel
+    inputs = {}
 
     for ij, job_config_path in enumerate(jobs_list):
 
@@ -149,7 +346,13 @@ def main(scheduler_config, processor_config):
                 "anomaly_db_url"
             ].replace(".db", "_" + job_config["Job"]["site_id"] + ".db")
 
-            inputs[ij] = (processor_config, job_config, True)
+            # jobs are identified by name on the worker processes
+            if scheduler_job_config["name"] in inputs:
+                raise ValueError(
+                    "Job name %s of %s is already used by another job of jobs list"
+                    % (scheduler_job_config["name"], job_config_path)
+                )
+            inputs[scheduler_job_config["name"]] = (processor_config, job_config)
 
         else:
             # schedule job
@@ -162,15 +365,35 @@ def main(scheduler_config, processor_config):
             )
 
     if scheduler_job_config["parallel"]:
-        pool = Pool(len(jobs_list))
-        outs = pool.starmap(processor_main, inputs)
+        # sequences of all jobs are processed on one pool of worker processes
+        workers = return_pool_workers(
+            scheduler_config["Processor Schedule"]["max_workers"],
+            scheduler_config["Processor Schedule"]["worker_memory"],
+        )
+        logger.info("Processing sequences with %s worker processes" % workers)
+
+        processor_sch = SequenceScheduler(
+            run_job_sequence,
+            workers,
+            initializer=init_scheduler_worker,
+            initargs=(inputs,),
+            logger=logger,
+        )
+
+        for name, configs in inputs.items():
+            job = ScheduledJob(name, *configs)
+            processor_sch.add_job(
+                name,
+                job.find_sequences,
+                completed=job.completed,
+                finished=job.finished,
+                seconds=scheduler_job_config["seconds"],
+                minutes=scheduler_job_config["minutes"],
+                hours=scheduler_job_config["hours"],
+            )
 
-        for i in range(len(jobs_list)):
-            log_msg = "Completed: " + jobs_list[i]
-            if type(outs[i]) == str:
-                log_msg += " (" + outs[i] + ")"
+        processor_sch.run()
 
-            logger.info(log_msg)
     else:
         # run scheduled jobs
         processor_sch.run(
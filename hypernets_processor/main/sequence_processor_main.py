@@ -1,14 +1,15 @@
 """
 Module with main to run sequence file processing chain
 """
-import datetime
 
 from hypernets_processor.version import __version__
 from hypernets_processor.utils.config import read_config_file
 from hypernets_processor.utils.logging import configure_logging
-from hypernets_processor.utils.paths import parse_sequence_path
 from hypernets_processor.context import Context
 from hypernets_processor.sequence_processor import SequenceProcessor
+from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
+from hypernets_processor.data_io.sequence_discovery import SequenceDiscovery
+from hypernets_processor.data_io.format.databases import DB_DICT_DEFS
 import os
 import traceback
 import cProfile, pstats
@@ -16,7 +17,6 @@ from itertools import repeat
 import numpy as np
 from multiprocessing import Pool
 import gc
-import glob
 
 """___Authorship___"""
 __author__ = "Sam Hunt"
@@ -30,105 +30,68 @@ __status__ = "Development"
 def get_target_sequences(context, to_archive):
     """
     Returns paths of sequences to process, checking against previous archived data if
-    adding to archive
+    adding to archive. Searches are incremental, see SequenceDiscovery.
 
     :type context: hypernets_processor.context.Context
     :param context: processor context
 
     :type to_archive: bool
     :param to_archive: switch for if to add processed data to data archive
+
+    :return: sequence paths
+    :rtype: list
     """
 
-    # Find potential sequence paths to process
-    # raw_data_directory may either be a sequence path or directory of sequence paths
-
-    raw_paths = []
-    incomplete_downloads = []
-
-    if parse_sequence_path(context.get_config_value("raw_data_directory")) is not None:
-        raw_paths.append(context.get_config_value("raw_data_directory"))
-    else:
-        #first add SEQ paths in raw_data_directory
-        paths=os.listdir(context.get_config_value("raw_data_directory"))
-        #then add paths in raw_data_directory/YYYY/mm/DD/SEQ*
-        paths.extend(glob.glob(
-                os.path.join(context.get_config_value("raw_data_directory"), "20*","*","*","SEQ*")
-            ))
-
-        for path in paths:
-            if parse_sequence_path(path, context) is not None:
-                sequence_path = os.path.join(context.get_config_value("raw_data_directory"), path)
-                if os.path.exists(os.path.join(sequence_path, "metadata.txt")):
-                    raw_paths.append(sequence_path)
-                else:
-                    incomplete_downloads.append(sequence_path)
-
-    # If adding to archive, remove previously processed paths from list by referencing
-    # archive db
-    if to_archive is True:
-        if context.archive_db is None:
-            raise ValueError("archive db has not been set!")
-
-        processed_products = [
-            product["sequence_name"]
-            for product in context.archive_db["products"].find(
-                site_id=context.get_config_value("site_id")
-            )
-            if "L2A" in product["product_level"]
-        ]
+    return SequenceDiscovery(context).target_sequences(to_archive)
+
+
+def defer_database_writes(context):
+    """
+    Sets databases of context to hold written rows in memory, until written with
+    flush_databases
+
+    :type context: hypernets_processor.context.Context
+    :param context: processor context
+    """
+
+    for db_fmt in DB_DICT_DEFS.keys():
+        db = getattr(context, db_fmt + "_db")
+        if db is not None:
+            db.defer_writes()
+
+
+def flush_databases(context):
+    """
+    Writes rows held in memory by databases of context, in one transaction per database
+
+    :type context: hypernets_processor.context.Context
+    :param context: processor context
+    """
+
+    for db_fmt in DB_DICT_DEFS.keys():
+        db = getattr(context, db_fmt + "_db")
+        if db is not None:
+            db.flush()
+
+
+def run_sequence(inputs, sp=None):
+    """
+    Runs sequence processing for target sequence
+
+    :type inputs: tuple
+    :param inputs: target sequence path, processor context, logger
+
+    :type sp: hypernets_processor.sequence_processor.SequenceProcessor
+    :param sp: (optional) sequence processor, to reuse its processing components for
+    the sequences of a job (default: new sequence processor)
+
+    :return: success (1 or 0)
+    :rtype: int
+    """
 
-        failed_products = [
-            anomaly["sequence_name"]
-            for anomaly in context.anomaly_db["anomalies"].find(
-                site_id=context.get_config_value("site_id")
-            )
-            if anomaly["anomaly_id"] != "m"
-        ]
-
-        complete_products = processed_products + failed_products
-
-        raw_products = [os.path.basename(raw_path) for raw_path in raw_paths]
-        raw_products = list(set(raw_products) - set(complete_products))
-
-        paths_to_process = []
-        for i in range(len(raw_paths)):
-            raw_product = os.path.basename(raw_paths[i])
-            raw_product_datetime = parse_sequence_path(raw_product)["datetime"]
-            if raw_product in raw_products:
-                if context.get_config_value("delay_hours") is not None and np.abs(
-                        raw_product_datetime - datetime.datetime.now()) < datetime.timedelta(
-                        hours=context.get_config_value("delay_hours")):
-                    print("%s is not processed yet due to not having reached required delay (%s hours)" % (
-                    raw_product, context.get_config_value("delay_hours")))
-                else:
-                    paths_to_process.append(raw_paths[i])
-
-        #next, check if incompete downloads have already been added to anomaly db, and if not add them
-        incomplete_products = [
-            anomaly["sequence_name"]
-            for anomaly in context.anomaly_db["anomalies"].find(
-                site_id=context.get_config_value("site_id")
-            )
-            if anomaly["anomaly_id"] == "m"
-        ]
-
-        for incomplete_download_path in incomplete_downloads:
-            seq_id = os.path.basename(incomplete_download_path)
-            if not seq_id in incomplete_products:
-                context.set_config_value("time", parse_sequence_path(incomplete_download_path)["datetime"])
-                context.set_config_value("sequence_name", seq_id)
-                context.set_config_value("sequence_path", incomplete_download_path)
-                context.logger.error(
-                    "metadata.txt not found in directory %s, will try processing again later" % (incomplete_download_path))
-                context.anomaly_handler.anomaly_db.add_anomaly("m")
-
-        return paths_to_process
-    else:
-        return raw_paths
-
-def run_sequence(inputs):
     target_sequence, context, logger = inputs
-    sp = SequenceProcessor(context=context)
+    if sp is None:
+        sp = SequenceProcessor(context=context)
     context.logger.info("Processing sequence: " + target_sequence)
     try:
         # profiler = cProfile.Profile()
@@ -137,19 +100,32 @@ def run_sequence(inputs):
         # profiler.disable()
         # stats = pstats.Stats(profiler).sort_stats('tottime')
         # stats.print_stats(100)
+
+        # wait for products written in background, and add them to archive
+        HypernetsWriter(context).flush()
+
+        # sequence processed and archived, so checkpoints to resume from not needed
+        sp.checkpoints.evict()
+
         if context.anomaly_handler.anomalies_added is not []:
             context.logger.info(
                 "Processing Anomalies: " + str(context.anomaly_handler.anomalies_added)
             )
 
         context.logger.info(target_sequence + " Complete")
-        del sp
         gc.collect()
         return 1
 
     except Exception as e:
 
+        # products completed before failure are still written and archived
+        try:
+            HypernetsWriter(context).flush()
+        except Exception:
+            pass
+
         context.anomaly_handler.add_x_anomaly()
+        sp.checkpoints.fail()
         if context.anomaly_handler.anomalies_added is not []:
             context.logger.info(
                 "Processing Anomalies: " + str(context.anomaly_handler.anomalies_added)
@@ -157,11 +133,130 @@ def run_sequence(inputs):
 
         logger.error(target_sequence + "Failed: " + repr(e))
         logger.info(traceback.format_exc())
-        del sp
         gc.collect()
         return 0
 
 
+# context and sequence processor of sequence processing worker process, set by
+# init_worker
+worker_context = None
+worker_processor = None
+
+
+def init_worker(processor_config, job_config, to_archive, name):
+    """
+    Initialises worker process for parallel sequence processing, with its own logger,
+    context and database connections. Database writes are deferred, to be returned to
+    the main process by run_sequence_worker, so databases are only written by one process.
+
+    :type processor_config: configparser.RawConfigParser
+    :param processor_config: processor configuration
+
+    :type job_config: configparser.RawConfigParser
+    :param job_config: job configuration
+
+    :type to_archive: bool
+    :param to_archive: switch for if to add processed data to data archive
+
+    :type name: str
+    :param name: logger name
+    """
+
+    global worker_context, worker_processor
+
+    logger = configure_logging(config=job_config, name=name)
+    worker_context = Context(
+        processor_config=processor_config, job_config=job_config, logger=logger
+    )
+    worker_context.set_config_value("to_archive", to_archive)
+    worker_context.freeze_config()
+    worker_processor = SequenceProcessor(context=worker_context)
+
+    defer_database_writes(worker_context)
+
+
+def run_sequence_worker(target_sequence):
+    """
+    Runs sequence processing in worker process initialised by init_worker
+
+    :type target_sequence: str
+    :param target_sequence: sequence path
+
+    :return: target sequence, success (1 or 0), deferred database rows for each database format
+    :rtype: tuple
+    """
+
+    context = worker_context
+    context.anomaly_handler.anomalies_added = []
+
+    success = run_sequence((target_sequence, context, context.logger), worker_processor)
+
+    rows = {}
+    for db_fmt in DB_DICT_DEFS.keys():
+        db = getattr(context, db_fmt + "_db")
+        if db is not None:
+            rows[db_fmt] = db.pop_deferred_rows()
+
+    return target_sequence, success, rows
+
+
+def run_sequences_parallel(
+    target_sequences,
+    context,
+    processor_config,
+    job_config,
+    to_archive,
+    name,
+    workers,
+    commit_sequences=1,
+):
+    """
+    Runs sequence processing for target sequences on a pool of worker processes, writing
+    database rows returned by the workers to the databases of the main process context
+    (which must have deferred writes), committed every commit_sequences sequences
+
+    :type target_sequences: list
+    :param target_sequences: sequence paths
+
+    :type context: hypernets_processor.context.Context
+    :param context: processor context
+
+    :type workers: int
+    :param workers: number of worker processes
+
+    :type commit_sequences: int
+    :param commit_sequences: (optional) number of sequences to write database rows of
+    in each transaction (default: 1)
+
+    :return: success (1 or 0) for each target sequence
+    :rtype: numpy.ndarray
+    """
+
+    success = np.zeros(len(target_sequences), dtype=int)
+    index = {target_sequence: i for i, target_sequence in enumerate(target_sequences)}
+
+    with Pool(
+        processes=workers,
+        initializer=init_worker,
+        initargs=(processor_config, job_config, to_archive, name),
+    ) as pool:
+        for i, (target_sequence, success_i, rows) in enumerate(
+            pool.imap_unordered(run_sequence_worker, target_sequences)
+        ):
+            success[index[target_sequence]] = success_i
+
+            for db_fmt, db_rows in rows.items():
+                db = getattr(context, db_fmt + "_db")
+                if db is not None:
+                    for table_name, row in db_rows:
+                        db.insert_row(table_name, row)
+
+            if (i + 1) % commit_sequences == 0:
+                flush_databases(context)
+
+    return success
+
+
 def main(processor_config, job_config, to_archive, parallel=None):
     """
     Main function to run processing chain for sequence files
@@ -174,6 +269,10 @@ def main(processor_config, job_config, to_archive, parallel=None):
 
     :type to_archive: bool
     :param to_archive: switch for if to add processed data to data archive
+
+    :type parallel: int
+    :param parallel: (optional) number of worker processes to process sequences with, if omitted
+    taken from job config max_workers (default 1, serial processing)
     """
     # Configure logging
     name = __name__
@@ -188,27 +287,66 @@ def main(processor_config, job_config, to_archive, parallel=None):
     )
 
     context.set_config_value("to_archive", to_archive)
-    # Determine target sequences
-    target_sequences = get_target_sequences(context, to_archive)
-
-    # Run processor
-    target_sequences_total = len(target_sequences)
+    context.freeze_config()
 
-    if target_sequences_total == 0:
-        msg = "No sequences to process"
+    # Database rows are written in one transaction per commit_sequences sequences, and
+    # any rows not yet written are written before returning, also on failure
+    commit_sequences = context.get_config_value("db_commit_sequences")
+    commit_sequences = 1 if commit_sequences is None else max(commit_sequences, 1)
+    defer_database_writes(context)
 
-    else:
-        success = np.zeros_like(target_sequences, dtype=int)
+    try:
+        # Determine target sequences
+        target_sequences = get_target_sequences(context, to_archive)
+        flush_databases(context)
+
+        # Run processor
+        target_sequences_total = len(target_sequences)
+
+        if target_sequences_total == 0:
+            msg = "No sequences to process"
+
+        else:
+            workers = parallel
+            if workers is None:
+                workers = context.get_config_value("max_workers")
+            workers = (
+                1 if workers is None else min(int(workers), target_sequences_total)
+            )
 
-        for i, target_sequence in enumerate(target_sequences):
-            success[i] = run_sequence((target_sequence, context, logger))
+            if workers > 1:
+                logger.info("Processing sequences with %s worker processes" % workers)
+                success = run_sequences_parallel(
+                    target_sequences,
+                    context,
+                    processor_config,
+                    job_config,
+                    to_archive,
+                    name,
+                    workers,
+                    commit_sequences,
+                )
+
+            else:
+                success = np.zeros_like(target_sequences, dtype=int)
+
+                # processing components are built once, for all sequences
+                sp = SequenceProcessor(context=context)
+                for i, target_sequence in enumerate(target_sequences):
+                    success[i] = run_sequence((target_sequence, context, logger), sp)
+
+                    if (i + 1) % commit_sequences == 0:
+                        flush_databases(context)
+
+            msg = (
+                str(np.sum(success))
+                + "/"
+                + str(target_sequences_total)
+                + " sequences successfully processed"
+            )
 
-        msg = (
-            str(np.sum(success))
-            + "/"
-            + str(target_sequences_total)
-            + " sequences successfully processed"
-        )
+    finally:
+        flush_databases(context)
 
     return msg
 
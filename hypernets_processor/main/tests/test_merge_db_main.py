@@ -0,0 +1,178 @@
+"""
+Tests for merge_db_main module
+"""
+
+import unittest
+import os
+import shutil
+import sqlite3
+import tempfile
+import datetime
+from unittest.mock import patch
+from hypernets_processor.version import __version__
+from hypernets_processor.main import merge_db_main
+from hypernets_processor.main.merge_db_main import main
+from hypernets_processor.data_io.database_util import create_template_db
+from hypernets_processor.data_io.format.databases import DB_DICT_DEFS
+
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def setup_archive_db(path, site_id, sequence_names, product_levels=("L1A", "L2A")):
+    """
+    Creates archive database with products for sequences
+
+    :return: path
+    :rtype: str
+    """
+
+    db = create_template_db("sqlite:///" + path, schema_dict=DB_DICT_DEFS["archive"])
+    for sequence_name in sequence_names:
+        for product_level in product_levels:
+            db["products"].insert(
+                dict(
+                    product_name=site_id + "_" + sequence_name + "_" + product_level,
+                    sequence_name=sequence_name,
+                    site_id=site_id,
+                    product_level=product_level,
+                    datetime_SEQ=datetime.datetime.strptime(
+                        sequence_name[3:], "%Y%m%dT%H%M%S"
+                    ),
+                )
+            )
+    db.close()
+    return path
+
+
+def read_rows(path, table_name):
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    rows = [dict(row) for row in connection.execute("SELECT * FROM " + table_name)]
+    connection.close()
+    return rows
+
+
+class TestMergeDBMain(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_main_archive(self):
+        path_a = setup_archive_db(
+            os.path.join(self.tmpdir, "archive_AAAA.db"),
+            "AAAA",
+            ["SEQ20210401T100000", "SEQ20210401T110000"],
+        )
+        path_b = setup_archive_db(
+            os.path.join(self.tmpdir, "archive_BBBB.db"), "BBBB", ["SEQ20210401T100000"]
+        )
+        output_path = os.path.join(self.tmpdir, "out", "archive.db")
+
+        merged = main(output_path, [path_a, "sqlite:///" + path_b])
+
+        self.assertEqual(merged, {"products": 6})
+        products = read_rows(output_path, "products")
+        self.assertEqual([product["id"] for product in products], list(range(1, 7)))
+        self.assertEqual(
+            [product["product_name"] for product in products],
+            [product["product_name"] for product in read_rows(path_a, "products")]
+            + [product["product_name"] for product in read_rows(path_b, "products")],
+        )
+        self.assertEqual(products[0]["datetime_SEQ"], "2021-04-01 10:00:00.000000")
+
+        # merging again only adds new products
+        setup_archive_db(
+            os.path.join(self.tmpdir, "archive_AAAA_2.db"),
+            "AAAA",
+            ["SEQ20210401T110000", "SEQ20210402T100000"],
+        )
+        merged = main(
+            output_path, [path_a, path_b, os.path.join(self.tmpdir, "archive_AAAA_2.db")]
+        )
+
+        self.assertEqual(merged, {"products": 2})
+        self.assertEqual(len(read_rows(output_path, "products")), 8)
+
+    def test_main_anomaly(self):
+        input_path = os.path.join(self.tmpdir, "anomaly_AAAA.db")
+        db = create_template_db(
+            "sqlite:///" + input_path, schema_dict=DB_DICT_DEFS["anomaly"]
+        )
+        for anomaly_id, product_level_last in [
+            ("a", None),
+            ("nld", "L1A"),
+            ("nld", "L1B"),
+        ]:
+            db["anomalies"].insert(
+                dict(
+                    anomaly_id=anomaly_id,
+                    site_id="AAAA",
+                    sequence_name="SEQ20210401T100000",
+                    product_level_last=product_level_last,
+                    system_id="220241",
+                )
+            )
+        db.close()
+
+        output_path = os.path.join(self.tmpdir, "anomaly.db")
+        self.assertEqual(main(output_path, [input_path]), {"anomalies": 3})
+        self.assertEqual(main(output_path, [input_path]), {"anomalies": 0})
+
+        anomalies = read_rows(output_path, "anomalies")
+        self.assertEqual(
+            [anomaly["anomaly_id"] for anomaly in anomalies], ["a", "nld", "nld"]
+        )
+        self.assertEqual(anomalies[0]["system_id"], "220241")
+
+    @patch("hypernets_processor.main.merge_db_main.MAX_ATTACHED", 2)
+    def test_main_transaction(self):
+        input_paths = [
+            setup_archive_db(
+                os.path.join(self.tmpdir, "archive_%s.db" % site_id),
+                site_id,
+                ["SEQ20210401T100000"],
+            )
+            for site_id in ["AAAA", "BBBB", "CCCC"]
+        ]
+        output_path = os.path.join(self.tmpdir, "archive.db")
+
+        # no rows merged from databases of failed transaction, merged on rerun
+        connection = sqlite3.connect(input_paths[2])
+        connection.execute("CREATE TABLE products_old (id INTEGER PRIMARY KEY, x)")
+        connection.execute("INSERT INTO products_old (x) VALUES (1)")
+        connection.commit()
+        connection.close()
+
+        merge_table_ = merge_db_main.merge_table
+
+        def merge_table(cursor, schema, table_name, sql):
+            if table_name == "products_old":
+                raise sqlite3.OperationalError("disk I/O error")
+            return merge_table_(cursor, schema, table_name, sql)
+
+        with patch(
+            "hypernets_processor.main.merge_db_main.merge_table",
+            side_effect=merge_table,
+        ):
+            self.assertRaises(sqlite3.OperationalError, main, output_path, input_paths)
+
+        self.assertEqual(
+            [product["site_id"] for product in read_rows(output_path, "products")],
+            ["AAAA", "AAAA", "BBBB", "BBBB"],
+        )
+        self.assertEqual(
+            main(output_path, input_paths), {"products": 2, "products_old": 1}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,15 +3,23 @@ Tests for scheduler_main module
 """
 
 import unittest
-from unittest.mock import patch, call
+from unittest.mock import patch, call, MagicMock
 from hypernets_processor.version import __version__
-from hypernets_processor.main.scheduler_main import main, unpack_scheduler_config
+from hypernets_processor.main import scheduler_main, sequence_processor_main
+from hypernets_processor.main.scheduler_main import (
+    main,
+    unpack_scheduler_config,
+    init_scheduler_worker,
+    run_job_sequence,
+)
 from hypernets_processor.utils.config import JOBS_FILE_PATH
 from hypernets_processor.main.sequence_processor_main import main as hpmain
 from configparser import RawConfigParser
 import os
 import random
+import shutil
 import string
+import tempfile
 
 
 """___Authorship___"""
@@ -131,6 +139,8 @@ class TestHypernetsSchedulerMain(unittest.TestCase):
                 "hours": None,
                 "start_time": "2",
                 "parallel": False,
+                "max_workers": None,
+                "worker_memory": None,
                 "jobs_list": "path",
             }
         }
@@ -150,11 +160,65 @@ class TestHypernetsSchedulerMain(unittest.TestCase):
                 "hours": None,
                 "start_time": "2",
                 "parallel": False,
+                "max_workers": None,
+                "worker_memory": None,
                 "jobs_list": JOBS_FILE_PATH,
             }
         }
         self.assertDictEqual(expected_d, d)
 
+    @patch("hypernets_processor.main.scheduler_main.SequenceScheduler")
+    @patch("hypernets_processor.main.scheduler_main.configure_logging")
+    def test_main_parallel_duplicate_job_name(self, mock_log, mock_sched):
+        tmpdir = tempfile.mkdtemp()
+        sched_path, jobs_path, job_list = write_test_config_files(tmpdir)
+        for job_config_path in job_list:
+            with open(job_config_path, "w") as f:
+                f.write("[Job]\njob_name = site\nsite_id = SITE\n")
+
+        scheduler_config = create_scheduler_config()
+        scheduler_config["Processor Schedule"]["parallel"] = "True"
+        scheduler_config["Processor Schedule"]["jobs_list"] = jobs_path
+        processor_config = RawConfigParser()
+        processor_config["Databases"] = {
+            name: "sqlite:///" + name + ".db"
+            for name in ["metadata_db_url", "archive_db_url", "anomaly_db_url"]
+        }
+
+        with self.assertRaises(ValueError) as e:
+            main(scheduler_config, processor_config)
+        self.assertIn(job_list[1], str(e.exception))
+        mock_sched.assert_not_called()
+
+        shutil.rmtree(tmpdir)
+
+    @patch("hypernets_processor.main.sequence_processor_main.run_sequence_worker")
+    @patch("hypernets_processor.main.sequence_processor_main.init_worker")
+    def test_run_job_sequence(self, mock_init, mock_run):
+        contexts = {}
+
+        def init_worker(processor_config, job_config, to_archive, name):
+            contexts[name] = MagicMock()
+            sequence_processor_main.worker_context = contexts[name]
+            sequence_processor_main.worker_processor = name
+
+        mock_init.side_effect = init_worker
+        mock_run.side_effect = lambda target_sequence: (
+            sequence_processor_main.worker_processor
+        )
+        init_scheduler_worker({name: ("p", name + ".config") for name in "abc"})
+
+        processed = [run_job_sequence(name, "seq") for name in "abacab"]
+
+        # context of least recently used job closed above worker jobs size
+        self.assertEqual(processed, list("abacab"))
+        self.assertEqual([c.args[3] for c in mock_init.call_args_list], list("abcb"))
+        self.assertEqual(list(scheduler_main.worker_jobs), ["a", "b"])
+        contexts["b"].archive_db.close.assert_not_called()
+        contexts["c"].archive_db.close.assert_called_once()
+
+        init_scheduler_worker({})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -5,14 +5,8 @@ Tests for Calibrate class
 from hypernets_processor.version import __version__
 from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
 
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-
-plt.style.use("tableau-colorblind10")
-
 import numpy as np
+import functools
 import os.path
 import warnings
 from obsarray.templater.dataset_util import DatasetUtil
@@ -27,13 +21,28 @@ __email__ = "pieter.de.vis@npl.co.uk"
 __status__ = "Development"
 
 
+@functools.lru_cache(maxsize=None)
+def pyplot():
+    """
+    Returns matplotlib.pyplot, set up for plotting to file on first call (so matplotlib is
+    only imported when plots are made)
+
+    :return: matplotlib.pyplot module
+    """
+
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plt.style.use("tableau-colorblind10")
+    return plt
+
+
 class Plotting:
     def __init__(self, context, path=None, plot_format=None):
         self.context = context
-        if path is None:
-            self.path = HypernetsWriter(context).return_plot_directory()
-        else:
-            self.path = path
+        self._path = path
         try:
             self.fontsize = context.get_config_value("plot_fontsize")
             self.legendfontsize = context.get_config_value("plot_legendfontsize")
@@ -44,14 +53,30 @@ class Plotting:
             self.fontsize = 10
         if self.legendfontsize is None:
             self.legendfontsize = 8
-        if not os.path.exists(self.path):
-            os.makedirs(self.path)
         if plot_format is None:
             self.plot_format = context.get_config_value("plotting_format")
         else:
             self.plot_format = plot_format
         pass
 
+    @property
+    def path(self):
+        """
+        Returns plot directory, as specified or else determined from context for the
+        sequence being processed (so one instance can be used for many sequences)
+        """
+
+        path = self._path
+        if path is None:
+            path = HypernetsWriter(self.context).return_plot_directory()
+        if not os.path.exists(path):
+            os.makedirs(path)
+        return path
+
+    @path.setter
+    def path(self, path):
+        self._path = path
+
     def plot_variable(self, measurandstring, *args, **kwargs):
         try:
             if measurandstring == "radiance":
@@ -325,6 +350,7 @@ class Plotting:
             )
 
     def plot_correlation(self, measurandstring, dataset, refl=False):
+        plt = pyplot()
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             plotpath = os.path.join(
@@ -385,6 +411,7 @@ class Plotting:
         linecolour=None,
         ylim=None,
     ):
+        plt = pyplot()
         fig1, ax1 = plt.subplots(figsize=(10, 5))
         if labels is None:
             ax1.plot(xdata, ydata, alpha=0.3)
@@ -428,6 +455,7 @@ class Plotting:
         linecolour=None,
         ylim=None,
     ):
+        plt = pyplot()
         fig1, ax1 = plt.subplots(figsize=(10, 5))
         if labels is None:
             ax1.plot(xdata, ydata, alpha=0.3)
@@ -456,6 +484,7 @@ class Plotting:
         linecolour=None,
         ylim=None,
     ):
+        plt = pyplot()
         fig1, ax1 = plt.subplots(figsize=(10, 5))
         if labels is None:
             ax1.plot(xdata, ydata, alpha=0.3)
@@ -485,6 +514,7 @@ class Plotting:
         linecolour=None,
         ylim=None,
     ):
+        plt = pyplot()
         fig1, ax1 = plt.subplots(figsize=(10, 5))
         if labels is None:
             ax1.plot(xdata, ydata, alpha=0.3)
@@ -528,6 +558,7 @@ class Plotting:
         linestyles=None,
         linecolour=None,
     ):
+        plt = pyplot()
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             fig1, ax1 = plt.subplots(figsize=(10, 5))
@@ -627,6 +658,7 @@ class Plotting:
         )
 
     def plot_polar_reflectance(self, dataset, wavelength):
+        plt = pyplot()
         plotpath = os.path.join(
             self.path,
             "plot_polar_reflectance_"
@@ -3,12 +3,18 @@ import pyhdf
 from numpy import linspace
 import os, dateutil.parser
 import numpy as np
-import matplotlib.pyplot as plt
 import scipy
 from scipy import interpolate
 from datetime import datetime
 
 from hypernets_processor.rhymer.rhymer.shared.rhymer_shared import RhymerShared
+from hypernets_processor.utils.paths import atomic_write
+
+# site wind time series read in this process, by csv path, as (mtime, timestamps, wind)
+WIND_SERIES = {}
+
+# GDAS point extractions in this process, by (process, lon, lat, nowcast datetime)
+GDAS_POINTS = {}
 
 
 class RhymerAncillary:
@@ -22,25 +28,82 @@ class RhymerAncillary:
         self.context = context
 
     def ts_wind(self, isodate, siteid):
-        met_dir = self.context.get_config_value("met_dir")
-        file = "{}/{}_obpg.csv".format(met_dir, siteid)
-        print(file)
-        data = np.loadtxt(file, delimiter=",", skiprows=1, dtype=str)
-        dtime = [dateutil.parser.parse(d) for d in data[:, 0]]
-        tseries = [np.nan if d == "None" else float(d) for d in data[:, 1]]
         output_time = dateutil.parser.parse(isodate)
-        print(isodate)
-        tstime = [dtime[i].timestamp() for i in range(0, len(dtime))]
-        print(self.context.get_config_value("wind_default"))
-        if output_time.timestamp() > max(tstime):
-            out = float(self.context.get_config_value("wind_default"))
-        elif output_time.timestamp() < min(tstime):
-            out = float(self.context.get_config_value("wind_default"))
-        else:
-            intfunc = scipy.interpolate.interp1d(tstime, tseries)
-            out = intfunc(output_time.timestamp())
+        return self.ts_wind_series(np.array([output_time.timestamp()]), siteid)[0]
+
+    def ts_wind_series(self, timestamps, siteid):
+        """
+        Returns wind speed from site wind time series, interpolated to given times
+
+        :type timestamps: numpy.ndarray
+        :param timestamps: times, as timestamps of naive datetimes (as ts_wind)
+        :type siteid: str
+        :param siteid: site id
+        :return: wind speeds, default wind speed outside of time series
+        :rtype: numpy.ndarray
+        """
+
+        tstime, tseries = self.read_wind_series(siteid)
+
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        out = np.interp(timestamps, tstime, tseries)
+        out[(timestamps > tstime[-1]) | (timestamps < tstime[0])] = float(
+            self.context.get_config_value("wind_default")
+        )
         return out
 
+    def read_wind_series(self, siteid):
+        """
+        Returns site wind time series from {met_dir}/{siteid}_obpg.csv. Parsed series are
+        cached in memory and in a .npz file next to the csv, until the csv is modified.
+
+        :type siteid: str
+        :param siteid: site id
+        :return: sorted time series timestamps, wind speeds
+        :rtype: tuple
+        """
+
+        met_dir = self.context.get_config_value("met_dir")
+        file = "{}/{}_obpg.csv".format(met_dir, siteid)
+        mtime = os.path.getmtime(file)
+
+        if (file in WIND_SERIES) and (WIND_SERIES[file][0] == mtime):
+            return WIND_SERIES[file][1:]
+
+        cache_file = os.path.splitext(file)[0] + ".npz"
+        tstime = None
+        if os.path.exists(cache_file):
+            # any error reading cache (e.g. truncated file) means csv is parsed again
+            try:
+                with np.load(cache_file) as cache:
+                    if cache["mtime"] == mtime:
+                        tstime, tseries = cache["tstime"], cache["tseries"]
+            except Exception:
+                tstime = None
+
+        if tstime is None:
+            if self.context.logger is not None:
+                self.context.logger.debug("Reading wind time series {}".format(file))
+            data = np.loadtxt(file, delimiter=",", skiprows=1, dtype=str, ndmin=2)
+            tstime = np.array([dateutil.parser.parse(d).timestamp() for d in data[:, 0]])
+            tseries = np.array([np.nan if d == "None" else float(d) for d in data[:, 1]])
+            idx = np.argsort(tstime, kind="stable")
+            tstime, tseries = tstime[idx], tseries[idx]
+
+            try:
+                atomic_write(
+                    cache_file,
+                    lambda f: np.savez(f, mtime=mtime, tstime=tstime, tseries=tseries),
+                )
+            except OSError:
+                if self.context.logger is not None:
+                    self.context.logger.debug(
+                        "Could not write wind time series cache %s" % cache_file
+                    )
+
+        WIND_SERIES[file] = (mtime, tstime, tseries)
+        return tstime, tseries
+
     ## ancillary_get
     ## downloads and interpolates ancillary data from the ocean data server
     ##
@@ -371,6 +434,13 @@ class RhymerAncillary:
         ## get data
         data_list = []
         for di, dtn in enumerate([dt0, dt1]):
+            ## point extractions only depend on location and 6-hour step
+            key = (process, lon, lat, dtn)
+            if key in GDAS_POINTS:
+                data_int = GDAS_POINTS[key]
+                data_list.append(data_int)
+                continue
+
             if "forecast" in url_base:
                 url = url_base.format(
                     year=str(dtn.year),
@@ -494,6 +564,7 @@ class RhymerAncillary:
                         + data[par][0, 1] * (latw) * (1 - lonw)
                         + data[par][1, 1] * (1 - latw) * (1 - lonw)
                     )
+                GDAS_POINTS[key] = data_int
                 data_list.append(data_int)
 
         # print(data_list)
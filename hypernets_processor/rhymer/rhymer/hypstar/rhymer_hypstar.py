@@ -17,6 +17,7 @@ from hypernets_processor.data_utils.average import Average
 from obsarray.templater.dataset_util import DatasetUtil as du
 from hypernets_processor.data_io.normalize_360 import normalizedeg
 from hypernets_processor.data_utils.quality_checks import QualityChecks
+from hypernets_processor.data_utils.solar_geometry import relative_azimuth_angle
 from obsarray.templater.dataset_util import DatasetUtil
 
 import numpy as np
@@ -273,34 +274,39 @@ class RhymerHypstar:
                     )
                 )
 
-        for i in range(len(l1b.scan)):
-            wa = self.context.get_config_value("wind_ancillary")
-            if not wa:
-                l1b["quality_flag"][l1b["scan"] == i] = du.set_flag(
-                    l1b["quality_flag"][l1b["scan"] == i], "def_wind_flag"
-                )
-                wind.append(self.context.get_config_value("wind_default"))
-                l1b.attrs["rhof_wind_source"] = "Default - {}".format(
-                    self.context.get_config_value("wind_default")
-                )
+        if not wa:
+            default = np.isin(l1b["scan"].values, np.arange(len(l1b.scan)))
+            l1b["quality_flag"][default] = du.set_flag(
+                l1b["quality_flag"][default], "def_wind_flag"
+            )
+            wind = [self.context.get_config_value("wind_default")] * len(l1b.scan)
+            l1b.attrs["rhof_wind_source"] = "Default - {}".format(
+                self.context.get_config_value("wind_default")
+            )
 
-            elif self.context.get_config_value("wind_ancillary") == "NCEP":
-                isotime = datetime.utcfromtimestamp(
-                    l1b["acquisition_time"].values[i]
-                ).strftime("%Y-%m-%d %H:%M:%S")
-                anc_wind = self.rhymeranc.ts_wind(isotime, l1b.attrs["site_id"])
-                if anc_wind is not None:
-                    wind.append(anc_wind)
-                l1b.attrs["rhof_wind_source"] = "NCEP"
+        elif wa == "NCEP":
+            # wind time series timestamps are of naive datetimes, as parsed from isotime
+            isotimes = [
+                datetime.utcfromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S")
+                for t in l1b["acquisition_time"].values
+            ]
+            timestamps = [
+                datetime.strptime(isotime, "%Y-%m-%d %H:%M:%S").timestamp()
+                for isotime in isotimes
+            ]
+            wind = list(
+                self.rhymeranc.ts_wind_series(timestamps, l1b.attrs["site_id"])
+            )
+            l1b.attrs["rhof_wind_source"] = "NCEP"
 
-            elif self.context.get_config_value("wind_ancillary") == "GDAS":
+        elif wa == "GDAS":
+            for i in range(len(l1b.scan)):
                 isotime = datetime.utcfromtimestamp(
                     l1b["acquisition_time"].values[i]
                 ).strftime("%Y-%m-%d %H:%M:%S")
                 anc_wind = self.rhymeranc.gdas_extract(isotime, lon, lat)
                 if anc_wind is not None:
                     wind.append(anc_wind["w"])
-                    now = datetime.now()
                     l1b.attrs[
                         "rhof_wind_source"
                     ] = "NCEP/GDAS FNL 0.25 ds083.3 | DOI: 10.5065/D65Q4T4Z"
@@ -312,44 +318,35 @@ class RhymerHypstar:
 
         ## read mobley rho lut
         rhof_coeff = np.zeros(len(l1b.scan))
-        rhof_vza = np.zeros(len(l1b.scan))
-        rhof_raa = np.zeros(len(l1b.scan))
-        rhof_sza = np.zeros(len(l1b.scan))
+        rhof_vza = l1b["viewing_zenith_angle"].values.astype(np.float64)
+        rhof_sza = l1b["solar_zenith_angle"].values.astype(np.float64)
+        rhof_raa = relative_azimuth_angle(
+            l1b["pointing_azimuth_angle"].values, l1b["solar_azimuth_angle"].values
+        ).astype(np.float64)
 
         wind = l1b["rhof_wind"].values
-        for i in range(len(l1b.scan)):
-            rhof_vza[i] = l1b["viewing_zenith_angle"][i].values
-            rhof_sza[i] = l1b["solar_zenith_angle"][i].values
-            ra = (
-                l1b["pointing_azimuth_angle"][i].values
-                - l1b["solar_azimuth_angle"][i].values
-            ) % 360
-
-            rhof_raa[i] = ((ra - 180) % 360) - 180
 
+        ## get air_water_int reflectance
+        if self.context.get_config_value("rhof_option") == "Mobley1999":
+            valid = np.abs(rhof_raa) < 180
+            rhof_coeff[valid] = self.rhymerproc.mobley_lut_interp(
+                np.minimum(rhof_sza[valid], 79.999),
+                rhof_vza[valid],
+                rhof_raa[valid],
+                wind=wind[valid],
+            )
 
-            ## get air_water_int reflectance
-            if self.context.get_config_value("rhof_option") == "Mobley1999":
-                if (
-                    (rhof_sza[i] is not None)
-                    & (rhof_raa[i] is not None)
-                    & (abs(rhof_raa[i]) < 180)
-                ):
-                    sza = min(rhof_sza[i], 79.999)
-                    rhof = self.rhymerproc.mobley_lut_interp(
-                        sza, rhof_vza[i], rhof_raa[i], wind=wind[i]
-                    )
-                else:
-                    l1b["quality_flag"][l1b["scan"] == i] = du.set_flag(
-                        l1b["quality_flag"][l1b["scan"] == i], "rhof_default"
-                    )
-                    rhof = self.context.get_config_value("rhof_default")
-            # if self.context.get_config_value("rhof_option") == "Ruddick2006":
-            #     rhof = self.context.get_config_value("rhof_default")
-            #     if wind[i] is not None:
-            #         rhof = rhof + 0.00039 * wind[i] + 0.000034 * wind[i] ** 2
+            default = np.isin(l1b["scan"].values, np.flatnonzero(~valid))
+            if np.any(default):
+                l1b["quality_flag"][default] = du.set_flag(
+                    l1b["quality_flag"][default], "rhof_default"
+                )
+                rhof_coeff[~valid] = self.context.get_config_value("rhof_default")
+        # if self.context.get_config_value("rhof_option") == "Ruddick2006":
+        #     rhof = self.context.get_config_value("rhof_default")
+        #     if wind[i] is not None:
+        #         rhof = rhof + 0.00039 * wind[i] + 0.000034 * wind[i] ** 2
 
-            rhof_coeff[i] = rhof
         print(rhof_coeff)
         l1b["rhof"].values = rhof_coeff
         l1b["rhof_vza"].values = rhof_vza
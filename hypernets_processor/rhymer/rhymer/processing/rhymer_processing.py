@@ -1,8 +1,15 @@
 from hypernets_processor.rhymer.rhymer.shared.rhymer_shared import RhymerShared
 from hypernets_processor.rhymer.rhymer.ancillary.rhymer_ancillary import RhymerAncillary
+from hypernets_processor.utils.paths import atomic_write
 import numpy as np
 import os
 
+# Mobley LUT dimensions, in order of LUT data axes
+MOBLEY_LUT_DIMS = ["Wind", "Theta-sun", "Theta", "Phi"]
+
+# Mobley LUTs read in this process, by ascii LUT path
+MOBLEY_LUTS = {}
+
 ## interpolate Mobley sky reflectance LUT
 ## ths is sun zenith angle
 ## thv is viewing angle
@@ -21,42 +28,163 @@ class RhymerProcessing:
         # self.path_ascii = os.path.join(dir_path, 'data', 'calibration_files_ascii', 'HYPSTAR_cal')
 
     def mobley_lut_interp(self, ths, thv, paa, wind=2.0):
-        rholut = self.mobley_lut_read()
+        """
+        Interpolates Mobley sky reflectance LUT, for scalars or arrays of geometries and wind speeds
+
+        :param ths: sun zenith angle
+        :param thv: viewing zenith angle
+        :param paa: relative azimuth angle
+        :param wind: wind speed
+        :return: sky reflectance factor rho
+        """
+
+        rholut = self.mobley_lut()
         dval = rholut["header"]
 
         # find wind speeds
-        wind_id, wind_br = self.rhymershared.lutpos(dval["Wind"], wind)
+        wind_id, wind_br = self.lutpos(dval["Wind"], wind)
         wind_w = wind_id - wind_br[0]
 
         # phi is phi-view/pointing azimuth angle
-        phi = 180 - abs(paa)
+        phi = 180 - np.abs(paa)
 
         # find geometry
-        ths_id, ths_br = self.rhymershared.lutpos(dval["Theta-sun"], ths)
-        thv_id, thv_br = self.rhymershared.lutpos(dval["Theta"], thv)
-        phi_id, phi_br = self.rhymershared.lutpos(dval["Phi"], abs(phi))
+        ths_id, ths_br = self.lutpos(dval["Theta-sun"], ths)
+        thv_id, thv_br = self.lutpos(dval["Theta"], thv)
+        phi_id, phi_br = self.lutpos(dval["Phi"], np.abs(phi))
 
         ## interpolate for both bracketing wind speeds
-        it1 = self.rhymershared.interp3d(
-            rholut["data"][wind_br[0], :, :, :], ths_id, thv_id, phi_id
-        )
-        it2 = self.rhymershared.interp3d(
-            rholut["data"][wind_br[1], :, :, :], ths_id, thv_id, phi_id
-        )
+        it1 = self.interp3d(rholut["data"], wind_br[0], ths_id, thv_id, phi_id)
+        it2 = self.interp3d(rholut["data"], wind_br[1], ths_id, thv_id, phi_id)
 
         ## and weigh to wind speed
         rint = it2 * wind_w + it1 * (1.0 - wind_w)
-        return rint
+        return rint[()]
+
+    @staticmethod
+    def lutpos(vector, value):
+        """
+        Finds position of values in a sorted vector for LUT lookup, as RhymerShared.lutpos for
+        arrays of values
+
+        :return: fractional index, (lower index, upper index)
+        :rtype: tuple
+        """
+
+        vector = np.asarray(vector)
+        value = np.asarray(value, dtype=np.float64)
+
+        uidx = np.clip(np.searchsorted(vector, value, side="right"), 0, len(vector) - 1)
+        above = vector[uidx] > value
+        # values that compare neither above nor below (nan) are positioned at 0
+        uidx = np.where(above | (vector[uidx] <= value), uidx, 0)
+        lidx = np.where(above, uidx - 1, uidx)
+        step = np.where(above, np.abs(vector[lidx] - vector[uidx]), 1)
+        index = np.where(above, lidx + (value - vector[lidx]) / step, uidx)
+        index = index.astype(np.float64)
+        return index, (lidx, uidx)
+
+    @staticmethod
+    def interp3d(data, wid, xid, yid, zid):
+        """
+        Interpolates 3D array of 4D LUT at wind index wid, as RhymerShared.interp3d for arrays
+        of fractional indices
+        """
+
+        dim = data.shape
+        xbr = (np.trunc(xid).astype(int), np.minimum(np.trunc(xid + 1), dim[1] - 1))
+        ybr = (np.trunc(yid).astype(int), np.minimum(np.trunc(yid + 1), dim[2] - 1))
+        zbr = (np.trunc(zid).astype(int), np.minimum(np.trunc(zid + 1), dim[3] - 1))
+        xbr, ybr, zbr = [(br[0], br[1].astype(int)) for br in (xbr, ybr, zbr)]
+
+        x = xid - xbr[0]
+        y = yid - ybr[0]
+        z = zid - zbr[0]
+
+        d000 = data[wid, xbr[0], ybr[0], zbr[0]]
+        d100 = data[wid, xbr[1], ybr[0], zbr[0]]
+        d010 = data[wid, xbr[0], ybr[1], zbr[0]]
+        d001 = data[wid, xbr[0], ybr[0], zbr[1]]
+        d101 = data[wid, xbr[1], ybr[0], zbr[1]]
+        d011 = data[wid, xbr[0], ybr[1], zbr[1]]
+        d110 = data[wid, xbr[1], ybr[1], zbr[0]]
+        d111 = data[wid, xbr[1], ybr[1], zbr[1]]
+
+        return (
+            d000 * (1 - x) * (1 - y) * (1 - z)
+            + d100 * x * (1 - y) * (1 - z)
+            + d010 * (1 - x) * y * (1 - z)
+            + d001 * (1 - x) * (1 - y) * z
+            + d101 * x * (1 - y) * z
+            + d011 * (1 - x) * y * z
+            + d110 * x * y * (1 - z)
+            + d111 * x * y * z
+        )
+
+    def mobley_lut(self):
+        """
+        Returns Mobley sky reflectance LUT, read once per process and cached as binary .npz
+        file next to the ascii LUT
+
+        :return: LUT header and data
+        :rtype: dict
+        """
+
+        ifile = self.mobley_lut_path()
+        if ifile in MOBLEY_LUTS:
+            return MOBLEY_LUTS[ifile]
+
+        cache_file = os.path.splitext(ifile)[0] + ".npz"
+        rholut = None
+        if os.path.exists(cache_file) and (
+            os.path.getmtime(cache_file) >= os.path.getmtime(ifile)
+        ):
+            # any error reading cache (e.g. truncated file) means LUT is read again
+            try:
+                with np.load(cache_file) as cache:
+                    rholut = {
+                        "header": {k: list(cache[k]) for k in MOBLEY_LUT_DIMS},
+                        "data": cache["data"],
+                    }
+            except Exception:
+                if self.context.logger is not None:
+                    self.context.logger.debug(
+                        "Could not read Mobley LUT cache %s" % cache_file
+                    )
+
+        if rholut is None:
+            rholut = self.mobley_lut_read()
+
+            try:
+                atomic_write(
+                    cache_file,
+                    lambda f: np.savez(
+                        f,
+                        data=rholut["data"],
+                        **{k: rholut["header"][k] for k in MOBLEY_LUT_DIMS}
+                    ),
+                )
+            except OSError:
+                if self.context.logger is not None:
+                    self.context.logger.debug(
+                        "Could not write Mobley LUT cache %s" % cache_file
+                    )
+
+        MOBLEY_LUTS[ifile] = rholut
+        return rholut
+
+    def mobley_lut_path(self):
+        vf = self.context.get_config_value("rholut")
+        return "{}/{}".format(
+            self.dir_path, "../rhymer/data/Shared/Mobley/{}.txt".format(vf)
+        )
 
     ## read Mobley sky reflectance LUT
     ## QV 2018-07-18
     ## Last modifications: 2019-07-10 (QV) integrated in rhymer
 
     def mobley_lut_read(self):
-        vf = self.context.get_config_value("rholut")
-        ifile = "{}/{}".format(
-            self.dir_path, "../rhymer/data/Shared/Mobley/{}.txt".format(vf)
-        )
+        ifile = self.mobley_lut_path()
 
         header = "   I   J    Theta      Phi  Phi-view       rho".split()
         data, cur = {}, None
@@ -0,0 +1,122 @@
+"""
+Tests for RhymerAncillary class
+"""
+
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import shutil
+import tempfile
+import numpy as np
+import dateutil.parser
+from hypernets_processor.version import __version__
+from hypernets_processor.context import Context
+from hypernets_processor.rhymer.rhymer.ancillary.rhymer_ancillary import (
+    RhymerAncillary,
+    WIND_SERIES,
+)
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def write_wind_csv(path, winds):
+    with open(path, "w") as f:
+        f.write("time,wind\n")
+        for i, w in enumerate(winds):
+            f.write("2021-01-01T{:02d}:00:00,{}\n".format(i, w))
+
+
+class TestRhymerAncillary(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.csv = os.path.join(self.tmpdir, "TEST_obpg.csv")
+        write_wind_csv(self.csv, [1.0, 3.0, "None", 5.0, 7.0])
+        WIND_SERIES.clear()
+
+        self.context = Context()
+        self.context.set_config_value("met_dir", self.tmpdir)
+        self.context.set_config_value("wind_default", 2.0)
+
+    def tearDown(self):
+        WIND_SERIES.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def test_ts_wind_series(self):
+        ra = RhymerAncillary(self.context)
+
+        isodates = [
+            "2021-01-01 00:30:00",
+            "2021-01-01 01:00:00",
+            "2021-01-01 03:15:00",
+            "2021-01-01 01:30:00",
+            "2020-12-31 23:00:00",
+            "2021-01-01 05:00:00",
+        ]
+        timestamps = np.array([dateutil.parser.parse(d).timestamp() for d in isodates])
+
+        wind = ra.ts_wind_series(timestamps, "TEST")
+
+        np.testing.assert_allclose(wind[:3], [2.0, 3.0, 5.5])
+        self.assertTrue(np.isnan(wind[3]))
+        np.testing.assert_array_equal(wind[4:], [2.0, 2.0])
+        self.assertEqual(ra.ts_wind(isodates[2], "TEST"), wind[2])
+
+    def test_read_wind_series_cache(self):
+        ra = RhymerAncillary(self.context)
+
+        tstime, tseries = ra.read_wind_series("TEST")
+        self.assertIn(self.csv, WIND_SERIES)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, "TEST_obpg.npz")))
+
+        # disk cache is used in a new process
+        WIND_SERIES.clear()
+        tstime_npz, tseries_npz = ra.read_wind_series("TEST")
+        np.testing.assert_array_equal(tstime_npz, tstime)
+        np.testing.assert_array_equal(tseries_npz, tseries)
+
+        # unreadable cache (e.g. partially written by other process) replaced
+        WIND_SERIES.clear()
+        cache_file = os.path.join(self.tmpdir, "TEST_obpg.npz")
+        with open(cache_file, "wb") as f:
+            f.write(b"PK\x03\x04truncated")
+        tstime_csv, tseries_csv = ra.read_wind_series("TEST")
+        np.testing.assert_array_equal(tstime_csv, tstime)
+        with np.load(cache_file) as cache:
+            np.testing.assert_array_equal(cache["tseries"], tseries)
+        self.assertEqual(
+            sorted(os.listdir(self.tmpdir)), ["TEST_obpg.csv", "TEST_obpg.npz"]
+        )
+
+        # modified csv is read again
+        write_wind_csv(self.csv, [4.0, 4.0])
+        mtime = os.path.getmtime(self.csv) + 10
+        os.utime(self.csv, (mtime, mtime))
+        tstime, tseries = ra.read_wind_series("TEST")
+        np.testing.assert_array_equal(tseries, [4.0, 4.0])
+
+    @patch(
+        "hypernets_processor.rhymer.rhymer.ancillary.rhymer_ancillary.atomic_write",
+        side_effect=OSError("No space left on device"),
+    )
+    def test_read_wind_series_cache_write_failed(self, mock_write):
+        self.context.logger = MagicMock()
+        ra = RhymerAncillary(self.context)
+
+        tstime, tseries = ra.read_wind_series("TEST")
+
+        self.assertEqual(len(tseries), 5)
+        self.assertIn(self.csv, WIND_SERIES)
+        self.context.logger.debug.assert_called_with(
+            "Could not write wind time series cache %s"
+            % os.path.join(self.tmpdir, "TEST_obpg.npz")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Tests for RhymerProcessing class
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from hypernets_processor.version import __version__
+from hypernets_processor.context import Context
+from hypernets_processor.rhymer.rhymer.processing.rhymer_processing import (
+    RhymerProcessing,
+    MOBLEY_LUTS,
+)
+from hypernets_processor.rhymer.rhymer.shared.rhymer_shared import RhymerShared
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def mobley_lut_interp_scalar(rholut, ths, thv, paa, wind):
+    """
+    Reference scalar Mobley LUT interpolation, using RhymerShared
+    """
+    rs = RhymerShared(None)
+    dval = rholut["header"]
+
+    wind_id, wind_br = rs.lutpos(dval["Wind"], wind)
+    wind_w = wind_id - wind_br[0]
+    phi = 180 - abs(paa)
+    ths_id, ths_br = rs.lutpos(dval["Theta-sun"], ths)
+    thv_id, thv_br = rs.lutpos(dval["Theta"], thv)
+    phi_id, phi_br = rs.lutpos(dval["Phi"], abs(phi))
+
+    it1 = rs.interp3d(rholut["data"][wind_br[0], :, :, :], ths_id, thv_id, phi_id)
+    it2 = rs.interp3d(rholut["data"][wind_br[1], :, :, :], ths_id, thv_id, phi_id)
+    return it2 * wind_w + it1 * (1.0 - wind_w)
+
+
+class TestRhymerProcessing(unittest.TestCase):
+    def setUp(self):
+        self.context = Context()
+        self.context.set_config_value("rholut", "rhoTable_AO1999")
+
+    def test_mobley_lut_interp(self):
+        rp = RhymerProcessing(self.context)
+        rholut = rp.mobley_lut_read()
+
+        rng = np.random.default_rng(0)
+        ths = np.append(rng.uniform(0, 79.999, 200), [0.0, 10.0, 79.999, np.nan])
+        thv = np.append(rng.uniform(0, 90, 200), [0.0, 40.0, 90.0, 40.0])
+        paa = np.append(rng.uniform(-179.9, 179.9, 200), [0.0, 180.0, -135.0, 100.0])
+        wind = np.append(rng.uniform(0, 16, 200), [0.0, 2.0, 20.0, 4.0])
+
+        rho = rp.mobley_lut_interp(ths, thv, paa, wind=wind)
+
+        expected = [
+            mobley_lut_interp_scalar(rholut, *args)
+            for args in zip(ths, thv, paa, wind)
+        ]
+        np.testing.assert_allclose(rho, expected, rtol=1e-12)
+
+        self.assertAlmostEqual(
+            rp.mobley_lut_interp(40.0, 35.0, 135.0, wind=5.0),
+            mobley_lut_interp_scalar(rholut, 40.0, 35.0, 135.0, 5.0),
+        )
+
+    def test_mobley_lut_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        lut_dir = os.path.join(tmpdir, "rhymer", "data", "Shared", "Mobley")
+        os.makedirs(lut_dir)
+
+        rp = RhymerProcessing(self.context)
+        shutil.copy(rp.mobley_lut_path(), lut_dir)
+        rp.dir_path = os.path.join(tmpdir, "rhymer")
+
+        rholut = rp.mobley_lut()
+        self.assertIs(rp.mobley_lut(), rholut)
+        self.assertTrue(os.path.exists(os.path.join(lut_dir, "rhoTable_AO1999.npz")))
+
+        # read from binary cache
+        del MOBLEY_LUTS[rp.mobley_lut_path()]
+        rholut_cache = rp.mobley_lut()
+        np.testing.assert_array_equal(rholut_cache["data"], rholut["data"])
+        self.assertEqual(rholut_cache["header"]["Phi"], rholut["header"]["Phi"])
+
+        # unreadable cache (e.g. partially written by other process) replaced
+        del MOBLEY_LUTS[rp.mobley_lut_path()]
+        cache_file = os.path.join(lut_dir, "rhoTable_AO1999.npz")
+        with open(cache_file, "wb") as f:
+            f.write(b"PK\x03\x04truncated")
+        rholut_read = rp.mobley_lut()
+        np.testing.assert_array_equal(rholut_read["data"], rholut["data"])
+        with np.load(cache_file) as cache:
+            np.testing.assert_array_equal(cache["data"], rholut["data"])
+        self.assertEqual(
+            sorted(os.listdir(lut_dir)), ["rhoTable_AO1999.npz", "rhoTable_AO1999.txt"]
+        )
+
+        del MOBLEY_LUTS[rp.mobley_lut_path()]
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    unittest.main()
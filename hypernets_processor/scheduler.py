@@ -3,11 +3,15 @@ Contains class for scheduling and automating hypernets data processing jobs
 """
 
 from hypernets_processor.version import __version__
+import os
 import time
 import functools
 from schedule import Scheduler as Sched
 import threading
 import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
 """___Authorship___"""
 __author__ = "Sam Hunt"
@@ -177,5 +181,345 @@ class Scheduler:
             time.sleep(1)
 
 
+def available_memory():
+    """
+    Returns available system memory
+
+    :return: available memory in bytes, None if unknown
+    :rtype: int
+    """
+
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def return_pool_workers(max_workers=None, worker_memory=None):
+    """
+    Returns number of worker processes to process sequences with, one per core, limited
+    by available memory if memory per worker given
+
+    :type max_workers: int
+    :param max_workers: (optional) maximum number of worker processes
+
+    :type worker_memory: float
+    :param worker_memory: (optional) memory required by a worker process in GB
+
+    :return: number of worker processes (at least 1)
+    :rtype: int
+    """
+
+    if hasattr(os, "sched_getaffinity"):
+        workers = len(os.sched_getaffinity(0))
+    else:
+        workers = os.cpu_count() or 1
+    if max_workers:
+        workers = min(workers, max_workers)
+
+    if worker_memory:
+        memory = available_memory()
+        if memory is not None:
+            workers = min(workers, int(memory / (worker_memory * 1024 ** 3)))
+
+    return max(workers, 1)
+
+
+class SequenceScheduler:
+    """
+    Class to process the sequences of recurring jobs (e.g. of different sites) on a
+    fixed-size pool of worker processes
+
+    New sequences found by a job are added to its queue and processed in order. Workers
+    take sequences from the queues of the jobs in turn, so a large backlog of one job
+    does not hold up the other jobs. A job only searches for new sequences once all
+    sequences of its previous run are processed, so runs of the same job do not overlap.
+
+    :type process_sequence: func
+    :param process_sequence: function to process sequence on worker process, with
+    interface ``process_sequence(job_name, sequence)`` (must be defined at module level)
+
+    :type workers: int
+    :param workers: number of worker processes
+
+    :type initializer: func
+    :param initializer: (optional) function to initialise worker processes
+
+    :type initargs: tuple
+    :param initargs: (optional) arguments of initializer
+
+    :param logger: logger (optional)
+    :type logger: logging.logger
+    """
+
+    def __init__(
+        self, process_sequence, workers, initializer=None, initargs=(), logger=None
+    ):
+        """
+        Initialises class
+        """
+        self.process_sequence = process_sequence
+        self.workers = workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.logger = logger
+
+        self.scheduler = Sched()
+        self.jobs = {}
+        self.job_order = []
+        self.next_job = 0
+        self.executor = None
+        self.running = {}
+
+    def add_job(
+        self,
+        name,
+        find_sequences,
+        completed=None,
+        finished=None,
+        seconds=None,
+        minutes=None,
+        hours=None,
+    ):
+        """
+        Adds recurring job, run when scheduling starts and then every given interval (or
+        when its previous run is finished, if later)
+
+        :type name: str
+        :param name: job name
+
+        :type find_sequences: func
+        :param find_sequences: function to return sequences to process, with interface
+        ``find_sequences()``
+
+        :type completed: func
+        :param completed: (optional) function called with result of each processed
+        sequence, with interface ``completed(sequence, result)``, where result is the
+        return value of process_sequence, or the exception raised
+
+        :type finished: func
+        :param finished: (optional) function called when all sequences of a run are
+        processed, with interface ``finished()``
+
+        :type seconds: int
+        :param seconds: seconds between job runs
+
+        :type minutes: int
+        :param minutes: minutes between job runs
+
+        :type hours: int
+        :param hours: hours between job runs
+        """
+
+        self.jobs[name] = {
+            "find_sequences": find_sequences,
+            "completed": completed,
+            "finished": finished,
+            "queue": deque(),
+            "running": 0,
+            "due": True,
+        }
+        self.job_order.append(name)
+
+        if seconds is not None:
+            self.scheduler.every(seconds).seconds.do(self.set_due, name)
+        elif minutes is not None:
+            self.scheduler.every(minutes).minutes.do(self.set_due, name)
+        elif hours is not None:
+            self.scheduler.every(hours).hours.do(self.set_due, name)
+
+    def set_due(self, name):
+        """
+        Sets job to run once its previous run is finished
+
+        :type name: str
+        :param name: job name
+        """
+
+        self.jobs[name]["due"] = True
+
+    def is_idle(self, name):
+        """
+        Returns True if job has no sequences queued or being processed
+
+        :type name: str
+        :param name: job name
+
+        :rtype: bool
+        """
+
+        return (len(self.jobs[name]["queue"]) == 0) and (
+            self.jobs[name]["running"] == 0
+        )
+
+    def start_runs(self):
+        """
+        Starts runs of due jobs which are idle, queueing the sequences they find
+        """
+
+        for name in self.job_order:
+            job = self.jobs[name]
+            if not (job["due"] and self.is_idle(name)):
+                continue
+
+            job["due"] = False
+            try:
+                sequences = job["find_sequences"]()
+            except Exception as exception:
+                self.log_error(name, exception)
+                continue
+
+            job["queue"].extend(sequences)
+            if self.logger is not None:
+                self.logger.info(
+                    "Started: %s (%s sequences queued)" % (name, len(sequences))
+                )
+
+            if len(sequences) == 0:
+                self.finish_run(name)
+
+    def dispatch(self):
+        """
+        Submits queued sequences to free workers, taking sequences from the job queues
+        in turn
+        """
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=self.initializer,
+                initargs=self.initargs,
+            )
+
+        n_jobs = len(self.job_order)
+        while len(self.running) < self.workers:
+            for i in range(n_jobs):
+                name = self.job_order[(self.next_job + i) % n_jobs]
+                if len(self.jobs[name]["queue"]) > 0:
+                    break
+            else:
+                return
+
+            self.next_job = (self.next_job + i + 1) % n_jobs
+            sequence = self.jobs[name]["queue"].popleft()
+            future = self.executor.submit(self.process_sequence, name, sequence)
+            self.running[future] = (name, sequence)
+            self.jobs[name]["running"] += 1
+
+    def collect(self):
+        """
+        Passes results of processed sequences to their jobs, restarting worker pool if
+        broken (e.g. a worker process was killed)
+        """
+
+        broken = False
+        for future in [future for future in self.running if future.done()]:
+            name, sequence = self.running.pop(future)
+            job = self.jobs[name]
+            job["running"] -= 1
+
+            result = future.exception()
+            if result is None:
+                result = future.result()
+            elif isinstance(result, BrokenProcessPool):
+                broken = True
+
+            if job["completed"] is not None:
+                try:
+                    job["completed"](sequence, result)
+                except Exception as exception:
+                    self.log_error(name, exception)
+
+            if self.is_idle(name):
+                self.finish_run(name)
+
+        if broken:
+            if self.logger is not None:
+                self.logger.error("Worker process terminated, restarting worker pool")
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def finish_run(self, name):
+        """
+        Finishes run of job
+
+        :type name: str
+        :param name: job name
+        """
+
+        job = self.jobs[name]
+        if job["finished"] is not None:
+            try:
+                job["finished"]()
+            except Exception as exception:
+                self.log_error(name, exception)
+
+    def log_error(self, name, exception):
+        """
+        Logs job error
+
+        :type name: str
+        :param name: job name
+
+        :type exception: Exception
+        :param exception: exception raised
+        """
+
+        if self.logger is not None:
+            self.logger.error(
+                "Failed: %s - %s: %s" % (name, type(exception).__name__, exception)
+            )
+            self.logger.info(traceback.format_exc())
+
+    def run(self, stop_event=None, poll_interval=1.0):
+        """
+        Runs scheduled jobs, until stop event set. Once stopped, sequences being
+        processed are completed, but no further sequences started.
+
+        :type stop_event: threading.Event
+        :param stop_event: (optional) event to stop running (default: run forever)
+
+        :type poll_interval: float
+        :param poll_interval: (optional) interval in seconds to check schedule and
+        workers (default: 1 second)
+        """
+
+        try:
+            while True:
+                self.collect()
+
+                if (stop_event is not None) and stop_event.is_set():
+                    if len(self.running) == 0:
+                        break
+                else:
+                    self.scheduler.run_pending()
+                    self.start_runs()
+                    self.dispatch()
+
+                if len(self.running) > 0:
+                    wait(
+                        list(self.running),
+                        timeout=poll_interval,
+                        return_when=FIRST_COMPLETED,
+                    )
+                elif stop_event is not None:
+                    stop_event.wait(poll_interval)
+                else:
+                    time.sleep(poll_interval)
+
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+
 if __name__ == "__main__":
     pass
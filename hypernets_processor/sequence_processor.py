@@ -3,23 +3,10 @@ Contains main class for processing sequence data
 """
 
 from hypernets_processor.version import __version__
-from hypernets_processor.calibration.calibrate import Calibrate
-from hypernets_processor.surface_reflectance.surface_reflectance import (
-    SurfaceReflectance,
-)
-from hypernets_processor.interpolation.interpolate import Interpolate
-from hypernets_processor.rhymer.rhymer.hypstar.rhymer_hypstar import RhymerHypstar
-from hypernets_processor.combine_SWIR.combine_SWIR import CombineSWIR
-from hypernets_processor.data_utils.average import Average
-from hypernets_processor.data_io.hypernets_reader import HypernetsReader
-from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
-from hypernets_processor.utils.paths import parse_sequence_path
-from hypernets_processor.calibration.calibration_converter import CalibrationConverter
-from obsarray.templater.dataset_util import DatasetUtil as du
-from hypernets_processor.data_utils.quality_checks import QualityChecks
+
+from hypernets_processor.data_io.checkpoint_store import CheckpointStore
 
 import warnings
-import os
 from datetime import datetime
 
 """___Authorship___"""
@@ -31,6 +18,50 @@ __email__ = "pieter.de.vis@npl.co.uk"
 __status__ = "Development"
 
 
+def share_components(components, shareable):
+    """
+    Rewires processing components (and the shareable components they hold) to share one
+    instance of each shareable class - the given component of the class, or else the
+    first found. Only instances of exactly the shareable classes are shared, any other
+    objects held are left as built.
+
+    :type components: list
+    :param components: processing components
+    :type shareable: tuple
+    :param shareable: classes of components to share
+
+    :return: shared instance of each shareable class
+    :rtype: dict
+    """
+
+    shared = {}
+    for component in components:
+        if type(component) in shareable:
+            shared.setdefault(type(component), component)
+
+    # find shareable components held by components
+    found = {}
+    stack = list(components)
+    while stack:
+        component = stack.pop()
+        if id(component) in found:
+            continue
+        found[id(component)] = component
+        if type(component) in shareable:
+            shared.setdefault(type(component), component)
+        stack.extend(
+            value for value in vars(component).values() if type(value) in shareable
+        )
+
+    # point attributes of components at shared instances
+    for component in found.values():
+        for name, value in vars(component).items():
+            if type(value) in shareable:
+                setattr(component, name, shared[type(value)])
+
+    return shared
+
+
 class SequenceProcessor:
     """
     Class for processing sequence data
@@ -44,6 +75,75 @@ class SequenceProcessor:
         Constructor method
         """
         self.context = context
+        self.components = None
+        self.checkpoints = CheckpointStore(context)
+
+    def build_components(self):
+        """
+        Builds processing components once, for processing of all sequences of job, with
+        one instance of each component class shared between the processing stages
+        """
+
+        # processing stages (and their dependencies) are imported when first needed
+        from hypernets_processor.data_io.hypernets_reader import HypernetsReader
+        from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
+        from hypernets_processor.calibration.calibration_converter import (
+            CalibrationConverter,
+        )
+        from hypernets_processor.calibration.calibrate import Calibrate
+        from hypernets_processor.surface_reflectance.surface_reflectance import (
+            SurfaceReflectance,
+        )
+        from hypernets_processor.data_utils.quality_checks import QualityChecks
+        from hypernets_processor.data_utils.average import Average
+        from hypernets_processor.rhymer.rhymer.hypstar.rhymer_hypstar import (
+            RhymerHypstar,
+        )
+        from hypernets_processor.combine_SWIR.combine_SWIR import CombineSWIR
+        from hypernets_processor.interpolation.interpolate import Interpolate
+        from hypernets_processor.data_io.data_templates import DataTemplates
+        from hypernets_processor.plotting.plotting import Plotting
+        from hypernets_processor.rhymer.rhymer.shared.rhymer_shared import RhymerShared
+        from hypernets_processor.rhymer.rhymer.processing.rhymer_processing import (
+            RhymerProcessing,
+        )
+        from hypernets_processor.rhymer.rhymer.ancillary.rhymer_ancillary import (
+            RhymerAncillary,
+        )
+
+        components = [
+            HypernetsReader(self.context),
+            CalibrationConverter(self.context),
+            Calibrate(self.context),
+            SurfaceReflectance(self.context),
+            QualityChecks(self.context),
+            Average(self.context),
+            RhymerHypstar(self.context),
+            HypernetsWriter(self.context),
+            CombineSWIR(self.context),
+            Interpolate(self.context),
+        ]
+        # classes of components which are built with the context only, so one instance
+        # can be used by all components holding one
+        shareable = (
+            HypernetsWriter,
+            Calibrate,
+            QualityChecks,
+            Average,
+            RhymerHypstar,
+            Interpolate,
+            DataTemplates,
+            Plotting,
+            RhymerShared,
+            RhymerProcessing,
+            RhymerAncillary,
+        )
+        shared = share_components(components, shareable)
+
+        self.components = {
+            type(component).__name__: component for component in components
+        }
+        self.components.update({cls.__name__: obj for cls, obj in shared.items()})
 
     def process_sequence(self, sequence_path):
         """
@@ -51,22 +151,20 @@ class SequenceProcessor:
         """
 
         # update context
-        self.context.set_config_value(
-            "time", parse_sequence_path(sequence_path)["datetime"]
-        )
-        self.context.set_config_value("sequence_path", sequence_path)
-        self.context.set_config_value("sequence_name", os.path.basename(sequence_path))
-
-        reader = HypernetsReader(self.context)
-        calcon = CalibrationConverter(self.context)
-        cal = Calibrate(self.context)
-        surf = SurfaceReflectance(self.context)
-        qc = QualityChecks(self.context)
-        avg = Average(
-            self.context,
-        )
-        rhymer = RhymerHypstar(self.context)
-        writer = HypernetsWriter(self.context)
+        self.context.start_sequence(sequence_path)
+        self.checkpoints.start_sequence()
+
+        if self.components is None:
+            self.build_components()
+
+        reader = self.components["HypernetsReader"]
+        calcon = self.components["CalibrationConverter"]
+        cal = self.components["Calibrate"]
+        surf = self.components["SurfaceReflectance"]
+        qc = self.components["QualityChecks"]
+        avg = self.components["Average"]
+        rhymer = self.components["RhymerHypstar"]
+        writer = self.components["HypernetsWriter"]
 
         with warnings.catch_warnings():
             if not self.context.get_config_value("verbose"):
@@ -75,67 +173,100 @@ class SequenceProcessor:
             tstart = datetime.now()
             self.context.set_config_value("start_time_processing_sequence", tstart)
             if self.context.get_config_value("network") == "w":
-                calibration_data_rad, calibration_data_irr = calcon.read_calib_files(
-                    sequence_path
-                )
-                # Read L0
-                self.context.logger.info("Reading raw data...")
-                l0a_irr, l0a_rad, l0a_bla = reader.read_sequence(
-                    sequence_path, calibration_data_rad, calibration_data_irr
-                )
-                self.context.logger.info("Done")
-
-                # Calibrate to L1a
-                if self.context.get_config_value("max_level") in [
-                    "L1A",
-                    "L1B",
-                    "L1C",
-                    "L2A",
-                ]:
-                    self.context.logger.info("Processing to L1a...")
-                    if l0a_rad:
-                        L1a_rad, l0a_rad_masked, l0a_rad_bla_masked = cal.calibrate_l1a(
-                            "radiance", l0a_rad, l0a_bla, calibration_data_rad
-                        )
-                    else:
-                        L1a_rad, l0a_rad_masked, l0a_rad_bla_masked = None, None, None
-
-                    if l0a_irr:
-                        L1a_irr, l0a_irr_masked, l0a_irr_bla_masked = cal.calibrate_l1a(
-                            "irradiance", l0a_irr, l0a_bla, calibration_data_irr
-                        )
-                    else:
-                        L1a_irr, l0a_irr_masked, l0a_irr_bla_masked = None, None, None
-
+                level, checkpoint = self.checkpoints.load(["L1B"])
+                if level == "L1B":
+                    L1a_rad = checkpoint["L1a_rad"]
+                    L1a_irr = checkpoint["L1a_irr"]
+                    L1b_rad = checkpoint["L1b_rad"]
+                    L1b_irr = checkpoint["L1b_irr"]
+                else:
+                    (
+                        calibration_data_rad,
+                        calibration_data_irr,
+                    ) = calcon.read_calib_files(sequence_path)
+                    # Read L0
+                    self.context.logger.info("Reading raw data...")
+                    l0a_irr, l0a_rad, l0a_bla = reader.read_sequence(
+                        sequence_path, calibration_data_rad, calibration_data_irr
+                    )
                     self.context.logger.info("Done")
 
-                if l0a_rad and l0a_irr:
+                    # Calibrate to L1a
                     if self.context.get_config_value("max_level") in [
+                        "L1A",
                         "L1B",
                         "L1C",
                         "L2A",
                     ]:
-                        self.context.logger.info("Processing to L1b radiance...")
-                        L1b_rad = cal.calibrate_l1b(
-                            "radiance",
-                            l0a_rad_masked,
-                            l0a_rad_bla_masked,
-                            calibration_data_rad,
-                        )
-                        # print(L1b_rad)
+                        self.context.logger.info("Processing to L1a...")
+                        if l0a_rad:
+                            (
+                                L1a_rad,
+                                l0a_rad_masked,
+                                l0a_rad_bla_masked,
+                            ) = cal.calibrate_l1a(
+                                "radiance", l0a_rad, l0a_bla, calibration_data_rad
+                            )
+                        else:
+                            (L1a_rad, l0a_rad_masked, l0a_rad_bla_masked) = (
+                                None,
+                                None,
+                                None,
+                            )
+
+                        if l0a_irr:
+                            (
+                                L1a_irr,
+                                l0a_irr_masked,
+                                l0a_irr_bla_masked,
+                            ) = cal.calibrate_l1a(
+                                "irradiance", l0a_irr, l0a_bla, calibration_data_irr
+                            )
+                        else:
+                            (L1a_irr, l0a_irr_masked, l0a_irr_bla_masked) = (
+                                None,
+                                None,
+                                None,
+                            )
 
                         self.context.logger.info("Done")
 
-                        self.context.logger.info("Processing to L1b irradiance...")
-                        L1b_irr = cal.calibrate_l1b(
-                            "irradiance",
-                            l0a_irr_masked,
-                            l0a_irr_bla_masked,
-                            calibration_data_irr,
-                        )
-                else:
-                    L1b_rad = None
-                    L1b_irr = None
+                    if l0a_rad and l0a_irr:
+                        if self.context.get_config_value("max_level") in [
+                            "L1B",
+                            "L1C",
+                            "L2A",
+                        ]:
+                            self.context.logger.info("Processing to L1b radiance...")
+                            L1b_rad = cal.calibrate_l1b(
+                                "radiance",
+                                l0a_rad_masked,
+                                l0a_rad_bla_masked,
+                                calibration_data_rad,
+                            )
+                            # print(L1b_rad)
+
+                            self.context.logger.info("Done")
+
+                            self.context.logger.info("Processing to L1b irradiance...")
+                            L1b_irr = cal.calibrate_l1b(
+                                "irradiance",
+                                l0a_irr_masked,
+                                l0a_irr_bla_masked,
+                                calibration_data_irr,
+                            )
+                            self.checkpoints.save(
+                                "L1B",
+                                {
+                                    "L1a_rad": L1a_rad,
+                                    "L1a_irr": L1a_irr,
+                                    "L1b_rad": L1b_rad,
+                                    "L1b_irr": L1b_irr,
+                                },
+                            )
+                    else:
+                        L1b_rad = None
+                        L1b_irr = None
 
                 azis = rhymer.checkazimuths(L1a_rad)
 
@@ -176,130 +307,163 @@ class SequenceProcessor:
                     self.context.anomaly_handler.add_anomaly("ms")
 
             elif self.context.get_config_value("network") == "l":
-                comb = CombineSWIR(self.context)
-                intp = Interpolate(self.context)
-
-                # Read L0
-                self.context.logger.info("Reading raw data...")
-                (
-                    calibration_data_rad,
-                    calibration_data_irr,
-                    calibration_data_swir_rad,
-                    calibration_data_swir_irr,
-                ) = calcon.read_calib_files(sequence_path)
-
-                (
-                    l0a_irr,
-                    l0a_rad,
-                    l0a_bla,
-                    l0a_swir_irr,
-                    l0a_swir_rad,
-                    l0a_swir_bla,
-                ) = reader.read_sequence(
-                    sequence_path,
-                    calibration_data_rad,
-                    calibration_data_irr,
-                    calibration_data_swir_rad,
-                    calibration_data_swir_irr,
-                )
-                self.context.logger.info("Done")
-
-                if self.context.get_config_value("max_level") in [
-                    "L1A",
-                    "L1B",
-                    "L1C",
-                    "L2A",
-                ]:
-                    self.context.logger.info("Processing to L1a...")
-                    if l0a_rad and l0a_bla:
-                        L1a_rad, l0a_rad_masked, l0a_rad_bla_masked = cal.calibrate_l1a(
-                            "radiance", l0a_rad, l0a_bla, calibration_data_rad
-                        )
-                    else:
-                        L1a_rad, l0a_rad_masked, l0a_rad_bla_masked = None, None, None
-
-                    if l0a_irr and l0a_bla:
-                        L1a_irr, l0a_irr_masked, l0a_irr_bla_masked = cal.calibrate_l1a(
-                            "irradiance", l0a_irr, l0a_bla, calibration_data_irr
-                        )
-                    else:
-                        L1a_irr, l0a_irr_masked, l0a_irr_bla_masked = None, None, None
-
-                    if l0a_swir_rad and l0a_swir_bla:
-                        (
-                            L1a_swir_rad,
-                            l0a_swir_rad_masked,
-                            l0a_swir_rad_bla_masked,
-                        ) = cal.calibrate_l1a(
-                            "radiance",
-                            l0a_swir_rad,
-                            l0a_swir_bla,
-                            calibration_data_swir_rad,
-                            swir=True,
-                        )
-                    else:
-                        L1a_swir_rad, l0a_swir_rad_masked, l0a_swir_rad_bla_masked = (
-                            None,
-                            None,
-                            None,
-                        )
-
-                    if l0a_swir_irr and l0a_swir_bla:
-                        (
-                            L1a_swir_irr,
-                            l0a_swir_irr_masked,
-                            l0a_swir_irr_bla_masked,
-                        ) = cal.calibrate_l1a(
-                            "irradiance",
-                            l0a_swir_irr,
-                            l0a_swir_bla,
-                            calibration_data_swir_irr,
-                            swir=True,
-                        )
-                    else:
-                        L1a_swir_irr, l0a_swir_irr_masked, l0a_swir_irr_bla_masked = (
-                            None,
-                            None,
-                            None,
-                        )
-
+                comb = self.components["CombineSWIR"]
+                intp = self.components["Interpolate"]
+
+                level, checkpoint = self.checkpoints.load(["L1B", "L1C"])
+                if level == "L1B":
+                    L1b_rad = checkpoint["L1b_rad"]
+                    L1b_irr = checkpoint["L1b_irr"]
+                elif level is None:
+                    # Read L0
+                    self.context.logger.info("Reading raw data...")
+                    (
+                        calibration_data_rad,
+                        calibration_data_irr,
+                        calibration_data_swir_rad,
+                        calibration_data_swir_irr,
+                    ) = calcon.read_calib_files(sequence_path)
+
+                    (
+                        l0a_irr,
+                        l0a_rad,
+                        l0a_bla,
+                        l0a_swir_irr,
+                        l0a_swir_rad,
+                        l0a_swir_bla,
+                    ) = reader.read_sequence(
+                        sequence_path,
+                        calibration_data_rad,
+                        calibration_data_irr,
+                        calibration_data_swir_rad,
+                        calibration_data_swir_irr,
+                    )
                     self.context.logger.info("Done")
 
-                if self.context.get_config_value("max_level") in ["L1B", "L1C", "L2A"]:
-                    if l0a_rad_masked and l0a_swir_rad_masked:
-                        self.context.logger.info("Processing to L1b radiance...")
-                        L1b_rad = comb.combine(
-                            "radiance",
-                            l0a_rad_masked,
-                            l0a_rad_bla_masked,
-                            l0a_swir_rad_masked,
-                            l0a_swir_rad_bla_masked,
-                            calibration_data_rad,
-                            calibration_data_swir_rad,
-                        )
-                        self.context.logger.info("Done")
-                    else:
-                        L1b_rad = None
+                    if self.context.get_config_value("max_level") in [
+                        "L1A",
+                        "L1B",
+                        "L1C",
+                        "L2A",
+                    ]:
+                        self.context.logger.info("Processing to L1a...")
+                        if l0a_rad and l0a_bla:
+                            (
+                                L1a_rad,
+                                l0a_rad_masked,
+                                l0a_rad_bla_masked,
+                            ) = cal.calibrate_l1a(
+                                "radiance", l0a_rad, l0a_bla, calibration_data_rad
+                            )
+                        else:
+                            (L1a_rad, l0a_rad_masked, l0a_rad_bla_masked) = (
+                                None,
+                                None,
+                                None,
+                            )
+
+                        if l0a_irr and l0a_bla:
+                            (
+                                L1a_irr,
+                                l0a_irr_masked,
+                                l0a_irr_bla_masked,
+                            ) = cal.calibrate_l1a(
+                                "irradiance", l0a_irr, l0a_bla, calibration_data_irr
+                            )
+                        else:
+                            (L1a_irr, l0a_irr_masked, l0a_irr_bla_masked) = (
+                                None,
+                                None,
+                                None,
+                            )
+
+                        if l0a_swir_rad and l0a_swir_bla:
+                            (
+                                L1a_swir_rad,
+                                l0a_swir_rad_masked,
+                                l0a_swir_rad_bla_masked,
+                            ) = cal.calibrate_l1a(
+                                "radiance",
+                                l0a_swir_rad,
+                                l0a_swir_bla,
+                                calibration_data_swir_rad,
+                                swir=True,
+                            )
+                        else:
+                            (
+                                L1a_swir_rad,
+                                l0a_swir_rad_masked,
+                                l0a_swir_rad_bla_masked,
+                            ) = (None, None, None)
+
+                        if l0a_swir_irr and l0a_swir_bla:
+                            (
+                                L1a_swir_irr,
+                                l0a_swir_irr_masked,
+                                l0a_swir_irr_bla_masked,
+                            ) = cal.calibrate_l1a(
+                                "irradiance",
+                                l0a_swir_irr,
+                                l0a_swir_bla,
+                                calibration_data_swir_irr,
+                                swir=True,
+                            )
+                        else:
+                            (
+                                L1a_swir_irr,
+                                l0a_swir_irr_masked,
+                                l0a_swir_irr_bla_masked,
+                            ) = (None, None, None)
 
-                    if l0a_irr_masked and l0a_swir_irr_masked:
-                        self.context.logger.info("Processing to L1b irradiance...")
-                        L1b_irr = comb.combine(
-                            "irradiance",
-                            l0a_irr_masked,
-                            l0a_irr_bla_masked,
-                            l0a_swir_irr_masked,
-                            l0a_swir_irr_bla_masked,
-                            calibration_data_irr,
-                            calibration_data_swir_irr,
-                        )
                         self.context.logger.info("Done")
-                    else:
-                        L1b_irr = None
 
-                if L1b_rad and L1b_irr:
-                    if self.context.get_config_value("max_level") in ["L1C", "L2A"]:
+                    if self.context.get_config_value("max_level") in [
+                        "L1B",
+                        "L1C",
+                        "L2A",
+                    ]:
+                        if l0a_rad_masked and l0a_swir_rad_masked:
+                            self.context.logger.info("Processing to L1b radiance...")
+                            L1b_rad = comb.combine(
+                                "radiance",
+                                l0a_rad_masked,
+                                l0a_rad_bla_masked,
+                                l0a_swir_rad_masked,
+                                l0a_swir_rad_bla_masked,
+                                calibration_data_rad,
+                                calibration_data_swir_rad,
+                            )
+                            self.context.logger.info("Done")
+                        else:
+                            L1b_rad = None
+
+                        if l0a_irr_masked and l0a_swir_irr_masked:
+                            self.context.logger.info("Processing to L1b irradiance...")
+                            L1b_irr = comb.combine(
+                                "irradiance",
+                                l0a_irr_masked,
+                                l0a_irr_bla_masked,
+                                l0a_swir_irr_masked,
+                                l0a_swir_irr_bla_masked,
+                                calibration_data_irr,
+                                calibration_data_swir_irr,
+                            )
+                            self.context.logger.info("Done")
+                        else:
+                            L1b_irr = None
+
+                        if L1b_rad and L1b_irr:
+                            self.checkpoints.save(
+                                "L1B", {"L1b_rad": L1b_rad, "L1b_irr": L1b_irr}
+                            )
+
+                if (level == "L1C") or (L1b_rad and L1b_irr):
+                    if level == "L1C":
+                        L1c = checkpoint["L1c"]
+                    elif self.context.get_config_value("max_level") in ["L1C", "L2A"]:
                         self.context.logger.info("Processing to L1c...")
                         L1c = intp.interpolate_l1c(L1b_rad, L1b_irr)
+                        self.checkpoints.save("L1C", {"L1c": L1c})
                         self.context.logger.info("Done")
                     if self.context.get_config_value("max_level") == "L2A":
                         self.context.logger.info("Processing to L2a...")
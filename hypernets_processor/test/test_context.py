@@ -9,8 +9,10 @@ from hypernets_processor.test.test_functions import (
     setup_test_job_config,
     setup_test_processor_config,
 )
-from hypernets_processor.context import Context
+from hypernets_processor.context import Context, ConfigSnapshot
 from configparser import RawConfigParser
+import datetime
+import pickle
 
 
 """___Authorship___"""
@@ -104,6 +106,68 @@ class TestContext(unittest.TestCase):
 
         self.assertCountEqual(value, "value2")
 
+    def test_get_config_value_missing(self):
+        context = Context()
+        context.config_values = {"entry1": "value1"}
+
+        self.assertIsNone(context.get_config_value("entry2"))
+
+    def test_freeze_config(self):
+        context = Context()
+        context.config_values = {"mcsteps": 100, "verbose": False, "entry1": "value1"}
+
+        config = context.freeze_config()
+
+        self.assertIs(context.config, config)
+        self.assertEqual(config.mcsteps, 100)
+        self.assertEqual(config["entry1"], "value1")
+        self.assertIsNone(config.entry2)
+        self.assertRaises(AttributeError, setattr, config, "mcsteps", 10)
+        self.assertEqual(pickle.loads(pickle.dumps(config)), config)
+
+        # values read from snapshot, and not set once frozen
+        context.config_values["mcsteps"] = 10
+        self.assertEqual(context.get_config_value("mcsteps"), 100)
+        self.assertRaises(AttributeError, context.set_config_value, "mcsteps", 10)
+        self.assertIs(context.config, config)
+
+    def test_freeze_config_invalid(self):
+        for name, value in [("mcsteps", "abc"), ("mcsteps", True), ("verbose", 1)]:
+            context = Context()
+            context.config_values = {name: value}
+
+            self.assertRaises(ValueError, context.freeze_config)
+
+    def test_sequence_state(self):
+        context = Context()
+        context.freeze_config()
+
+        sequence_path = "data/SEQ20210403T112115"
+        context.start_sequence(sequence_path)
+
+        self.assertEqual(
+            context.get_config_value("time"), datetime.datetime(2021, 4, 3, 11, 21, 15)
+        )
+        self.assertEqual(context.get_config_value("sequence_path"), sequence_path)
+        self.assertEqual(
+            context.get_config_value("sequence_name"), "SEQ20210403T112115"
+        )
+
+        # sequence state is not part of config
+        context.set_config_value("start_time_processing_sequence", 1)
+        self.assertEqual(context.sequence.start_time_processing_sequence, 1)
+        self.assertNotIn("time", context.config)
+        self.assertNotIn("start_time_processing_sequence", context.config_values)
+
+        # sequence override names set for sequence only
+        context.set_config_value("site_id", "BSBE")
+        self.assertEqual(context.get_config_value("site_id"), "BSBE")
+        self.assertEqual(context.config.site_id, "TEST")
+
+        context.start_sequence("data/SEQ20210404T112115")
+        self.assertIsNone(context.get_config_value("start_time_processing_sequence"))
+        self.assertEqual(context.get_config_value("site_id"), "TEST")
+
     @patch("hypernets_processor.context.dataset")
     def test___init__(self, mock_dataset):
         job_config = setup_test_job_config()
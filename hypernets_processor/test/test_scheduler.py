@@ -11,7 +11,13 @@ from contextlib import contextmanager
 from io import StringIO
 import multiprocessing
 import time
-from hypernets_processor.scheduler import Scheduler
+import threading
+from unittest.mock import patch
+from hypernets_processor.scheduler import (
+    Scheduler,
+    SequenceScheduler,
+    return_pool_workers,
+)
 
 
 """___Authorship___"""
@@ -42,6 +48,12 @@ def bad_job():
     return 1 / 0
 
 
+def process_test_sequence(job_name, sequence):
+    if sequence == "bad":
+        raise ValueError("bad sequence")
+    return job_name + sequence
+
+
 def return_test_logger(fname=None):
     logger = logging.getLogger(__name__)
     logger.setLevel(logging.INFO)
@@ -217,5 +229,79 @@ class TestScheduler(unittest.TestCase):
         os.remove(log_fname)
 
 
+class TestSequenceScheduler(unittest.TestCase):
+    def test_run(self):
+        stop_event = threading.Event()
+        results = []
+        finished = []
+
+        def finish(name):
+            finished.append(name)
+            if len(finished) == 2:
+                stop_event.set()
+
+        s = SequenceScheduler(process_test_sequence, 1)
+        s.add_job(
+            "a",
+            lambda: ["1", "2", "bad", "4"],
+            completed=lambda sequence, result: results.append(result),
+            finished=lambda: finish("a"),
+            hours=1,
+        )
+        s.add_job(
+            "b",
+            lambda: ["1", "2"],
+            completed=lambda sequence, result: results.append(result),
+            finished=lambda: finish("b"),
+            hours=1,
+        )
+
+        s.run(stop_event=stop_event, poll_interval=0.01)
+
+        # sequences taken from job queues in turn
+        self.assertEqual(results[:4], ["a1", "b1", "a2", "b2"])
+        self.assertIsInstance(results[4], ValueError)
+        self.assertEqual(results[5], "a4")
+        self.assertEqual(finished, ["b", "a"])
+        self.assertIsNone(s.executor)
+
+    def test_start_runs(self):
+        calls = []
+
+        def find_sequences():
+            calls.append(1)
+            return ["1", "2"]
+
+        s = SequenceScheduler(process_test_sequence, 2)
+        s.add_job("a", find_sequences, seconds=1)
+
+        s.start_runs()
+        self.assertEqual(list(s.jobs["a"]["queue"]), ["1", "2"])
+
+        # no new run of job until previous run processed
+        s.set_due("a")
+        s.start_runs()
+        self.assertEqual(len(calls), 1)
+
+        s.jobs["a"]["queue"].clear()
+        s.start_runs()
+        self.assertEqual(len(calls), 2)
+
+
+class TestReturnPoolWorkers(unittest.TestCase):
+    @patch(
+        "hypernets_processor.scheduler.available_memory", return_value=10 * 1024 ** 3
+    )
+    @patch(
+        "hypernets_processor.scheduler.os.sched_getaffinity", return_value={0, 1, 2, 3}
+    )
+    def test_return_pool_workers(self, mock_affinity, mock_memory):
+        self.assertEqual(return_pool_workers(), 4)
+        self.assertEqual(return_pool_workers(max_workers=2), 2)
+        self.assertEqual(return_pool_workers(worker_memory=3), 3)
+        self.assertEqual(return_pool_workers(max_workers=2, worker_memory=3), 2)
+        self.assertEqual(return_pool_workers(worker_memory=20), 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,196 @@
+"""
+Tests for SequenceProcessor class
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+from unittest.mock import MagicMock
+import numpy as np
+import xarray as xr
+from hypernets_processor.version import __version__
+from hypernets_processor.context import Context
+from hypernets_processor.sequence_processor import SequenceProcessor, share_components
+from hypernets_processor.calibration.calibrate import Calibrate
+from hypernets_processor.surface_reflectance.surface_reflectance import (
+    SurfaceReflectance,
+)
+from hypernets_processor.data_utils.quality_checks import QualityChecks
+from hypernets_processor.data_utils.average import Average
+from hypernets_processor.rhymer.rhymer.hypstar.rhymer_hypstar import RhymerHypstar
+from hypernets_processor.plotting.plotting import Plotting
+from hypernets_processor.data_io.data_templates import DataTemplates
+from hypernets_processor.data_io.hypernets_writer import HypernetsWriter
+
+"""___Authorship___"""
+__author__ = "Pieter De Vis"
+__created__ = "18/10/2026"
+__version__ = __version__
+__maintainer__ = "Pieter De Vis"
+__email__ = "pieter.de.vis@npl.co.uk"
+__status__ = "Development"
+
+
+def find_components(components):
+    """
+    Returns all hypernets_processor objects reachable from components, by class name
+    """
+
+    found = {}
+    stack = list(components)
+    seen = set()
+    while stack:
+        component = stack.pop()
+        if id(component) in seen:
+            continue
+        seen.add(id(component))
+        found.setdefault(type(component).__name__, set()).add(id(component))
+        stack.extend(
+            value
+            for value in vars(component).values()
+            if type(value).__module__.startswith("hypernets_processor.")
+            and hasattr(value, "__dict__")
+            and not isinstance(value, type)
+        )
+    return found
+
+
+class TestSequenceProcessor(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.context = Context(logger=MagicMock())
+        self.context.set_config_value("archive_directory", self.tmpdir)
+        self.context.set_config_value("model", "series_rep,series_id")
+        self.context.set_config_value("calibration_file_version", 2.1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_share_components(self):
+        surf = SurfaceReflectance(self.context)
+        cal = Calibrate(self.context)
+        qc = QualityChecks(self.context)
+
+        shared = share_components(
+            [cal, surf, qc],
+            (Calibrate, QualityChecks, Average, RhymerHypstar, Plotting, DataTemplates),
+        )
+
+        self.assertIs(shared[Calibrate], cal)
+        self.assertIs(surf.calibrate, cal)
+        self.assertIs(surf.qual, qc)
+        self.assertIs(cal.qual, qc)
+        self.assertIs(surf.rh.plot, cal.plot)
+        self.assertNotIn(HypernetsWriter, shared)
+        self.assertIsNot(surf.writer, cal.writer)
+
+    def test_share_components_exact_class(self):
+        class PathPlotting(Plotting):
+            pass
+
+        cal = Calibrate(self.context)
+        qc = QualityChecks(self.context)
+        qc.plot = PathPlotting(self.context, path=self.tmpdir)
+
+        share_components([cal, qc], (Calibrate, QualityChecks, Plotting))
+
+        self.assertIsInstance(qc.plot, PathPlotting)
+        self.assertIsNot(cal.plot, qc.plot)
+        self.assertIs(cal.qual, qc)
+
+    def test_build_components(self):
+        sp = SequenceProcessor(context=self.context)
+        sp.build_components()
+
+        for name in [
+            "HypernetsReader",
+            "CalibrationConverter",
+            "Calibrate",
+            "SurfaceReflectance",
+            "QualityChecks",
+            "Average",
+            "RhymerHypstar",
+            "HypernetsWriter",
+            "CombineSWIR",
+            "Interpolate",
+        ]:
+            self.assertIn(name, sp.components)
+        for name, ids in find_components(sp.components.values()).items():
+            self.assertEqual(len(ids), 1, msg=name)
+        self.assertIs(
+            sp.components["SurfaceReflectance"].calibrate, sp.components["Calibrate"]
+        )
+
+    def test_plot_path_sequence(self):
+        self.context.set_config_value("to_archive", True)
+        sp = SequenceProcessor(context=self.context)
+        sp.build_components()
+        plot = sp.components["Plotting"]
+
+        for sequence_name in ["SEQ20210403T112115", "SEQ20210404T091500"]:
+            self.context.start_sequence("data/" + sequence_name)
+            self.assertIn(sequence_name, plot.path)
+
+    def test_process_sequence_checkpoint(self):
+        self.context.set_config_value("network", "l")
+        self.context.set_config_value("max_level", "L2A")
+        self.context.set_config_value("checkpoint_directory", self.tmpdir)
+        sp = SequenceProcessor(context=self.context)
+        sp.components = {
+            name: MagicMock()
+            for name in [
+                "HypernetsReader",
+                "CalibrationConverter",
+                "Calibrate",
+                "SurfaceReflectance",
+                "QualityChecks",
+                "Average",
+                "RhymerHypstar",
+                "HypernetsWriter",
+                "CombineSWIR",
+                "Interpolate",
+            ]
+        }
+        reader = sp.components["HypernetsReader"]
+        calcon = sp.components["CalibrationConverter"]
+        comb = sp.components["CombineSWIR"]
+        intp = sp.components["Interpolate"]
+        surf = sp.components["SurfaceReflectance"]
+        reader.read_sequence.return_value = (1, 1, 1, 1, 1, 1)
+        calcon.read_calib_files.return_value = (1, 1, 1, 1)
+        sp.components["Calibrate"].calibrate_l1a.return_value = (1, 1, 1)
+        comb.combine.return_value = xr.Dataset({"radiance": ("wavelength", [1.0])})
+        L1c = xr.Dataset({"reflectance": ("wavelength", np.array([0.1, 0.2]))})
+        intp.interpolate_l1c.return_value = L1c
+
+        # first run fails at L2A
+        surf.process_l2.side_effect = ValueError
+        self.assertRaises(ValueError, sp.process_sequence, "data/SEQ20210403T112115")
+
+        # second run resumes from L1C checkpoint, with changed L2A config
+        for component in sp.components.values():
+            component.reset_mock()
+        surf.process_l2.side_effect = None
+        self.context.set_config_value("measurement_function_surface_reflectance", "b")
+        sp.process_sequence("data/SEQ20210403T112115")
+
+        reader.read_sequence.assert_not_called()
+        calcon.read_calib_files.assert_not_called()
+        comb.combine.assert_not_called()
+        intp.interpolate_l1c.assert_not_called()
+        xr.testing.assert_identical(surf.process_l2.call_args[0][0], L1c)
+
+        sp.checkpoints.evict()
+        self.assertEqual(
+            [
+                name
+                for name in os.listdir(self.tmpdir)
+                if name.endswith((".json", ".nc"))
+            ],
+            [],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
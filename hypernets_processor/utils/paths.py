@@ -69,5 +69,33 @@ def parse_sequence_path(path, context=None):
     return None
 
 
+def atomic_write(path, write_function, mode="wb"):
+    """
+    Writes file by writing to a temporary file next to it and renaming it into place, so
+    other processes never read a partially written file. The temporary file name is
+    unique to the process and the temporary file is removed if writing fails.
+
+    :type path: str
+    :param path: path of file to write
+
+    :type write_function: function
+    :param write_function: function writing the file contents to the open file object
+        it is passed
+
+    :type mode: str
+    :param mode: mode to open temporary file with (default: "wb")
+    """
+
+    tmp_path = path + ".%s.tmp" % os.getpid()
+    try:
+        with open(tmp_path, mode) as f:
+            write_function(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 if __name__ == "__main__":
     pass
@@ -4,9 +4,14 @@ Tests for paths module
 
 import unittest
 from hypernets_processor.version import __version__
-from hypernets_processor.utils.paths import relative_path, parse_sequence_path
+from hypernets_processor.utils.paths import (
+    relative_path,
+    parse_sequence_path,
+    atomic_write,
+)
 from datetime import datetime as dt
 import os
+import tempfile
 
 
 """___Authorship___"""
@@ -69,6 +74,34 @@ class TestPaths(unittest.TestCase):
     def test_parse_sequence_directory_none(self):
         self.assertIsNone(parse_sequence_path("test"))
 
+    def test_atomic_write(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test.txt")
+            with open(path, "w") as f:
+                f.write("old")
+
+            atomic_write(path, lambda f: f.write("new"), mode="w")
+
+            with open(path) as f:
+                self.assertEqual(f.read(), "new")
+            self.assertEqual(os.listdir(tmp_dir), ["test.txt"])
+
+    def test_atomic_write_error(self):
+        def write_function(f):
+            f.write("partial")
+            raise OSError("No space left on device")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test.txt")
+            with open(path, "w") as f:
+                f.write("old")
+
+            self.assertRaises(OSError, atomic_write, path, write_function, "w")
+
+            with open(path) as f:
+                self.assertEqual(f.read(), "old")
+            self.assertEqual(os.listdir(tmp_dir), ["test.txt"])
+
 
 if __name__ == "__main__":
     unittest.main()
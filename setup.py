@@ -142,7 +142,8 @@ setup(
             "hypernets_sequence_processor = hypernets_processor.cli.sequence_processor_cli:cli",
             "hypernets_scheduler = hypernets_processor.cli.scheduler_cli:cli",
             "hypernets_processor_setup = hypernets_processor.cli.setup_processor_cli:cli",
-            "hypernets_processor_job_init = hypernets_processor.cli.init_job_cli:cli"
+            "hypernets_processor_job_init = hypernets_processor.cli.init_job_cli:cli",
+            "hypernets_merge_db = hypernets_processor.cli.merge_db_cli:cli",
         ],
     },
 )